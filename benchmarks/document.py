@@ -0,0 +1,127 @@
+"""Per-document overhead of the `Document` container.
+
+Runs the attribute traffic of a pipeline on documents, without the models:
+the cleaner, tokenizer, featurizer, classifier and entity extractor set
+their attributes, the next components read them and the result is
+serialized. Compares the `Document` built on `AttributeDict` with the same
+document built on the converting `Dict`:
+
+    python benchmarks/document.py --documents 10000 --tokens 50
+
+For each container and step, reports the time per document and the memory
+blocks per document that the step leaves allocated (the documents or
+copies it returns), as counted by tracemalloc.
+"""
+import argparse
+import copy
+import pickle
+import time
+import tracemalloc
+
+import numpy as np
+
+from kolibri.document import Document
+from kolibri.tokenizer.token_ import Token
+from kolibri.utils import Dict
+
+
+class DictDocument(Dict):
+    """The document before `AttributeDict`, on the converting `Dict`."""
+
+    def __init__(self, text="", data=None, output_properties=None, time=None):
+        self.raw_text = text
+        self.time = time
+        if data:
+            super(Dict, self).__init__(data)
+        self.output_properties = output_properties if output_properties else set()
+
+    @property
+    def text(self):
+        if "clean" in self:
+            return self["clean"]
+        return self.raw_text
+
+
+def default_output_attributes():
+    return {"target": {"name": None, "confidence": 0.0}, "entities": []}
+
+
+def make_inputs(n_tokens, n_features):
+    text = " ".join("word{}".format(i) for i in range(n_tokens))
+    tokens, start = [], 0
+    for i, word in enumerate(text.split()):
+        tokens.append(Token(word, start, i))
+        start += len(word) + 1
+    features = np.ones(n_features, dtype=np.float32)
+    ranking = [{"name": "class{}".format(i), "confidence": 0.1} for i in range(10)]
+    entities = [{"entity": "person", "value": "word1", "start": 6, "end": 11, "extractor": "crf"}]
+    return text, tokens, features, ranking, entities
+
+
+def process(cls, inputs):
+    """The attributes set and read by a pipeline on one document."""
+    text, tokens, features, ranking, entities = inputs
+    document = cls(text, default_output_attributes())
+    document.clean = document.raw_text
+    document.tokens = list(tokens)
+    document.text_features = features
+    document.target = {"name": ranking[0]["name"], "confidence": ranking[0]["confidence"]}
+    document.target_ranking = ranking
+    document.entities = document.entities + entities
+    for name in ("text", "tokens", "text_features", "target", "entities", "missing"):
+        getattr(document, name)
+    return document
+
+
+def serialize(document):
+    return dict(target=document.target, entities=document.entities,
+                target_ranking=document.target_ranking, text=document.text)
+
+
+STEPS = [
+    ("pipeline", lambda cls, inputs, documents: [process(cls, inputs) for _ in documents]),
+    ("output", lambda cls, inputs, documents: [serialize(d) for d in documents]),
+    ("to_dict", lambda cls, inputs, documents: [d.to_dict() for d in documents]),
+    ("deepcopy", lambda cls, inputs, documents: [copy.deepcopy(d) for d in documents]),
+    ("pickle", lambda cls, inputs, documents: [pickle.loads(pickle.dumps(d, -1)) for d in documents]),
+]
+
+
+def measure(cls, inputs, n_documents):
+    results = {}
+    documents = [None] * n_documents
+    for name, step in STEPS:
+        start = time.perf_counter()
+        output = step(cls, inputs, documents)
+        elapsed = time.perf_counter() - start
+        del output
+
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        output = step(cls, inputs, documents)
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+        if name == "pipeline":
+            documents = output
+        del output
+        results[name] = (elapsed / n_documents, blocks / float(n_documents))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--documents", type=int, default=10000)
+    parser.add_argument("--tokens", type=int, default=50)
+    parser.add_argument("--features", type=int, default=300)
+    args = parser.parse_args()
+
+    inputs = make_inputs(args.tokens, args.features)
+    print("{:>14} {:>10} {:>10} {:>14}".format("container", "step", "time (us)", "blocks / doc"))
+    for cls in (DictDocument, Document):
+        for name, (elapsed, blocks) in measure(cls, inputs, args.documents).items():
+            print("{:>14} {:>10} {:>10.1f} {:>14.1f}".format(cls.__name__, name, elapsed * 1e6, blocks))
+
+
+if __name__ == "__main__":
+    main()
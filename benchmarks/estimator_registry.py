@@ -0,0 +1,70 @@
+"""Import time of the classifier models and cost of selecting an estimator.
+
+Every measure runs in a fresh interpreter, so that the modules imported by
+a previous measure do not hide the cost of the next one:
+
+    python benchmarks/estimator_registry.py --models lrg svm rf xgb
+
+For each model type, reports the time to import `kolibri.classifier.models`,
+to create the first and the next estimators, to create a
+`SkLearnClassifier`, and which of the heavy libraries ended up imported.
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+HEAVY_MODULES = ["xgboost", "sklearn_crfsuite", "mlxtend", "sklearn.ensemble",
+                 "sklearn.neural_network", "sklearn.svm", "sklearn.neighbors"]
+
+MEASURE = r"""
+import json, sys, time
+
+start = time.perf_counter()
+from kolibri.classifier import models
+import_time = time.perf_counter() - start
+
+model_type, repeat = sys.argv[1], int(sys.argv[2])
+start = time.perf_counter()
+models.get_kolibri_model(model_type)
+first_time = time.perf_counter() - start
+start = time.perf_counter()
+for _ in range(repeat):
+    models.get_kolibri_model(model_type)
+next_time = (time.perf_counter() - start) / repeat
+
+from kolibri.classifier.sklearn_classifier import SkLearnClassifier
+start = time.perf_counter()
+for _ in range(repeat):
+    SkLearnClassifier({"models": [model_type]})
+init_time = (time.perf_counter() - start) / repeat
+
+print(json.dumps({"import": import_time, "first": first_time, "next": next_time,
+                  "init": init_time,
+                  "imported": [m for m in json.loads(sys.argv[3]) if m in sys.modules]}))
+"""
+
+
+def measure(model_type, repeat):
+    output = subprocess.check_output([sys.executable, "-c", MEASURE, model_type, str(repeat),
+                                      json.dumps(HEAVY_MODULES)])
+    return json.loads(output.decode("utf-8").strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--models", nargs="+", default=["lrg", "svm", "knn", "nb", "rf", "dt", "xgb", "crf"])
+    parser.add_argument("--repeat", type=int, default=1000)
+    args = parser.parse_args()
+
+    print("{:>6} {:>11} {:>10} {:>10} {:>10}  {}".format(
+        "model", "import (ms)", "first (ms)", "next (us)", "init (us)", "heavy modules imported"))
+    for model_type in args.models:
+        result = measure(model_type, args.repeat)
+        print("{:>6} {:>11.1f} {:>10.2f} {:>10.1f} {:>10.1f}  {}".format(
+            model_type, result["import"] * 1000., result["first"] * 1000., result["next"] * 1e6,
+            result["init"] * 1e6, ", ".join(result["imported"]) or "-"))
+
+
+if __name__ == "__main__":
+    main()
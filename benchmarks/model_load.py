@@ -0,0 +1,93 @@
+"""Startup time and per-worker memory of a persisted model.
+
+Every worker process loads the model on its own, like gunicorn workers
+without `--preload`, parses a text and reports its load time and memory.
+Run it once with memory mapping and once without to compare:
+
+    python benchmarks/model_load.py path/to/model --workers 4 --mmap r
+    python benchmarks/model_load.py path/to/model --workers 4 --mmap none
+
+RSS counts the shared pages in every worker, PSS splits them between the
+workers that map them and USS only counts the private ones, so the memory
+saved by sharing the model shows in PSS and USS.
+"""
+import argparse
+import multiprocessing
+import resource
+import time
+
+
+def memory_usage():
+    """Returns the RSS, PSS and USS of the current process in MB (Linux)."""
+    usage = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                fields = line.split()
+                if fields[0] in ("Rss:", "Pss:", "Private_Clean:", "Private_Dirty:"):
+                    usage[fields[0][:-1]] = int(fields[1]) / 1024.
+    except (IOError, OSError):
+        usage["Rss"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.
+    return {
+        "rss": usage.get("Rss"),
+        "pss": usage.get("Pss"),
+        "uss": usage.get("Private_Clean", 0) + usage.get("Private_Dirty", 0) if "Pss" in usage else None
+    }
+
+
+def load_and_parse(model_dir, mmap_mode, text, barrier):
+    from kolibri.model import Interpreter
+
+    start = time.perf_counter()
+    interpreter = Interpreter.load(model_dir, mmap_mode=mmap_mode)
+    load_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    interpreter.parse(text)
+    first_parse = time.perf_counter() - start
+
+    # measure once every worker has loaded the model, so that PSS
+    # accounts for all the processes sharing the pages
+    barrier.wait()
+    result = dict(memory_usage(), load=load_time, first_parse=first_parse)
+    barrier.wait()
+    return result
+
+
+def _worker(args):
+    return load_and_parse(*args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("model_dir", help="directory of the persisted model")
+    parser.add_argument("--workers", type=int, default=4, help="number of worker processes")
+    parser.add_argument("--mmap", default="r", help="mmap mode of the arrays, 'none' loads them in memory")
+    parser.add_argument("--text", default="This is a short text to warm up the model.")
+    args = parser.parse_args()
+
+    mmap_mode = False if args.mmap.lower() == "none" else args.mmap
+
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Manager() as manager:
+        barrier = manager.Barrier(args.workers)
+        with ctx.Pool(args.workers) as pool:
+            results = pool.map(_worker, [(args.model_dir, mmap_mode, args.text, barrier)] * args.workers)
+
+    print("mmap_mode={} workers={}".format(args.mmap, args.workers))
+    print("{:>6} {:>10} {:>12} {:>10} {:>10} {:>10}".format("worker", "load (s)", "1st parse (s)",
+                                                          "RSS (MB)", "PSS (MB)", "USS (MB)"))
+
+    def fmt(value):
+        return "{:10.1f}".format(value) if value is not None else "{:>10}".format("n/a")
+
+    for i, r in enumerate(results):
+        print("{:>6} {:10.2f} {:12.3f} {} {} {}".format(i, r["load"], r["first_parse"],
+                                                         fmt(r["rss"]), fmt(r["pss"]), fmt(r["uss"])))
+    total_pss = [r["pss"] for r in results if r["pss"] is not None]
+    if total_pss:
+        print("total PSS of the workers: {:.1f} MB".format(sum(total_pss)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Latency and throughput of `kolibri.server` at increasing concurrency.
+
+Start the server, then run the load generator against it:
+
+    python -m kolibri.server path/to/model --workers 4 --port 5005
+    python benchmarks/server_load.py --port 5005 --concurrency 1 4 16 64 --duration 10
+
+Every client keeps one connection open and sends its next request as soon
+as it gets the previous response, so the concurrency is the number of
+requests in flight. Rejected requests (503) are counted apart.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import numpy as np
+
+
+async def request(reader, writer, host, body):
+    writer.write(("POST /parse HTTP/1.1\r\nHost: {}\r\nContent-Type: application/json\r\n"
+                  "Content-Length: {}\r\n\r\n").format(host, len(body)).encode("latin-1") + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def client(host, port, texts, offset, deadline, latencies, statuses):
+    reader, writer = await asyncio.open_connection(host, port)
+    i = offset
+    try:
+        while time.perf_counter() < deadline:
+            body = json.dumps({"text": texts[i % len(texts)]}).encode("utf-8")
+            start = time.perf_counter()
+            status = await request(reader, writer, host, body)
+            if status == 200:
+                latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+            i += 1
+    finally:
+        writer.close()
+
+
+async def run_level(host, port, texts, concurrency, duration):
+    latencies, statuses = [], {}
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(*[client(host, port, texts, c, deadline, latencies, statuses)
+                           for c in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    return latencies, statuses, elapsed
+
+
+async def fetch_metrics(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write("GET /metrics HTTP/1.1\r\nHost: {}\r\nConnection: close\r\n\r\n"
+                 "".format(host).encode("latin-1"))
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return json.loads(response.split(b"\r\n\r\n", 1)[1].decode("utf-8"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5005)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument("--duration", type=float, default=10., help="seconds per concurrency level")
+    parser.add_argument("--texts", help="file with one text per line to send")
+    args = parser.parse_args()
+
+    if args.texts:
+        with open(args.texts, encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()]
+    else:
+        texts = ["This is test request number {} for the server.".format(i) for i in range(100)]
+
+    loop = asyncio.get_event_loop()
+    print("{:>11} {:>10} {:>9} {:>9} {:>9} {:>9} {:>10}".format(
+        "concurrency", "requests", "req/s", "p50 (ms)", "p99 (ms)", "rejected", "batch size"))
+    for concurrency in args.concurrency:
+        before = loop.run_until_complete(fetch_metrics(args.host, args.port))
+        latencies, statuses, elapsed = loop.run_until_complete(
+            run_level(args.host, args.port, texts, concurrency, args.duration))
+        after = loop.run_until_complete(fetch_metrics(args.host, args.port))
+        batches = after["batches"] - before["batches"]
+        batch_size = (after["texts"] - before["texts"]) / batches if batches else 0.
+        if latencies:
+            p50, p99 = np.percentile(np.asarray(latencies) * 1000., [50, 99])
+        else:
+            p50 = p99 = float("nan")
+        print("{:>11} {:>10} {:>9.1f} {:>9.2f} {:>9.2f} {:>9} {:>10.1f}".format(
+            concurrency, len(latencies), len(latencies) / elapsed, p50, p99,
+            statuses.get(503, 0), batch_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,387 @@
+import logging
+import os
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Text
+from typing import Tuple
+
+import numpy as np
+
+from kolibri import settings
+from kolibri.classifier.model import Classifier
+from kolibri.utils.file import dump_artifact, load_artifact
+
+logger = logging.getLogger(__name__)
+
+ANN_INDEX_FILE_NAME = "classifier_ann.pkl"
+
+# rows scored at once when assigning vectors to their list
+_ASSIGN_CHUNK = 65536
+
+
+def _top_k(scores, k):
+    """Indices of the `k` highest scores, best first."""
+    if k >= len(scores):
+        return np.argsort(-scores, kind="mergesort")
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind="mergesort")]
+
+
+class IVFIndex(object):
+    """Approximate nearest neighbour index in numpy, for cosine or inner
+    product similarity.
+
+    The vectors are clustered by k-means into `n_lists` inverted lists. A
+    query is only scored against the vectors of the `n_probe` lists whose
+    centroid is the most similar to it, so it costs about
+    `n_probe / n_lists` of an exhaustive search. Raising `n_probe` trades
+    latency for recall, `n_probe = n_lists` is exact.
+
+    High dimensional vectors, e.g. TF-IDF features, can be reduced to
+    `projection_dim` dimensions by a gaussian random projection, which
+    approximately preserves their inner products.
+
+    Vectors added after the lists are built go to the list of their
+    nearest centroid; `build` clusters the whole index again when the
+    distribution of the data changed.
+    """
+
+    def __init__(self,
+                 metric="cosine",  # type: Text
+                 n_lists=None,  # type: Optional[int]
+                 n_probe=8,  # type: int
+                 projection_dim=None,  # type: Optional[int]
+                 kmeans_iterations=10,  # type: int
+                 random_state=0  # type: int
+                 ):
+        # type: (...) -> None
+        if metric not in ("cosine", "inner_product"):
+            raise ValueError("Unknown metric '{}', use 'cosine' or 'inner_product'.".format(metric))
+        self.metric = metric
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.projection_dim = projection_dim
+        self.kmeans_iterations = kmeans_iterations
+        self.random_state = random_state
+
+        self.projection = None
+        self.centroids = None
+        self._vectors = None
+        self._size = 0
+        self._lists = []
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def vectors(self):
+        # type: () -> np.ndarray
+        """The indexed vectors, projected and normalized."""
+        if self._vectors is None:
+            return np.zeros((0, 0), dtype=np.float32)
+        return self._vectors[:self._size]
+
+    def _prepare(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors.reshape(1, -1)
+        if self.projection is None and self.projection_dim and vectors.shape[1] > self.projection_dim:
+            rng = np.random.RandomState(self.random_state)
+            self.projection = (rng.standard_normal((vectors.shape[1], self.projection_dim))
+                               / np.sqrt(self.projection_dim)).astype(np.float32)
+        if self.projection is not None:
+            vectors = vectors.dot(self.projection)
+        if self.metric == "cosine":
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.maximum(norms, 1e-12)
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+
+    def _assign(self, vectors):
+        assignments = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), _ASSIGN_CHUNK):
+            chunk = vectors[start:start + _ASSIGN_CHUNK]
+            assignments[start:start + _ASSIGN_CHUNK] = np.argmax(chunk.dot(self.centroids.T), axis=1)
+        return assignments
+
+    def _kmeans(self, vectors, n_lists):
+        """Spherical k-means on a sample of the vectors."""
+        rng = np.random.RandomState(self.random_state)
+        sample = vectors
+        if len(vectors) > 256 * n_lists:
+            sample = vectors[rng.choice(len(vectors), 256 * n_lists, replace=False)]
+        self.centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+        for _ in range(self.kmeans_iterations):
+            assignments = self._assign(sample)
+            order = np.argsort(assignments, kind="mergesort")
+            present, starts = np.unique(assignments[order], return_index=True)
+            self.centroids[present] = np.add.reduceat(sample[order], starts, axis=0)
+            # lists left empty restart from random vectors
+            empty = np.setdiff1d(np.arange(n_lists), present)
+            if len(empty):
+                self.centroids[empty] = sample[rng.choice(len(sample), len(empty))]
+            norms = np.linalg.norm(self.centroids, axis=1, keepdims=True)
+            self.centroids /= np.maximum(norms, 1e-12)
+
+    def build(self, vectors=None):
+        # type: (Optional[np.ndarray]) -> IVFIndex
+        """Clusters the vectors into the inverted lists, the vectors given
+        replace the indexed ones."""
+        if vectors is not None:
+            self.projection = None
+            self._vectors = self._prepare(vectors)
+            self._size = len(self._vectors)
+        vectors = self.vectors
+        n_lists = self.n_lists or int(np.sqrt(len(vectors)))
+        n_lists = max(1, min(n_lists, len(vectors)))
+        if n_lists == 1:
+            self.centroids = np.zeros((1, vectors.shape[1]), dtype=np.float32)
+            assignments = np.zeros(len(vectors), dtype=np.int64)
+        else:
+            self._kmeans(vectors, n_lists)
+            assignments = self._assign(vectors)
+        order = np.argsort(assignments, kind="mergesort")
+        bounds = np.searchsorted(assignments[order], np.arange(n_lists + 1))
+        self._lists = [order[bounds[i]:bounds[i + 1]] for i in range(n_lists)]
+        return self
+
+    def add(self, vectors):
+        # type: (np.ndarray) -> np.ndarray
+        """Adds vectors to the index and returns their ids."""
+        vectors = self._prepare(vectors)
+        ids = np.arange(self._size, self._size + len(vectors))
+        if self._vectors is None:
+            self._vectors = vectors
+        else:
+            if self._size + len(vectors) > len(self._vectors) or not self._vectors.flags.writeable:
+                # grows by half to amortize the copies
+                capacity = max(self._size + len(vectors), int(self._size * 1.5))
+                grown = np.empty((capacity, vectors.shape[1]), dtype=np.float32)
+                grown[:self._size] = self._vectors[:self._size]
+                self._vectors = grown
+            self._vectors[self._size:self._size + len(vectors)] = vectors
+        self._size += len(vectors)
+        if self.centroids is None:
+            self.build()
+            return ids
+        assignments = self._assign(vectors)
+        for list_id in np.unique(assignments):
+            self._lists[list_id] = np.concatenate([self._lists[list_id], ids[assignments == list_id]])
+        return ids
+
+    def search(self, queries, k=10, n_probe=None):
+        # type: (np.ndarray, int, Optional[int]) -> Tuple[np.ndarray, np.ndarray]
+        """Returns the similarities and the ids of the `k` nearest
+        neighbours of each query, best first. Missing neighbours have the
+        id -1."""
+        queries = self._prepare(queries)
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        if not self._size:
+            return scores, ids
+        n_probe = min(n_probe or self.n_probe, len(self._lists))
+        vectors = self.vectors
+        probes = None
+        if n_probe < len(self._lists):
+            centroid_scores = queries.dot(self.centroids.T)
+            probes = np.argpartition(-centroid_scores, n_probe - 1, axis=1)[:, :n_probe]
+        for i, query in enumerate(queries):
+            if probes is None:
+                candidates = None
+                similarities = vectors.dot(query)
+            else:
+                candidates = np.concatenate([self._lists[c] for c in probes[i]])
+                similarities = vectors[candidates].dot(query)
+            top = _top_k(similarities, k)
+            scores[i, :len(top)] = similarities[top]
+            ids[i, :len(top)] = top if candidates is None else candidates[top]
+        return scores, ids
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # the lists are stored as one array of ids in list order, so that
+        # they are memory mapped on load
+        state["_vectors"] = self.vectors if self._vectors is not None else None
+        lists = self._lists
+        state["_lists"] = None
+        state["_list_ids"] = np.concatenate(lists) if lists else np.zeros(0, dtype=np.int64)
+        state["_list_bounds"] = np.cumsum([0] + [len(ids) for ids in lists])
+        return state
+
+    def __setstate__(self, state):
+        list_ids = state.pop("_list_ids")
+        bounds = state.pop("_list_bounds")
+        self.__dict__.update(state)
+        self._lists = [list_ids[bounds[i]:bounds[i + 1]] for i in range(len(bounds) - 1)]
+
+
+class ANNClassifier(Classifier):
+    """k nearest neighbours classifier and similarity search over the
+    `text_features` of the training examples, backed by an `IVFIndex`.
+
+    The classes are ranked by the summed similarity of the neighbours of
+    each class (or their count with uniform weights). `most_similar`
+    returns the training examples nearest to a document."""
+
+    name = "classifier_ann"
+
+    provides = ["classification", "target_ranking"]
+
+    requires = ["text_features"]
+
+    defaults = {
+        "n_neighbors": 10,
+
+        # "cosine" or "inner_product"
+        "metric": "cosine",
+
+        # "similarity" sums the similarities of the neighbours of a class,
+        # "uniform" counts them
+        "weights": "similarity",
+
+        # number of inverted lists, sqrt of the number of examples by default
+        "n_lists": None,
+
+        # lists searched per query, the higher the better the recall and
+        # the slower the query
+        "n_probe": 8,
+
+        # reduces the features to this dimension by random projection
+        "projection_dim": None,
+
+        "kmeans_iterations": 10,
+
+        # keeps the texts of the examples for `most_similar`
+        "store_texts": True,
+
+        "random_state": 0
+    }
+
+    def __init__(self,
+                 component_config=None,  # type: Dict[Text, Any]
+                 index=None,  # type: Optional[IVFIndex]
+                 targets=None,  # type: Optional[np.ndarray]
+                 class_names=None,  # type: Optional[List[Text]]
+                 texts=None  # type: Optional[List[Text]]
+                 ):
+        # type: (...) -> None
+        super(ANNClassifier, self).__init__(component_config)
+        self.index = index
+        self.targets = targets if targets is not None else np.zeros(0, dtype=np.int64)
+        self.class_names = list(class_names) if class_names is not None else []
+        self.texts = texts if texts is not None else []
+
+    def _new_index(self):
+        return IVFIndex(metric=self.component_config["metric"],
+                        n_lists=self.component_config["n_lists"],
+                        n_probe=self.component_config["n_probe"],
+                        projection_dim=self.component_config["projection_dim"],
+                        kmeans_iterations=self.component_config["kmeans_iterations"],
+                        random_state=self.component_config["random_state"])
+
+    def _target_ids(self, targets):
+        class_ids = {name: i for i, name in enumerate(self.class_names)}
+        ids = []
+        for target in targets:
+            if target not in class_ids:
+                class_ids[target] = len(self.class_names)
+                self.class_names.append(target)
+            ids.append(class_ids[target])
+        return np.asarray(ids, dtype=np.int64)
+
+    def train(self, training_data, cfg, **kwargs):
+        """Indexes the features of the training examples."""
+        examples = [e for e in training_data.training_examples if e.get("text_features") is not None]
+        if not examples:
+            logger.warning("No training example has text features, the index is empty.")
+            return
+        self.class_names = []
+        self.targets = self._target_ids([e.target for e in examples])
+        self.texts = [e.text for e in examples] if self.component_config["store_texts"] else []
+        self.index = self._new_index().build(np.stack([e.text_features for e in examples]))
+
+    def add_documents(self, documents, targets=None):
+        # type: (List[Any], Optional[List[Text]]) -> None
+        """Adds featurized documents to the index without rebuilding it,
+        with their `targets` or the `target` of each document."""
+        if targets is None:
+            targets = [d.get("target") for d in documents]
+        if self.index is None:
+            self.index = self._new_index()
+        self.index.add(np.stack([d.text_features for d in documents]))
+        self.targets = np.concatenate([np.asarray(self.targets, dtype=np.int64),
+                                       self._target_ids(targets)])
+        if self.component_config["store_texts"]:
+            self.texts = list(self.texts) + [d.text for d in documents]
+
+    def neighbors(self, document, k=None, n_probe=None):
+        # type: (Any, Optional[int], Optional[int]) -> Tuple[np.ndarray, np.ndarray]
+        """Returns the similarities and the ids of the nearest training
+        examples of a featurized document."""
+        k = k or self.component_config["n_neighbors"]
+        scores, ids = self.index.search(document.text_features, k, n_probe)
+        found = ids[0] >= 0
+        return scores[0][found], ids[0][found]
+
+    def most_similar(self, document, k=10, n_probe=None):
+        # type: (Any, int, Optional[int]) -> List[Dict[Text, Any]]
+        """Returns the `k` training examples the most similar to a
+        featurized document, most similar first."""
+        if self.index is None:
+            return []
+        scores, ids = self.neighbors(document, k, n_probe)
+        return [{"id": int(i),
+                 "text": self.texts[i] if i < len(self.texts) else None,
+                 "target": self.class_names[self.targets[i]],
+                 "similarity": float(score)}
+                for score, i in zip(scores, ids)]
+
+    def process(self, document, **kwargs):
+        # type: (Any, **Any) -> None
+        """Ranks the classes of the nearest neighbours of a document."""
+        target = None
+        target_ranking = []
+        if self.index is not None and len(self.index):
+            scores, ids = self.neighbors(document)
+            if len(ids):
+                weights = np.ones(len(ids)) if self.component_config["weights"] == "uniform" \
+                    else np.maximum(scores, 0.)
+                votes = np.bincount(self.targets[ids], weights=weights, minlength=len(self.class_names))
+                total = votes.sum()
+                confidences = votes / total if total > 0 else votes
+                ranking = _top_k(confidences, settings.modeling['TARGET_RANKING_LENGTH'])
+                ranking = [i for i in ranking if votes[i] > 0]
+                target_ranking = [{"name": self.class_names[i], "confidence": float(confidences[i])}
+                                  for i in ranking]
+                target = target_ranking[0] if target_ranking else None
+
+        document.target = target
+        document.set_output_property("target")
+        document.target_ranking = target_ranking
+        document.set_output_property("target_ranking")
+
+    @classmethod
+    def load(cls,
+             model_dir=None,  # type: Optional[Text]
+             model_metadata=None,  # type: Optional[Metadata]
+             cached_component=None,  # type: Optional[ANNClassifier]
+             **kwargs  # type: Any
+             ):
+        # type: (...) -> ANNClassifier
+        meta = model_metadata.for_component(cls.name)
+        file_name = meta.get("classifier_file", ANN_INDEX_FILE_NAME)
+        classifier_file = os.path.join(model_dir, file_name)
+
+        if os.path.exists(classifier_file):
+            return load_artifact(classifier_file, model_metadata.mmap_mode)
+        else:
+            return cls(meta)
+
+    def persist(self, model_dir):
+        # type: (Text) -> Dict[Text, Any]
+        """Persists the index; its arrays are memory mapped on load."""
+        classifier_file = os.path.join(model_dir, ANN_INDEX_FILE_NAME)
+        dump_artifact(self, classifier_file)
+
+        return {"classifier_file": ANN_INDEX_FILE_NAME}
@@ -12,15 +12,21 @@ from sklearn.preprocessing import LabelEncoder
 
 from keras.layers import Embedding
 from keras.layers import Dense, Input, Flatten
-from keras.layers import Conv1D, MaxPooling1D, Embedding, Concatenate
+from keras.layers import Conv1D, MaxPooling1D, GlobalMaxPooling1D, Embedding, Concatenate
 from keras.models import Model
 import pandas as pd
 
+from kolibri.classifier.dnn.preprocessing import pad_batch
+from kolibri.classifier.dnn.utils import BucketedSequence, load_glove
+
 
 MAX_SEQUENCE_LENGTH = 1000
+# the shortest input the convolution and pooling stacks accept
+MIN_SEQUENCE_LENGTH = 150
 MAX_NB_WORDS = 20000
 EMBEDDING_DIM = 160
 VALIDATION_SPLIT = 0.2
+WORKERS = 4
 
 
 data=pd.read_excel('/Users/mohamedmentis/Documents/Mentis/Development/Python/Engie/data/NL_topic_Invoice.xlsx')
@@ -35,56 +41,50 @@ def clean_str(string):
     string = re.sub(r"\"", "", string)
     return string.strip().lower()
 
-texts = []
-labels = []
-
-for idx, row  in data.iterrows():
-    text = row['Text']
-    texts.append(clean_str(text))
-    labels.append(row['Intent'])
+texts = data['Text'].map(clean_str).tolist()
+labels = data['Intent'].tolist()
 
 tokenizer = Tokenizer(nb_words=MAX_NB_WORDS)
 tokenizer.fit_on_texts(texts)
-sequences = tokenizer.texts_to_sequences(texts)
 
 word_index = tokenizer.word_index
 print('Found %s unique tokens.' % len(word_index))
 
-data = pad_sequences(sequences, maxlen=MAX_SEQUENCE_LENGTH)
-
 #labels = to_categorical(np.asarray(labels))
 encoder = LabelEncoder()
 encoder.fit(labels)
 encoded_Y = encoder.transform(labels)
 # convert integers to dummy variables (i.e. one hot encoded)
 labels = to_categorical(encoded_Y)
-print('Shape of data tensor:', data.shape)
 print('Shape of label tensor:', labels.shape)
 
-indices = np.arange(data.shape[0])
-np.random.shuffle(indices)
-data = data[indices]
-labels = labels[indices]
-nb_validation_samples = int(VALIDATION_SPLIT * data.shape[0])
 
-x_train = data[:-nb_validation_samples]
-y_train = labels[:-nb_validation_samples]
-x_val = data[-nb_validation_samples:]
-y_val = labels[-nb_validation_samples:]
+def featurize(batch_texts, batch_labels):
+    """turns a batch of texts into word ids, padded to the longest text of the batch"""
+    sequences = tokenizer.texts_to_sequences(batch_texts)
+    # a multiple of 5 keeps the pooled outputs of the 3 and 4 wide convolutions of the same length
+    return pad_batch(sequences, max_length=MAX_SEQUENCE_LENGTH, min_length=MIN_SEQUENCE_LENGTH, multiple=5), \
+           np.asarray(batch_labels)
+
+
+indices = np.random.permutation(len(texts))
+nb_validation_samples = int(VALIDATION_SPLIT * len(texts))
+train_indices = indices[:-nb_validation_samples]
+val_indices = indices[-nb_validation_samples:]
+lengths = [len(text.split()) for text in texts]
+
+# the texts are featurized batch by batch in background workers, in batches of texts of similar lengths
+train_seq = BucketedSequence([texts[i] for i in train_indices], labels[train_indices], batch_size=4,
+                             preprocess=featurize, lengths=[lengths[i] for i in train_indices])
+val_seq = BucketedSequence([texts[i] for i in val_indices], labels[val_indices], batch_size=4,
+                           preprocess=featurize, lengths=[lengths[i] for i in val_indices], shuffle=False)
 
 print('Number of positive and negative reviews in traing and validation set ')
-print(y_train.sum(axis=0))
-print(y_val.sum(axis=0))
+print(labels[train_indices].sum(axis=0))
+print(labels[val_indices].sum(axis=0))
 
 GLOVE_DIR = "/Users/mohamedmentis/kilibri_data/embeddings/nl"
-embeddings_index = {}
-f = open(os.path.join(GLOVE_DIR, 'combined-160.txt'))
-for line in f:
-    values = line.split()
-    word = values[0]
-    coefs = np.asarray(values[1:], dtype='float32')
-    embeddings_index[word] = coefs
-f.close()
+embeddings_index = load_glove(os.path.join(GLOVE_DIR, 'combined-160.txt'))
 
 print('Total %s word vectors in Glove 6B 100d.' % len(embeddings_index))
 
@@ -98,19 +98,17 @@ for word, i in word_index.items():
 embedding_layer = Embedding(len(word_index) + 1,
                             EMBEDDING_DIM,
                             weights=[embedding_matrix],
-                            input_length=MAX_SEQUENCE_LENGTH,
                             trainable=True)
 
-sequence_input = Input(shape=(MAX_SEQUENCE_LENGTH,), dtype='int32')
+sequence_input = Input(shape=(None,), dtype='int32')
 embedded_sequences = embedding_layer(sequence_input)
 l_cov1 = Conv1D(128, 5, activation='relu')(embedded_sequences)
 l_pool1 = MaxPooling1D(5)(l_cov1)
 l_cov2 = Conv1D(128, 5, activation='relu')(l_pool1)
 l_pool2 = MaxPooling1D(5)(l_cov2)
 l_cov3 = Conv1D(128, 5, activation='relu')(l_pool2)
-l_pool3 = MaxPooling1D(35)(l_cov3)  # global max pooling
-l_flat = Flatten()(l_pool3)
-l_dense = Dense(128, activation='relu')(l_flat)
+l_pool3 = GlobalMaxPooling1D()(l_cov3)
+l_dense = Dense(128, activation='relu')(l_pool3)
 preds = Dense(21, activation='softmax')(l_dense)
 
 model = Model(sequence_input, preds)
@@ -120,8 +118,8 @@ model.compile(loss='categorical_crossentropy',
 
 print("model fitting - simplified convolutional neural network")
 model.summary()
-model.fit(x_train, y_train, validation_data=(x_val, y_val),
-          nb_epoch=10, batch_size=4)
+model.fit_generator(train_seq, validation_data=val_seq,
+                    epochs=10, workers=WORKERS)
 
 embedding_matrix = np.random.random((len(word_index) + 1, EMBEDDING_DIM))
 for word, i in word_index.items():
@@ -133,14 +131,13 @@ for word, i in word_index.items():
 embedding_layer = Embedding(len(word_index) + 1,
                             EMBEDDING_DIM,
                             weights=[embedding_matrix],
-                            input_length=MAX_SEQUENCE_LENGTH,
                             trainable=True)
 
 # applying a more complex convolutional approach
 convs = []
 filter_sizes = [3, 4]
 
-sequence_input = Input(shape=(MAX_SEQUENCE_LENGTH,), dtype='int32')
+sequence_input = Input(shape=(None,), dtype='int32')
 embedded_sequences = embedding_layer(sequence_input)
 
 for fsz in filter_sizes:
@@ -152,9 +149,8 @@ l_merge = Concatenate()(convs)
 l_cov1 = Conv1D(128, 5, activation='relu')(l_merge)
 l_pool1 = MaxPooling1D(5)(l_cov1)
 l_cov2 = Conv1D(128, 5, activation='relu')(l_pool1)
-l_pool2 = MaxPooling1D(30)(l_cov2)
-l_flat = Flatten()(l_pool2)
-l_dense = Dense(128, activation='relu')(l_flat)
+l_pool2 = GlobalMaxPooling1D()(l_cov2)
+l_dense = Dense(128, activation='relu')(l_pool2)
 preds = Dense(21, activation='softmax')(l_dense)
 
 model = Model(sequence_input, preds)
@@ -164,5 +160,5 @@ model.compile(loss='categorical_crossentropy',
 
 print("model fitting - more complex convolutional neural network")
 model.summary()
-model.fit(x_train, y_train, validation_data=(x_val, y_val),
-          nb_epoch=10, batch_size=4)
\ No newline at end of file
+model.fit_generator(train_seq, validation_data=val_seq,
+                    epochs=10, workers=WORKERS)
\ No newline at end of file
@@ -6,7 +6,7 @@ from seqeval.metrics import f1_score
 from kolibri.classifier.dnn.bilstmcrf import BiLstmCrf, save_model, load_model, BiLstrmCnnCRF
 from kolibri.classifier.dnn.preprocessing import FeatureTransformer
 from kolibri.classifier.dnn.utils import filter_embeddings
-from kolibri.classifier.dnn.utils import NERSequence
+from kolibri.classifier.dnn.utils import BucketedSequence
 from kolibri.classifier.dnn.callbacks import F1score
 import logging
 import numpy as np
@@ -49,8 +49,10 @@ class DnnModel(object):
         self.model_type=model_type
 
     def fit(self, X, y,validate=True,
-            epochs=5, batch_size=10, verbose=1, callbacks=None, shuffle=True):
-        X_train = X_valid = y_train = y_valid = None
+            epochs=5, batch_size=10, verbose=1, callbacks=None, shuffle=True,
+            workers=1, use_multiprocessing=False, bucket_pool_size=100):
+        X_train, y_train = X, y
+        X_valid = y_valid = None
 
         if validate:
             X_train, X_valid, y_train, y_valid = train_test_split(X, y, test_size=0.1)
@@ -71,6 +73,12 @@ class DnnModel(object):
                 List of callbacks to apply during training.
             shuffle: Boolean (whether to shuffle the training data
                 before each epoch). `shuffle` will default to True.
+            workers: Integer. Number of background workers featurizing
+                the batches.
+            use_multiprocessing: Boolean. Featurize in processes rather
+                than threads.
+            bucket_pool_size: Integer. Number of batches sorted by length
+                together, see `bucket_batches`.
         """
         p = FeatureTransformer(initial_vocab=self.initial_vocab, use_char=self.use_char)
         p.fit(X_train, y_train)
@@ -106,20 +114,24 @@ class DnnModel(object):
         model, loss = model.build()
         model.compile(loss=loss, optimizer=self.optimizer)
 
-        train_seq = NERSequence(X_train, y_train, batch_size, p.transform)
+        # each batch is padded to the longest of its sentences, which are of similar lengths
+        train_seq = BucketedSequence(X_train, y_train, batch_size, p.transform,
+                                     pool_size=bucket_pool_size, shuffle=shuffle)
 
+        f1 = None
         if X_valid and y_valid:
-            valid_seq = NERSequence(X_valid, y_valid, batch_size, p.transform)
+            valid_seq = BucketedSequence(X_valid, y_valid, batch_size, p.transform, shuffle=False)
             f1 = F1score(valid_seq, preprocessor=p)
             callbacks = [f1] + callbacks if callbacks else [f1]
-        print(epochs)
         model.fit_generator(generator=train_seq,
                             epochs=epochs,
                             callbacks=callbacks,
                             verbose=verbose,
-                            shuffle=shuffle)
+                            shuffle=shuffle,
+                            workers=workers,
+                            use_multiprocessing=use_multiprocessing)
 
-        self.current_score = f1.score
+        self.current_score = f1.score if f1 is not None else None
         self.p = p
         self.model = model
 
@@ -6,11 +6,11 @@ import re
 
 import numpy as np
 from sklearn.base import BaseEstimator, TransformerMixin
-from sklearn.externals import joblib
 from keras.utils.np_utils import to_categorical
 from keras.preprocessing.sequence import pad_sequences
 
 from kolibri.classifier.dnn.utils import Vocabulary
+from kolibri.utils.file import dump_artifact, load_artifact
 
 
 def normalize_number(text):
@@ -154,15 +154,40 @@ class FeatureTransformer(BaseEstimator, TransformerMixin):
         return len(self._label_vocab)
 
     def save(self, file_path):
-        joblib.dump(self, file_path)
+        dump_artifact(self, file_path)
 
     @classmethod
-    def load(cls, file_path):
-        p = joblib.load(file_path)
+    def load(cls, file_path, mmap_mode=None):
+        p = load_artifact(file_path, mmap_mode)
 
         return p
 
 
+def pad_batch(sequences, max_length=None, min_length=1, multiple=1, dtype='int32',
+              padding='pre', truncating='pre'):
+    """Pads the sequences of a batch to the length of its longest sequence.
+
+    Args:
+        sequences: List of lists.
+        max_length: the sequences are truncated to this length.
+        min_length: the batch is padded to at least this length, e.g. the
+            receptive field of the convolutions of a model.
+        multiple: the batch length is rounded up to a multiple of this.
+        dtype: Type of the output sequences.
+        padding: 'pre' or 'post', as keras pad_sequences.
+        truncating: 'pre' or 'post', as keras pad_sequences.
+
+    # Returns
+        x: Numpy array of shape `(num_samples, batch_length)`.
+    """
+    length = max([len(seq) for seq in sequences] + [min_length])
+    if max_length:
+        length = min(length, max_length)
+    length = -(-length // multiple) * multiple
+
+    return pad_sequences(sequences, maxlen=length, dtype=dtype, padding=padding, truncating=truncating)
+
+
 def pad_nested_sequences(sequences, dtype='int32'):
     """Pads nested sequences to the same length.
 
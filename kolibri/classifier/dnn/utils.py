@@ -1,13 +1,20 @@
 """
 Utility functions.
 """
+import json
 import math
 import os
+import sys
+from array import array
 from collections import Counter
+from collections.abc import Mapping
+from itertools import repeat
 
 import numpy as np
 from keras.utils import Sequence, get_file
 
+from kolibri.embeddings.vectors import FLOAT16, FLOAT32, INT8, QuantizedMatrix, WordVectors, quantize_rows
+
 
 def download(url):
     """Download a trained weights, config and preprocessor.
@@ -100,6 +107,96 @@ class NERSequence(Sequence):
         self.n += 1
         return result
 
+
+def bucket_batches(lengths, batch_size, pool_size=100, shuffle=True, random_state=None):
+    """Groups the samples into batches of similar lengths.
+
+    The samples are shuffled and cut into pools of `pool_size` batches, each
+    pool is sorted by length and cut into batches, and the batches are
+    shuffled. A batch is then padded to the longest of similar lengths, and
+    the batches of an epoch still come in a random order.
+
+    Args:
+        lengths (list): the length of each sample.
+        batch_size (int): number of samples per batch.
+        pool_size (int): number of batches sorted together, None to sort all
+            the samples.
+        shuffle (boolean): shuffle the samples and the batches.
+        random_state (int or numpy.random.RandomState): seed of the shuffles.
+
+    Returns:
+        list: the sample indices of each batch.
+    """
+    lengths = np.asarray(lengths)
+    if not isinstance(random_state, np.random.RandomState):
+        random_state = np.random.RandomState(random_state)
+    indices = random_state.permutation(len(lengths)) if shuffle else np.arange(len(lengths))
+    pool = batch_size * pool_size if pool_size else max(len(indices), 1)
+
+    batches = []
+    for start in range(0, len(indices), pool):
+        chunk = indices[start:start + pool]
+        chunk = chunk[np.argsort(lengths[chunk], kind='mergesort')]
+        batches.extend(chunk[i:i + batch_size] for i in range(0, len(chunk), batch_size))
+    if shuffle:
+        random_state.shuffle(batches)
+
+    return batches
+
+
+class BucketedSequence(Sequence):
+    """Batches of samples of similar lengths, featurized when they are
+    requested.
+
+    Unlike `NERSequence`, each batch holds samples of similar lengths (see
+    `bucket_batches`), so `preprocess` pads it to a length close to that of
+    its samples rather than to the longest sample of the data set. The
+    samples stay as they are given, only the batches being trained on are
+    featurized, so memory does not grow with the padded size of the data
+    set. Featurizing runs in the background workers of `fit_generator`.
+
+    Args:
+        x (list): the samples, e.g. lists of tokens or texts.
+        y (list): the targets of the samples, or None.
+        batch_size (int): number of samples per batch.
+        preprocess (callable): featurizes and pads a batch, called with the
+            samples and targets of the batch, e.g. `FeatureTransformer.transform`.
+        lengths (list): the length of each sample, `len` of the samples by default.
+        pool_size (int): number of batches sorted by length together.
+        shuffle (boolean): draw new batches at the end of each epoch.
+        random_state (int): seed of the shuffles.
+    """
+
+    def __init__(self, x, y=None, batch_size=32, preprocess=None, lengths=None, pool_size=100,
+                 shuffle=True, random_state=None):
+        self.x = x
+        self.y = y
+        self.batch_size = batch_size
+        self.preprocess = preprocess
+        self.lengths = np.fromiter(map(len, x), dtype=np.int64, count=len(x)) if lengths is None \
+            else np.asarray(lengths)
+        self.pool_size = pool_size
+        self.shuffle = shuffle
+        self.random_state = np.random.RandomState(random_state)
+        self.batches = bucket_batches(self.lengths, batch_size, pool_size, shuffle, self.random_state)
+
+    def __len__(self):
+        return len(self.batches)
+
+    def __getitem__(self, idx):
+        indices = self.batches[idx]
+        batch_x = [self.x[i] for i in indices]
+        batch_y = [self.y[i] for i in indices] if self.y is not None else None
+        if self.preprocess is None:
+            return batch_x, batch_y
+
+        return self.preprocess(batch_x, batch_y)
+
+    def on_epoch_end(self):
+        if self.shuffle:
+            self.batches = bucket_batches(self.lengths, self.batch_size, self.pool_size, True, self.random_state)
+
+
 class Vocabulary(object):
     """A vocabulary that maps tokens to ints (storing a vocabulary).
 
@@ -161,8 +258,9 @@ class Vocabulary(object):
         Returns:
             list: int id of doc.
         """
-        doc = map(self.process_token, doc)
-        return [self.token_to_id(token) for token in doc]
+        if self._lower:
+            doc = [token.lower() for token in doc]
+        return list(map(self._token2id.get, doc, repeat(len(self._token2id) - 1)))
 
     def id2doc(self, ids):
         """Get the token list.
@@ -182,6 +280,7 @@ class Vocabulary(object):
         token_freq = self._token_count.most_common(self._max_size)
         idx = len(self.vocab)
         for token, _ in token_freq:
+            token = sys.intern(token)
             self._token2id[token] = idx
             self._id2token.append(token)
             idx += 1
@@ -254,32 +353,170 @@ def filter_embeddings(embeddings, vocab, dim):
     """Loads word vectors in numpy array.
 
     Args:
-        embeddings (dict): a dictionary of numpy array.
+        embeddings (dict or WordVectors): word vectors indexed by word.
         vocab (dict): word_index lookup table.
+        dim (int): dimension of the word vectors.
 
     Returns:
         numpy array: an array of word embeddings.
     """
-    if not isinstance(embeddings, dict):
+    if not isinstance(embeddings, Mapping):
         return
-    _embeddings = np.zeros([len(vocab), dim])
-    for word in vocab:
-        if word in embeddings:
-            word_idx = vocab[word]
-            _embeddings[word_idx] = embeddings[word]
+    _embeddings = np.zeros([len(vocab), dim], dtype=np.float32)
+
+    if isinstance(embeddings, WordVectors):
+        index = embeddings.index
+        pairs = [(vocab[word], index[word]) for word in vocab if word in index]
+        if pairs:
+            dst, src = np.array(pairs, dtype=np.int64).T
+            # sorted reads keep the memmap access sequential
+            order = np.argsort(src)
+            _embeddings[dst[order]] = embeddings.vectors[src[order]]
+    else:
+        words = [word for word in vocab if word in embeddings]
+        if words:
+            dst = np.fromiter((vocab[word] for word in words), dtype=np.int64, count=len(words))
+            _embeddings[dst] = np.stack([embeddings[word] for word in words])
 
     return _embeddings
 
 
-def load_glove(file):
+# the suffix of the matrix file of each quantization
+MATRIX_SUFFIXES = {FLOAT32: '.f32', FLOAT16: '.f16', INT8: '.i8'}
+
+
+def _glove_cache_paths(file, cache_dir=None, quantization=None):
+    base = os.path.basename(file)
+    directory = cache_dir if cache_dir else os.path.dirname(os.path.abspath(file))
+    prefix = os.path.join(directory, base)
+    quantization = quantization or FLOAT32
+    if quantization not in MATRIX_SUFFIXES:
+        raise ValueError("Unknown quantization '{}', use one of {}.".format(quantization, list(MATRIX_SUFFIXES)))
+    suffix = MATRIX_SUFFIXES[quantization]
+    meta_file = prefix + '.meta.json' if quantization == FLOAT32 else prefix + suffix + '.meta.json'
+    return prefix + '.vocab', prefix + suffix, meta_file
+
+
+def _source_signature(file):
+    stat = os.stat(file)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime}
+
+
+def convert_glove(file, cache_dir=None, quantization=None):
+    """Converts a glove-style text file to a vocabulary index and a raw
+    float32 matrix that can be memory mapped.
+
+    Args:
+        file (str): a path to a glove file.
+        cache_dir (str): where to write the converted files. Defaults to the
+            directory of `file`.
+        quantization (str): 'float16' or 'int8' to write a quantized matrix,
+            the int8 scales of the rows are written to '<matrix>.scales'.
+
+    Returns:
+        tuple(str, str, str): paths of the vocabulary, matrix and meta files.
+    """
+    vocab_file, matrix_file, meta_file = _glove_cache_paths(file, cache_dir, quantization)
+    scales = array('f')
+    words = set()
+    dim = None
+    with open(file, encoding="utf8", errors='ignore') as f, \
+            open(vocab_file + '.tmp', 'w', encoding='utf8') as fv, \
+            open(matrix_file + '.tmp', 'wb') as fm:
+        for line in f:
+            line = line.rstrip().split(' ')
+            word = line[0]
+            if len(line) < 2:
+                continue
+            if dim is None:
+                if len(line) == 2:
+                    # word2vec style "<count> <dim>" header
+                    continue
+                dim = len(line) - 1
+            if len(line) - 1 != dim or word in words:
+                continue
+            words.add(word)
+            row, scale = quantize_rows(np.asarray(line[1:], dtype=np.float32), quantization)
+            fm.write(row.tobytes())
+            if scale is not None:
+                scales.append(float(scale))
+            fv.write(word)
+            fv.write('\n')
+
+    meta = _source_signature(file)
+    meta.update({'rows': len(words), 'dim': dim or 0, 'quantization': quantization or FLOAT32})
+    os.replace(vocab_file + '.tmp', vocab_file)
+    os.replace(matrix_file + '.tmp', matrix_file)
+    if quantization == INT8:
+        with open(matrix_file + '.scales', 'wb') as fs:
+            scales.tofile(fs)
+    with open(meta_file, 'w') as f:
+        json.dump(meta, f)
+
+    return vocab_file, matrix_file, meta_file
+
+
+def load_glove_cache(file, cache_dir=None, quantization=None):
+    """Loads the converted form of a glove file, converting it first if the
+    cache is missing or older than the source file.
+
+    Args:
+        file (str): a path to a glove file.
+        cache_dir (str): where the converted files are kept.
+        quantization (str): 'float16' or 'int8' to keep the vectors quantized,
+            they are dequantized as they are looked up.
+
+    Return:
+        WordVectors: the memory mapped word vectors.
+    """
+    vocab_file, matrix_file, meta_file = _glove_cache_paths(file, cache_dir, quantization)
+    meta = None
+    if os.path.exists(meta_file) and os.path.exists(vocab_file) and os.path.exists(matrix_file):
+        with open(meta_file) as f:
+            meta = json.load(f)
+        signature = _source_signature(file)
+        if meta.get('size') != signature['size'] or meta.get('mtime') != signature['mtime']:
+            meta = None
+    if meta is None:
+        convert_glove(file, cache_dir, quantization)
+        with open(meta_file) as f:
+            meta = json.load(f)
+
+    with open(vocab_file, encoding='utf8') as f:
+        words = f.read().split('\n')[:meta['rows']]
+    index = dict(zip(words, range(len(words))))
+    shape = (meta['rows'], meta['dim'])
+    dtype = {FLOAT16: np.float16, INT8: np.int8}.get(quantization, np.float32)
+    if meta['rows'] == 0:
+        vectors = np.zeros(shape, dtype=np.float32)
+    elif quantization == INT8:
+        vectors = QuantizedMatrix(np.memmap(matrix_file, dtype=dtype, mode='r', shape=shape),
+                                  np.memmap(matrix_file + '.scales', dtype=np.float32, mode='r', shape=shape[:1]))
+    elif quantization == FLOAT16:
+        vectors = QuantizedMatrix(np.memmap(matrix_file, dtype=dtype, mode='r', shape=shape))
+    else:
+        vectors = np.memmap(matrix_file, dtype=dtype, mode='r', shape=shape)
+
+    return WordVectors(index, vectors)
+
+
+def load_glove(file, use_cache=True, cache_dir=None, quantization=None):
     """Loads GloVe vectors in numpy array.
 
     Args:
         file (str): a path to a glove file.
+        use_cache (bool): convert the file once to a binary cache and memory
+            map it on later loads.
+        cache_dir (str): where the converted files are kept.
+        quantization (str): 'float16' or 'int8' to keep the cached vectors
+            quantized, see kolibri.embeddings.vectors.
 
     Return:
-        dict: a dict of numpy arrays.
+        dict: a dict (or a dict like WordVectors) of numpy arrays.
     """
+    if use_cache:
+        return load_glove_cache(file, cache_dir, quantization)
+
     model = {}
     with open(file, encoding="utf8", errors='ignore') as f:
         for line in f:
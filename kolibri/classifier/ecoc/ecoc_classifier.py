@@ -1,6 +1,7 @@
 from sklearn.svm import SVC
 from kolibri.utils.distance import *
 from kolibri.pipeComponent import Component
+from kolibri.utils.file import dump_artifact, load_artifact
 from kolibri.classifier.ecoc import matrix as MT
 import logging
 from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
@@ -9,7 +10,7 @@ from scipy.special import comb
 from kolibri.classifier.models import get_model
 from sklearn.preprocessing import LabelEncoder
 from sklearn.model_selection import StratifiedKFold
-import os, joblib
+import os
 import copy
 logger = logging.getLogger(__name__)
 
@@ -251,10 +252,10 @@ class ECOC(Component):
         classifier_file = os.path.join(model_dir, file_name)
 
         if os.path.exists(classifier_file):
-            model = joblib.load(classifier_file)
+            model = load_artifact(classifier_file, model_metadata.mmap_mode)
             for i, predictor in enumerate(model.predictors):
-                predictor=joblib.load(os.path.join(model_dir, ECOC_PREDICTORS_FILE_NAME.format(i)))
-                model.predictors[i]=joblib.load(os.path.join(model_dir, ECOC_PREDICTORS_FILE_NAME.format(i)))
+                model.predictors[i]=load_artifact(os.path.join(model_dir, ECOC_PREDICTORS_FILE_NAME.format(i)),
+                                                  model_metadata.mmap_mode)
             return model
         else:
             return cls(meta)
@@ -265,7 +266,7 @@ class ECOC(Component):
 
         classifier_file = os.path.join(model_dir, ECOC_MODEL_FILE_NAME)
 
-        joblib.dump(self, classifier_file)
+        dump_artifact(self, classifier_file)
         for i, predictor in enumerate(self.predictors):
-            joblib.dump(predictor, os.path.join(model_dir, ECOC_PREDICTORS_FILE_NAME.format(i)))
+            dump_artifact(predictor, os.path.join(model_dir, ECOC_PREDICTORS_FILE_NAME.format(i)))
         return {"classifier_file": ECOC_MODEL_FILE_NAME}
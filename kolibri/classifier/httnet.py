@@ -22,11 +22,16 @@ from keras import backend as K
 from keras.engine.topology import Layer, InputSpec
 from keras import initializers
 
+from kolibri.classifier.dnn.preprocessing import pad_nested_sequences
+from kolibri.classifier.dnn.utils import BucketedSequence, load_glove
+
 MAX_SENT_LENGTH = 80
 MAX_SENTS = 80
 MAX_NB_WORDS = 20000
 EMBEDDING_DIM = 160
 VALIDATION_SPLIT = 0.2
+WORKERS = 4
+SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+')
 
 
 data=pd.read_excel('/Users/mohamedmentis/Documents/Mentis/Development/Python/Engie/data/NL_topic_Invoice.xlsx')
@@ -41,26 +46,16 @@ def clean_str(string):
     string = re.sub(r"\"", "", string)
     return string.strip().lower()
 
-texts = []
-labels = []
-
-for idx, row  in data.iterrows():
-    text = row['Text']
-    texts.append(clean_str(text))
-    labels.append(row['Intent'])
+texts = data['Text'].map(clean_str).tolist()
+labels = data['Intent'].tolist()
 
 
 
 tokenizer = Tokenizer(nb_words=MAX_NB_WORDS)
 tokenizer.fit_on_texts(texts)
-sequences = tokenizer.texts_to_sequences(texts)
 
 word_index = tokenizer.word_index
 print('Found %s unique tokens.' % len(word_index))
-data = np.zeros((len(texts), MAX_SENTS, MAX_SENT_LENGTH), dtype='int32')
-
-
-data = pad_sequences(sequences, maxlen=MAX_SENT_LENGTH)
 
 #labels = to_categorical(np.asarray(labels))
 encoder = LabelEncoder()
@@ -68,33 +63,37 @@ encoder.fit(labels)
 encoded_Y = encoder.transform(labels)
 # convert integers to dummy variables (i.e. one hot encoded)
 labels = to_categorical(encoded_Y)
-print('Shape of data tensor:', data.shape)
 print('Shape of label tensor:', labels.shape)
 
-indices = np.arange(data.shape[0])
-np.random.shuffle(indices)
-data = data[indices]
-labels = labels[indices]
-nb_validation_samples = int(VALIDATION_SPLIT * data.shape[0])
 
-x_train = data[:-nb_validation_samples]
-y_train = labels[:-nb_validation_samples]
-x_val = data[-nb_validation_samples:]
-y_val = labels[-nb_validation_samples:]
+def featurize(batch_texts, batch_labels):
+    """turns a batch of texts into sentences of word ids, padded to the most sentences and the longest sentence
+    of the batch"""
+    documents = []
+    for text in batch_texts:
+        sentences = SENTENCE_SPLIT.split(text)[:MAX_SENTS]
+        documents.append([sequence[:MAX_SENT_LENGTH] for sequence in tokenizer.texts_to_sequences(sentences)])
+    return pad_nested_sequences(documents), np.asarray(batch_labels)
+
+
+indices = np.random.permutation(len(texts))
+nb_validation_samples = int(VALIDATION_SPLIT * len(texts))
+train_indices = indices[:-nb_validation_samples]
+val_indices = indices[-nb_validation_samples:]
+lengths = [len(text.split()) for text in texts]
+
+# the texts are featurized batch by batch in background workers, in batches of texts of similar lengths
+train_seq = BucketedSequence([texts[i] for i in train_indices], labels[train_indices], batch_size=50,
+                             preprocess=featurize, lengths=[lengths[i] for i in train_indices])
+val_seq = BucketedSequence([texts[i] for i in val_indices], labels[val_indices], batch_size=50,
+                           preprocess=featurize, lengths=[lengths[i] for i in val_indices], shuffle=False)
 
 print('Number of positive and negative reviews in traing and validation set ')
-print(y_train.sum(axis=0))
-print(y_val.sum(axis=0))
+print(labels[train_indices].sum(axis=0))
+print(labels[val_indices].sum(axis=0))
 
 GLOVE_DIR = "/Users/mohamedmentis/kilibri_data/embeddings/nl"
-embeddings_index = {}
-f = open(os.path.join(GLOVE_DIR, 'combined-160.txt'))
-for line in f:
-    values = line.split()
-    word = values[0]
-    coefs = np.asarray(values[1:], dtype='float32')
-    embeddings_index[word] = coefs
-f.close()
+embeddings_index = load_glove(os.path.join(GLOVE_DIR, 'combined-160.txt'))
 
 print('Total %s word vectors in Glove 6B 100d.' % len(embeddings_index))
 
@@ -118,7 +117,6 @@ for word, i in word_index.items():
 embedding_layer = Embedding(len(word_index) + 1,
                             EMBEDDING_DIM,
                             weights=[embedding_matrix],
-                            input_length=MAX_SENT_LENGTH,
                             trainable=True,
                             mask_zero=True)
 
@@ -165,13 +163,13 @@ class AttLayer(Layer):
         return (input_shape[0], input_shape[-1])
 
 
-sentence_input = Input(shape=(MAX_SENT_LENGTH,), dtype='int32')
+sentence_input = Input(shape=(None,), dtype='int32')
 embedded_sequences = embedding_layer(sentence_input)
 l_lstm = Bidirectional(GRU(100, return_sequences=True))(embedded_sequences)
 l_att = AttLayer(100)(l_lstm)
 sentEncoder = Model(sentence_input, l_att)
 
-review_input = Input(shape=(MAX_SENTS, MAX_SENT_LENGTH), dtype='int32')
+review_input = Input(shape=(None, None), dtype='int32')
 review_encoder = TimeDistributed(sentEncoder)(review_input)
 l_lstm_sent = Bidirectional(GRU(100, return_sequences=True))(review_encoder)
 l_att_sent = AttLayer(100)(l_lstm_sent)
@@ -183,5 +181,5 @@ model.compile(loss='categorical_crossentropy',
               metrics=['acc'])
 
 print("model fitting - Hierachical attention network")
-model.fit(x_train, y_train, validation_data=(x_val, y_val),
-          nb_epoch=10, batch_size=50)
\ No newline at end of file
+model.fit_generator(train_seq, validation_data=val_seq,
+                    epochs=10, workers=WORKERS)
\ No newline at end of file
@@ -0,0 +1,354 @@
+"""Budgeted hyperparameter search over `models.get_model_parameters_range`.
+
+Candidates are sampled from the parameter range of a model type and raced
+by successive halving: every candidate is cross validated on a small
+stratified subset of the training set, the best `1 / eta` of them are
+evaluated again on `eta` times more examples, and so on until the full
+training set. With `hyperband`, several such brackets are run, from many
+candidates on few examples to few candidates on all of them.
+
+The evaluations of a round run in parallel in a process pool. The feature
+matrix is written once to a temporary file that the workers memory map,
+so it is neither recomputed nor copied per candidate. The search stops
+when its `time_budget` is spent or when a round does not improve the best
+score, and reports the best parameters found so far. With a budget, the
+evaluations run in worker processes even with `n_jobs=1`: the ones still
+running at the deadline are stopped with their workers.
+
+    >>> search = SuccessiveHalvingSearch("svm", time_budget=60)
+    >>> search.fit(X, y).best_params_
+"""
+import logging
+import math
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Text
+
+import numpy as np
+
+from kolibri.classifier import models
+from kolibri.utils.file import dump_artifact, load_artifact
+
+logger = logging.getLogger(__name__)
+
+# parameters that only matter for the final model, they are left out of the
+# candidates while searching: `probability` makes every SVC fit run its own
+# cross validated Platt scaling
+FINAL_ONLY_PARAMETERS = {"probability"}
+
+# the data of a search worker process
+_X = None
+_y = None
+
+
+def _init_worker(data_file):
+    global _X, _y
+    _X, _y = load_artifact(data_file, "r")
+
+
+def _terminate(executor):
+    """Shuts a process pool down without waiting for its evaluations: the
+    pending ones are cancelled and the workers killed."""
+    processes = list((getattr(executor, "_processes", None) or {}).values())
+    try:
+        executor.shutdown(wait=False, cancel_futures=True)
+    except TypeError:
+        # python < 3.9, the pending futures were cancelled by `_run_round`
+        executor.shutdown(wait=False)
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+    for process in processes:
+        process.join()
+
+
+def _to_python(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _evaluate(model_type, params, indices, cv, scoring, random_state, X=None, y=None):
+    """Cross validates a candidate on the examples at `indices`, returns its
+    mean score and the time it took."""
+    from sklearn.metrics import get_scorer
+    from sklearn.model_selection import StratifiedKFold, cross_val_score
+
+    X = _X if X is None else X
+    y = _y if y is None else y
+    start = time.perf_counter()
+    folds = StratifiedKFold(n_splits=cv, shuffle=True, random_state=random_state)
+    scores = cross_val_score(models.get_model_with_parms(model_type, params),
+                             X[indices], y[indices], cv=folds, scoring=get_scorer(scoring),
+                             error_score="raise")
+    return float(np.mean(scores)), time.perf_counter() - start
+
+
+def stratified_order(y, random_state=0):
+    # type: (np.ndarray, int) -> np.ndarray
+    """Orders the examples so that every prefix of the order has about the
+    class proportions of `y`: the subsets of increasing size used by the
+    rounds are nested and stratified."""
+    rng = np.random.RandomState(random_state)
+    order = rng.permutation(len(y))
+    _, classes, counts = np.unique(y[order], return_inverse=True, return_counts=True)
+    # rank of each example within its class, as a fraction of the class
+    ranks = np.empty(len(y))
+    for c, count in enumerate(counts):
+        members = np.flatnonzero(classes == c)
+        ranks[members] = (np.arange(count) + 0.5) / count
+    return order[np.argsort(ranks, kind="mergesort")]
+
+
+class SuccessiveHalvingSearch(object):
+    """Successive halving (and hyperband) search of the parameters of a
+    model type of `kolibri.classifier.models`.
+
+    Args:
+        model_type: the model type, e.g. "svm", "logistic_regression" or
+            their `get_kolibri_model` names ("lrg", "rf", ...).
+        param_grid: the parameter range, `get_model_parameters_range` of
+            the model type by default.
+        n_candidates: the number of candidates sampled from the range, all
+            of them if the range is smaller. Hyperband sets it per bracket.
+        eta: the ratio of candidates dropped, and of examples added, at
+            every round.
+        min_resources: the number of examples of the first round, chosen
+            so that the last round uses all the examples by default.
+        hyperband: runs the hyperband brackets instead of a single
+            successive halving.
+        cv: the number of cross validation folds of an evaluation.
+        scoring: the sklearn scorer name.
+        time_budget: the wall clock seconds the search may take.
+        tol: the search stops after a round improving the best score by
+            less than `tol`, when some rounds remain. None disables it.
+        n_jobs: the number of worker processes, all the cpus by default.
+            Without a budget, `n_jobs=1` evaluates in the calling process.
+        random_state: seeds the sampling and the folds.
+    """
+
+    def __init__(self,
+                 model_type,  # type: Text
+                 param_grid=None,  # type: Optional[Dict[Text, List[Any]]]
+                 n_candidates=64,  # type: Optional[int]
+                 eta=3,  # type: int
+                 min_resources=None,  # type: Optional[int]
+                 hyperband=False,  # type: bool
+                 cv=3,  # type: int
+                 scoring="f1_weighted",  # type: Text
+                 time_budget=None,  # type: Optional[float]
+                 tol=None,  # type: Optional[float]
+                 n_jobs=None,  # type: Optional[int]
+                 random_state=0  # type: int
+                 ):
+        # type: (...) -> None
+        self.model_type = model_type
+        self.param_grid = param_grid
+        self.n_candidates = n_candidates
+        self.eta = eta
+        self.min_resources = min_resources
+        self.hyperband = hyperband
+        self.cv = cv
+        self.scoring = scoring
+        self.time_budget = time_budget
+        self.tol = tol
+        self.n_jobs = n_jobs or os.cpu_count() or 1
+        self.random_state = random_state
+
+        self.best_params_ = None
+        self.best_score_ = None
+        self.results_ = []
+        self.elapsed_ = None
+        self.stopped_ = None
+
+    def _grid(self):
+        param_grid = self.param_grid
+        if param_grid is None:
+            param_grid = models.get_model_parameters_range(self.model_type)
+        if not param_grid:
+            raise ValueError("No parameter range for model type '{}'.".format(self.model_type))
+        final = {name: values[0] for name, values in param_grid.items()
+                 if name in FINAL_ONLY_PARAMETERS and len(values) == 1}
+        searched = {name: values for name, values in param_grid.items() if name not in final}
+        return searched, final
+
+    def _sample(self, param_grid, n_candidates, seed):
+        from sklearn.model_selection import ParameterGrid, ParameterSampler
+
+        grid = ParameterGrid(param_grid)
+        if n_candidates is None or n_candidates >= len(grid):
+            candidates = list(grid)
+        else:
+            candidates = list(ParameterSampler(param_grid, n_candidates, random_state=seed))
+        return [{name: _to_python(value) for name, value in params.items()} for params in candidates]
+
+    def _min_resources(self, n_samples, rarest, n_rounds=None):
+        # the rarest class needs an example in every fold
+        smallest = min(int(math.ceil(self.cv * n_samples / rarest)), n_samples)
+        if self.min_resources is not None:
+            return max(self.min_resources, smallest)
+        if n_rounds is None:
+            return smallest
+        return max(int(n_samples / self.eta ** (n_rounds - 1)), smallest)
+
+    def _brackets(self, param_grid, n_samples, rarest):
+        """Returns the (number of candidates, examples of the first round)
+        of every bracket."""
+        if not self.hyperband:
+            n_candidates = len(self._sample(param_grid, self.n_candidates, 0))
+            n_rounds = int(math.log(max(n_candidates, 1), self.eta)) + 1
+            return [(n_candidates, self._min_resources(n_samples, rarest, n_rounds))]
+        smallest = self._min_resources(n_samples, rarest)
+        s_max = max(int(math.log(n_samples / smallest, self.eta)), 0)
+        return [(int(math.ceil((s_max + 1) / (s + 1) * self.eta ** s)),
+                 max(int(n_samples / self.eta ** s), smallest))
+                for s in range(s_max, -1, -1)]
+
+    def fit(self, X, y):
+        # type: (np.ndarray, np.ndarray) -> SuccessiveHalvingSearch
+        """Searches the parameters on `X`, `y` and keeps the best ones in
+        `best_params_`. The model is not fitted, see `best_estimator`."""
+        start = time.perf_counter()
+        deadline = start + self.time_budget if self.time_budget else None
+        y = np.asarray(y)
+        n_samples, rarest = len(y), np.unique(y, return_counts=True)[1].min()
+        order = stratified_order(y, self.random_state)
+        param_grid, self._final_params = self._grid()
+        self.results_ = []
+        self.best_params_, self.best_score_, self.stopped_ = None, None, None
+        self._best_key = None
+
+        tmp_dir, executor = None, None
+        # with a budget, a single evaluation runs in a worker as well, so
+        # that it can be stopped at the deadline
+        if self.n_jobs > 1 or deadline is not None:
+            tmp_dir = tempfile.mkdtemp(prefix="kolibri-search-")
+            data_file = os.path.join(tmp_dir, "data.joblib")
+            dump_artifact((X, y), data_file)
+            executor = ProcessPoolExecutor(self.n_jobs, initializer=_init_worker,
+                                           initargs=(data_file,))
+        completed = False
+        try:
+            for bracket, (n_candidates, resources) in enumerate(self._brackets(param_grid, n_samples, rarest)):
+                candidates = self._sample(param_grid, n_candidates, self.random_state + bracket)
+                self._run_bracket(bracket, candidates, resources, order, X, y, executor, deadline)
+                if self.stopped_ == "time_budget":
+                    break
+            completed = True
+        finally:
+            if executor is not None:
+                if completed and self.stopped_ != "time_budget":
+                    executor.shutdown(wait=True)
+                else:
+                    # evaluations still running past the budget are stopped
+                    _terminate(executor)
+            if tmp_dir is not None:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        self.elapsed_ = time.perf_counter() - start
+        logger.info("Searched {} evaluations of '{}' in {:.1f}s, best {} {:.4f} with {}."
+                    "".format(len(self.results_), self.model_type, self.elapsed_, self.scoring,
+                              self.best_score_ if self.best_score_ is not None else float("nan"),
+                              self.best_params_))
+        return self
+
+    def _run_bracket(self, bracket, candidates, resources, order, X, y, executor, deadline):
+        n_samples = len(order)
+        previous_best = None
+        rnd = 0
+        while True:
+            n_examples = min(int(resources * self.eta ** rnd), n_samples)
+            scores = self._run_round(candidates, order[:n_examples], X, y, executor, deadline)
+            evaluated = []
+            for params, (score, fit_time) in zip(candidates, scores):
+                if score is None:
+                    continue
+                self.results_.append({"params": params, "bracket": bracket, "round": rnd,
+                                      "n_examples": n_examples, "score": score, "fit_time": fit_time})
+                evaluated.append((score, params))
+                # a score on more examples beats any score on fewer
+                if self._best_key is None or (n_examples, score) > self._best_key:
+                    self._best_key = (n_examples, score)
+                    self.best_params_, self.best_score_ = params, score
+            if self.stopped_ == "time_budget" or not evaluated or n_examples == n_samples:
+                return
+            evaluated.sort(key=lambda item: item[0], reverse=True)
+            round_best = evaluated[0][0]
+            if self.tol is not None and previous_best is not None and round_best - previous_best < self.tol:
+                self.stopped_ = "early_stopping"
+                logger.info("Stopping bracket {} at round {}, the best score improved by less "
+                            "than {}.".format(bracket, rnd, self.tol))
+                return
+            previous_best = round_best
+            candidates = [params for _, params in evaluated[:max(len(evaluated) // self.eta, 1)]]
+            rnd += 1
+
+    def _run_round(self, candidates, indices, X, y, executor, deadline):
+        """Evaluates the candidates on the examples at `indices`, returns
+        their (score, fit time), (None, None) for the failed candidates and
+        the ones left when the budget is spent."""
+        args = [(self.model_type, dict(params), indices, self.cv, self.scoring, self.random_state)
+                for params in candidates]
+        results = [(None, None)] * len(candidates)
+        if executor is None:
+            # no budget
+            for i, arg in enumerate(args):
+                results[i] = self._result(candidates[i], lambda: _evaluate(*arg, X=X, y=y))
+            return results
+
+        futures = {executor.submit(_evaluate, *arg): i for i, arg in enumerate(args)}
+        pending = set(futures)
+        while pending:
+            timeout = None if deadline is None else max(deadline - time.perf_counter(), 0)
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[futures[future]] = self._result(candidates[futures[future]], future.result)
+            if not done and pending:
+                self.stopped_ = "time_budget"
+                for future in pending:
+                    future.cancel()
+                break
+        return results
+
+    def _result(self, params, evaluate):
+        try:
+            return evaluate()
+        except Exception as e:
+            logger.warning("Candidate {} of '{}' failed: {}".format(params, self.model_type, e))
+            return None, None
+
+    @property
+    def best_full_params_(self):
+        # type: () -> Optional[Dict[Text, Any]]
+        """The best parameters, with the ones only set on the final model."""
+        if self.best_params_ is None:
+            return None
+        params = dict(self.best_params_)
+        params.update(getattr(self, "_final_params", {}))
+        return params
+
+    def best_estimator(self):
+        """Returns an unfitted model with the best parameters."""
+        if self.best_params_ is None:
+            raise ValueError("The search found no parameters, call `fit` first.")
+        return models.get_model_with_parms(self.model_type, self.best_full_params_)
+
+    def report(self):
+        # type: () -> Dict[Text, Any]
+        """Summarizes the search."""
+        return {
+            "model_type": self.model_type,
+            "best_params": self.best_full_params_,
+            "best_score": self.best_score_,
+            "scoring": self.scoring,
+            "evaluations": len(self.results_),
+            "candidates": len({tuple(sorted(r["params"].items(), key=str)) for r in self.results_}),
+            "elapsed": self.elapsed_,
+            "stopped": self.stopped_
+        }
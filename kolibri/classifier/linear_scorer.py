@@ -0,0 +1,284 @@
+"""Numpy inference for a fitted TF-IDF vectorizer and linear classifier.
+
+`export_linear_model` compiles a fitted sklearn `TfidfVectorizer` and a
+linear classifier (logistic regression, SGD with log loss, multinomial
+naive Bayes, or a `CalibratedClassifierCV` of linear SVMs) into a few numpy
+arrays: the vocabulary, the idf weights, the coefficients, the intercepts
+and the sigmoid calibration. `LinearScorer` loads them without importing
+sklearn and reproduces `predict_proba` with one sparse dot product per
+document, which skips sklearn's validation and dispatch:
+
+    >>> export_interpreter(interpreter, "model/linear.npz")
+    >>> scorer = LinearScorer.load("model/linear.npz")
+    >>> scorer.predict_proba_one(["the", "invoice", "is", "late"])
+"""
+import logging
+import re
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Text
+from typing import Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# how the decision values become probabilities
+SOFTMAX = "softmax"
+OVR_SIGMOID = "ovr_sigmoid"
+CALIBRATED_SIGMOID = "calibrated_sigmoid"
+
+# how a raw text becomes terms: split by the token pattern, or not at all
+# when the vectorizer analyzes it in a way the scorer can not reproduce
+TOKEN_PATTERN = "token_pattern"
+TERMS_ONLY = "terms_only"
+
+
+def _vocabulary_terms(vocabulary):
+    """Returns the terms of a vectorizer vocabulary by column."""
+    tokens = np.array(list(vocabulary.keys()), dtype=str)
+    ids = np.array(list(vocabulary.values()), dtype=np.int64)
+    terms = np.empty(len(tokens), dtype=tokens.dtype if len(tokens) else str)
+    terms[ids] = tokens
+    return terms
+
+
+def _text_analyzer(vectorizer):
+    """Whether the scorer can split a raw text as `vectorizer` does: only
+    the default word analyzer, with its `token_pattern` and lowercasing,
+    is reproduced."""
+    default = (getattr(vectorizer, "analyzer", "word") == "word"
+               and getattr(vectorizer, "tokenizer", None) is None
+               and getattr(vectorizer, "preprocessor", None) is None
+               and getattr(vectorizer, "strip_accents", None) is None
+               and getattr(vectorizer, "stop_words", None) is None
+               and tuple(getattr(vectorizer, "ngram_range", (1, 1))) == (1, 1))
+    return TOKEN_PATTERN if default else TERMS_ONLY
+
+
+def _is_multinomial(classifier):
+    """Whether a logistic regression predicts by softmax, as sklearn's
+    `LogisticRegression.predict_proba` decides it."""
+    n_classes = len(classifier.classes_)
+    multi_class = getattr(classifier, "multi_class", "auto")
+    if multi_class in ("ovr", "warn"):
+        return False
+    if multi_class == "multinomial":
+        return True
+    return n_classes > 2 and getattr(classifier, "solver", None) != "liblinear"
+
+
+def _linear_arrays(classifier):
+    """Returns the probability kind, coefficients and intercepts of a
+    linear classifier."""
+    name = type(classifier).__name__
+    if name == "MultinomialNB":
+        return SOFTMAX, classifier.feature_log_prob_, classifier.class_log_prior_
+    coef = np.atleast_2d(classifier.coef_)
+    intercept = np.atleast_1d(classifier.intercept_) * np.ones(coef.shape[0])
+    if name == "LogisticRegression":
+        return (SOFTMAX if _is_multinomial(classifier) else OVR_SIGMOID), coef, intercept
+    if name == "SGDClassifier" and getattr(classifier, "loss", None) in ("log", "log_loss"):
+        return OVR_SIGMOID, coef, intercept
+    raise ValueError("Can not export a {}, the numpy scorer supports LogisticRegression, "
+                     "SGDClassifier(loss='log'), MultinomialNB and CalibratedClassifierCV "
+                     "with a sigmoid calibration.".format(name))
+
+
+def _calibrated_arrays(classifier):
+    """Stacks the linear models and sigmoid calibrations of the calibrated
+    classifiers of a `CalibratedClassifierCV`."""
+    if getattr(classifier, "method", "sigmoid") != "sigmoid":
+        raise ValueError("Only the sigmoid calibration can be exported.")
+    coefs, intercepts, slopes, offsets = [], [], [], []
+    for calibrated in classifier.calibrated_classifiers_:
+        estimator = getattr(calibrated, "estimator", None)
+        if estimator is None:
+            estimator = calibrated.base_estimator
+        calibrators = getattr(calibrated, "calibrators", None) or getattr(calibrated, "calibrators_")
+        if not np.array_equal(estimator.classes_, classifier.classes_):
+            raise ValueError("A calibrated classifier was fitted on a subset of the classes.")
+        coef = np.atleast_2d(estimator.coef_)
+        coefs.append(coef)
+        intercepts.append(np.atleast_1d(estimator.intercept_) * np.ones(coef.shape[0]))
+        slopes.append([c.a_ for c in calibrators])
+        offsets.append([c.b_ for c in calibrators])
+    return np.stack(coefs), np.stack(intercepts), np.array(slopes), np.array(offsets)
+
+
+def export_linear_model(vectorizer, classifier, filename, class_names=None):
+    # type: (Any, Any, Text, Optional[Sequence[Text]]) -> None
+    """Compiles a fitted `TfidfVectorizer` and linear classifier into the
+    numpy arrays of a `LinearScorer` and writes them to `filename` (.npz).
+
+    :param class_names: the names of the classes, e.g. the classes of the
+        label encoder when the classifier was fitted on numeric labels."""
+    if getattr(classifier, "clf", None) is not None and hasattr(classifier, "le"):
+        # a kolibri SkLearnClassifier
+        class_names = class_names if class_names is not None else classifier.le.classes_
+        classifier = classifier.clf
+    terms = _vocabulary_terms(vectorizer.vocabulary_)
+    arrays = {
+        "terms": terms,
+        "idf": np.asarray(vectorizer.idf_ if getattr(vectorizer, "use_idf", True) else np.ones(len(terms)),
+                          dtype=np.float64),
+        "classes": np.asarray(class_names if class_names is not None else classifier.classes_).astype(str),
+        "sublinear_tf": np.array(bool(getattr(vectorizer, "sublinear_tf", False))),
+        "binary": np.array(bool(getattr(vectorizer, "binary", False))),
+        "norm": np.array(getattr(vectorizer, "norm", "l2") or ""),
+        "lowercase": np.array(bool(getattr(vectorizer, "lowercase", True))),
+        "token_pattern": np.array(getattr(vectorizer, "token_pattern", None) or r"(?u)\b\w\w+\b"),
+        "analyzer": np.array(_text_analyzer(vectorizer)),
+    }
+    if type(classifier).__name__ == "CalibratedClassifierCV":
+        coef, intercept, slopes, offsets = _calibrated_arrays(classifier)
+        arrays.update(kind=np.array(CALIBRATED_SIGMOID), slopes=slopes, offsets=offsets)
+    else:
+        kind, coef, intercept = _linear_arrays(classifier)
+        coef, intercept = coef[np.newaxis], np.asarray(intercept)[np.newaxis]
+        arrays.update(kind=np.array(kind))
+    if coef.shape[2] != len(terms):
+        raise ValueError("The classifier has {} features but the vectorizer {}, the numpy scorer "
+                         "needs the tf-idf features alone.".format(coef.shape[2], len(terms)))
+    # one row of coefficients per term, gathered by the terms of a document
+    arrays["coef"] = np.ascontiguousarray(np.transpose(coef, (2, 0, 1)), dtype=np.float64)
+    arrays["intercept"] = np.asarray(intercept, dtype=np.float64)
+    np.savez(filename, **arrays)
+
+
+def export_interpreter(interpreter, filename):
+    # type: (Any, Text) -> None
+    """Exports the tf-idf featurizer and sklearn classifier of a trained
+    interpreter, see `export_linear_model`. The featurizer tokenizes the
+    documents itself, so the scorer is given the terms of a document, as
+    `featurizer._get_document_text` returns them, not its text."""
+    featurizer = interpreter.get_component("tf_idf_featurizer")
+    classifier = interpreter.get_component("classifier_sklearn")
+    if featurizer is None or classifier is None or featurizer.vectorizer is None or classifier.clf is None:
+        raise ValueError("The model needs a trained 'tf_idf_featurizer' and 'classifier_sklearn'.")
+    export_linear_model(featurizer.vectorizer, classifier, filename)
+
+
+def _sigmoid(x):
+    return 1. / (1. + np.exp(-x))
+
+
+class LinearScorer(object):
+    """Scores documents with the arrays written by `export_linear_model`,
+    with numpy only.
+
+    A document is either the list of its terms, as the vectorizer's
+    tokenizer produced them, or a text split by the vectorizer's
+    `token_pattern`. A text is rejected when the vectorizer analyzed it
+    otherwise (a custom tokenizer, stop words, n-grams...)."""
+
+    def __init__(self, arrays):
+        # type: (Dict[Text, np.ndarray]) -> None
+        self.terms = arrays["terms"]
+        self.idf = arrays["idf"]
+        self.classes = arrays["classes"]
+        self.coef = arrays["coef"]
+        self.intercept = arrays["intercept"]
+        self.kind = str(arrays["kind"])
+        self.slopes = arrays.get("slopes")
+        self.offsets = arrays.get("offsets")
+        self.sublinear_tf = bool(arrays["sublinear_tf"])
+        self.binary = bool(arrays["binary"])
+        self.norm = str(arrays["norm"]) or None
+        self.lowercase = bool(arrays["lowercase"])
+        self._token_pattern = re.compile(str(arrays["token_pattern"]))
+        self.analyzer = str(arrays["analyzer"]) if "analyzer" in arrays else TOKEN_PATTERN
+        self.vocabulary = {term: i for i, term in enumerate(self.terms.tolist())}
+
+    @classmethod
+    def load(cls, filename):
+        # type: (Text) -> LinearScorer
+        with np.load(filename, allow_pickle=False) as data:
+            return cls({name: data[name] for name in data.files})
+
+    def _terms(self, document):
+        if isinstance(document, str):
+            if self.analyzer != TOKEN_PATTERN:
+                raise ValueError("The vectorizer of this model does not split texts by its token "
+                                 "pattern, score the list of terms of the document instead.")
+            text = document.lower() if self.lowercase else document
+            return self._token_pattern.findall(text)
+        return document
+
+    def features(self, document):
+        """Returns the columns and the tf-idf weights of the terms of a
+        document."""
+        counts = {}
+        vocabulary = self.vocabulary
+        for term in self._terms(document):
+            column = vocabulary.get(term)
+            if column is not None:
+                counts[column] = counts.get(column, 0) + 1
+        columns = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        weights = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+        if self.binary:
+            weights[:] = 1.
+        elif self.sublinear_tf:
+            weights = np.log(weights) + 1.
+        weights *= self.idf[columns]
+        if self.norm == "l2":
+            norm = np.sqrt(weights.dot(weights))
+        elif self.norm == "l1":
+            norm = np.abs(weights).sum()
+        else:
+            norm = 0.
+        if norm > 0:
+            weights /= norm
+        return columns, weights
+
+    def decision_function(self, document):
+        # type: (Union[Text, List[Text]]) -> np.ndarray
+        """The decision values of a document, one row per calibrated
+        model."""
+        columns, weights = self.features(document)
+        return np.tensordot(weights, self.coef[columns], axes=1) + self.intercept
+
+    def _probabilities(self, decision):
+        n_classes = len(self.classes)
+        if self.kind == SOFTMAX:
+            decision = decision[0]
+            if decision.shape[0] == 1:
+                decision = np.array([-decision[0], decision[0]])
+            exp = np.exp(decision - decision.max())
+            return exp / exp.sum()
+        if self.kind == OVR_SIGMOID:
+            proba = _sigmoid(decision[0])
+            if n_classes == 2:
+                return np.array([1. - proba[0], proba[0]])
+            total = proba.sum()
+            return proba / total if total > 0 else np.full(n_classes, 1. / n_classes)
+        # the sigmoid calibration of each model, averaged
+        proba = _sigmoid(-(self.slopes * decision + self.offsets))
+        if n_classes == 2:
+            proba = np.column_stack([1. - proba[:, 0], proba[:, 0]])
+        else:
+            totals = proba.sum(axis=1, keepdims=True)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                proba = proba / totals
+            proba[~np.isfinite(proba)] = 1. / n_classes
+        proba[(1. < proba) & (proba <= 1. + 1e-5)] = 1.
+        return proba.mean(axis=0)
+
+    def predict_proba_one(self, document):
+        # type: (Union[Text, List[Text]]) -> np.ndarray
+        """The class probabilities of a document, ordered as `classes`."""
+        return self._probabilities(self.decision_function(document))
+
+    def predict_proba(self, documents):
+        # type: (List[Union[Text, List[Text]]]) -> np.ndarray
+        """The class probabilities of a list of documents, one row per
+        document."""
+        return np.array([self.predict_proba_one(d) for d in documents]).reshape(-1, len(self.classes))
+
+    def predict(self, documents):
+        # type: (List[Union[Text, List[Text]]]) -> List[Text]
+        """The most probable class of each document."""
+        return [str(self.classes[i]) for i in np.argmax(self.predict_proba(documents), axis=1)]
@@ -1,5 +1,4 @@
 from sklearn.model_selection import cross_val_predict
-from sklearn_crfsuite.metrics import flat_classification_report
 from sklearn.base import BaseEstimator
 from kolibri.pipeComponent import Component
 
@@ -15,6 +14,8 @@ class KolibriModel(BaseEstimator):
 
 
     def fit(self, X, y):
+        from sklearn_crfsuite.metrics import flat_classification_report
+
         y_pred = cross_val_predict(self.model, X, y, cv=5)
         report = flat_classification_report(y_pred=y_pred, y_true=y)
         self.model.fit(X,y)
@@ -1,87 +1,242 @@
 # -*- coding: utf-8 -*-
 # Author: XuMing <xuming624@qq.com>
 # Brief:
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.linear_model import LogisticRegression
-from sklearn.naive_bayes import MultinomialNB
-from sklearn.neighbors import KNeighborsClassifier
-import sklearn.svm as svm
-from sklearn.tree import DecisionTreeClassifier
-from xgboost import XGBClassifier
-from sklearn.neural_network import MLPClassifier
-from sklearn.calibration import CalibratedClassifierCV
-from sklearn_crfsuite import CRF
+"""The estimators of the classifiers, by model type.
+
+The estimators are registered with a loader that imports their library
+only when the model type is first used, so importing this module or
+selecting a model type does not import xgboost, sklearn_crfsuite or the
+unused sklearn modules. Third-party packages add model types with
+`register_estimator`, or by declaring an entry point in the
+`kolibri.estimators` group whose name is the model type and whose object
+is the estimator class (or a function returning an estimator):
+
+    entry_points={"kolibri.estimators": ["lgbm = lightgbm:LGBMClassifier"]}
+"""
+import threading
+
 import numpy as np
 
+ENTRY_POINT_GROUP = "kolibri.estimators"
 
-def get_kolibri_model(model_type):
 
-    return {
-        'lrg': ['Logistic Regression', LogisticRegression(random_state=0, multi_class='auto')],
-        'lrg_l2':['Logistic Regression L2', LogisticRegression(penalty='l2', tol=0.0001, C=1.0)],
-        'lrg_l1': ['Logistic Regression L1', LogisticRegression(penalty='l1', tol=0.0001, C=1.0)],
-
-        'svm': ['Support Vector Machine', svm.SVC(kernel="linear", probability=True)],
-        'knn': ['K nearest neighbor', KNeighborsClassifier(
-            n_neighbors=10,
-            algorithm='brute',
-            metric='cosine',
-            n_jobs=2)],
-        'nb': ['Naive Bayes', MultinomialNB()],
-        'mlp': ['MultiLayer Perceptron', MLPClassifier()],
-        'rf': ['Random Forest', RandomForestClassifier(max_depth=20, random_state=50, n_jobs=-1)],
-        'dt': ['Decision Tree', DecisionTreeClassifier(
-            random_state=789654,
-            criterion="gini")],
-        'xgb': ['XGBoost', XGBClassifier(
-            max_depth=6,
-            subsample=0.8,
-            colsample_bytree=0.7,
-            objective='multi:softmax',
-            silent=True,
-            booster='gbtree',
-            learning_rate=0.05,
-            n_jobs=-1)],
-        'lsvm': ['Linear SVM', CalibratedClassifierCV(svm.LinearSVC(dual=False))],
-        'crf' :['Conditional Random Fields', CRF(
-                algorithm='lbfgs',
-                c1=1,
-                c2=0.1,
-                max_iterations=100,
-                # include transitions that are possible, but not observed
-                all_possible_transitions=True
-        )]
-    }.get(model_type.lower(), [None, None])
+class EstimatorSpec(object):
+    """A registered model type: `loader` imports and returns the estimator
+    class (or a function returning an estimator), `defaults` are the
+    parameters of `get_kolibri_model`."""
+
+    def __init__(self, name, display_name, loader, defaults=None):
+        self.name = name
+        self.display_name = display_name
+        self.loader = loader
+        self.defaults = defaults or {}
+        self._estimator_class = None
+
+    @property
+    def estimator_class(self):
+        if self._estimator_class is None:
+            self._estimator_class = self.loader()
+        return self._estimator_class
+
+    def create(self, params=None, use_defaults=True):
+        kwargs = dict(self.defaults) if use_defaults else {}
+        kwargs.update(params or {})
+        return self.estimator_class(**kwargs)
+
+
+_estimators = {}
+_aliases = {}
+_plugins_lock = threading.Lock()
+_plugins_loaded = False
+
+
+def register_estimator(name, loader, display_name=None, defaults=None, aliases=()):
+    """Registers a model type.
+
+    :param name: the model type used in the `models` of a configuration.
+    :param loader: a function importing and returning the estimator class,
+        or a function building an estimator from keyword parameters.
+    :param display_name: a readable name of the model.
+    :param defaults: the parameters the estimator is created with.
+    :param aliases: other names of the model type."""
+    name = name.lower()
+    _estimators[name] = EstimatorSpec(name, display_name or name, loader, defaults)
+    for alias in aliases:
+        _aliases[alias.lower()] = name
+
+
+def _iter_entry_points():
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:
+        import pkg_resources
+        return list(pkg_resources.iter_entry_points(ENTRY_POINT_GROUP))
+    eps = entry_points()
+    if hasattr(eps, "select"):
+        return list(eps.select(group=ENTRY_POINT_GROUP))
+    return list(eps.get(ENTRY_POINT_GROUP, []))
+
+
+def _load_plugins():
+    """Registers the model types declared by entry points. Their modules
+    are only imported when the model type is used."""
+    global _plugins_loaded
+    with _plugins_lock:
+        if _plugins_loaded:
+            return
+        _plugins_loaded = True
+        for entry_point in _iter_entry_points():
+            if entry_point.name.lower() not in _estimators:
+                register_estimator(entry_point.name, entry_point.load)
+
+
+def get_estimator_spec(model_type):
+    """Returns the `EstimatorSpec` of a model type, or None."""
+    name = model_type.lower()
+    name = _aliases.get(name, name)
+    spec = _estimators.get(name)
+    if spec is None and not _plugins_loaded:
+        _load_plugins()
+        spec = _estimators.get(name)
+    return spec
+
+
+def registered_estimators():
+    """The names of the registered model types."""
+    _load_plugins()
+    return sorted(_estimators)
+
+
+def _logistic_regression():
+    from sklearn.linear_model import LogisticRegression
+    return LogisticRegression
+
+
+def _svc():
+    from sklearn.svm import SVC
+    return SVC
+
+
+def _knn():
+    from sklearn.neighbors import KNeighborsClassifier
+    return KNeighborsClassifier
+
+
+def _naive_bayes():
+    from sklearn.naive_bayes import MultinomialNB
+    return MultinomialNB
+
+
+def _mlp():
+    from sklearn.neural_network import MLPClassifier
+    return MLPClassifier
+
+
+def _random_forest():
+    from sklearn.ensemble import RandomForestClassifier
+    return RandomForestClassifier
+
+
+def _decision_tree():
+    from sklearn.tree import DecisionTreeClassifier
+    return DecisionTreeClassifier
+
+
+def _xgboost():
+    from xgboost import XGBClassifier
+    return XGBClassifier
+
+
+def _calibrated_linear_svm():
+    from sklearn.calibration import CalibratedClassifierCV
+    from sklearn.svm import LinearSVC
+
+    def calibrated_linear_svm(**params):
+        return CalibratedClassifierCV(LinearSVC(**params))
+    return calibrated_linear_svm
+
+
+def _crf():
+    from sklearn_crfsuite import CRF
+    return CRF
+
+
+register_estimator('lrg', _logistic_regression, 'Logistic Regression',
+                   {'random_state': 0, 'multi_class': 'auto'}, aliases=['logistic_regression'])
+register_estimator('lrg_l2', _logistic_regression, 'Logistic Regression L2',
+                   {'penalty': 'l2', 'tol': 0.0001, 'C': 1.0})
+register_estimator('lrg_l1', _logistic_regression, 'Logistic Regression L1',
+                   {'penalty': 'l1', 'tol': 0.0001, 'C': 1.0})
+register_estimator('svm', _svc, 'Support Vector Machine', {'kernel': "linear", 'probability': True})
+register_estimator('knn', _knn, 'K nearest neighbor',
+                   {'n_neighbors': 10, 'algorithm': 'brute', 'metric': 'cosine', 'n_jobs': 2})
+register_estimator('nb', _naive_bayes, 'Naive Bayes', aliases=['bayes'])
+register_estimator('mlp', _mlp, 'MultiLayer Perceptron')
+register_estimator('rf', _random_forest, 'Random Forest',
+                   {'max_depth': 20, 'random_state': 50, 'n_jobs': -1}, aliases=['random_forest'])
+register_estimator('dt', _decision_tree, 'Decision Tree',
+                   {'random_state': 789654, 'criterion': "gini"}, aliases=['decision_tree'])
+register_estimator('xgb', _xgboost, 'XGBoost',
+                   {'max_depth': 6,
+                    'subsample': 0.8,
+                    'colsample_bytree': 0.7,
+                    'objective': 'multi:softmax',
+                    'silent': True,
+                    'booster': 'gbtree',
+                    'learning_rate': 0.05,
+                    'n_jobs': -1}, aliases=['xgboost'])
+register_estimator('lsvm', _calibrated_linear_svm, 'Linear SVM', {'dual': False})
+register_estimator('crf', _crf, 'Conditional Random Fields',
+                   {'algorithm': 'lbfgs',
+                    'c1': 1,
+                    'c2': 0.1,
+                    'max_iterations': 100,
+                    # include transitions that are possible, but not observed
+                    'all_possible_transitions': True})
+
+
+def get_kolibri_model(model_type):
+    """Returns the display name and a new estimator of a model type, or
+    [None, None] for an unknown model type."""
+    spec = get_estimator_spec(model_type)
+    if spec is None:
+        return [None, None]
+    return [spec.display_name, spec.create()]
 
 
 def get_model(model_type):
     return get_kolibri_model(model_type)[1]
 
-def get_model_with_parms(model_type, params):
-    if model_type == "logistic_regression":
-        model = LogisticRegression(params)
-    elif model_type == "random_forest":
-        model = RandomForestClassifier(params)
-    elif model_type == "decision_tree":
-        model = DecisionTreeClassifier(params)
-    elif model_type == "knn":
-        model = KNeighborsClassifier(params)
-    elif model_type == "bayes":
-        model = MultinomialNB(params)
-    elif model_type == "xgboost":
-        model = XGBClassifier(params)
-    elif model_type == "svm":
-        model = svm.SVC(params)
-    elif model_type == 'mlp':
-        model = MLPClassifier(params)
+# the names of `get_model_parameters_range` for the model types
+MODEL_TYPE_ALIASES = {
+    'lrg': 'logistic_regression',
+    'lrg_l2': 'logistic_regression',
+    'lrg_l1': 'logistic_regression',
+    'svm': 'svm',
+    'knn': 'knn',
+    'nb': 'bayes',
+    'mlp': 'mlp',
+    'rf': 'random_forest',
+    'dt': 'decision_tree',
+    'xgb': 'xgboost'
+}
+
 
-    return model
+def get_model_with_parms(model_type, params):
+    """Returns a new estimator of a model type created with `params` only,
+    without the defaults of `get_kolibri_model`."""
+    spec = get_estimator_spec(model_type)
+    if spec is None:
+        raise ValueError("Unknown model type '{}'.".format(model_type))
+    return spec.create(params, use_defaults=False)
 
 
 def get_model_parameters_range(model_type):
+    model_type = MODEL_TYPE_ALIASES.get(model_type, model_type)
     paramgrid={}
     if model_type=='logistic_regression':
         paramgrid={"penalty":['l1', 'l2'],
+                   "solver":['saga'],
                    "C":np.logspace(0,4,10)}
     elif model_type=='svm':
         paramgrid = {"kernel": ["rbf", "linear"],
@@ -90,12 +245,12 @@ def get_model_parameters_range(model_type):
                      "probability":[True]}
     elif model_type == "decision_tree":
         paramgrid={"criterion":['gini', 'entropy'],
-                   "min_samples":[2, 3, 4],
-                   "class_weight":['balanced', 'None']}
+                   "min_samples_split":[2, 3, 4],
+                   "class_weight":['balanced', None]}
     elif model_type == "random_forest":
         paramgrid={"n_estimators":[100, 200, 300, 400],
-                   "max_features" : ['auto', 'sqrt'],
-                   "max_depth" : np.linspace(10, 110, num=11),
+                   "max_features" : ['sqrt', 'log2'],
+                   "max_depth" : np.linspace(10, 110, num=11, dtype=int),
                    "bootstrap" : [True, False]
         }
     elif model_type == "knn":
@@ -19,10 +19,14 @@ from keras.models import Model
 from keras import backend as K
 from keras.engine.topology import Layer, InputSpec
 
+from kolibri.classifier.dnn.preprocessing import pad_batch
+from kolibri.classifier.dnn.utils import BucketedSequence, load_glove
+
 MAX_SEQUENCE_LENGTH = 1000
 MAX_NB_WORDS = 20000
 EMBEDDING_DIM = 160
 VALIDATION_SPLIT = 0.2
+WORKERS = 4
 
 
 data=pd.read_excel('/Users/mohamedmentis/Documents/Mentis/Development/Python/Engie/data/NL_topic_Invoice.xlsx')
@@ -37,56 +41,48 @@ def clean_str(string):
     string = re.sub(r"\"", "", string)
     return string.strip().lower()
 
-texts = []
-labels = []
-
-for idx, row  in data.iterrows():
-    text = row['Text']
-    texts.append(clean_str(text))
-    labels.append(row['Intent'])
+texts = data['Text'].map(clean_str).tolist()
+labels = data['Intent'].tolist()
 tokenizer = Tokenizer(nb_words=MAX_NB_WORDS)
 tokenizer.fit_on_texts(texts)
-sequences = tokenizer.texts_to_sequences(texts)
 
 word_index = tokenizer.word_index
 print('Found %s unique tokens.' % len(word_index))
 
-data = pad_sequences(sequences, maxlen=MAX_SEQUENCE_LENGTH)
-
 #labels = to_categorical(np.asarray(labels))
 encoder = LabelEncoder()
 encoder.fit(labels)
 encoded_Y = encoder.transform(labels)
 # convert integers to dummy variables (i.e. one hot encoded)
 labels = to_categorical(encoded_Y)
-print('Shape of data tensor:', data.shape)
 print('Shape of label tensor:', labels.shape)
 
-indices = np.arange(data.shape[0])
-np.random.shuffle(indices)
-data = data[indices]
-labels = labels[indices]
-nb_validation_samples = int(VALIDATION_SPLIT * data.shape[0])
 
-x_train = data[:-nb_validation_samples]
-y_train = labels[:-nb_validation_samples]
-x_val = data[-nb_validation_samples:]
-y_val = labels[-nb_validation_samples:]
+def featurize(batch_texts, batch_labels):
+    """turns a batch of texts into word ids, padded to the longest text of the batch"""
+    sequences = tokenizer.texts_to_sequences(batch_texts)
+    return pad_batch(sequences, max_length=MAX_SEQUENCE_LENGTH), np.asarray(batch_labels)
+
+
+indices = np.random.permutation(len(texts))
+nb_validation_samples = int(VALIDATION_SPLIT * len(texts))
+train_indices = indices[:-nb_validation_samples]
+val_indices = indices[-nb_validation_samples:]
+lengths = [len(text.split()) for text in texts]
+
+# the texts are featurized batch by batch in background workers, in batches of texts of similar lengths
+train_seq = BucketedSequence([texts[i] for i in train_indices], labels[train_indices], batch_size=5,
+                             preprocess=featurize, lengths=[lengths[i] for i in train_indices])
+val_seq = BucketedSequence([texts[i] for i in val_indices], labels[val_indices], batch_size=5,
+                           preprocess=featurize, lengths=[lengths[i] for i in val_indices], shuffle=False)
 
 
 print('Traing and validation set number of positive and negative reviews')
-print(y_train.sum(axis=0))
-print(y_val.sum(axis=0))
+print(labels[train_indices].sum(axis=0))
+print(labels[val_indices].sum(axis=0))
 
 GLOVE_DIR = "/Users/mohamedmentis/kilibri_data/embeddings/nl"
-embeddings_index = {}
-f = open(os.path.join(GLOVE_DIR, 'combined-160.txt'))
-for line in f:
-    values = line.split()
-    word = values[0]
-    coefs = np.asarray(values[1:], dtype='float32')
-    embeddings_index[word] = coefs
-f.close()
+embeddings_index = load_glove(os.path.join(GLOVE_DIR, 'combined-160.txt'))
 
 print('Total %s word vectors.' % len(embeddings_index))
 
@@ -100,10 +96,9 @@ for word, i in word_index.items():
 embedding_layer = Embedding(len(word_index) + 1,
                             EMBEDDING_DIM,
                             weights=[embedding_matrix],
-                            input_length=MAX_SEQUENCE_LENGTH,
                             trainable=True)
 
-sequence_input = Input(shape=(MAX_SEQUENCE_LENGTH,), dtype='int32')
+sequence_input = Input(shape=(None,), dtype='int32')
 embedded_sequences = embedding_layer(sequence_input)
 l_lstm = Bidirectional(LSTM(100))(embedded_sequences)
 preds = Dense(21, activation='softmax')(l_lstm)
@@ -114,6 +109,6 @@ model.compile(loss='categorical_crossentropy',
 
 print("model fitting - Bidirectional LSTM")
 model.summary()
-model.fit(x_train, y_train, validation_data=(x_val, y_val),
-          nb_epoch=5, batch_size=5)
+model.fit_generator(train_seq, validation_data=val_seq,
+                    epochs=5, workers=WORKERS)
 
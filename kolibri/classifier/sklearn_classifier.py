@@ -8,20 +8,16 @@ from typing import List
 from typing import Text
 from typing import Tuple
 
-import joblib
 import numpy as np
-from lime.lime_text import LimeTextExplainer
-from mlxtend.classifier import EnsembleVoteClassifier, StackingClassifier
-from sklearn.ensemble import AdaBoostClassifier
-from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
 from sklearn.model_selection import StratifiedKFold
 from sklearn.model_selection import cross_val_predict
-from kolibri.classifier.cost_sensitive import AdaCostClassifier
 from kolibri import settings
 from kolibri.classifier import models
 from kolibri.classifier.model import Classifier
 from kolibri.pipeComponent import Component
+from kolibri.utils import lazyproperty
+from kolibri.utils.file import dump_artifact, load_artifact
 
 logger = logging.getLogger(__name__)
 
@@ -69,6 +65,11 @@ class SkLearnClassifier(Classifier):
         "balance_data_min_freq":None,
         "balance_data_max_freq": None,
         "cost_sensitive": False,
+
+        # searches the parameters of a single model before training it, e.g.
+        # {"time_budget": 60, "n_jobs": 4, "hyperband": False}, the keys
+        # are arguments of `SuccessiveHalvingSearch`
+        "hyperparameter_search": None,
         "explain":False,
         "ouput_folder": None
     }
@@ -90,13 +91,26 @@ class SkLearnClassifier(Classifier):
             self.le = LabelEncoder()
         self.clf = clf
 
-        if self.component_config["explain"]:
-            if self.clf:
-                class_names = self.clf.classes_
-                self.explainer = LimeTextExplainer(class_names=class_names)
-
         _sklearn_numpy_warning_fix()
 
+    @lazyproperty
+    def explainer(self):
+        """LIME explainer of the classifier, lime is only imported the
+        first time it is used."""
+        if not self.clf:
+            return None
+        from lime.lime_text import LimeTextExplainer
+
+        return LimeTextExplainer(class_names=self.clf.classes_)
+
+    def __getstate__(self):
+        state = super(SkLearnClassifier, self).__getstate__()
+        # the explainer is rebuilt on demand, models saved with an explainer
+        # would otherwise import lime when they are loaded
+        state.pop("_lazy_explainer", None)
+        state.pop("explainer", None)
+        return state
+
     @classmethod
     def required_packages(cls):
         # type: () -> List[Text]
@@ -137,9 +151,12 @@ class SkLearnClassifier(Classifier):
                           for example in DATA])
             ensemble_strategy=cfg.get("ensemble_strategy", 'voting')
             self.clf = self._create_classifier(self.component_config["models"], ensemble_strategy)
+            if self.component_config.get("hyperparameter_search"):
+                self.clf = self._search_classifier(self.component_config["models"], X, y)
             self.class_names = self.le.classes_
 
             if self.component_config["cost_sensitive"]:
+                from kolibri.classifier.cost_sensitive import AdaCostClassifier
                 self.clf=AdaCostClassifier(self.clf)
 
             kf=StratifiedKFold(n_splits=self.component_config["cross_validation_folds"], shuffle=False)
@@ -167,7 +184,29 @@ class SkLearnClassifier(Classifier):
 
         return clf
 
+    def _search_classifier(self, model_type, X, y):
+        """Returns the model with the best parameters found by a
+        `SuccessiveHalvingSearch` within the configured budget."""
+        from kolibri.classifier.hyperparameter_search import SuccessiveHalvingSearch
+
+        if len(model_type) != 1:
+            raise ValueError("The hyperparameter search needs a single model, got {}.".format(model_type))
+        search_config = dict(self.component_config["hyperparameter_search"])
+        search_config.setdefault("scoring", self.component_config["scoring_function"])
+        search = SuccessiveHalvingSearch(model_type[0], **search_config).fit(X, y)
+        report = search.report()
+        logger.info("Hyperparameter search: {}".format(report))
+        self.component_config["hyperparameter_search_report"] = report
+        if search.best_params_ is None:
+            logger.warning("The hyperparameter search of '{}' evaluated no candidate within its "
+                           "budget, using the configured model.".format(model_type[0]))
+            return self._create_classifier(model_type)
+        return search.best_estimator()
+
     def _get_multiple_classifiers(self, classifiers, esemble_strategy):
+        from mlxtend.classifier import EnsembleVoteClassifier, StackingClassifier
+        from sklearn.ensemble import AdaBoostClassifier
+        from sklearn.linear_model import LogisticRegression
 
         if esemble_strategy == 'voting':
             w=[1 for c in classifiers]
@@ -266,12 +305,7 @@ class SkLearnClassifier(Classifier):
         classifier_file = os.path.join(model_dir, file_name)
 
         if os.path.exists(classifier_file):
-            model = joblib.load(classifier_file)
-            if model.clf:
-                class_names = model.clf.classes_
-                model.explainer = LimeTextExplainer(class_names=class_names)
-
-            return model
+            return load_artifact(classifier_file, model_metadata.mmap_mode)
         else:
             return cls(meta)
 
@@ -280,6 +314,6 @@ class SkLearnClassifier(Classifier):
         """Persist this model into the passed directory."""
 
         classifier_file = os.path.join(model_dir, SKLEARN_MODEL_FILE_NAME)
-        joblib.dump(self, classifier_file)
+        dump_artifact(self, classifier_file)
 
         return {"classifier_file": SKLEARN_MODEL_FILE_NAME}
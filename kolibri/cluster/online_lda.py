@@ -0,0 +1,384 @@
+"""Online variational Bayes LDA implemented with numpy.
+
+Follows Hoffman, Blei & Bach, "Online Learning for Latent Dirichlet
+Allocation" (NIPS 2010). The corpus is held as a scipy CSR matrix of term
+counts, so a million short documents only cost a few bytes per token, and
+the E-step of every mini-batch is spread across worker processes.
+"""
+import logging
+
+import numpy as np
+import scipy.sparse as sp
+from joblib import Parallel, delayed, effective_n_jobs
+from scipy.special import gammaln, psi
+
+from kolibri.cluster.baseTopic import TopicModel
+
+logger = logging.getLogger(__name__)
+
+EPS = np.finfo(np.float64).eps
+
+
+def dirichlet_expectation(alpha):
+    """Expected value of log(theta) for theta ~ Dirichlet(alpha), row wise."""
+    if alpha.ndim == 1:
+        return psi(alpha) - psi(np.sum(alpha))
+    return psi(alpha) - psi(np.sum(alpha, axis=1))[:, np.newaxis]
+
+
+def corpus_to_csr(corpus, num_terms):
+    """Converts a corpus in BoW format (iterable of lists of
+    `(token_id, count)`) to a CSR document-term matrix."""
+    indptr = [0]
+    indices = []
+    data = []
+    for bow in corpus:
+        for token_id, count in bow:
+            indices.append(token_id)
+            data.append(count)
+        indptr.append(len(indices))
+    return sp.csr_matrix((np.asarray(data, dtype=np.float64),
+                          np.asarray(indices, dtype=np.int32),
+                          np.asarray(indptr, dtype=np.int64)),
+                         shape=(len(indptr) - 1, num_terms))
+
+
+def _update_doc_distribution(X, exp_elog_beta, alpha, max_iter, gamma_threshold,
+                             cal_sstats, random_state):
+    """E-step for a block of documents.
+
+    Returns the variational doc-topic parameters of each document and,
+    if `cal_sstats` is set, the (unscaled) sufficient statistics."""
+    num_topics = exp_elog_beta.shape[0]
+    n_docs = X.shape[0]
+    rng = np.random.RandomState(random_state)
+    gamma = rng.gamma(100., 1. / 100., (n_docs, num_topics))
+    exp_elog_theta = np.exp(dirichlet_expectation(gamma))
+    sstats = np.zeros(exp_elog_beta.shape) if cal_sstats else None
+
+    indptr, indices, data = X.indptr, X.indices, X.data
+    for d in range(n_docs):
+        ids = indices[indptr[d]:indptr[d + 1]]
+        cnts = data[indptr[d]:indptr[d + 1]]
+        gamma_d = gamma[d, :]
+        exp_elog_theta_d = exp_elog_theta[d, :]
+        exp_elog_beta_d = exp_elog_beta[:, ids]
+        norm_phi = np.dot(exp_elog_theta_d, exp_elog_beta_d) + EPS
+
+        for _ in range(max_iter):
+            last_gamma = gamma_d
+            gamma_d = alpha + exp_elog_theta_d * np.dot(cnts / norm_phi, exp_elog_beta_d.T)
+            exp_elog_theta_d = np.exp(dirichlet_expectation(gamma_d))
+            norm_phi = np.dot(exp_elog_theta_d, exp_elog_beta_d) + EPS
+            if np.mean(np.abs(gamma_d - last_gamma)) < gamma_threshold:
+                break
+        gamma[d, :] = gamma_d
+
+        if cal_sstats:
+            sstats[:, ids] += np.outer(exp_elog_theta_d, cnts / norm_phi)
+
+    return gamma, sstats
+
+
+def _split_rows(n_rows, n_parts):
+    bounds = np.linspace(0, n_rows, min(n_parts, n_rows) + 1).astype(int)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+class OnlineLda(TopicModel):
+    """Latent Dirichlet Allocation trained with online variational Bayes.
+
+    Parameters
+    ----------
+    num_topics : int
+        Number of topics.
+    id2word : dict of (int, str), optional
+        Mapping from token ids to words, used to show topics.
+    alpha : float, optional
+        Prior of the document-topic distribution (per topic). Defaults to 1 / num_topics.
+    eta : float, optional
+        Prior of the topic-word distribution. Defaults to 1 / num_topics.
+    decay : float
+        Learning rate exponent (kappa), in (0.5, 1].
+    offset : float
+        Down-weights early iterations (tau_0).
+    batch_size : int
+        Number of documents per mini-batch.
+    passes : int
+        Number of passes over the corpus.
+    iterations : int
+        Maximum number of E-step iterations per document.
+    gamma_threshold : float
+        Convergence threshold of the per document E-step.
+    workers : int
+        Number of processes used for the E-step, -1 uses all cores. A few
+        documents are inferred in the calling process, and `transform`
+        keeps one pool of workers between calls.
+    random_state : int
+        Seed of the random initialisation.
+
+    """
+
+    def __init__(self, num_topics=20, id2word=None, alpha=None, eta=None, decay=0.7, offset=10.,
+                 batch_size=2048, passes=1, iterations=50, gamma_threshold=1e-3, workers=1,
+                 random_state=0):
+        self.num_topics = num_topics
+        self.id2word = id2word
+        self.alpha = alpha if alpha is not None else 1. / num_topics
+        self.eta = eta if eta is not None else 1. / num_topics
+        self.decay = decay
+        self.offset = offset
+        self.batch_size = batch_size
+        self.passes = passes
+        self.iterations = iterations
+        self.gamma_threshold = gamma_threshold
+        self.workers = workers
+        self.random_state = random_state
+        self.components_ = None
+        self.exp_elog_beta = None
+        self.num_updates = 0
+        self.num_docs = 0
+        self._parallel = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_parallel'] = None
+        return state
+
+    def _init_latent_vars(self, num_terms):
+        rng = np.random.RandomState(self.random_state)
+        self.components_ = rng.gamma(100., 1. / 100., (self.num_topics, num_terms))
+        self.exp_elog_beta = np.exp(dirichlet_expectation(self.components_))
+        self.num_updates = 0
+
+    def _uses_workers(self, n_docs):
+        """Whether the E-step of `n_docs` documents is worth spreading
+        across the workers."""
+        n_jobs = effective_n_jobs(self.workers)
+        return n_jobs > 1 and n_docs >= 2 * n_jobs
+
+    def _transform_parallel(self):
+        """The pool of the E-step of `transform`, created on first use."""
+        if getattr(self, '_parallel', None) is None:
+            self._parallel = Parallel(n_jobs=self.workers)
+        return self._parallel
+
+    def _e_step(self, X, cal_sstats, parallel=None):
+        n_jobs = effective_n_jobs(self.workers)
+        if parallel is None or not self._uses_workers(X.shape[0]):
+            return _update_doc_distribution(X, self.exp_elog_beta, self.alpha, self.iterations,
+                                            self.gamma_threshold, cal_sstats, self.random_state)
+
+        results = parallel(delayed(_update_doc_distribution)(
+            X[start:end], self.exp_elog_beta, self.alpha, self.iterations,
+            self.gamma_threshold, cal_sstats, self.random_state + i)
+            for i, (start, end) in enumerate(_split_rows(X.shape[0], n_jobs)))
+        gamma = np.vstack([g for g, _ in results])
+        sstats = sum(s for _, s in results) if cal_sstats else None
+        return gamma, sstats
+
+    def _m_step(self, X, total_docs, parallel):
+        _, sstats = self._e_step(X, cal_sstats=True, parallel=parallel)
+        sstats *= self.exp_elog_beta
+        rho = np.power(self.offset + self.num_updates, -self.decay)
+        self.components_ *= (1 - rho)
+        self.components_ += rho * (self.eta + total_docs * sstats / X.shape[0])
+        self.exp_elog_beta = np.exp(dirichlet_expectation(self.components_))
+        self.num_updates += 1
+
+    def fit(self, X):
+        """Trains the model.
+
+        Parameters
+        ----------
+        X : scipy.sparse matrix or iterable of list of (int, int)
+            Document-term counts, or a corpus in BoW format.
+
+        Returns
+        -------
+        OnlineLda
+            The fitted model.
+
+        """
+        X = self._check_corpus(X)
+        self._init_latent_vars(X.shape[1])
+        self.partial_fit(X, total_docs=X.shape[0], passes=self.passes)
+        return self
+
+    def partial_fit(self, X, total_docs=None, passes=1):
+        """Updates the model with a (possibly new) chunk of documents.
+
+        Parameters
+        ----------
+        X : scipy.sparse matrix or iterable of list of (int, int)
+            Document-term counts, or a corpus in BoW format.
+        total_docs : int, optional
+            Estimated size of the whole corpus, defaults to the number of documents seen so far.
+        passes : int
+            Number of passes over `X`.
+
+        """
+        X = self._check_corpus(X)
+        if self.components_ is None:
+            self._init_latent_vars(X.shape[1])
+        self.num_docs += X.shape[0]
+        total_docs = total_docs or self.num_docs
+        rng = np.random.RandomState(self.random_state)
+
+        with Parallel(n_jobs=self.workers) as parallel:
+            for p in range(passes):
+                order = rng.permutation(X.shape[0])
+                for start in range(0, X.shape[0], self.batch_size):
+                    batch = X[np.sort(order[start:start + self.batch_size])]
+                    self._m_step(batch, total_docs, parallel)
+                logger.info("lda pass {} finished, {} updates".format(p, self.num_updates))
+        return self
+
+    def _check_corpus(self, X):
+        if sp.issparse(X):
+            return sp.csr_matrix(X, dtype=np.float64)
+        num_terms = self.components_.shape[1] if self.components_ is not None else None
+        corpus = list(X)
+        if num_terms is None:
+            if self.id2word:
+                num_terms = max(self.id2word.keys()) + 1
+            else:
+                num_terms = 1 + max((i for bow in corpus for i, _ in bow), default=-1)
+        return corpus_to_csr(corpus, num_terms)
+
+    def transform(self, X):
+        """Infers the normalised topic distribution of each document.
+
+        Returns
+        -------
+        numpy.ndarray
+            Matrix of shape (n_docs, num_topics).
+
+        """
+        X = self._check_corpus(X)
+        parallel = self._transform_parallel() if self._uses_workers(X.shape[0]) else None
+        gamma, _ = self._e_step(X, cal_sstats=False, parallel=parallel)
+        return gamma / gamma.sum(axis=1)[:, np.newaxis]
+
+    def get_document_topics(self, bow, minimum_probability=0.0):
+        """Topic distribution of a single document as a list of `(topic_id, probability)`."""
+        distribution = self.transform([bow])[0]
+        return [(topic_id, float(p)) for topic_id, p in enumerate(distribution) if p > minimum_probability]
+
+    def __getitem__(self, bow):
+        """Topic distribution of a document, or of every document of a corpus (same conventions as gensim)."""
+        if len(bow) > 0 and not isinstance(bow[0], tuple):
+            distributions = self.transform(bow)
+            return [[(topic_id, float(p)) for topic_id, p in enumerate(row)] for row in distributions]
+        return self.get_document_topics(bow)
+
+    def get_topics(self):
+        """Get words X topics matrix, shape (`num_topics`, `vocabulary_size`)."""
+        return self.components_ / self.components_.sum(axis=1)[:, np.newaxis]
+
+    def get_topic_terms(self, topicid, topn=10):
+        topic = self.get_topics()[topicid]
+        best = np.argsort(topic)[::-1][:topn]
+        return [(int(i), float(topic[i])) for i in best]
+
+    def show_topic(self, topicid, topn=10):
+        return [(self.id2word[i] if self.id2word else i, p) for i, p in self.get_topic_terms(topicid, topn)]
+
+    def show_topics(self, num_topics=10, num_words=10, log=False, formatted=True):
+        if num_topics < 0 or num_topics >= self.num_topics:
+            num_topics = self.num_topics
+        shown = []
+        for topicid in range(num_topics):
+            if formatted:
+                topic = self.print_topic(topicid, topn=num_words)
+            else:
+                topic = self.show_topic(topicid, topn=num_words)
+            shown.append((topicid, topic))
+            if log:
+                logger.info("topic #{}: {}".format(topicid, topic))
+        return shown
+
+    def print_topic(self, topicid, topn=10):
+        return ' + '.join('%.3f*"%s"' % (v, k) for k, v in self.show_topic(topicid, topn))
+
+    def bound(self, X):
+        """Approximate variational bound of the corpus, used to compute the perplexity."""
+        X = self._check_corpus(X)
+        gamma, _ = self._e_step(X, cal_sstats=False)
+        elog_theta = dirichlet_expectation(gamma)
+        elog_beta = dirichlet_expectation(self.components_)
+        score = 0.
+        for d in range(X.shape[0]):
+            ids = X.indices[X.indptr[d]:X.indptr[d + 1]]
+            cnts = X.data[X.indptr[d]:X.indptr[d + 1]]
+            norm = elog_theta[d, :, np.newaxis] + elog_beta[:, ids]
+            norm_max = norm.max(axis=0)
+            score += np.dot(cnts, norm_max + np.log(np.sum(np.exp(norm - norm_max), axis=0)))
+        score += np.sum((self.alpha - gamma) * elog_theta)
+        score += np.sum(gammaln(gamma) - gammaln(self.alpha))
+        score += np.sum(gammaln(self.alpha * self.num_topics) - gammaln(np.sum(gamma, axis=1)))
+        score += np.sum((self.eta - self.components_) * elog_beta)
+        score += np.sum(gammaln(self.components_) - gammaln(self.eta))
+        score += np.sum(gammaln(self.eta * self.components_.shape[1]) - gammaln(np.sum(self.components_, axis=1)))
+        return score
+
+    def perplexity(self, X):
+        X = self._check_corpus(X)
+        return np.exp(-self.bound(X) / X.sum())
+
+
+def topic_coherence(topics, X, measure='c_npmi'):
+    """Mean coherence of a set of topics using document co-occurrence.
+
+    Parameters
+    ----------
+    topics : list of list of int
+        Top token ids of every topic.
+    X : scipy.sparse matrix
+        Document-term matrix of the reference corpus.
+    measure : str
+        Either 'u_mass' or 'c_npmi'.
+
+    Returns
+    -------
+    float
+        The average coherence over the topics.
+
+    """
+    if measure not in ('u_mass', 'c_npmi'):
+        raise ValueError("Unknown coherence measure '{}'".format(measure))
+    X = sp.csr_matrix(X)
+    n_docs = X.shape[0]
+    scores = []
+    for top in topics:
+        top = np.asarray(top)
+        occurrences = (X[:, top] > 0).astype(np.float64)
+        co_doc = np.asarray((occurrences.T @ occurrences).todense())
+        doc_freq = np.diag(co_doc)
+        i, j = np.tril_indices(len(top), k=-1)
+        if measure == 'u_mass':
+            pair_scores = np.log((co_doc[i, j] + 1.) / np.maximum(doc_freq[j], 1.))
+        else:
+            p_ij = co_doc[i, j] / n_docs + EPS
+            p_i = doc_freq[i] / n_docs + EPS
+            p_j = doc_freq[j] / n_docs + EPS
+            pair_scores = np.log(p_ij / (p_i * p_j)) / -np.log(p_ij)
+        scores.append(np.mean(pair_scores) if len(pair_scores) else 0.)
+    return float(np.mean(scores))
+
+
+def fit_and_score(X, num_topics, params, measure='c_npmi', topn=10):
+    """Trains an `OnlineLda` with `num_topics` topics on `X` and scores it
+    with `topic_coherence`.
+
+    Returns
+    -------
+    tuple of (OnlineLda, float)
+        The fitted model and its coherence.
+
+    """
+    model = OnlineLda(num_topics=num_topics, **params)
+    model.fit(X)
+    topics = [[i for i, _ in model.get_topic_terms(t, topn)] for t in range(num_topics)]
+    return model, topic_coherence(topics, X, measure)
+
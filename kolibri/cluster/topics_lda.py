@@ -7,11 +7,11 @@ import random
 import tempfile
 
 import gensim
-import joblib
 from gensim.models import CoherenceModel
 import matplotlib.pyplot as plt
 from kolibri.cluster.baseTopic import TopicModel
 from kolibri.pipeComponent import Component
+from kolibri.utils.file import dump_artifact, load_artifact
 from kolibri.settings import resources_path
 from kolibri.utils.downloader import Downloader
 from kolibri.vocabulary import Vocabulary
@@ -164,7 +164,7 @@ class LdaMallet(Component, Downloader, TopicModel):
         classifier_file = os.path.join(model_dir, file_name)
 
         if os.path.exists(classifier_file):
-            model = joblib.load(classifier_file)
+            model = load_artifact(classifier_file, model_metadata.mmap_mode)
 
             return model
         else:
@@ -175,6 +175,6 @@ class LdaMallet(Component, Downloader, TopicModel):
         """Persist this model into the passed directory."""
 
         classifier_file = os.path.join(model_dir, TOPIC_MODEL_FILE_NAME)
-        joblib.dump(self, classifier_file)
+        dump_artifact(self, classifier_file)
 
         return {"topic_file": TOPIC_MODEL_FILE_NAME}
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+import logging
+import os
+
+from joblib import Parallel, delayed
+
+from kolibri.cluster.online_lda import OnlineLda, corpus_to_csr, fit_and_score
+from kolibri.pipeComponent import Component
+from kolibri.utils.file import dump_artifact, load_artifact
+from kolibri.vocabulary import Vocabulary
+
+logger = logging.getLogger(__name__)
+
+TOPIC_MODEL_FILE_NAME = "topic_lda_model.pkl"
+
+
+class LdaTopics(Component):
+    """LDA topic model trained in-process with online variational Bayes.
+
+    Drop-in replacement for :class:`kolibri.cluster.topics_lda.LdaMallet`
+    that needs neither the MALLET binary nor a JVM. The E-step is spread
+    across `workers` processes and, when a range of `num_topics` is given,
+    the candidate models are trained and scored in parallel.
+    """
+
+    name = "lda_topics_online"
+
+    provides = ["topics"]
+
+    requires = ["tokens"]
+
+    defaults = {
+        "num_topics": 20,
+
+        # sum of the document-topic prior over all topics (MALLET convention)
+        "alpha": 50,
+        "beta": 0.01,
+        "workers": -1,
+        "iterations": 50,
+        "passes": 1,
+        "batch_size": 2048,
+        "decay": 0.7,
+        "offset": 10.,
+        "topic_threshold": 0.0,
+        "random_seed": 0,
+        "use_lemma": True,
+
+        # experiment with the number of topics, the model with the best
+        # coherence is kept
+        "nb_topic_start": 1,
+        "nb_topic_stop": 1,
+        "step": 1,
+        "coherence": "c_npmi",
+        "output_folder": "."
+    }
+
+    def __init__(self, component_config=None, vocabulary=None, topic_model=None):
+
+        super(LdaTopics, self).__init__(component_config)
+        start = self.component_config["nb_topic_start"]
+        stop = self.component_config["nb_topic_stop"]
+        if start > stop:
+            raise Exception("In topic experimentation start should be larger than stop.")
+        self.vocabulary = vocabulary
+        self.num_topics = self.component_config["num_topics"]
+        self.topic_threshold = self.component_config["topic_threshold"]
+        self.workers = self.component_config["workers"]
+        self.topic_model = topic_model
+        self.coherence_values = None
+
+    @classmethod
+    def required_packages(cls):
+        return ["numpy", "scipy", "joblib"]
+
+    def _model_params(self, num_topics):
+        return {
+            "alpha": float(self.component_config["alpha"]) / num_topics,
+            "eta": self.component_config["beta"],
+            "decay": self.component_config["decay"],
+            "offset": self.component_config["offset"],
+            "batch_size": self.component_config["batch_size"],
+            "passes": self.component_config["passes"],
+            "iterations": self.component_config["iterations"],
+            "random_state": self.component_config["random_seed"],
+            "id2word": self.vocabulary.id2token
+        }
+
+    def train(self, training_data, cfg, **kwargs):
+
+        if self.vocabulary is None:
+            self.vocabulary = Vocabulary()
+            self.vocabulary.add_training_data(training_data)
+        if len(self.vocabulary.vocab) == 0:
+            raise ValueError("cannot compute LDA over an empty collection (no terms)")
+        self.vocabulary.build()
+
+        corpus = corpus_to_csr((self.vocabulary.doc2bow(doc) for doc in training_data.training_examples),
+                               self.vocabulary.count)
+
+        start = self.component_config["nb_topic_start"]
+        limit = self.component_config["nb_topic_stop"]
+        if start == limit:
+            self.topic_model = OnlineLda(num_topics=self.num_topics, workers=self.workers,
+                                         **self._model_params(self.num_topics))
+            self.topic_model.fit(corpus)
+            return
+
+        step = self.component_config["step"]
+        measure = self.component_config["coherence"]
+        num_topics_range = list(range(start, limit, step))
+        # one process per candidate, each model runs its E-step serially
+        scored = Parallel(n_jobs=self.workers)(
+            delayed(fit_and_score)(corpus, k, dict(self._model_params(k), workers=1), measure)
+            for k in num_topics_range)
+
+        self.coherence_values = [(k, score) for k, (_, score) in zip(num_topics_range, scored)]
+        for k, score in self.coherence_values:
+            logger.info("num_topics={} coherence={:.4f}".format(k, score))
+        best = max(range(len(scored)), key=lambda i: scored[i][1])
+        self.num_topics = num_topics_range[best]
+        self.topic_model = scored[best][0]
+        self.topic_model.workers = self.workers
+        self._plot_coherence()
+
+    def _plot_coherence(self):
+        try:
+            import matplotlib.pyplot as plt
+        except ImportError:
+            return
+        x, y = zip(*self.coherence_values)
+        plt.plot(x, y)
+        plt.xlabel("Num Topics")
+        plt.ylabel("Coherence score")
+        plt.legend(("coherence_values",), loc='best')
+        plt.savefig(os.path.join(self.component_config["output_folder"], "coherence_plot.png"))
+
+    def process(self, message, **kwargs):
+
+        self._check_nlp_doc(message)
+        message.set_output_property("topics")
+        bow = [self.vocabulary.doc2bow(message)]
+
+        topics = self.topic_model[bow]
+        message.topics = [[(t, p) for t, p in doc if p > self.topic_threshold] for doc in topics]
+
+    @classmethod
+    def load(cls,
+             model_dir=None,
+             model_metadata=None,
+             cached_component=None,
+             **kwargs
+             ):
+        meta = model_metadata.for_component(cls.name)
+        file_name = meta.get("topic_file", TOPIC_MODEL_FILE_NAME)
+        classifier_file = os.path.join(model_dir, file_name)
+
+        if os.path.exists(classifier_file):
+            return load_artifact(classifier_file, model_metadata.mmap_mode)
+        else:
+            return cls(meta)
+
+    def persist(self, model_dir):
+        """Persist this model into the passed directory."""
+
+        classifier_file = os.path.join(model_dir, TOPIC_MODEL_FILE_NAME)
+        dump_artifact(self, classifier_file)
+
+        return {"topic_file": TOPIC_MODEL_FILE_NAME}
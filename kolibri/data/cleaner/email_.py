@@ -1,5 +1,5 @@
 from typing import Any
-from kolibri.data.cleaner.scripts.email2text import EmailMessage
+from kolibri.data.cleaner.scripts.email2text import EmailMessage, clean_emails
 from kolibri.document import Document
 from kolibri.pipeComponent import Component
 
@@ -9,25 +9,42 @@ class EmailCleaner(Component):
 
     provides = ["clean"]
 
+    defaults = {
+        # number of processes used to clean batches of emails,
+        # None uses all cores and 1 cleans in process
+        "n_jobs": 1,
+        "batch_chunksize": 500
+    }
+
     def __init__(self, config):
         super().__init__(config)
         split_pattern = None
         if "split_pattern" in config:
             split_pattern = config["split_pattern"]
+        self.language = config["language"]
+        self.split_pattern = split_pattern
         self.email_parser = EmailMessage(config["language"], split_pattern)
+        self.timings = None
 
     def train(self, training_data, config, **kwargs):
 
-        for example in training_data.training_examples:
-            example.clean = self.clean(example.raw_text)
+        self.process_batch(training_data.training_examples)
 
     def process(self, document, **kwargs):
         # type: (Document, **Any) -> None
 
         document.clean = self.clean(document.raw_text)
 
+    def process_batch(self, documents, n_jobs=None):
+        """Cleans a list of documents at once, in `n_jobs` processes
+        (defaults to the `n_jobs` of the component configuration)."""
+        if n_jobs is None:
+            n_jobs = self.component_config.get("n_jobs", 1)
+        cleaned, self.timings = clean_emails([document.raw_text for document in documents],
+                                             self.language, self.split_pattern, n_jobs=n_jobs,
+                                             chunksize=self.component_config.get("batch_chunksize", 500))
+        for document, text in zip(documents, cleaned):
+            document.clean = text
+
     def clean(self, text):
-        cleaned = self.email_parser.read(text)
-        cleaned = [fragment.body for fragment in cleaned.fragments]
-        text = '. '.join(cleaned)
-        return text
+        return self.email_parser.clean(text)
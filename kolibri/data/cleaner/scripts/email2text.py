@@ -2,6 +2,11 @@
 #!/usr/bin/env python
 
 import re
+import time
+import hashlib
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from kolibri.settings import resources_path
 import collections
 from kolibri.data.cleaner.scripts.cleaning_scripts import fix_formating
@@ -12,6 +17,8 @@ import os
 from math import sqrt
 import gcld3
 
+logger = logging.getLogger(__name__)
+
 resources=Ressources()
 
 filename_job_functions = resources.get('gazetteers/default/Job_Functions.txt').path
@@ -24,6 +31,7 @@ disclaimers=open(filename_disclaimer).readlines()
 disclaimers=[d for d in disclaimers if d.strip()]
 disclaimer_openings=[d.strip() for d in disclaimers]
 salutation_opening_statements=[s.strip() for s in open(filename_salutation).readlines() if s.strip()!=""]
+email_closings=[c.strip() for c in open(filename_email_closing).readlines() if c.strip()!=""]
 pattern_disclaimer = r"[\s*]*(?P<disclaimer_text>(" + "|".join(disclaimer_openings)+ ")(\s*\w*))"
 pattern_salutation = r'(?P<salutation>(^(- |\s)*\b((' + r'|'.join(
     salutation_opening_statements) + r'))\b)( [A-Z][a-z]+){0,4},?)'
@@ -50,21 +58,111 @@ regex_headers=[
     r"\s{0, 10}(\d{1,2})?\s?(Jan|Feb|Mar|Apr|Mai|Jun|Jul|Aug|Sep|Nov|Oct|Dec)\s?(\d{1,2})?,\s+\d{2}:\d{2}\s+UTC$"
 
 ]
+regex_header = r"|".join(regex_headers)
+
+patterns_title=[
+    "(R[Ee]|F[Ww])\s?:\s?.+",
+    ".*\s+(?=(Hi|Hello|Dear))"
+    ]
+patterns_caution=[
+    "This message\scontains?\s[A-Z ]*.*\s+(Sensitivity: [\w ]+)?",
+#    "\*-+\s+Sent\s+:.*\s+Received\s+:.*\s+Reply to\s:.*\s+Attachments\s+:.*\s+\*-*",
+    "^##-\s+Please type your reply above this line\s+-##",
+    "\[EXTERNAL EMAIL\].*",
+    "\[EXTERNAL\].*",
+    r"CAUTION\s.*",
+    "Classified Personnel Information.*",
+    "Please forward suspicious emails as attachments to .*",
+    "For Internal Use Only.*",
+    "(Importance|Importancia):\s+([\w+ ]+)",
+    "Information Classification\s*:\s+([\w+ ]+)",
+    "THIS\s+IS\s+A\s+MASS\s+COMM\s+UNICATION.+",
+    "This is a secure, encrypted message.",
+    "This message was sent securely using TLS.",
+    "Verified Sender"
+]
+pattern_attachement = r'(?P<attachement>(^\s*[a-zA-Z0-9_,\. -]+\.(png|jpeg|docx|doc|xlsx|xls|pdf|pptx|ppt))|Attachments\s?:\s?([a-zA-Z0-9_,\. -]+\.(png|jpeg|docx|doc|xlsx|xls|pdf|pptx|ppt)))'
+pattern_forward = '(?P<forward_text>([- ]* Forwarded Message [- ]*|[- ]* Forwarded By [- ]*|[- ]*Original Message[- ]*))'
+pattern_language_noise = "\*?-+\s+Sent\s+:.*\s+Received\s+:.*\s+Reply to\s:.*\s+Attachments\s+:.*\s+\*?-*|Dear Sender, thank you for your e-mail. I'll be out of office until.*|NO BODY.*|[^\w.,:\s]"
+
+# compiled once per process, a cleaner handles millions of fragments
+re_header_split = re.compile(regex_header, re.MULTILINE | re.UNICODE)
+re_salutation_split = re.compile(pattern_salutation, re.MULTILINE | re.IGNORECASE)
+re_salutation = re.compile(pattern_salutation, re.IGNORECASE)
+re_disclaimer = re.compile(pattern_disclaimer, re.MULTILINE | re.DOTALL)
+re_title = re.compile(r'(?P<title>(' + '|'.join(patterns_title) + '))')
+re_caution = re.compile(r'(?P<caution>^\s*(' + r'|'.join(patterns_caution) + '))', re.MULTILINE)
+re_attachement = re.compile(pattern_attachement, re.IGNORECASE)
+re_forward = re.compile(pattern_forward, re.DOTALL)
+re_language_noise = re.compile(pattern_language_noise)
+
+
+def _compile_signature(closings):
+    pattern = r'(?P<signature>(^|\.\s)\s*\b(' + '|'.join(closings) + r')(,|.)?\s)'
+    return re.compile(pattern, re.IGNORECASE | re.MULTILINE), re.compile(pattern, re.IGNORECASE)
+
+
+re_signature, re_signature_inner = _compile_signature(email_closings)
+
+_compiled_headers = {regex_header: re.compile(r"(?P<header_text>(" + regex_header + "))")}
+
+
+def _compile_header(regex):
+    if regex not in _compiled_headers:
+        _compiled_headers[regex] = re.compile(r"(?P<header_text>(" + regex + "))")
+    return _compiled_headers[regex]
+
+
+LANGUAGE_CACHE_SIZE = 100000
+_language_cache = {}
+
+
+def detect_languages(text):
+    """Top two languages of `text` as (language, probability) pairs.
+
+    Results are cached on the md5 of the text, quoted replies and
+    signatures repeat a lot across an email archive."""
+    key = hashlib.md5(text.encode('utf-8', 'surrogatepass')).digest()
+    if key not in _language_cache:
+        if len(_language_cache) >= LANGUAGE_CACHE_SIZE:
+            _language_cache.clear()
+        _language_cache[key] = tuple((l.language, l.probability)
+                                     for l in lang_detector.FindTopNMostFreqLangs(text=text, num_langs=2))
+    return _language_cache[key]
+
+
+@contextmanager
+def _timed(timings, stage):
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    yield
+    timings[stage] += time.perf_counter() - start
+
 class EmailMessage(object):
     """
     An email message represents a parsed email body.
     """
 
-    def __init__(self, language='en', split_pattern=None):
+    def __init__(self, language='en', split_pattern=None, timings=None):
         self.fragments = []
         self.fragment = None
         self.found_visible = False
         self.language=language
-        self.salutations=[s.strip() for s in open(filename_salutation).readlines() if s.strip()!=""]
+        self.salutations=salutation_opening_statements
 
         self.split_pattern=split_pattern
-        self.closings=[c.strip() for c in open(filename_email_closing).readlines()  if c.strip()!=""]
-        self.regex_header = r"|".join(regex_headers)
+        self.closings=email_closings
+        self.regex_header = regex_header
+        self.re_header_split = re_header_split
+        if self.split_pattern:
+            self.regex_header=r""+self.split_pattern
+            self.re_header_split = re.compile(self.regex_header, re.MULTILINE | re.UNICODE)
+            self.re_split_pattern = re.compile(self.split_pattern)
+        # optional collections.Counter accumulating seconds spent per stage
+        self.timings=timings
+
     def read(self, body_text, title_text=None):
         """ Creates new fragment for each line
             and labels as a signature, quote, or hidden.
@@ -72,18 +170,18 @@ class EmailMessage(object):
         """
         self.fragments=[]
 
-        self.text = fix_formating(str(body_text))
+        with _timed(self.timings, 'format'):
+            self.text = fix_formating(str(body_text))
         self.title=title_text
 #        regex_header = r"(From|To)\s*:[0-9A-Za-zöóìśćłńéáú⺀-⺙⺛-⻳⼀-⿕々〇〡-〩〸-〺〻㐀-䶵一-鿃豈-鶴侮-頻並-龎\s\/@\.:,;\&\?\\\(\)'\"\*[\]<>#\/\+_-]+?((Subj(ect)?)|Sent at)\s?:|From\s*:[\w @\.:,;\&\(\)'\"\*[\]<>#\/\+-]+?(Sent|Date)\s?:(\s*\d+(\s|\/)(\w+|\d+)(\s|\/)\d+(\s|\/)?(\d+:\d+)?)?|From\s*:[\w @\.:,;\&\(\)'\"\*[\]<>#\/\+-]+?(Sent\s+at)\s?:(\s*\d+\s\w+\s\d+\s?\d+:\d+)?|From\s*:[\w @\.:,;\&\?\\\(\)'\"\*[\]<>#\/\+-]+?(CC)\s?:|From\s*:[\w @\.:,;\&\?\\\(\)'\"\*[\]<>#\/\+-]+?(To)\s?:|(De|Da)\s*:[0-9ÀA-Za-zéàçèêù\s\/@\.:,;\&\?\\\(\)'\"\*[\]<>#\/\+-]+(Objet|Oggetto)\s?:"
-        if self.split_pattern:
-            self.regex_header=r""+self.split_pattern
-        starts = [m.start(0) for m in re.finditer(self.regex_header, self.text, re.MULTILINE | re.UNICODE)]
+        with _timed(self.timings, 'split'):
+            starts = [m.start(0) for m in self.re_header_split.finditer(self.text)]
 
-        if len(starts) < 1:
-            starts = [m.start(0) for m in re.finditer(pattern_salutation, self.text, re.MULTILINE | re.IGNORECASE)]
-            starts=[s for s in starts if s>150]
+            if len(starts) < 1:
+                starts = [m.start(0) for m in re_salutation_split.finditer(self.text)]
+                starts=[s for s in starts if s>150]
         if len(starts)<1:
-            self.fragments.append(Fragment(self.text, self.salutations, self.closings, self.regex_header))
+            self.fragments.append(Fragment(self.text, self.salutations, self.closings, self.regex_header, self.timings))
 
         else:
             if starts[0] > 0:
@@ -92,12 +190,17 @@ class EmailMessage(object):
 
             for line in lines:
                 if self.split_pattern:
-                    line=re.sub(self.split_pattern, '', line)
+                    line=self.re_split_pattern.sub('', line)
                 if line.strip()!='':
-                    self.fragments.append(Fragment(line, self.salutations, self.closings, self.regex_header))
+                    self.fragments.append(Fragment(line, self.salutations, self.closings, self.regex_header, self.timings))
 
         return self
 
+    def clean(self, body_text, title_text=None):
+        """Text of the email without headers, salutations, disclaimers and signatures."""
+        self.read(body_text, title_text)
+        return '. '.join([fragment.body for fragment in self.fragments])
+
     def get_languges(self):
         langs=[l.language for l in self.fragments]
         languages = collections.Counter()
@@ -105,18 +208,18 @@ class EmailMessage(object):
             languages.update(d)
         if not languages:
             try:
-                lang = lang_detector.FindTopNMostFreqLangs(self.title, num_langs=2)
+                lang = detect_languages(self.title)
 
             except:
                 try:
-                    lang = lang_detector.FindTopNMostFreqLangs(self.text, num_langs=2)
+                    lang = detect_languages(self.text)
                 except:
                     languages['und']=0.90
 
                     return languages
 
-            for l in lang:
-                    languages[l.language] = l.probability
+            for language, probability in lang:
+                    languages[language] = probability
 
 
         return max(languages, key=languages.get)
@@ -127,34 +230,40 @@ class Fragment(object):
         an Email Message, labeling each part.
     """
 
-    def __init__(self, email_text, salutations, closings, regex_header):
+    def __init__(self, email_text, salutations, closings, regex_header, timings=None):
 
 
         self.salutations = salutations
         self.closings = closings
         self.body = email_text.strip()
         self.regex_header=regex_header
-        self.is_forwarded_message = self._get_forwarded()
+        if closings is email_closings:
+            self.re_signature, self.re_signature_inner = re_signature, re_signature_inner
+        else:
+            self.re_signature, self.re_signature_inner = _compile_signature(closings)
+        with _timed(timings, 'forwarded'):
+            self.is_forwarded_message = self._get_forwarded()
         self.title=None
-        self.headers = self._get_header()
-        self.caution=self._get_caution()
-        if self.title is None:
-            self.title=self._get_title()
-        self.attachement = self._get_attachement()
-        self.salutation = self._get_salutation()
-        self.disclaimer = self._get_disclaimer()
-        self.signature = self._get_signature()
+        with _timed(timings, 'header'):
+            self.headers = self._get_header()
+        with _timed(timings, 'caution'):
+            self.caution=self._get_caution()
+        with _timed(timings, 'title'):
+            if self.title is None:
+                self.title=self._get_title()
+        with _timed(timings, 'attachement'):
+            self.attachement = self._get_attachement()
+        with _timed(timings, 'salutation'):
+            self.salutation = self._get_salutation()
+        with _timed(timings, 'disclaimer'):
+            self.disclaimer = self._get_disclaimer()
+        with _timed(timings, 'signature'):
+            self.signature = self._get_signature()
 
         self._content = email_text
 
     def _get_title(self):
-        patterns=[
-            "(R[Ee]|F[Ww])\s?:\s?.+",
-            ".*\s+(?=(Hi|Hello|Dear))"
-            ]
-
-        pattern = r'(?P<title>(' + '|'.join(patterns) + '))'
-        groups = re.match(pattern, self.body)
+        groups = re_title.match(self.body)
         title = ""
         if groups is not None:
             if "title" in groups.groupdict().keys():
@@ -162,26 +271,7 @@ class Fragment(object):
                 self.body = self.body[len(title):].strip()
         return title
     def _get_caution(self):
-        patterns=[
-            "This message\scontains?\s[A-Z ]*.*\s+(Sensitivity: [\w ]+)?",
-#            "\*-+\s+Sent\s+:.*\s+Received\s+:.*\s+Reply to\s:.*\s+Attachments\s+:.*\s+\*-*",
-            "^##-\s+Please type your reply above this line\s+-##",
-            "\[EXTERNAL EMAIL\].*",
-            "\[EXTERNAL\].*",
-            r"CAUTION\s.*",
-            "Classified Personnel Information.*",
-            "Please forward suspicious emails as attachments to .*",
-            "For Internal Use Only.*",
-            "(Importance|Importancia):\s+([\w+ ]+)",
-            "Information Classification\s*:\s+([\w+ ]+)",
-            "THIS\s+IS\s+A\s+MASS\s+COMM\s+UNICATION.+",
-            "This is a secure, encrypted message.",
-            "This message was sent securely using TLS.",
-            "Verified Sender"
-        ]
-        pattern=r'(?P<caution>^\s*('+r'|'.join(patterns)+'))'
-
-        matches = re.finditer(pattern, self.body, re.MULTILINE)
+        matches = re_caution.finditer(self.body)
         cautions=[]
         for matchNum, match in enumerate(matches, start=1):
             caution=match.group()
@@ -197,8 +287,7 @@ class Fragment(object):
         return '\n'.join(cautions)
 
     def _get_attachement(self):
-        pattern = r'(?P<attachement>(^\s*[a-zA-Z0-9_,\. -]+\.(png|jpeg|docx|doc|xlsx|xls|pdf|pptx|ppt))|Attachments\s?:\s?([a-zA-Z0-9_,\. -]+\.(png|jpeg|docx|doc|xlsx|xls|pdf|pptx|ppt)))'
-        groups = re.match(pattern, self.body, re.IGNORECASE)
+        groups = re_attachement.match(self.body)
         attachement = ''
         if not groups is None:
             if "attachement" in groups.groupdict().keys():
@@ -211,7 +300,7 @@ class Fragment(object):
         # Max of 5 words succeeding first Hi/To etc, otherwise is probably an entire sentence
 
 
-        groups = re.match(pattern_salutation, self.body, re.IGNORECASE)
+        groups = re_salutation.match(self.body)
         salutation = ''
         if groups is not None:
             if "salutation" in groups.groupdict().keys():
@@ -221,15 +310,13 @@ class Fragment(object):
     @property
     def language(self):
         return_val = {}
-        regx = "\*?-+\s+Sent\s+:.*\s+Received\s+:.*\s+Reply to\s:.*\s+Attachments\s+:.*\s+\*?-*|Dear Sender, thank you for your e-mail. I'll be out of office until.*|NO BODY.*|[^\w.,:\s]"
         text=self.body
-        text=re.sub(regx, ' ', text.strip())
+        text=re_language_noise.sub(' ', text.strip())
 
         if len(text.strip()) >0:
             try:
-                lang = lang_detector.FindTopNMostFreqLangs(text=text, num_langs=2)
-                for l in lang:
-                    return_val[l.language]=l.probability*sqrt(len(text))
+                for language, probability in detect_languages(text):
+                    return_val[language]=probability*sqrt(len(text))
             except:
                 pass
             try:
@@ -248,9 +335,7 @@ class Fragment(object):
     def _get_header(self):
 #        regex = r"From\s*:[\w @\.:,;\&\?\\\(\)'\"\*[\]<>#\/\+-]+?(Subj(ect)?)\s?:|From\s*:[\w @\.:,;\&\(\)'\"\*[\]<>#\/\+-]+?(Sent|Date)\s?:(\s*\d+(\s|\/)(\w+|\d+)(\s|\/)\d+(\s|\/)?(\d+:\d+)?)?|From\s*:[\w @\.:,;\&\(\)'\"\*[\]<>#\/\+-]+?(Sent\s+at)\s?:(\s*\d+\s\w+\s\d+\s?\d+:\d+)?|From\s*:[\w @\.:,;\&\?\\\(\)'\"\*[\]<>#\/\+-]+?(CC)\s?:|From\s*:[\w @\.:,;\&\?\\\(\)'\"\*[\]<>#\/\+-]+?(To)\s?:"
 
-        pattern = r"(?P<header_text>("+self.regex_header+"))"
-
-        groups = re.search(pattern, self.body)
+        groups = _compile_header(self.regex_header).search(self.body)
         header_text = None
         if groups is not None:
             if "header_text" in groups.groupdict().keys():
@@ -263,7 +348,7 @@ class Fragment(object):
     def _get_disclaimer(self):
 
 
-        groups = re.search(pattern_disclaimer, self.body, re.MULTILINE+re.DOTALL)
+        groups = re_disclaimer.search(self.body)
         disclaimer_text = None
         if groups is not None:
             if "disclaimer_text" in groups.groupdict().keys():
@@ -279,11 +364,8 @@ class Fragment(object):
 
         # TODO DRY
         self.signature=''
-        sig_opening_statements = self.closings
-
-        pattern = r'(?P<signature>(^|\.\s)\s*\b(' + '|'.join(sig_opening_statements ) + r')(,|.)?\s)'
 
-        groups = re.search(pattern, self.body, re.IGNORECASE | re.MULTILINE)
+        groups = self.re_signature.search(self.body)
         signature = None
         if groups:
             if "signature" in groups.groupdict().keys():
@@ -292,7 +374,7 @@ class Fragment(object):
                 sig_span=groups.span()
                 signature = self.body[sig_span[0]:]
                 self.body=self.body[:sig_span[0]]
-                groups = re.search(pattern, signature[len(signature1):], re.IGNORECASE)
+                groups = self.re_signature_inner.search(signature[len(signature1):])
                 if groups:
                     signature2 = groups.groupdict()["signature"]
                     sig_span=groups.span()
@@ -302,8 +384,7 @@ class Fragment(object):
 
     def _get_forwarded(self):
 
-        pattern = '(?P<forward_text>([- ]* Forwarded Message [- ]*|[- ]* Forwarded By [- ]*|[- ]*Original Message[- ]*))'
-        groups = re.search(pattern, self.body, re.DOTALL)
+        groups = re_forward.search(self.body)
         forward = None
         if groups is not None:
             if "forward_text" in groups.groupdict().keys():
@@ -320,6 +401,68 @@ class Fragment(object):
 
 
 
+_worker_message = None
+
+
+def _init_worker(language, split_pattern):
+    global _worker_message
+    _worker_message = EmailMessage(language, split_pattern)
+
+
+def _clean_chunk(texts):
+    timings = collections.Counter()
+    _worker_message.timings = timings
+    try:
+        cleaned = [_worker_message.clean(text) for text in texts]
+    finally:
+        _worker_message.timings = None
+    return cleaned, timings
+
+
+def clean_emails(texts, language='en', split_pattern=None, n_jobs=None, chunksize=500):
+    """Cleans a batch of email bodies, fanned out over a pool of processes.
+
+    The gazetteers and compiled regexes are module globals, so each worker
+    loads them once; each worker keeps its own language detection cache.
+
+    Args:
+        texts: the email bodies.
+        language: language of the emails.
+        split_pattern: optional regex separating the messages of a thread.
+        n_jobs: number of worker processes, None uses all cores and 1
+            cleans in the calling process.
+        chunksize: number of emails sent to a worker at a time.
+
+    Returns:
+        tuple(list, collections.Counter): the cleaned texts, in input
+        order, and the seconds spent in each stage summed over workers.
+    """
+    texts = list(texts)
+    chunks = [texts[i:i + chunksize] for i in range(0, len(texts), chunksize)]
+    cleaned = []
+    timings = collections.Counter()
+    start = time.perf_counter()
+    if n_jobs == 1:
+        _init_worker(language, split_pattern)
+        results = map(_clean_chunk, chunks)
+        for chunk, chunk_timings in results:
+            cleaned.extend(chunk)
+            timings.update(chunk_timings)
+    else:
+        if n_jobs is not None and n_jobs < 0:
+            n_jobs = None
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                                 initargs=(language, split_pattern)) as executor:
+            for chunk, chunk_timings in executor.map(_clean_chunk, chunks):
+                cleaned.extend(chunk)
+                timings.update(chunk_timings)
+    timings['total'] = time.perf_counter() - start
+    logger.info("cleaned {} emails in {:.1f}s ({})".format(
+        len(texts), timings['total'],
+        ", ".join("{}: {:.1f}s".format(stage, t) for stage, t in timings.most_common() if stage != 'total')))
+
+    return cleaned, timings
+
 
 if __name__ =="__main__":
     import pandas as pd
@@ -70,10 +70,9 @@ class SequenceLabelField(Field):
     @overrides
     def index(self, vocab: Vocabulary):
         if not self._skip_indexing:
-            self._indexed_labels = [
-                vocab.get_token_index(label, self._label_namespace)  # type: ignore
-                for label in self.labels
-            ]
+            self._indexed_labels = vocab.get_token_indices(
+                list(self.labels), self._label_namespace  # type: ignore
+            )
 
     @overrides
     def empty_field(self) -> "SequenceLabelField":
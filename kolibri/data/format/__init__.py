@@ -21,6 +21,8 @@ def _guess_format(filename):
         guess=KOLIBRI
     if extension==".csv":
         guess=CSV
+    if extension in (".json", ".jsonl", ".ndjson"):
+        guess=JSON
 
     return guess
 
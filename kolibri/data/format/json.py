@@ -3,6 +3,7 @@ import logging, json
 
 from kolibri.data import TrainingData
 from kolibri.document import Document
+from kolibri.data.writer_reader import iter_json_examples
 from kolibri.utils import build_entity
 
 CLASS = "class"
@@ -22,7 +23,11 @@ logger = logging.getLogger(__name__)
 
 
 class JsonReader():
-    """Reads markdown training data and creates a TrainingData object."""
+    """Reads the examples of a json array or json lines file.
+
+    An example is either an object with a `text`, its target and optional
+    entities, or a string with markdown entity annotations. The file is
+    decoded one example at a time."""
 
     def __init__(self):
         self.current_title = None
@@ -30,17 +35,19 @@ class JsonReader():
         self.training_examples = []
 
     def reads(self, s, **kwargs):
-        """Read markdown string and create TrainingData object"""
+        """Read a json file and return its documents"""
         self.__init__()
-        data=json.loads(open(s).read())
- #       texts, labels = csv_data_reader(s, kwargs["col_sep"], kwargs["has_column_names"], kwargs["content_column"], kwargs["label_column"])
-        class_id=kwargs['target']
+        for document in self.iter_documents(s, **kwargs):
+            self.training_examples.append(document)
 
-        for d in data:
-            self._parse_item(d)
+        return self.training_examples
 
+    def iter_documents(self, s, **kwargs):
+        """Yields the documents of a json file as they are read."""
+        class_id = kwargs.get('target', 'target')
 
-        return TrainingData(self.training_examples)
+        for _, example in iter_json_examples(s):
+            yield self._parse_item(example, class_id)
 
     @staticmethod
     def _strip_comments(text):
@@ -54,37 +61,47 @@ class JsonReader():
 
         return {sn: make_regex(sn) for sn in section_names}
 
-    def _parse_item(self, line):
-        """Parses an md list item line based on the current section type."""
-        self.training_examples.append(line)
+    def _parse_item(self, example, class_id='target'):
+        """Builds the document of a json example."""
+        if isinstance(example, str):
+            return self._parse_training_example(example, self.current_title)
+        if not isinstance(example, dict) or not isinstance(example.get('text'), str):
+            raise ValueError("Expected an object with a 'text' string or a string "
+                             "but found {!r}".format(example))
+        target = example.get(class_id, example.get('target'))
+        if example.get('entities') is not None:
+            return Document.build(example['text'], target, example['entities'])
+        return self._parse_training_example(example['text'], target)
 
-    def _find_entities_in_training_example(self, example):
-        """Extracts entities from a markdown intent example."""
+    @staticmethod
+    def _find_entities_in_training_example(example):
+        """Extracts entities from a markdown intent example and returns
+        them with the plain text."""
+        if '[' not in example:
+            return [], example
         entities = []
-        offset = 0
-        for match in re.finditer(ent_regex, example):
-            entity_text = match.groupdict()['entity_text']
-            entity_type = match.groupdict()['entity']
-            entity_value = match.groupdict()['value'] if match.groupdict()['value'] else entity_text
-
-            start_index = match.start() - offset
-            end_index = start_index + len(entity_text)
-            offset += len(match.group(0)) - len(entity_text)
-
-            entity = build_entity(start_index, end_index, entity_value, entity_type)
+        parts = []
+        pos = 0
+        length = 0
+        for match in ent_regex.finditer(example):
+            entity_text, entity_type, entity_value = match.group('entity_text', 'entity', 'value')
+
+            parts.append(example[pos:match.start()])
+            length += match.start() - pos
+            entity = build_entity(length, length + len(entity_text),
+                                  entity_value or entity_text, entity_type)
             entities.append(entity)
+            parts.append(entity_text)
+            length += len(entity_text)
+            pos = match.end()
 
-        return entities
-
+        parts.append(example[pos:])
+        return entities, ''.join(parts)
 
-    def _parse_training_example(self, example):
+    def _parse_training_example(self, example, target=None):
         """Extract entities and synonyms, and convert to plain text."""
-        entities = self._find_entities_in_training_example(example)
-        plain_text = re.sub(ent_regex, lambda m: m.groupdict()['entity_text'], example)
-        document = Document(plain_text, {'target': self.current_title})
-        if len(entities) > 0:
-            document.set('entities', entities)
-        return document
+        entities, plain_text = self._find_entities_in_training_example(example)
+        return Document.build(plain_text, target, entities)
 
 
 class JsonWriter():
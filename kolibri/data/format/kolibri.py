@@ -6,9 +6,20 @@ from kolibri.document import Document
 
 from kolibri.utils import json_to_string
 logger = logging.getLogger(__name__)
-from kolibri.data.writer_reader import JsonTrainingDataReader, DataWriter
+from kolibri.data.writer_reader import JsonTrainingDataReader, DataWriter, compile_schema
 
 class KolibriReader(JsonTrainingDataReader):
+    sections = ("common_examples", "class_examples", "entity_examples")
+    deprecated_sections = ("class_examples", "entity_examples")
+
+    def example_validator(self):
+        return compile_schema(_training_example_schema())
+
+    def build_document(self, example, **kwargs):
+        classlabel = kwargs.get('target', "class")
+        return Document.build(example['text'], example.get(classlabel),
+                              example.get("entities"))
+
     def read_from_json(self, js, **kwargs):
         """Loads training data stored in theNLU data format."""
         validate_nlu_data(js)
@@ -76,8 +87,8 @@ def validate_nlu_data(data):
         raise e
 
 
-def _nlu_data_schema():
-    training_example_schema = {
+def _training_example_schema():
+    return {
         "type": "object",
         "properties": {
             "text": {"type": "string", "minLength": 1},
@@ -99,6 +110,10 @@ def _nlu_data_schema():
         "required": ["text"]
     }
 
+
+def _nlu_data_schema():
+    training_example_schema = _training_example_schema()
+
     return {
         "type": "object",
         "properties": {
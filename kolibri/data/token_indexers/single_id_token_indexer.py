@@ -40,9 +40,16 @@ class SingleIdTokenIndexer(TokenIndexer):
     def tokens_to_indices(
         self, tokens: List[Token], vocabulary: Vocabulary, index_name: str
     ) -> Dict[str, List[int]]:
+        tokens = list(itertools.chain(self._start_tokens, tokens, self._end_tokens))
+        if all(getattr(token, "text_id", None) is None for token in tokens):
+            texts = [token.text for token in tokens]
+            if self.lowercase_tokens:
+                texts = [text.lower() for text in texts]
+            return {index_name: vocabulary.get_token_indices(texts, self.namespace)}
+
         indices: List[int] = []
 
-        for token in itertools.chain(self._start_tokens, tokens, self._end_tokens):
+        for token in tokens:
             if getattr(token, "text_id", None) is not None:
                 # `text_id` being set on the token means that we aren't using the vocab, we just use
                 # this id instead.
@@ -9,25 +9,88 @@ from copy import deepcopy
 from langdetect import detect
 
 from kolibri.settings import data
-from kolibri.utils import write_to_file, list_to_str, lazyproperty
+from kolibri.utils import write_to_file, list_to_str
 
 logger = logging.getLogger(__name__)
 
 
 class TrainingData(object):
-    """Holds loaded class and entity training data."""
+    """Holds loaded class and entity training data.
+
+    The examples are indexed by class and by entity type as they are added,
+    so the statistics (`classes`, `examples_per_class`, `sorted_entities`,
+    ...) do not scan the examples. Examples appended to `training_examples`
+    are indexed on the next access; after changing the target or entities
+    of examples in place, or removing examples from the list, call
+    `invalidate`."""
 
     def __init__(self, language=None, training_examples=None, detect_language=False):
 
+        self._training_examples = []
+        self.invalidate()
         if training_examples:
             self.training_examples = self.post_process(training_examples, language, detect_language)
-        else:
-            self.training_examples = []
 
         self.data_train = None
         self.data_test = None
         self.print_stats()
 
+    @property
+    def training_examples(self):
+        return self._training_examples
+
+    @training_examples.setter
+    def training_examples(self, examples):
+        self._training_examples = examples if isinstance(examples, list) else list(examples)
+        self.invalidate()
+
+    def add_examples(self, examples):
+        """Appends examples and indexes them."""
+        self._index()
+        self._training_examples.extend(examples)
+        self._index()
+
+    def invalidate(self):
+        """Drops the indexes, they are rebuilt on the next access."""
+        self._indexed = 0
+        # target -> examples, for the examples with a target
+        self._class_index = {}
+        # target -> number of examples, None for the examples without target
+        self._class_counts = Counter()
+        # entity type -> entities, in the order of the examples
+        self._entity_index = {}
+        # entity type -> examples having an entity of this type
+        self._entity_example_index = {}
+        self._class_examples = []
+        self._entity_examples = []
+        self._sorted_entities = None
+        self._targets = {}
+
+    def _index(self):
+        """Indexes the examples added since the last call."""
+        examples = self._training_examples
+        if len(examples) < self._indexed:
+            self.invalidate()
+        if len(examples) == self._indexed:
+            return
+        for ex in examples[self._indexed:]:
+            target = ex.target
+            self._class_counts[target] += 1
+            if target:
+                self._class_examples.append(ex)
+                self._class_index.setdefault(target, []).append(ex)
+            if ex.entities:
+                self._entity_examples.append(ex)
+                for entity in ex.entities:
+                    entity_type = entity["entity"]
+                    self._entity_index.setdefault(entity_type, []).append(entity)
+                    examples_of_type = self._entity_example_index.setdefault(entity_type, [])
+                    if not examples_of_type or examples_of_type[-1] is not ex:
+                        examples_of_type.append(ex)
+        self._indexed = len(examples)
+        self._sorted_entities = None
+        self._targets = {}
+
     def merge(self, *others):
         """Return merged instance of this data with other training data."""
 
@@ -36,7 +99,9 @@ class TrainingData(object):
         for o in others:
             training_examples.extend(deepcopy(o.training_examples))
 
-        return TrainingData(training_examples)
+        merged = TrainingData()
+        merged.add_examples(training_examples)
+        return merged
 
     @staticmethod
     def post_process(examples, lang, detectlanguage):
@@ -54,44 +119,47 @@ class TrainingData(object):
                     ex.target = ex.target.strip()
         return examples
 
-    @lazyproperty
+    @property
     def class_examples(self):
-        return [ex
-                for ex in self.training_examples
-                if ex.target]
+        self._index()
+        return self._class_examples
 
-    @lazyproperty
+    @property
     def entity_examples(self):
-        return [ex
-                for ex in self.training_examples
-                if ex.entities]
+        self._index()
+        return self._entity_examples
 
     def targets(self, tag):
         """Returns the set of targets in the training data."""
-        return set([ex.tag for ex in self.training_examples]) - {None}
-
-    @lazyproperty
+        self._index()
+        if tag == "target":
+            return set(self._class_counts) - {None}
+        if tag not in self._targets:
+            self._targets[tag] = set([getattr(ex, tag) for ex in self.training_examples]) - {None}
+        return self._targets[tag]
+
+    @property
     def classes(self):
         """Returns the set of classes in the training data."""
         return self.targets("target")
 
-    @lazyproperty
+    @property
     def examples_per_class(self):
         """Calculates the number of examples per class."""
-        classes = [ex.target for ex in self.training_examples]
-        return dict(Counter(classes))
+        self._index()
+        return dict(self._class_counts)
 
-    @lazyproperty
+    @property
     def entities(self):
         """Returns the set of entity types in the training data."""
-        entity_types = [e["entity"] for e in self.sorted_entities]
-        return set(entity_types)
+        self._index()
+        return set(self._entity_index)
 
-    @lazyproperty
+    @property
     def examples_per_entity(self):
         """Calculates the number of examples per entity."""
-        entity_types = [e["entity"] for e in self.sorted_entities]
-        return dict(Counter(entity_types))
+        self._index()
+        return {entity_type: len(entities) for entity_type, entities in self._entity_index.items()}
 
     def as_json(self, **kwargs):
         """Represent this set of training examples as json."""
@@ -109,19 +177,22 @@ class TrainingData(object):
             "training_data": "training_data.json"
         }
 
-    @lazyproperty
+    @property
     def sorted_entities(self):
         """Extract all entities from examples and sorts them by entity type."""
-
-        entity_examples = [entity
-                           for ex in self.entity_examples
-                           for entity in ex.entities]
-        return sorted(entity_examples, key=lambda e: e["entity"])
+        self._index()
+        if self._sorted_entities is None:
+            self._sorted_entities = [entity
+                                     for entity_type in sorted(self._entity_index)
+                                     for entity in self._entity_index[entity_type]]
+        return self._sorted_entities
 
     def sorted_class_examples(self):
         """Sorts the class examples by the name of the class."""
-
-        return sorted(self.class_examples, key=lambda e: e.target)
+        self._index()
+        return [ex
+                for aClass in sorted(self._class_index)
+                for ex in self._class_index[aClass]]
 
     def validate(self):
         """Ensures that the loaded training data is valid.
@@ -135,43 +206,62 @@ class TrainingData(object):
                           "class predictions.")
 
         # emit warnings for classs with only a few training samples
+        rare_classes = set()
         for aClass, count in self.examples_per_class.items():
             if count < data.MIN_EXAMPLES_PER_CLASS:
                 warnings.warn("Class '{}' has only {} training examples! "
                               "Minimum is {}/ Removing {}."
                               .format(aClass, count,
                                       data.MIN_EXAMPLES_PER_CLASS, aClass))
-                self.training_examples = [example for example in self.training_examples if example['target'] != aClass]
+                rare_classes.add(aClass)
 
         # emit warnings for entities with only a few training samples
+        rare_entities = set()
         for entity_type, count in self.examples_per_entity.items():
             if count < data.MIN_EXAMPLES_PER_ENTITY:
                 warnings.warn("Entity '{}' has only {} training examples! "
                               "minimum is {}. Removing {}."
                               "".format(entity_type, count,
                                         data.MIN_EXAMPLES_PER_ENTITY, entity_type))
+                rare_entities.add(entity_type)
 
-                self.remove_entity_type(entity_type)
+        # removes the rare classes and entities in one pass
+        if rare_classes:
+            rare_classes = set(self._class_index) & rare_classes
+            self.training_examples = [example for example in self.training_examples
+                                      if not example.target or example.target not in rare_classes]
+        if rare_entities:
+            self._remove_entity_types(rare_entities)
 
     def remove_entity_type(self, entity_type):
-        for example in self.entity_examples:
-            example['entities'] = [entity for entity in example['entities'] if entity['entity'] != entity_type]
+        self._remove_entity_types({entity_type})
+
+    def _remove_entity_types(self, entity_types):
+        self._index()
+        examples = {id(example): example
+                    for entity_type in entity_types
+                    for example in self._entity_example_index.get(entity_type, [])}
+        for example in examples.values():
+            example['entities'] = [entity for entity in example['entities'] if entity['entity'] not in entity_types]
+        if examples:
+            self.invalidate()
 
     def train_test_split(self, train_frac=0.8):
         """Split into a training and test dataset, preserving the fraction of examples per class."""
+        self._index()
         train, test = [], []
-        for aClass, count in self.examples_per_class.items():
-            ex = [e for e in self.class_examples if e.data["target"] == aClass]
+        for aClass, class_examples in self._class_index.items():
+            ex = list(class_examples)
             random.shuffle(ex)
-            n_train = int(count * train_frac)
+            n_train = int(len(ex) * train_frac)
             train.extend(ex[:n_train])
             test.extend(ex[n_train:])
 
         self.data_train = TrainingData(
-            train
+            training_examples=train
         )
         self.data_test = TrainingData(
-            test
+            training_examples=test
         )
 
     def print_stats(self):
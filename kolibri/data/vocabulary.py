@@ -7,11 +7,15 @@ import codecs
 import copy
 import logging
 import os
+import sys
 from collections import defaultdict
+from itertools import repeat
 from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Union
+import numpy as np
 import tqdm
 from kolibri.utils import namespace_match
 from kolibri.config import ModelConfig
+from kolibri.vocabulary import encode_tokens, decode_tokens
 logger = logging.getLogger(__name__)
 
 
@@ -19,6 +23,7 @@ DEFAULT_NON_PADDED_NAMESPACES = ("*tags", "*labels")
 DEFAULT_PADDING_TOKEN = "__PADDING__"
 DEFAULT_OOV_TOKEN = "__UNKNOWN__"
 NAMESPACE_PADDING_FILE = "non_padded_namespaces.txt"
+VOCABULARY_BINARY_FILE = "vocabulary.npz"
 
 
 class _NamespaceDict(defaultdict):
@@ -160,15 +165,19 @@ class Vocabulary():
         )
         self._index_to_token.update(state["_index_to_token"])
 
-    def save_to_files(self, directory: str) -> None:
+    def save_to_files(self, directory: str, binary: bool = True) -> None:
         """
         Persist this Vocabulary to files so it can be reloaded later.
-        Each namespace corresponds to one file.
+        The namespaces are written together in one binary file, or each
+        namespace in its own text file when ``binary`` is False.
 
         Parameters
         ----------
         directory : ``str``
             The directory where we save the serialized vocabulary.
+        binary : ``bool``, optional (default=True)
+            Write the tokens of all the namespaces in ``VOCABULARY_BINARY_FILE``
+            (utf-8 bytes + offsets) instead of one line per token.
         """
         os.makedirs(directory, exist_ok=True)
         if os.listdir(directory):
@@ -180,6 +189,17 @@ class Vocabulary():
             for namespace_str in self._non_padded_namespaces:
                 print(namespace_str, file=namespace_file)
 
+        if binary:
+            arrays = {}
+            for i, (namespace, mapping) in enumerate(self._index_to_token.items()):
+                tokens, offsets = encode_tokens([mapping[j] for j in range(len(mapping))])
+                arrays["namespace_{}".format(i)] = np.frombuffer(namespace.encode("utf-8"), dtype=np.uint8)
+                arrays["tokens_{}".format(i)] = tokens
+                arrays["offsets_{}".format(i)] = offsets
+            with open(os.path.join(directory, VOCABULARY_BINARY_FILE), "wb") as binary_file:
+                np.savez(binary_file, **arrays)
+            return
+
         for namespace, mapping in self._index_to_token.items():
             # Each namespace gets written to its own file, in index order.
             with codecs.open(
@@ -219,11 +239,23 @@ class Vocabulary():
             oov_token=oov_token,
         )
 
+        binary_filename = os.path.join(directory, VOCABULARY_BINARY_FILE)
+        if os.path.exists(binary_filename):
+            with np.load(binary_filename, allow_pickle=False) as data:
+                i = 0
+                while "namespace_{}".format(i) in data:
+                    namespace = bytes(data["namespace_{}".format(i)]).decode("utf-8")
+                    tokens = decode_tokens(data["tokens_{}".format(i)], data["offsets_{}".format(i)])
+                    vocab._token_to_index[namespace] = {token: index for index, token in enumerate(tokens)}
+                    vocab._index_to_token[namespace] = dict(enumerate(tokens))
+                    i += 1
+            return vocab
+
         # Check every file in the directory.
         for namespace_filename in os.listdir(directory):
             if namespace_filename == NAMESPACE_PADDING_FILE:
                 continue
-            if namespace_filename.startswith("."):
+            if namespace_filename.startswith(".") or namespace_filename == VOCABULARY_BINARY_FILE:
                 continue
             namespace = namespace_filename.replace(".txt", "")
             if any(namespace_match(pattern, namespace) for pattern in non_padded_namespaces):
@@ -459,6 +491,7 @@ class Vocabulary():
                 "  Got %s (with type %s)" % (repr(token), type(token))
             )
         if token not in self._token_to_index[namespace]:
+            token = sys.intern(token)
             index = len(self._token_to_index[namespace])
             self._token_to_index[namespace][token] = index
             self._index_to_token[namespace][index] = token
@@ -489,6 +522,21 @@ class Vocabulary():
                 logger.error("Token: %s", token)
                 raise
 
+    def get_token_indices(self, tokens: List[str], namespace: str = "tokens") -> List[int]:
+        """
+        Batch version of ``get_token_index``: the ids of all the ``tokens`` are looked up in
+        one pass over the namespace's mapping, unknown tokens get the id of the OOV token.
+        """
+        mapping = self._token_to_index[namespace]
+        oov_index = mapping.get(self._oov_token)
+        indices = list(map(mapping.get, tokens, repeat(oov_index)))
+        if oov_index is None and None in indices:
+            token = tokens[indices.index(None)]
+            logger.error("Namespace: %s", namespace)
+            logger.error("Token: %s", token)
+            raise KeyError(token)
+        return indices
+
     def get_token_from_index(self, index: int, namespace: str = "tokens") -> str:
         return self._index_to_token[namespace][index]
 
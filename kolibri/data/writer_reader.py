@@ -1,4 +1,6 @@
+import io
 import logging, json
+import re
 from collections import defaultdict
 
 from kolibri.data.training_data import TrainingData
@@ -36,7 +38,7 @@ class DataReader():
                                 ex.get("entities"))
             training_examples.append(msg)
 
-        return TrainingData(training_examples)
+        return TrainingData(training_examples=training_examples)
 
 
 class DataWriter():
@@ -56,15 +58,209 @@ class DataWriter():
 
 
 class JsonTrainingDataReader(DataReader):
+    """Reads the training examples of a json file one by one.
+
+    The file is either a json object holding the `sections` arrays under
+    the `root` key, a json array of examples or json lines with one
+    example per line. Each example is validated on its own and turned
+    into a `Document`, so the whole json tree is never held in memory."""
+
+    root = "kolibri_nlu_data"
+    sections = ("common_examples", "intent_examples", "entity_examples")
+    deprecated_sections = ("intent_examples", "entity_examples")
+
     def reads(self, s, **kwargs):
-        """Transforms string into json object and passes it on."""
-        js = json.loads(read_file(s))
-        return self.read_from_json(js, **kwargs)
+        """Reads the documents of a training data file."""
+        return list(self.iter_documents(s, **kwargs))
+
+    def iter_documents(self, s, **kwargs):
+        """Yields the documents of a training data file, validating the
+        examples as they are read."""
+        validator = self.example_validator()
+        warned = False
+        for i, (section, example) in enumerate(iter_json_examples(s, self.root, self.sections)):
+            if section in self.deprecated_sections and not warned:
+                warned = True
+                logger.warning("DEPRECATION warning: your data contains '{}' which will be "
+                               "removed in the future. Consider putting all your examples "
+                               "into the '{}' section.".format(section, self.sections[0]))
+            validate_example(validator, example, i, section)
+            yield self.build_document(example, **kwargs)
+
+    def example_validator(self):
+        """Returns the compiled json schema validator of an example."""
+        return compile_schema(_training_example_schema())
+
+    def build_document(self, example, **kwargs):
+        """Builds a `Document` from a validated example."""
+        return Document.build(example['text'], example.get("target"), example.get("entities"))
 
     def read_from_json(self, js, **kwargs):
         """Reads TrainingData from a json object."""
         raise NotImplementedError
 
+
+class _JsonStream(object):
+    """Decodes the values of a json document one at a time, reading the
+    file in chunks."""
+
+    chunk_size = 1 << 20
+    _blank = re.compile(r'[ \t\n\r]*')
+
+    def __init__(self, f):
+        self._file = f
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self):
+        """Drops the consumed text and reads the next chunk."""
+        self._buffer = self._buffer[self._pos:]
+        self._pos = 0
+        chunk = self._file.read(self.chunk_size)
+        if not chunk:
+            self._eof = True
+        self._buffer += chunk
+        return bool(chunk)
+
+    def peek(self):
+        """Returns the next non blank character, '' at the end of the file."""
+        while True:
+            self._pos = self._blank.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, chars):
+        """Consumes the next character, one of `chars`."""
+        c = self.peek()
+        if not c or c not in chars:
+            raise ValueError("Expected one of {!r} but found {!r} in the json data".format(
+                chars, c or "end of file"))
+        self._pos += 1
+        return c
+
+    def value(self):
+        """Decodes the next json value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except ValueError:
+                # the value may continue in the next chunk
+                if self._eof:
+                    raise
+                self._fill()
+                continue
+            if end == len(self._buffer) and not self._eof:
+                # a number may have been cut at the end of the chunk
+                self._fill()
+                continue
+            self._pos = end
+            return value
+
+    def keys(self):
+        """Iterates over the keys of an object, the caller reads the
+        value of each key before asking for the next one."""
+        self.expect('{')
+        if self.peek() == '}':
+            self._pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key
+            if self.expect(',}') == '}':
+                return
+
+    def items(self):
+        """Iterates over the decoded items of an array."""
+        self.expect('[')
+        if self.peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.expect(',]') == ']':
+                return
+
+
+def iter_json_examples(filename, root=None, sections=()):
+    """Yields the (section, example) pairs of a json training data file.
+
+    The examples are read from the `sections` arrays of the object under
+    the `root` key, from a top level array or from json lines (section is
+    None for the last two). Only one example is decoded at a time."""
+    with io.open(filename, encoding="utf-8") as f:
+        stream = _JsonStream(f)
+        first = stream.peek()
+        if first == '[':
+            for example in stream.items():
+                yield None, example
+            return
+        if first == '{' and root is not None and not filename.endswith((".jsonl", ".ndjson")):
+            for i, key in enumerate(stream.keys()):
+                if key != root:
+                    if i == 0:
+                        # not a training data object: json lines
+                        break
+                    _raise_validation_error("Additional properties are not allowed "
+                                            "({!r} was unexpected)".format(key))
+                for section in stream.keys():
+                    if section in sections:
+                        for example in stream.items():
+                            yield section, example
+                    else:
+                        stream.value()
+            else:
+                return
+
+        f.seek(0)
+        for i, line in enumerate(f):
+            line = line.strip()
+            if line:
+                try:
+                    example = json.loads(line)
+                except ValueError as e:
+                    raise ValueError("Failed to read json from line {} of '{}'. Error: "
+                                     "{}".format(i + 1, filename, e))
+                yield None, example
+
+
+def validate_example(validator, example, index=None, section=None):
+    # type: (Any, Dict[Text, Any], int, Text) -> None
+    """Validates a single training example with a compiled schema.
+
+    Raises exception on failure."""
+    if validator is None:
+        return
+    from jsonschema import ValidationError
+
+    try:
+        validator.validate(example)
+    except ValidationError as e:
+        e.message += (". Failed to validate training example {}{}, make sure your data "
+                      "is valid.".format(index, " of '{}'".format(section) if section else ""))
+        raise e
+
+
+def compile_schema(schema):
+    """Returns the validator of a json schema, compiled once and reused
+    for every example."""
+    from jsonschema.validators import validator_for
+
+    return validator_for(schema)(schema)
+
+
+def _raise_validation_error(message):
+    from jsonschema import ValidationError
+
+    raise ValidationError(message + ". Failed to validate training data, make sure your data "
+                                    "is valid.")
+
+
 def validate_nlu_data(data):
     # type: (Dict[Text, Any]) -> None
     """Validatetraining data format to ensure proper training.
@@ -80,8 +276,8 @@ def validate_nlu_data(data):
         raise e
 
 
-def _kolibri_data_schema():
-    training_example_schema = {
+def _training_example_schema():
+    return {
         "type": "object",
         "properties": {
             "text": {"type": "string", "minLength": 1},
@@ -103,6 +299,10 @@ def _kolibri_data_schema():
         "required": ["text"]
     }
 
+
+def _kolibri_data_schema():
+    training_example_schema = _training_example_schema()
+
     regex_feature_schema = {
         "type": "object",
         "properties": {
@@ -50,7 +50,7 @@ movie_reviews = LazyCorpusLoader(
 
 
 qc = LazyCorpusLoader(
-    'qc', ListReader, ['train.txt', 'test.txt'], encoding='ISO-8859-2'
+    'qc', TupleStringReader, ['train.txt', 'test.txt'], encoding='ISO-8859-2'
 )
 
 reuters = LazyCorpusLoader(
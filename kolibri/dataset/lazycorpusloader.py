@@ -1,9 +1,18 @@
 import re
 import gc
 from kolibri.dataset.corpusreader import CorpusReader
-from kolibri.data import find
+import nltk.data
+from kolibri.settings import resources_path
 TRY_ZIPFILE_FIRST = True
 
+def find(resource_name):
+    """Finds a resource of the kolibri data directory with `nltk.data.find`,
+    which also lets nltk open the files found there."""
+    if resources_path not in nltk.data.path:
+        nltk.data.path.append(resources_path)
+    return nltk.data.find(resource_name)
+
+
 class LazyCorpusLoader(object):
     """
     lazy dataset loader from nltk.
@@ -56,7 +56,7 @@ __all__ = [
     'CategorizedPlaintextCorpusReader',
     'SentiWordNetCorpusReader',
     'SentiSynset',
-    'ListReader',
+    'TupleStringReader',
     'TwitterCorpusReader',
     'CategorizedSentencesCorpusReader'
 ]
\ No newline at end of file
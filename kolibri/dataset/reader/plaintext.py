@@ -31,8 +31,8 @@ class PlaintextCorpusReader(CorpusReader):
             self,
             root,
             fileids,
-            word_tokenizer=WordTokenizer(),
-            sent_tokenizer=SentenceTokenizer(),
+            word_tokenizer=None,
+            sent_tokenizer=None,
             para_block_reader=read_blankline_block,
             encoding='utf8',
     ):
@@ -42,15 +42,15 @@ class PlaintextCorpusReader(CorpusReader):
         :param root: The root directory for this dataset.
         :param fileids: A list or regexp specifying the fileids in this dataset.
         :param word_tokenizer: Tokenizer for breaking sentences or
-            paragraphs into words.
+            paragraphs into words, a ``WordTokenizer`` by default.
         :param sent_tokenizer: Tokenizer for breaking paragraphs
-            into words.
+            into words, a ``SentenceTokenizer`` by default.
         :param para_block_reader: The block reader used to divide the
             dataset into paragraph blocks.
         """
         CorpusReader.__init__(self, root, fileids, encoding)
-        self._word_tokenizer = word_tokenizer
-        self._sent_tokenizer = sent_tokenizer
+        self._word_tokenizer = word_tokenizer if word_tokenizer is not None else WordTokenizer({})
+        self._sent_tokenizer = sent_tokenizer if sent_tokenizer is not None else SentenceTokenizer({})
         self._para_block_reader = para_block_reader
 
     def raw(self, fileids=None):
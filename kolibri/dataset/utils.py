@@ -1,9 +1,19 @@
 import os, csv
 import bisect
+import functools
+import hashlib
+import inspect
+import io
+import json
+import logging
 import re
+import shutil
 import tempfile
+from array import array
 from functools import reduce
 
+import numpy as np
+
 try:
     import cPickle as pickle
 except ImportError:
@@ -18,9 +28,68 @@ from six import string_types, text_type
 
 from nltk.tokenize import wordpunct_tokenize
 from nltk.internals import slice_bounds
+from nltk.data import PathPointer, FileSystemPathPointer, ZipFilePathPointer, SeekableUnicodeStreamReader
 from kolibri.utils._collections import AbstractLazySequence, LazyConcatenation, LazySubsequence
 from kolibri.utils.file import *
-from kolibri.utils.file import ZipFilePathPointer
+from kolibri.vocabulary import encode_tokens, decode_tokens
+
+logger = logging.getLogger(__name__)
+
+INDEX_DIR = os.path.join(tempfile.gettempdir(), "kolibri_corpus_index")
+"""Directory of the block offset indexes of the dataset files whose own
+directory is not writable."""
+
+INDEX_VERSION = 2
+
+# the attributes of a corpus reader that its block readers read with
+_READER_STATE = re.compile(r'tokenizer|reader|tagset|encoding')
+
+
+def _qualname(function):
+    return '%s.%s' % (getattr(function, '__module__', ''),
+                      getattr(function, '__qualname__', None) or type(function).__qualname__)
+
+
+def describe_reader(value, depth=0):
+    """Describes a block reader, and the state it reads with, by a string
+    that does not change across processes: the qualified name of the
+    function, the attributes of the corpus reader of a bound method that
+    name a tokenizer, reader, tagset or encoding, the variables a closure
+    captures, the arguments of a partial, and the class and attributes of
+    the objects among them (tokenizers)."""
+    if value is None or isinstance(value, (string_types, bytes, int, float, bool)):
+        return repr(value)
+    if depth > 4:
+        return type(value).__qualname__
+    if isinstance(value, functools.partial):
+        return 'partial(%s, %s, %s)' % (describe_reader(value.func, depth + 1),
+                                        describe_reader(value.args, depth + 1),
+                                        describe_reader(value.keywords, depth + 1))
+    if inspect.ismethod(value):
+        owner = getattr(value.__self__, '__dict__', {})
+        state = {name: attr for name, attr in owner.items() if _READER_STATE.search(name)}
+        return '%s(%s)' % (_qualname(value.__func__), describe_reader(state, depth + 1))
+    if inspect.isfunction(value) or inspect.isbuiltin(value):
+        cells = []
+        for cell in getattr(value, '__closure__', None) or ():
+            try:
+                cells.append(cell.cell_contents)
+            except ValueError:
+                cells.append(None)
+        return _qualname(value) + (describe_reader(cells, depth + 1) if cells else '')
+    if isinstance(value, dict):
+        return '{%s}' % ', '.join('%s: %s' % (describe_reader(k, depth + 1), describe_reader(v, depth + 1))
+                                  for k, v in sorted(value.items(), key=lambda item: repr(item[0])))
+    if isinstance(value, (list, tuple)):
+        return '[%s]' % ', '.join(describe_reader(v, depth + 1) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return '{%s}' % ', '.join(sorted(describe_reader(v, depth + 1) for v in value))
+    if isinstance(value, type(re.compile(''))):
+        return 're(%r, %d)' % (value.pattern, value.flags)
+    if hasattr(value, '__dict__'):
+        return '%s(%s)' % (_qualname(type(value)), describe_reader(vars(value), depth + 1))
+    return _qualname(type(value))
+
 ######################################################################
 # { Corpus View
 ######################################################################
@@ -104,9 +173,27 @@ class StreamBackedCorpusView(AbstractLazySequence):
        start_toknum is the token index of the first token in the block;
        end_toknum is the token index of the first token not in the
        block; and tokens is a list of the tokens in the block.
+    With ``persist_index``, once a file has been read to the end, the
+    complete toknum/filepos mapping is saved in a sidecar ``.idx.npy``
+    file (next to the dataset file, or in ``INDEX_DIR`` if its directory
+    is not writable).  Views created later on the same file, with the same
+    block reader, reader state, start position and encoding, memory map
+    that index: their length is known and any token is reached by reading
+    a single block.  The index is ignored, and rebuilt, when the size or
+    modification time of the file or the reader changes.
+    :ivar persist_index: Whether the block offset index is saved and
+        reused across processes.  Off by default, as it writes files next
+        to the dataset.
+    :ivar index_key: Added to the key of the persisted index, for block
+        readers whose blocks depend on state that ``describe_reader`` does
+        not see.
     """
 
-    def __init__(self, fileid, block_reader=None, startpos=0, encoding='utf8'):
+    persist_index = False
+    index_key = None
+
+    def __init__(self, fileid, block_reader=None, startpos=0, encoding='utf8', persist_index=None,
+                 index_key=None):
         """
         Create a new dataset view, based on the file ``fileid``, and
         read with ``block_reader``.  See the class documentation
@@ -121,7 +208,15 @@ class StreamBackedCorpusView(AbstractLazySequence):
             read the file's contents.  If no encoding is specified,
             then the file's contents will be read as a non-unicode
             string (i.e., a str).
+        :param persist_index: Overrides the ``persist_index`` class
+            attribute for this view.
+        :param index_key: Overrides the ``index_key`` class attribute for
+            this view.
         """
+        if persist_index is not None:
+            self.persist_index = persist_index
+        if index_key is not None:
+            self.index_key = index_key
         if block_reader:
             self.read_block = block_reader
         # Initialize our toknum/filepos mapping.
@@ -161,6 +256,10 @@ class StreamBackedCorpusView(AbstractLazySequence):
         # increase efficiency of random access.
         self._cache = (-1, -1, None)
 
+        self._index_loaded = False
+        if self.persist_index and isinstance(self._fileid, string_types):
+            self._load_index(startpos)
+
     fileid = property(
         lambda self: self._fileid,
         doc="""
@@ -168,6 +267,83 @@ class StreamBackedCorpusView(AbstractLazySequence):
         :type: str or PathPointer""",
     )
 
+    def _reader_digest(self):
+        """A hash of the block reader, of the state it reads with, and of
+        ``index_key``."""
+        description = describe_reader(self.read_block)
+        if self.index_key is not None:
+            description += '|' + str(self.index_key)
+        return hashlib.md5(description.encode('utf8')).digest()
+
+    def _index_files(self, startpos, digest):
+        """The candidate paths of the index of this view: next to the
+        dataset file, then in ``INDEX_DIR``."""
+        path = os.path.abspath(self._fileid)
+        key = '%s|%s|%s|%s' % (path, digest.hex(), startpos, self._encoding)
+        name = '%s.%s.idx.npy' % (os.path.basename(path), hashlib.md5(key.encode('utf8')).hexdigest()[:12])
+        return [os.path.join(os.path.dirname(path), name), os.path.join(INDEX_DIR, name)]
+
+    def _file_signature(self):
+        stat = os.stat(self._fileid)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def _load_index(self, startpos):
+        """Memory map the persisted toknum/filepos mapping, if there is
+        one for the current version of the file and of the reader.
+
+        The index is an int64 array of shape (3 + n_blocks, 2): the file
+        size and modification time, the number of tokens and the start
+        position, the reader digest and the index version, then the
+        (toknum, filepos) of every block."""
+        digest = self._reader_digest()
+        header = [int.from_bytes(digest[:8], 'little', signed=True), INDEX_VERSION]
+        for index_file in self._index_files(startpos, digest):
+            if not os.path.exists(index_file):
+                continue
+            try:
+                index = np.load(index_file, mmap_mode='r')
+            except (OSError, IOError, ValueError):
+                continue
+            if index.ndim != 2 or index.shape[0] < 4 or list(index[0]) != self._file_signature() \
+                    or index[1, 1] != startpos or list(index[2]) != header:
+                logger.debug('Ignoring the stale corpus index %s', index_file)
+                continue
+            self._toknum = index[3:, 0]
+            self._filepos = index[3:, 1]
+            self._len = int(index[1, 0])
+            self._index_loaded = True
+            return
+
+    def _save_index(self):
+        """Persist the toknum/filepos mapping, once the whole file has been
+        read."""
+        startpos = int(self._filepos[0])
+        digest = self._reader_digest()
+        index = np.empty((3 + len(self._toknum), 2), dtype=np.int64)
+        index[0] = self._file_signature()
+        index[1] = (self._len, startpos)
+        index[2] = (int.from_bytes(digest[:8], 'little', signed=True), INDEX_VERSION)
+        index[3:, 0] = self._toknum
+        index[3:, 1] = self._filepos
+        for index_file in self._index_files(startpos, digest):
+            try:
+                os.makedirs(os.path.dirname(index_file), exist_ok=True)
+                tmp_file = index_file + '.%d.tmp' % os.getpid()
+                with io.open(tmp_file, 'wb') as f:
+                    np.save(f, index)
+                os.replace(tmp_file, index_file)
+                self._index_loaded = True
+                return
+            except (OSError, IOError) as e:
+                logger.debug('Could not write the corpus index %s: %s', index_file, e)
+
+    def build_index(self):
+        """Read the whole file once, if needed, so that the block offset
+        index is available to this and the following views of the file."""
+        len(self)
+        if not self._index_loaded and self.persist_index and isinstance(self._fileid, string_types):
+            self._save_index()
+
     def read_block(self, stream):
         """
         Read a block from the input stream.
@@ -252,13 +428,16 @@ class StreamBackedCorpusView(AbstractLazySequence):
         # our mapping, then we can jump straight to the correct block;
         # otherwise, start at the last block we've processed.
         if start_tok < self._toknum[-1]:
-            block_index = bisect.bisect_right(self._toknum, start_tok) - 1
-            toknum = self._toknum[block_index]
-            filepos = self._filepos[block_index]
+            if isinstance(self._toknum, np.ndarray):
+                block_index = int(np.searchsorted(self._toknum, start_tok, side='right')) - 1
+            else:
+                block_index = bisect.bisect_right(self._toknum, start_tok) - 1
+            toknum = int(self._toknum[block_index])
+            filepos = int(self._filepos[block_index])
         else:
             block_index = len(self._toknum) - 1
-            toknum = self._toknum[-1]
-            filepos = self._filepos[-1]
+            toknum = int(self._toknum[-1])
+            filepos = int(self._filepos[-1])
 
         # Open the stream, if it's not open already.
         if self._stream is None:
@@ -309,8 +488,11 @@ class StreamBackedCorpusView(AbstractLazySequence):
                     ), 'inconsistent block reader (num tokens returned)'
 
             # If we reached the end of the file, then update self._len
+            # and save the complete mapping
             if new_filepos == self._eofpos:
                 self._len = toknum + num_toks
+                if self.persist_index and not self._index_loaded and isinstance(self._fileid, string_types):
+                    self._save_index()
             # Generate the tokens in this block (but skip any tokens
             # before start_tok).  Note that between yields, our state
             # may be modified.
@@ -368,9 +550,7 @@ class ConcatenatedCorpusView(AbstractLazySequence):
 
     def __len__(self):
         if len(self._offsets) <= len(self._pieces):
-            # Iterate to the end of the dataset.
-            for tok in self.iterate_from(self._offsets[-1]):
-                pass
+            self._offsets_to(float('inf'))
 
         return self._offsets[-1]
 
@@ -378,7 +558,15 @@ class ConcatenatedCorpusView(AbstractLazySequence):
         for piece in self._pieces:
             piece.close()
 
+    def _offsets_to(self, start_tok):
+        """Extend the offsets table with the lengths of the pieces until
+        the one holding ``start_tok``.  The length of a piece with a block
+        offset index is known without reading it."""
+        while len(self._offsets) <= len(self._pieces) and self._offsets[-1] <= start_tok:
+            self._offsets.append(self._offsets[-1] + len(self._pieces[len(self._offsets) - 1]))
+
     def iterate_from(self, start_tok):
+        self._offsets_to(start_tok)
         piecenum = bisect.bisect_right(self._offsets, start_tok) - 1
 
         while piecenum < len(self._pieces):
@@ -474,6 +662,9 @@ class PickleCorpusView(StreamBackedCorpusView):
         >>> feature_corpus = LazyMap(detect_features, dataset) # doctest: +SKIP
         >>> PickleCorpusView.write(feature_corpus, some_fileid)  # doctest: +SKIP
         >>> pcv = PickleCorpusView(some_fileid) # doctest: +SKIP
+    Corpora of tokens (words, sentences, paragraphs) are better cached
+    with ``ShardedCorpusView``, which stores them as typed arrays
+    instead of one pickle per item.
     """
 
     BLOCK_SIZE = 100
@@ -487,7 +678,8 @@ class PickleCorpusView(StreamBackedCorpusView):
             whenever this object gets garbage-collected.
         """
         self._delete_on_gc = delete_on_gc
-        StreamBackedCorpusView.__init__(self, fileid)
+        # the index of a temporary file would outlive it
+        StreamBackedCorpusView.__init__(self, fileid, persist_index=False if delete_on_gc else None)
 
     def read_block(self, stream):
         result = []
@@ -539,6 +731,283 @@ class PickleCorpusView(StreamBackedCorpusView):
             raise ValueError('Error while creating temp file: %s' % e)
 
 
+######################################################################
+# { Corpus View for Columnar Shards
+######################################################################
+
+
+class ShardedCorpusView(AbstractLazySequence):
+    """
+    A dataset view over a corpus of tokens cached as typed arrays.  The
+    items of the cached sequence are tokens (``words()``), lists of
+    tokens (``sents()``) or lists of lists of tokens (``paras()``); the
+    number of list levels is the ``depth`` of the corpus.
+
+    The cache is a directory holding:
+      - ``meta.json``: the depth, the number of items of each shard;
+      - ``vocab.npy``/``vocab_offsets.npy``: the utf-8 bytes of the
+        distinct tokens and their offsets;
+      - for each shard, ``shard-NNNNN.ids.npy``: the int32 token ids, and
+        one ``shard-NNNNN.offsets-L.npy`` array per level: item ``i`` of
+        level ``L`` spans ``offsets-L[i]:offsets-L[i + 1]`` of level
+        ``L + 1`` (of the ids at the last level).
+
+    The arrays are memory mapped: ``ids()`` and ``batches()`` return
+    slices of the files without copying them.  Iterating over the items
+    as lists of strings decodes each shard in one pass; indexing an item
+    decodes only that item.
+        >>> from kolibri.dataset.utils import ShardedCorpusView
+        >>> ShardedCorpusView.write(reader.sents(), cache_dir) # doctest: +SKIP
+        >>> sents = ShardedCorpusView(cache_dir) # doctest: +SKIP
+        >>> list(sents) == list(reader.sents()) # doctest: +SKIP
+        True
+    """
+
+    SHARD_SIZE = 100000
+    META_FILE = 'meta.json'
+
+    def __init__(self, directory, delete_on_gc=False):
+        """
+        Create a new dataset view over the shards written by ``write``
+        in ``directory``.
+        :param delete_on_gc: If true, then ``directory`` will be deleted
+            whenever this object gets garbage-collected.
+        """
+        self._directory = directory
+        self._delete_on_gc = delete_on_gc
+        with io.open(os.path.join(directory, self.META_FILE), encoding='utf8') as f:
+            meta = json.load(f)
+        self._depth = meta['depth']
+        self._shard_offsets = np.concatenate([[0], np.cumsum(meta['shards'], dtype=np.int64)])
+        self._shards = [None] * len(meta['shards'])
+        self._vocab = None
+        self._decoded = (None, None)
+
+    @property
+    def depth(self):
+        """Number of list levels above the tokens in each item."""
+        return self._depth
+
+    @property
+    def vocab(self):
+        """The list of the distinct tokens, indexed by their id."""
+        if self._vocab is None:
+            self._vocab = decode_tokens(self._load('vocab.npy'), self._load('vocab_offsets.npy'))
+        return self._vocab
+
+    def _load(self, name):
+        return np.load(os.path.join(self._directory, name), mmap_mode='r')
+
+    def _shard(self, n):
+        """The (ids, [offsets of each level]) arrays of shard ``n``."""
+        if self._shards[n] is None:
+            prefix = 'shard-%05d' % n
+            self._shards[n] = (self._load(prefix + '.ids.npy'),
+                               [self._load('%s.offsets-%d.npy' % (prefix, level))
+                                for level in range(self._depth)])
+        return self._shards[n]
+
+    def _locate(self, i):
+        """The shard of item ``i`` and the index of the item in it."""
+        n = int(np.searchsorted(self._shard_offsets, i, side='right')) - 1
+        return n, i - int(self._shard_offsets[n])
+
+    def __len__(self):
+        return int(self._shard_offsets[-1])
+
+    def _decoded_shard(self, n):
+        """The items of shard ``n`` as nested lists of strings.  The last
+        decoded shard is kept, for iterations that restart in it."""
+        if self._decoded[0] == n:
+            return self._decoded[1]
+        vocab = self.vocab
+        ids, offsets = self._shard(n)
+        items = [vocab[t] for t in ids.tolist()]
+        # rebuild the nested lists from the deepest level up
+        for level_offsets in reversed(offsets):
+            bounds = level_offsets.tolist()
+            items = [items[a:b] for a, b in zip(bounds[:-1], bounds[1:])]
+        self._decoded = (n, items)
+        return items
+
+    def _decode_item(self, n, i):
+        """Item ``i`` of shard ``n``, decoded from its offsets alone."""
+        vocab = self.vocab
+        ids, offsets = self._shard(n)
+
+        def decode(level, start, stop):
+            if level == self._depth:
+                return [vocab[t] for t in ids[start:stop].tolist()]
+            bounds = offsets[level][start:stop + 1].tolist()
+            return [decode(level + 1, a, b) for a, b in zip(bounds[:-1], bounds[1:])]
+
+        return decode(0, i, i + 1)[0]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return AbstractLazySequence.__getitem__(self, i)
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('index out of range')
+        n, i = self._locate(i)
+        if self._decoded[0] == n:
+            return self._decoded[1][i]
+        return self._decode_item(n, i)
+
+    def iterate_from(self, start):
+        if start < 0 or start >= len(self):
+            return
+        n, i = self._locate(start)
+        for n in range(n, len(self._shards)):
+            items = self._decoded_shard(n)
+            for item in items[i:]:
+                yield item
+            i = 0
+
+    def ids(self, i):
+        """
+        The token ids of item ``i``, a read-only slice of the shard.
+        Items of depth 2 or more return the ids of all their tokens.
+        """
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('index out of range')
+        n, i = self._locate(i)
+        ids, offsets = self._shard(n)
+        start, stop = i, i + 1
+        for level_offsets in offsets:
+            start, stop = int(level_offsets[start]), int(level_offsets[stop])
+        return ids[start:stop]
+
+    def batches(self, batch_size=1000):
+        """
+        Iterate over the corpus ``batch_size`` items at a time.  Each
+        batch is a tuple ``(ids, offsets)``: ``ids`` is a read-only slice
+        of the shard and ``offsets`` the boundaries of the items of each
+        level, rebased on the batch.  Batches do not span shards.
+        """
+        for n in range(len(self._shards)):
+            ids, offsets = self._shard(n)
+            num_items = int(self._shard_offsets[n + 1] - self._shard_offsets[n])
+            for start in range(0, num_items, batch_size):
+                stop = min(start + batch_size, num_items)
+                batch_offsets = []
+                for level_offsets in offsets:
+                    level = level_offsets[start:stop + 1]
+                    batch_offsets.append(level - level[0])
+                    start, stop = int(level[0]), int(level[-1])
+                yield ids[start:stop], batch_offsets
+
+    def __del__(self):
+        """
+        If ``delete_on_gc`` was set to true when this view was created,
+        then delete its directory.
+        """
+        if getattr(self, '_delete_on_gc', False):
+            self._shards = None
+            self._decoded = (None, None)
+            shutil.rmtree(self._directory, ignore_errors=True)
+
+    @staticmethod
+    def _depth_of(item):
+        depth = 0
+        while not isinstance(item, string_types):
+            if len(item) == 0:
+                return None
+            item = item[0]
+            depth += 1
+        return depth
+
+    @classmethod
+    def write(cls, sequence, directory, shard_size=None, depth=None):
+        """
+        Write the given sequence of tokens, or nested lists of tokens, as
+        columnar shards in ``directory``.
+        :param shard_size: The number of items per shard.
+        :param depth: The number of list levels above the tokens; it is
+            guessed from the first item if not given.
+        """
+        shard_size = shard_size or cls.SHARD_SIZE
+        os.makedirs(directory, exist_ok=True)
+        token2id = {}
+        shards = []
+        items = iter(sequence)
+        pending = []
+
+        if depth is None:
+            for item in items:
+                pending.append(item)
+                depth = cls._depth_of(item)
+                if depth is not None:
+                    break
+            if depth is None:
+                # only empty lists, or an empty sequence
+                depth = 1 if pending else 0
+
+        def add_tokens(tokens, ids):
+            for token in tokens:
+                if not isinstance(token, string_types):
+                    raise TypeError('Only tokens of type str can be cached, got %r' % (token,))
+                token_id = token2id.get(token)
+                if token_id is None:
+                    token_id = token2id[token] = len(token2id)
+                ids.append(token_id)
+
+        def add(item, level, ids, offsets):
+            if level == depth:
+                add_tokens((item,), ids)
+            elif level == depth - 1:
+                add_tokens(item, ids)
+                offsets[level].append(len(ids))
+            else:
+                for child in item:
+                    add(child, level + 1, ids, offsets)
+                offsets[level].append(len(offsets[level + 1]) - 1)
+
+        def write_shard(chunk):
+            ids = array('i')
+            offsets = [array('q', [0]) for _ in range(depth)]
+            for item in chunk:
+                add(item, 0, ids, offsets)
+            prefix = os.path.join(directory, 'shard-%05d' % len(shards))
+            np.save(prefix + '.ids.npy', np.frombuffer(ids, dtype=np.int32))
+            for level, level_offsets in enumerate(offsets):
+                np.save('%s.offsets-%d.npy' % (prefix, level), np.frombuffer(level_offsets, dtype=np.int64))
+            shards.append(len(chunk))
+
+        chunk = pending
+        for item in items:
+            chunk.append(item)
+            if len(chunk) >= shard_size:
+                write_shard(chunk)
+                chunk = []
+        if chunk or not shards:
+            write_shard(chunk)
+
+        vocab, vocab_offsets = encode_tokens(list(token2id))
+        np.save(os.path.join(directory, 'vocab.npy'), vocab)
+        np.save(os.path.join(directory, 'vocab_offsets.npy'), vocab_offsets)
+        with io.open(os.path.join(directory, cls.META_FILE), 'w', encoding='utf8') as f:
+            f.write(text_type(json.dumps({'depth': depth, 'shards': shards})))
+
+    @classmethod
+    def cache_to_tempdir(cls, sequence, delete_on_gc=True, **kwargs):
+        """
+        Write the given sequence as shards in a temporary directory; and
+        then return a ``ShardedCorpusView`` view for it.
+        :param delete_on_gc: If true, then the temporary directory will be
+            deleted whenever this object gets garbage-collected.
+        """
+        try:
+            directory = tempfile.mkdtemp('.scv', 'kolibri-')
+            cls.write(sequence, directory, **kwargs)
+            return cls(directory, delete_on_gc)
+        except (OSError, IOError) as e:
+            raise ValueError('Error while creating temp directory: %s' % e)
+
+
 ######################################################################
 # { Block Readers
 ######################################################################
@@ -1,18 +1,24 @@
-from .utils import Dict
+from .utils import AttributeDict
 from .utils import ordered
 from kolibri.utils import lazyproperty
 
-class Document(Dict):
+class Document(AttributeDict):
+    """The text and the attributes the pipeline components set on it.
+
+    The attributes are kept as given, by reference: setting the tokens or
+    the features of a document does not copy them."""
+
+    __slots__ = ()
+
     def __init__(self, text="", data=None, output_properties=None, time=None):
-        self.raw_text = text
-        self.time = time
+        super(Document, self).__init__(raw_text=text, time=time)
         if data:
-            super(Dict, self).__init__(data)
+            self.update(data)
 
         if output_properties:
-            self.output_properties = output_properties
+            self["output_properties"] = output_properties
         else:
-            self.output_properties = set()
+            self["output_properties"] = set()
 
     def set_output_property(self, prop):
             self.output_properties.add(prop)
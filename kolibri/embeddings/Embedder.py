@@ -15,9 +15,12 @@ MODELS_DIR = os.path.join(DATA_DIR, PACKAGE)
 
 
 class Embedder(object, metaclass=ArgSingleton):
-    def __init__(self, embedding: str, model: str = None, language: str = None, download: bool = False):
+    def __init__(self, embedding: str, model: str = None, language: str = None, download: bool = False,
+                 quantization: str = None):
         self.embedding = embedding
         self.model = model
+        # None (float32), 'float16' or 'int8', see kolibri.embeddings.vectors
+        self.quantization = quantization
         self.embedding_model_dict = None
         self.model_path = None
         self.langauge = language_iso2(language)
@@ -118,9 +121,19 @@ class Embedder(object, metaclass=ArgSingleton):
         return model_path
 
     def _load_model(self):
-        self.embedding_cls.load_model(self.model, self.model_path)
+        if self.quantization:
+            self.embedding_cls.load_model(self.model, self.model_path, quantization=self.quantization)
+        else:
+            self.embedding_cls.load_model(self.model, self.model_path)
         return
 
+    def lookup(self, words: List[str]) -> np.array:
+        """The float32 vectors of words, one row per word, looked up (and
+        dequantized) in one batch when the embedding supports it."""
+        if hasattr(self.embedding_cls, 'lookup'):
+            return self.embedding_cls.lookup(words)
+        return np.array([self.encode(word) for word in words])
+
     def encode(self,
                texts: Union[List[str], List[List[str]]],
                pooling: Optional[str] = None,
@@ -6,6 +6,7 @@ import os
 import cProfile
 
 from kolibri.embeddings import Embedding
+from kolibri.embeddings.vectors import read_text_vectors
 from kolibri.utils import POOL_FUNC_MAP
 
 
@@ -67,20 +68,21 @@ class Embeddings(object):
     def __init__(self):
         self.word_vectors: Dict[Any, Any] = {}
         self.model_name = None
+        self.quantization = None
 
     @classmethod
     def tokenize(cls, text):
         return [x.lower().strip() for x in text.split()]
 
-    def load_model(self, model: str, model_path: str):
+    def load_model(self, model: str, model_path: str, quantization: Optional[str] = None):
+        """Loads the vectors of a .vec file as a float32, float16 or int8
+        matrix, see kolibri.embeddings.vectors."""
         try:
             model_file = [f for f in os.listdir(model_path) if os.path.isfile(os.path.join(model_path, f))]
 
-            with open(os.path.join(model_path, model_file[0]), 'r') as f:
-                    for line in tqdm(f):
-                        split_line = line.split()
-                        word = split_line[0]
-                        self.word_vectors[word] = split_line[1:]
+            with open(os.path.join(model_path, model_file[0]), 'r', encoding='utf-8', errors='ignore') as f:
+                self.word_vectors = read_text_vectors(tqdm(f), quantization)
+            self.quantization = quantization
             print("Model loaded Successfully !")
             self.model_name = model
             return self
@@ -97,11 +99,12 @@ class Embeddings(object):
             tokens = Embeddings.tokenize(text)
         if len(tokens) > max_seq_length:
             tokens = tokens[0: max_seq_length]
-        embeddings=[]
-        for token in tokens:
-            embeddings.append(np.array(self.word_vectors.get(token, oov_vector)))
 
-        return np.array(embeddings)
+        return self.word_vectors.lookup(tokens, oov_vector)
+
+    def lookup(self, words: List[str]) -> np.array:
+        """The vectors of words, one row per word, zeros for the unknown words."""
+        return self.word_vectors.lookup(words)
 
     def encode(self, texts: Union[List[str], List[List[str]]],
                pooling: str,
@@ -109,6 +112,8 @@ class Embeddings(object):
                is_tokenized: bool = False,
                **kwargs
                ) -> Optional[np.array]:
-        oov_vector = np.zeros(Embeddings.EMBEDDING_MODELS[self.model_name].dimensions, dtype="float32")
+        if not isinstance(texts, str):
+            return self.lookup(texts)
+        oov_vector = np.zeros(self.word_vectors.dim, dtype="float32")
 
         return np.array(self.word_vectors.get(texts, oov_vector))
\ No newline at end of file
@@ -0,0 +1,288 @@
+"""Word vector matrices, optionally quantized.
+
+A 2M x 300 float32 matrix takes 2.4 GB. `quantize` stores it as float16
+(half the memory) or as int8 with one float32 scale per row (a quarter):
+
+    >>> vectors = WordVectors(index, quantize(matrix, "int8"))
+    >>> vectors.lookup(["the", "invoice"])  # float32 rows, zeros for unknown words
+
+The rows are dequantized when they are looked up, a batch at a time, and
+may stay on disk in memory maps. `WordVectorsBuilder` quantizes vectors as
+they are read from a file, so the float32 matrix is never held whole.
+`quantization_report` measures what the quantization loses: the error of the
+rows, and how well the cosine similarities and nearest neighbours between
+words are preserved.
+"""
+from collections.abc import Mapping
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import Optional
+from typing import Text
+
+import numpy as np
+
+FLOAT32 = "float32"
+FLOAT16 = "float16"
+INT8 = "int8"
+
+QUANTIZATIONS = [FLOAT32, FLOAT16, INT8]
+
+# int8 rows span [-INT8_MAX, INT8_MAX] times their scale
+INT8_MAX = 127
+
+
+def quantize_rows(rows, quantization):
+    """Quantizes the rows of a matrix, returns the quantized rows and, for
+    int8, their scales. Each row is quantized on its own, a large matrix can
+    be quantized by blocks of rows."""
+    rows = np.asarray(rows, dtype=np.float32)
+    if quantization in (None, FLOAT32):
+        return rows, None
+    if quantization == FLOAT16:
+        return rows.astype(np.float16), None
+    if quantization == INT8:
+        scales = np.abs(rows).max(axis=-1) / INT8_MAX if rows.size else np.zeros(rows.shape[:-1], np.float32)
+        scales = scales.astype(np.float32)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            quantized = np.where(scales[..., np.newaxis] > 0, rows / scales[..., np.newaxis], 0)
+        return np.rint(quantized).clip(-INT8_MAX, INT8_MAX).astype(np.int8), scales
+    raise ValueError("Unknown quantization '{}', use one of {}.".format(quantization, QUANTIZATIONS))
+
+
+def quantize(matrix, quantization=INT8, block_size=65536):
+    # type: (np.ndarray, Text, int) -> QuantizedMatrix
+    """Quantizes a matrix of vectors, `block_size` rows at a time so that
+    the float32 copy of a float64 matrix is never made whole."""
+    matrix = np.asarray(matrix)
+    n_rows = matrix.shape[0]
+    dtype = {FLOAT16: np.float16, INT8: np.int8}.get(quantization, np.float32)
+    data = np.empty(matrix.shape, dtype=dtype)
+    scales = np.empty(n_rows, dtype=np.float32) if quantization == INT8 else None
+    for start in range(0, n_rows, block_size):
+        rows, row_scales = quantize_rows(matrix[start:start + block_size], quantization)
+        data[start:start + block_size] = rows
+        if scales is not None:
+            scales[start:start + block_size] = row_scales
+    return QuantizedMatrix(data, scales)
+
+
+class QuantizedMatrix(object):
+    """A float16 or int8 matrix read as float32.
+
+    Indexing it with a row, a slice or an array of rows returns the
+    dequantized float32 rows, so it can replace a float32 matrix wherever
+    rows are selected. `data` and `scales` may be memory maps."""
+
+    def __init__(self, data, scales=None):
+        # type: (np.ndarray, Optional[np.ndarray]) -> None
+        self.data = data
+        self.scales = scales
+
+    @property
+    def quantization(self):
+        return INT8 if self.scales is not None else np.dtype(self.data.dtype).name
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    @property
+    def dtype(self):
+        return np.dtype(np.float32)
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def __len__(self):
+        return self.data.shape[0]
+
+    def __getitem__(self, rows):
+        data = np.asarray(self.data[rows], dtype=np.float32)
+        if self.scales is None:
+            return data
+        return data * np.asarray(self.scales[rows], dtype=np.float32)[..., np.newaxis]
+
+    def take(self, rows):
+        return self[np.asarray(rows, dtype=np.int64)]
+
+    def dequantize(self):
+        # type: () -> np.ndarray
+        return self[:]
+
+
+class WordVectors(Mapping):
+    """Read-only word vectors, a mapping of words to float32 vectors.
+
+    Attributes:
+        index: dict mapping words to row numbers in `vectors`.
+        vectors: numpy array, memmap or QuantizedMatrix of shape (len(index), dim).
+    """
+
+    def __init__(self, index, vectors):
+        self.index = index
+        self.vectors = vectors
+
+    def __getitem__(self, word):
+        return self.vectors[self.index[word]]
+
+    def __contains__(self, word):
+        return word in self.index
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def dim(self):
+        return self.vectors.shape[1]
+
+    @property
+    def nbytes(self):
+        return self.vectors.nbytes
+
+    def lookup(self, words, oov_vector=None):
+        # type: (Iterable[Text], Optional[np.ndarray]) -> np.ndarray
+        """The float32 vectors of words, one row per word, `oov_vector`
+        (zeros by default) for the unknown words. The known rows are read
+        and dequantized in one go."""
+        words = list(words)
+        rows = np.fromiter((self.index.get(word, -1) for word in words), dtype=np.int64, count=len(words))
+        known = rows >= 0
+        out = np.zeros((len(words), self.dim), dtype=np.float32)
+        if oov_vector is not None:
+            out[~known] = oov_vector
+        if known.any():
+            out[known] = self.vectors[rows[known]]
+        return out
+
+
+class WordVectorsBuilder(object):
+    """Collects word vectors one at a time and quantizes them by blocks of
+    `block_size` rows. The first vector of a repeated word is kept."""
+
+    def __init__(self, quantization=None, block_size=65536):
+        # type: (Optional[Text], int) -> None
+        if quantization not in QUANTIZATIONS + [None]:
+            raise ValueError("Unknown quantization '{}', use one of {}.".format(quantization, QUANTIZATIONS))
+        self.quantization = quantization
+        self.block_size = block_size
+        self.index = {}
+        self.dim = None
+        self._pending = []
+        self._blocks = []
+        self._scales = []
+
+    def add(self, word, vector):
+        # type: (Text, Any) -> bool
+        """Adds the vector of a word, returns False if it was skipped, for a
+        repeated word or a vector of another dimension."""
+        if word in self.index:
+            return False
+        vector = np.asarray(vector, dtype=np.float32)
+        if self.dim is None:
+            self.dim = vector.shape[0]
+        elif vector.shape[0] != self.dim:
+            return False
+        self.index[word] = len(self.index)
+        self._pending.append(vector)
+        if len(self._pending) >= self.block_size:
+            self._flush()
+        return True
+
+    def _flush(self):
+        if self._pending:
+            rows, scales = quantize_rows(np.stack(self._pending), self.quantization)
+            self._blocks.append(rows)
+            if scales is not None:
+                self._scales.append(scales)
+            self._pending = []
+
+    def build(self):
+        # type: () -> WordVectors
+        self._flush()
+        dtype = {FLOAT16: np.float16, INT8: np.int8}.get(self.quantization, np.float32)
+        data = np.concatenate(self._blocks) if self._blocks else np.zeros((0, self.dim or 0), dtype=dtype)
+        self._blocks = []
+        if self.quantization in (FLOAT16, INT8):
+            scales = np.concatenate(self._scales) if self._scales else np.zeros(0, dtype=np.float32)
+            vectors = QuantizedMatrix(data, scales if self.quantization == INT8 else None)
+        else:
+            vectors = data
+        return WordVectors(self.index, vectors)
+
+
+def read_text_vectors(lines, quantization=None, block_size=65536):
+    # type: (Iterable[Text], Optional[Text], int) -> WordVectors
+    """Reads word vectors from the lines of a text file of words followed
+    by their vector (fastText .vec, GloVe), skipping a "<count> <dim>"
+    header line."""
+    builder = WordVectorsBuilder(quantization, block_size)
+    for line in lines:
+        values = line.rstrip().split(' ')
+        if len(values) <= 2:
+            continue
+        builder.add(values[0], values[1:])
+    return builder.build()
+
+
+def _cosine_similarities(a, b):
+    a = a / np.maximum(np.linalg.norm(a, axis=1, keepdims=True), 1e-12)
+    b = b / np.maximum(np.linalg.norm(b, axis=1, keepdims=True), 1e-12)
+    return a.dot(b.T)
+
+
+def quantization_report(original, quantized, n_queries=500, n_candidates=10000, k=10, random_state=0):
+    # type: (np.ndarray, Any, int, int, int, Any) -> Dict[Text, float]
+    """Measures how much a quantized matrix differs from the original.
+
+    On `n_queries` rows drawn at random, compares the original and the
+    dequantized vectors, their cosine similarities to `n_candidates` other
+    rows, and their `k` nearest neighbours among them.
+
+    Returns:
+        dict: the memory of both matrices and their ratio; the mean relative
+        error and the mean cosine similarity of the rows to their original;
+        the mean and max absolute error of the cosine similarities between
+        rows; the recall of the original k nearest neighbours.
+    """
+    if isinstance(original, QuantizedMatrix):
+        original_bytes = original.nbytes
+    else:
+        original_bytes = np.asarray(original).nbytes
+    quantized = quantized if isinstance(quantized, QuantizedMatrix) else QuantizedMatrix(np.asarray(quantized))
+    n_rows = len(quantized)
+    random_state = np.random.RandomState(random_state)
+    queries = np.sort(random_state.choice(n_rows, min(n_queries, n_rows), replace=False))
+    candidates = np.sort(random_state.choice(n_rows, min(n_candidates, n_rows), replace=False))
+
+    exact = np.asarray(original[queries], dtype=np.float32)
+    approximate = quantized[queries]
+    norms = np.maximum(np.linalg.norm(exact, axis=1), 1e-12)
+    row_error = np.linalg.norm(exact - approximate, axis=1) / norms
+    row_cosine = np.sum(exact * approximate, axis=1) / norms / np.maximum(np.linalg.norm(approximate, axis=1), 1e-12)
+
+    exact_similarities = _cosine_similarities(exact, np.asarray(original[candidates], dtype=np.float32))
+    approximate_similarities = _cosine_similarities(approximate, quantized[candidates])
+    similarity_error = np.abs(exact_similarities - approximate_similarities)
+
+    k = min(k, len(candidates))
+    exact_neighbours = np.argpartition(-exact_similarities, k - 1, axis=1)[:, :k]
+    approximate_neighbours = np.argpartition(-approximate_similarities, k - 1, axis=1)[:, :k]
+    recall = np.mean([len(np.intersect1d(e, a)) / float(k)
+                      for e, a in zip(exact_neighbours, approximate_neighbours)])
+
+    return {
+        "quantization": quantized.quantization,
+        "original_mb": original_bytes / (1024. * 1024.),
+        "quantized_mb": quantized.nbytes / (1024. * 1024.),
+        "compression": original_bytes / float(max(quantized.nbytes, 1)),
+        "mean_relative_error": float(row_error.mean()),
+        "mean_row_cosine": float(row_cosine.mean()),
+        "mean_similarity_error": float(similarity_error.mean()),
+        "max_similarity_error": float(similarity_error.max()),
+        "neighbour_recall@{}".format(k): float(recall)
+    }
@@ -1,8 +1,8 @@
 import os
-import joblib
 import logging
 import multiprocessing
 from kolibri.pipeComponent import Component
+from kolibri.utils.file import dump_artifact, load_artifact
 
 
 import gensim
@@ -53,6 +53,20 @@ class CustomWord2Vec(Component):
 
                 token.vector=self.model.wv[token.text]
 
+    @classmethod
+    def cache_key(cls, model_metadata):
+        """Models whose embeddings are the same file share the component."""
+        meta = model_metadata.for_component(cls.name)
+        embeddings = meta.get("embedding_file")
+        if not embeddings or model_metadata.model_dir is None:
+            return None
+        embeddings_file = os.path.realpath(os.path.join(model_metadata.model_dir, embeddings))
+        if not os.path.exists(embeddings_file):
+            return None
+        # models linking the same embeddings file (e.g. a symlink to a
+        # shared copy) load the vectors once
+        return "{}-{}-{}".format(cls.name, embeddings_file, os.path.getmtime(embeddings_file))
+
     @classmethod
     def load(cls,
              model_dir=None,
@@ -61,6 +75,9 @@ class CustomWord2Vec(Component):
              **kwargs
              ):
 
+        if cached_component:
+            return cached_component
+
         meta = model_metadata.for_component(cls.name)
         embeddings = meta.get("embedding_file", W2V_VECTOR_FILE_NAME)
         model_ = meta.get("word2vec_file", W2V_MODEL_FILE_NAME)
@@ -69,10 +86,12 @@ class CustomWord2Vec(Component):
         model_file = os.path.join(model_dir, model_)
         w2v=None
         if os.path.exists(embeddings_file):
-            w2v = gensim.models.FastText.load(embeddings_file)
-            w2v.init_sims(replace=True)
+            w2v = gensim.models.FastText.load(embeddings_file, mmap=model_metadata.mmap_mode)
+            # the vectors are saved normalized, memory mapped ones are read-only
+            if not model_metadata.mmap_mode:
+                w2v.init_sims(replace=True)
         if os.path.exists(model_file):
-            model = joblib.load(model_file)
+            model = load_artifact(model_file, model_metadata.mmap_mode)
             model.model=w2v
             return model
         else:
@@ -85,7 +104,7 @@ class CustomWord2Vec(Component):
         w2v_file = os.path.join(model_dir, W2V_VECTOR_FILE_NAME.format(self.dim))
         model_file = os.path.join(model_dir, W2V_MODEL_FILE_NAME)
         self.model.save(w2v_file)
-        joblib.dump(self, model_file)
+        dump_artifact(self, model_file)
 
         return {"word2vec_file": W2V_MODEL_FILE_NAME, "embedding_file":W2V_VECTOR_FILE_NAME.format(self.dim)}
 
@@ -1,6 +1,7 @@
 from typing import List, Dict, Any, Optional, Union
 
 from kolibri.embeddings import Embedding
+from kolibri.embeddings.vectors import WordVectorsBuilder
 from kolibri.utils import POOL_FUNC_MAP
 from smart_open import open
 from tqdm import tqdm
@@ -29,12 +30,15 @@ class Embeddings(object):
     def __init__(self):
         self.word_vectors: Dict[Any, Any] = {}
         self.model_name = None
+        self.quantization = None
 
     @classmethod
     def tokenize(cls, text: str) -> List[str]:
         return [x.lower().strip() for x in text.split()]
 
-    def load_model(self, model: str, model_path: str):
+    def load_model(self, model: str, model_path: str, quantization: Optional[str] = None):
+        """Loads the vectors of a binary word2vec file as a float32, float16
+        or int8 matrix, see kolibri.embeddings.vectors."""
         try:
             encoding = 'utf-8'
             unicode_errors = 'strict'
@@ -50,6 +54,7 @@ class Embeddings(object):
             vocab_size, vector_size = (int(x) for x in header.split())  # throws for invalid file format
 
             binary_len = dtype(real).itemsize * vector_size
+            builder = WordVectorsBuilder(quantization)
             for _ in tqdm(range(vocab_size)):
                 word = []
                 while True:
@@ -62,9 +67,11 @@ class Embeddings(object):
                         word.append(ch)
                 word = b''.join(word)
 
-                weights = fromstring(f.read(binary_len), dtype=real).astype(real)
+                weights = np.frombuffer(f.read(binary_len), dtype=real)
 
-                self.word_vectors[word] = weights
+                builder.add(word.decode(encoding, errors=unicode_errors), weights)
+            self.word_vectors = builder.build()
+            self.quantization = quantization
             self.model_name = model
             print("Model loaded Successfully !")
             return self
@@ -81,7 +88,11 @@ class Embeddings(object):
             tokens = tokens[0: max_seq_length]
         while len(tokens) < max_seq_length:
             tokens.append('<pad>')
-        return np.array([self.word_vectors.get(token, oov_vector) for token in tokens])
+        return self.word_vectors.lookup(tokens, oov_vector)
+
+    def lookup(self, words: List[str]) -> np.array:
+        """The vectors of words, one row per word, zeros for the unknown words."""
+        return self.word_vectors.lookup(words)
 
     def encode(self, texts: Union[List[str], List[List[str]]],
                pooling: str,
@@ -89,7 +100,7 @@ class Embeddings(object):
                is_tokenized: bool = False,
                **kwargs
                ) -> Optional[np.array]:
-        oov_vector = np.zeros(Embeddings.EMBEDDING_MODELS[self.model_name].dimensions, dtype="float32")
+        oov_vector = np.zeros(self.word_vectors.dim, dtype="float32")
         token_embeddings = np.array([self._single_encode_text(text, oov_vector, max_seq_length, is_tokenized)
                                      for text in texts])
 
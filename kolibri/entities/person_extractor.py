@@ -3,6 +3,7 @@ from kolibri.tokenizer.structured_tokenizer import StructuredTokenizer
 from kolibri.entities.entity import Entity
 from kolibri.entities.dictionaryExtractor import DictionaryExtractor
 import re, os
+from bisect import bisect_right
 from kolibri.settings import resources_path
 
 PACKAGE = 'corpora'
@@ -11,57 +12,102 @@ GAZ_DIR = os.path.join(DATA_DIR, PACKAGE)
 
 person_file_name = os.path.join(GAZ_DIR, 'gazetteers/first_name.txt')
 
+CANDIDATE_TYPES = ('CANDIDATE', 'ACRONYM')
+
+GREETING = re.compile(r"^(Hi|Hello|Dear|However|If|Employees?)\s")
+POSSESSIVE = re.compile(r"'s$")
+EMPLOYEE_ID = re.compile(r"e?\d{4,8}\b", re.IGNORECASE)
+# what may separate a person from an employee id written after it, or
+# before it
+ID_AFTER_SEPARATORS = frozenset(' \t\n\r\f\v([#')
+ID_BEFORE_SEPARATORS = frozenset(' \t\n\r\f\v)]#')
+
+_candidate_tokenizer = None
+
+
+def candidate_tokenizer():
+    """The tokenizer generating the person candidates, shared by all the
+    extractors: its patterns are compiled once."""
+    global _candidate_tokenizer
+    if _candidate_tokenizer is None:
+        _candidate_tokenizer = StructuredTokenizer(component_config={}, generate_candidates=True)
+    return _candidate_tokenizer
+
 
 class PersonExtractor(DictionaryExtractor):
     def __init__(self, case_sensitive=False):
         DictionaryExtractor.__init__(self, person_file_name, 'Person', case_sensitive=case_sensitive)
-        self.tokenizer = StructuredTokenizer(component_config={}, generate_candidates=True)
-
-    def get_entities(self, text):
-        #    print(d)
-        tokens = self.tokenizer.tokenize(text)
+        self.tokenizer = candidate_tokenizer()
 
-        persons = self.keywords.extract_keywords(text, True)
+    def get_entities(self, text, tokens=None):
+        """Returns the persons of a text and their employee ids.
 
-        # print(persons)
+        `tokens` are the tokens of the text from a tokenizer generating
+        candidates, e.g. the ones of the pipeline; the text is tokenized
+        when they are not given."""
+        if tokens is None:
+            tokens = self.tokenizer.tokenize(text)
+        persons = self._persons(text, tokens)
+        persons.extend(self._employee_ids(text, persons))
+        return persons
 
-        FinalPersonns = []
+    def _persons(self, text, tokens):
+        """The candidate tokens holding a first name of the gazetteer, or
+        followed by a candidate token."""
+        starts = [t.start for t in tokens]
+        persons = []
         j = 0
+        for _, start, _ in self.keywords.extract_keywords(text, True):
+            i = bisect_right(starts, start) - 1
+            if i < j or start >= tokens[i].end:
+                continue
+            if tokens[i].get('type') in CANDIDATE_TYPES:
+                persons.append(Entity(self.type, tokens[i].text, tokens[i].start, tokens[i].end))
+            elif i < len(tokens) - 1 and tokens[i + 1].get('type') in CANDIDATE_TYPES:
+                persons.append(Entity(self.type, tokens[i].text + ' ' + tokens[i + 1].text,
+                                      tokens[i].start, tokens[i + 1].end))
+            j = i + 1
+
         for person in persons:
-            start = person[1]
-            for i in range(j, len(tokens)):
-                if start >= tokens[i].start and start < tokens[i].end:
-                    if tokens[i].get('type') in ['CANDIDATE', 'ACRONYM']:
-                        FinalPersonns.append(Entity(self.type, tokens[i].text, tokens[i].start, tokens[i].end))
-                    elif i < len(tokens) - 1 and tokens[i + 1].get('type') in ['CANDIDATE', 'ACRONYM']:
-                        FinalPersonns.append(
-                            Entity(self.type, tokens[i].text + ' ' + tokens[i + 1].text, tokens[i].start,
-                                   tokens[i + 1].end))
-                    j = i + 1
-        employeeids = []
-
-        for person in FinalPersonns:
-            person.value = re.sub(r"^(Hi|Hello|Dear|However|If|Employees?)\s", '', person.value)
+            person.value = GREETING.sub('', person.value)
             person.start = person.end - len(person.value)
-            person.value = re.sub(r"'s$", '', person.value)
+            person.value = POSSESSIVE.sub('', person.value)
             person.end = person.start + len(person.value)
-            pattern = re.escape(
-                person.value) + r"[\s\(\[#]*(?P<EmployeeId>e?\d{4,8}\b)|\b(?P<EmployeeId2>e?\d{4,8}\b)[\s\)\]#]*" + re.escape(
-                person.value)
-            matches = re.finditer(pattern, text, re.MULTILINE | re.IGNORECASE)
-            for match in matches:
-                for group, index in zip(match.groups(), range(0, len(match.group()))):
-                    if group is not None:
-                        employeeids.append(
-                            Entity("EmployeeId", group, match.start(index + 1), match.end(index + 1)))
-
-                # print(match.groups())
-                # for groupidx in range(0, len(match.group())):
-                #     if match.group(groupidx) is not None:
-                #         employeeids.append(Entity("EmployeeId", match.group(groupidx), match.start(groupidx), match.end(groupidx)))
-
-        FinalPersonns.extend(employeeids)
-        return FinalPersonns
+        return persons
+
+    @staticmethod
+    def _employee_ids(text, persons):
+        """The employee ids written right before or after a name of
+        `persons`, anywhere in the text.
+
+        The text is scanned once for the id-like numbers, then the text
+        around each of them is compared with the names."""
+        names = {}
+        for person in persons:
+            if person.value:
+                names.setdefault(len(person.value), set()).add(person.value.lower())
+        if not names:
+            return []
+
+        employee_ids = []
+        for match in EMPLOYEE_ID.finditer(text):
+            # "<name> (e1234"
+            k = match.start()
+            while k > 0 and text[k - 1] in ID_AFTER_SEPARATORS:
+                k -= 1
+            if any(text[k - length:k].lower() in values
+                   for length, values in names.items() if length <= k):
+                employee_ids.append(Entity("EmployeeId", match.group(), match.start(), match.end()))
+                continue
+            # "e1234) <name>", the id starts a word
+            if match.start() > 0 and (text[match.start() - 1].isalnum() or text[match.start() - 1] == '_'):
+                continue
+            k = match.end()
+            while k < len(text) and text[k] in ID_BEFORE_SEPARATORS:
+                k += 1
+            if any(text[k:k + length].lower() in values for length, values in names.items()):
+                employee_ids.append(Entity("EmployeeId", match.group(), match.start(), match.end()))
+        return employee_ids
 
 
 if __name__ == '__main__':
@@ -1,52 +1,167 @@
 import typing
+from collections import OrderedDict
 from kolibri.model import Interpreter
 from kolibri.features.features import Features
 from kolibri.classifier.model import Classifier
-from sklearn.pipeline import make_pipeline
 from kolibri.document import Document
-from lime.lime_text import LimeTextExplainer
+from lime.lime_text import LimeTextExplainer, IndexedString, TextDomainMapper
+from lime import explanation
 import numpy as np
+import scipy.sparse as sp
+from sklearn.metrics.pairwise import pairwise_distances
 import os
 
+
+class BatchLimeTextExplainer(LimeTextExplainer):
+    """LimeTextExplainer that hands the perturbation masks to the scoring
+    function instead of the perturbed strings.
+
+    `classifier_fn(masks, indexed_string)` receives the binary matrix of
+    kept words (n_samples, n_words) and returns the probabilities of all
+    samples in one call. The sampling, kernel and regression are the
+    same as in `LimeTextExplainer.explain_instance`."""
+
+    def explain_instance(self, text_instance, classifier_fn, labels=(1,), top_labels=None,
+                         num_features=10, num_samples=5000, distance_metric='cosine',
+                         model_regressor=None):
+        indexed_string = IndexedString(text_instance, bow=self.bow)
+        domain_mapper = TextDomainMapper(indexed_string)
+
+        doc_size = indexed_string.num_words()
+        sample = self.random_state.randint(1, doc_size + 1, num_samples - 1)
+        data = np.ones((num_samples, doc_size))
+        features_range = range(doc_size)
+        for i, size in enumerate(sample, start=1):
+            inactive = self.random_state.choice(features_range, size, replace=False)
+            data[i, inactive] = 0
+
+        yss = classifier_fn(data, indexed_string)
+        distances = pairwise_distances(sp.csr_matrix(data), sp.csr_matrix(data[0]),
+                                       metric=distance_metric).ravel() * 100
+
+        ret_exp = explanation.Explanation(domain_mapper=domain_mapper,
+                                          class_names=self.class_names,
+                                          random_state=self.random_state)
+        ret_exp.predict_proba = yss[0]
+        if top_labels:
+            labels = np.argsort(yss[0])[-top_labels:]
+            ret_exp.top_labels = list(labels)
+            ret_exp.top_labels.reverse()
+        for label in labels:
+            (ret_exp.intercept[label],
+             ret_exp.local_exp[label],
+             ret_exp.score, ret_exp.local_pred) = self.base.explain_instance_with_data(
+                data, yss, distances, label, num_features,
+                model_regressor=model_regressor,
+                feature_selection=self.feature_selection)
+        return ret_exp
+
+
 class Explainer:
-    def __init__(self, model: Interpreter=None):
+    """Explains the predictions of a trained pipeline with LIME.
+
+    Perturbed documents are scored in batches: the components before the
+    featurizer run once on the source document, and if the featurizer
+    exposes `masked_features` the perturbations are applied as masks on
+    its tokens. Otherwise each distinct perturbed text is featurized and
+    the classifier scores all of them in a single call. Explanations are
+    memoized per text and settings."""
+
+    def __init__(self, model: Interpreter=None, num_samples=5000, cache_size=128, random_state=0):
+        self.num_samples = num_samples
+        self.cache_size = cache_size
+        self.random_state = random_state
+        self._explanations = OrderedDict()
         if model:
             self.model=model
             self.classifier=None
+            self.classifier_component=None
+            self.featurizer=None
             self.begining_of_pipline=[]
-            for component in self.model.pipeline:
+            for i, component in enumerate(self.model.pipeline):
                 if isinstance(component, Classifier):
                     self.classifier=component.clf
+                    self.classifier_component=component
                     self.class_names=component.class_names
+                    self.begining_of_pipline=self.model.pipeline[:i]
+                    break
+            featurizers=[c for c in self.begining_of_pipline if isinstance(c, Features)]
+            if len(featurizers)==1 and featurizers[0] is self.begining_of_pipline[-1] \
+                    and hasattr(featurizers[0], "masked_features"):
+                self.featurizer=featurizers[0]
 
     def load_model(self, path):
         model_interpreter = Interpreter.load(path)
-        self.__init__(model_interpreter)
-
-    def _predict(self, text):
-        documents=[]
-        for t in text:
-            documents.append(Document(t))
+        self.__init__(model_interpreter, self.num_samples, self.cache_size, self.random_state)
 
-        res=[]
-        for d in documents:
-            res.append(self.model.parse(d.text))
+    def _can_batch(self):
+        return self.classifier_component is not None and hasattr(self.classifier_component, "predict_prob")
 
-        predictions= [r['raw_prediction_results'][0] for r in res]
+    def _process(self, text, components):
+        document = Document(text, self.model.default_output_attributes())
+        for component in components:
+            component.process(document, **self.model.context)
+        return document
 
-        if len(res)>0:
-            self.class_names=res[0]['target']
-#        print(np.asarray(predictions).shape)
-        return np.asarray(predictions)
+    def _predict(self, text):
+        """Scores a list of texts, parsing each distinct text only once."""
+        unique=list(OrderedDict.fromkeys(text))
+        if self._can_batch():
+            documents=[self._process(t, self.begining_of_pipline) for t in unique]
+            X=np.stack([d.text_features for d in documents])
+            predictions=self.classifier_component.predict_prob(X)
+        else:
+            predictions=[self.model.parse(t)['raw_prediction_results'][0] for t in unique]
+        scores=dict(zip(unique, predictions))
+        return np.asarray([scores[t] for t in text])
+
+    def _predict_masks(self, source):
+        """Returns a `BatchLimeTextExplainer` scoring function for `source`."""
+        def predict_texts(masks, indexed_string):
+            texts=[indexed_string.inverse_removing(np.flatnonzero(m == 0)) for m in masks]
+            return self._predict(texts)
+
+        if self.featurizer is None or not self._can_batch():
+            return predict_texts
+
+        document = self._process(source, self.begining_of_pipline[:-1])
+        tokens, _ = self.featurizer._get_feature_tokens(document)
+        if tokens is None:
+            # the featurizer reads the raw text, there are no tokens to mask
+            return predict_texts
+
+        def classifier_fn(masks, indexed_string):
+            # tokens that are not a LIME word are kept in every sample
+            vocab = {w: i for i, w in enumerate(indexed_string.inverse_vocab)}
+            word_ids = np.array([vocab.get(t.text, masks.shape[1]) for t in tokens], dtype=int)
+            masks = np.hstack((masks, np.ones((masks.shape[0], 1))))
+            X = self.featurizer.masked_features(document, masks[:, word_ids])
+            return self.classifier_component.predict_prob(X)
+        return classifier_fn
+
+    def explain_instance(self, text, nb_features=10, top_labels=2, num_samples=None):
+        """Returns the LIME `Explanation` of the prediction for `text`."""
+        num_samples = num_samples or self.num_samples
+        key = (text, nb_features, top_labels, num_samples)
+        if key in self._explanations:
+            self._explanations.move_to_end(key)
+            return self._explanations[key]
+
+        class_names = self.class_names
+        if self.classifier_component is not None and hasattr(self.classifier_component, "le"):
+            class_names = list(self.classifier_component.le.classes_)
+        explainer = BatchLimeTextExplainer(class_names=class_names, random_state=self.random_state)
+        exp = explainer.explain_instance(text, self._predict_masks(text), num_features=nb_features,
+                                         top_labels=top_labels, num_samples=num_samples)
+
+        self._explanations[key] = exp
+        if len(self._explanations) > self.cache_size:
+            self._explanations.popitem(last=False)
+        return exp
 
     def explain(self, text, id, save_path=None, nb_features=10, top_labels=2):
 
-
-        explainer = LimeTextExplainer(class_names=self.class_names)
-
-
-
-        exp = explainer.explain_instance(text, self._predict, num_features=nb_features, top_labels=top_labels)
+        exp = self.explain_instance(text, nb_features=nb_features, top_labels=top_labels)
 
         file_name=str(id)+"_lime_explanation.html"
         if save_path:
@@ -64,4 +179,4 @@ if __name__=='__main__':
     explainer.load_model(model_directory)
     text = "Bonjour,  Suite a votre mail du 22 mois, je voudrais vous faire savoir qu’il a un nouveau locataire au nom de Razvan Virgil Condruz en place depui le 1er mois..   EAN Gaz 541449020704582124  Indice au 01/09:  31479.291  Ean Electricite 541449020704582117 indice au 01/09 : 68546    Jean Mugabo +352671140784 "
 
-    explainer.explain(text, 4, save_path='/Users/mohamedmentis/Documents/Mentis/Development/Python/Kolibri/examples')
\ No newline at end of file
+    explainer.explain(text, 4, save_path='/Users/mohamedmentis/Documents/Mentis/Development/Python/Kolibri/examples')
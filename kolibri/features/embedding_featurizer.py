@@ -63,7 +63,11 @@ class EmbeddingsFeaturizer(Features):
         "use_bigram_model": False,
         "embedding_file": None,
         "language": "en",
-        "embedding_type": "fasttext"
+        "embedding_type": "fasttext",
+
+        # store the fasttext and word2vec vectors as "float16" or "int8"
+        # (2x and 4x less memory), None keeps them as float32
+        "quantization": None
 
     }
 
@@ -89,7 +93,16 @@ class EmbeddingsFeaturizer(Features):
             elif self.component_config["embedding_type"]=="gensim":
                 gensim.EMBEDDING_MODELS[os.path.basename(self.component_config["embedding_file"])]=e
 
-        self.embeddings=Embedder(embedding=self.component_config["embedding_type"], language=self.component_config["language"],model=model, download=True)
+        self.embeddings=Embedder(embedding=self.component_config["embedding_type"], language=self.component_config["language"],model=model, download=True,
+                                 quantization=self.component_config["quantization"])
+
+    @classmethod
+    def cache_key(cls, model_metadata):
+        """The embeddings only depend on the configuration, models using the
+        same embeddings share them."""
+        meta = model_metadata.for_component(cls.name, cls.defaults)
+        return "{}-{}-{}-{}-{}".format(cls.name, meta.get("embedding_type"), meta.get("language"),
+                                       meta.get("embedding_file"), meta.get("quantization"))
     def train(self, training_data, config, **kwargs):
 
 
@@ -121,8 +134,9 @@ class EmbeddingsFeaturizer(Features):
     def process(self, message, **kwargs):
 
 
-        for token in message.tokens:
-            token.vector=self.embeddings.encode(token.text)
+        vectors = self.embeddings.lookup([token.text for token in message.tokens])
+        for token, vector in zip(message.tokens, vectors):
+            token.vector=vector
         self._set_nlp_features(message)
 
     def _set_nlp_features(self, message):
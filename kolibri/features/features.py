@@ -1,4 +1,7 @@
+import copy
+
 from kolibri.pipeComponent import Component
+from kolibri.vocabulary import CompactVocabulary
 import numpy as np
 class Features(Component):
 
@@ -13,4 +16,36 @@ class Features(Component):
             return np.hstack((document.get("text_features"),
                               additional_features))
         else:
-            return additional_features
\ No newline at end of file
+            return additional_features
+
+    @staticmethod
+    def _compact_vectorizer(vectorizer):
+        """Returns a copy of a fitted sklearn vectorizer (or of a
+        Pipeline/FeatureUnion of vectorizers) prepared for persistence: the
+        `vocabulary_` dicts become a `CompactVocabulary` and the
+        `stop_words_` sets, only kept for introspection, are dropped. The
+        vectorizer itself is left unchanged."""
+
+        if vectorizer is None:
+            return None
+        vectorizer = copy.copy(vectorizer)
+        if hasattr(vectorizer, "steps"):
+            vectorizer.steps = [(name, Features._compact_vectorizer(step))
+                                for name, step in vectorizer.steps]
+        if hasattr(vectorizer, "transformer_list"):
+            vectorizer.transformer_list = [(name, Features._compact_vectorizer(step))
+                                           for name, step in vectorizer.transformer_list]
+        vocabulary = getattr(vectorizer, "vocabulary_", None)
+        if isinstance(vocabulary, dict) and not isinstance(vocabulary, CompactVocabulary):
+            vectorizer.vocabulary_ = CompactVocabulary(vocabulary)
+        if hasattr(vectorizer, "stop_words_"):
+            vectorizer.stop_words_ = None
+        return vectorizer
+
+    def _persisted_copy(self, vectorizer_attribute="vectorizer"):
+        """A copy of this component to persist, with a compacted copy of
+        its vectorizer."""
+        persisted = copy.copy(self)
+        setattr(persisted, vectorizer_attribute,
+                self._compact_vectorizer(getattr(self, vectorizer_attribute)))
+        return persisted
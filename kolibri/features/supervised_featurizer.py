@@ -1,8 +1,9 @@
 import logging
 import os
-import re, joblib
+import re
 from typing import Any, Dict, List, Optional, Text
 from kolibri.features.features import Features
+from kolibri.utils.file import dump_artifact, load_artifact
 from sklearn.feature_extraction.text import CountVectorizer
 from kolibri.features.supervised_weigthing import *
 from string import punctuation
@@ -185,7 +186,7 @@ class CBTWFeaturizer(Features):
         Returns the metadata necessary to load the model again."""
 
         featurizer_file = os.path.join(model_dir, self.name + ".pkl")
-        joblib.dump(self, featurizer_file)
+        dump_artifact(self._persisted_copy("count_vect"), featurizer_file)
         return {"featurizer_file": self.name + ".pkl"}
 
     @classmethod
@@ -202,7 +203,7 @@ class CBTWFeaturizer(Features):
         if model_dir and meta.get("featurizer_file"):
             file_name = meta.get("featurizer_file")
             featurizer_file = os.path.join(model_dir, file_name)
-            return joblib.load(featurizer_file)
+            return load_artifact(featurizer_file, model_metadata.mmap_mode)
         else:
             logger.warning("Failed to load featurizer. Maybe path {} "
                            "doesn't exist".format(os.path.abspath(model_dir)))
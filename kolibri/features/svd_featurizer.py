@@ -4,14 +4,18 @@ from sklearn.pipeline import FeatureUnion
 from sklearn.pipeline import Pipeline
 import logging
 import os
-import dill, joblib
 from typing import Any, Dict, List, Optional, Text
 from kolibri.features.features import Features
+from kolibri.utils.file import dump_artifact, load_artifact
 from sklearn.feature_extraction.text import TfidfVectorizer
 from string import punctuation
 logger = logging.getLogger(__name__)
 
 
+def _identity_tokenizer(tokens):
+    return tokens
+
+
 class TDIDFSVDFeaturizer(Features):
     """Bag of words featurizer
 
@@ -165,11 +169,11 @@ class TDIDFSVDFeaturizer(Features):
             ('union', FeatureUnion(
                 transformer_list=[
                     # TFIDF features
-                    ('tfidf', TfidfVectorizer(tokenizer=lambda x: x, max_df=self.max_df, min_df=self.min_df,
+                    ('tfidf', TfidfVectorizer(tokenizer=_identity_tokenizer, max_df=self.max_df, min_df=self.min_df,
                                                   max_features=self.max_features, lowercase=False, use_idf=True)),
                     # standard bag-of-words model : TFIDF+SVD
                     ('body_bow', Pipeline([
-                        ('tfidf', TfidfVectorizer(tokenizer=lambda x: x, max_df=self.max_df, min_df=self.min_df,
+                        ('tfidf', TfidfVectorizer(tokenizer=_identity_tokenizer, max_df=self.max_df, min_df=self.min_df,
                                                   max_features=self.max_features, lowercase=False, use_idf=True)),
                         ('best', TruncatedSVD(n_components=self.svd_components)),
                     ]))
@@ -204,11 +208,7 @@ class TDIDFSVDFeaturizer(Features):
         Returns the metadata necessary to load the model again."""
 
         featurizer_file = os.path.join(model_dir, self.name + ".pkl")
-        pipeline_file=os.path.join(model_dir, 'scv_pipeline.pcl')
-        with open(pipeline_file, 'wb') as f:
-            dill.dump(self.vectorizer, f)
-        self.vectorizer=None
-        joblib.dump(self, featurizer_file)
+        dump_artifact(self._persisted_copy(), featurizer_file)
         return {"featurizer_file": self.name + ".pkl"}
 
     @classmethod
@@ -221,17 +221,18 @@ class TDIDFSVDFeaturizer(Features):
         # type: (...) -> TDIDFSVDFeaturizer
 
         meta = model_metadata.for_component(cls.name)
-        pipeline_file=os.path.join(model_dir, 'scv_pipeline.pcl')
 
         if model_dir and meta.get("featurizer_file"):
             file_name = meta.get("featurizer_file")
             featurizer_file = os.path.join(model_dir, file_name)
-            featurizer=joblib.load(featurizer_file)
-
-            with open(pipeline_file, 'rb') as f:
-                pipeline = dill.load(f)
-
-            featurizer.pipeline=pipeline
+            featurizer=load_artifact(featurizer_file, model_metadata.mmap_mode)
+
+            # models saved before the pipeline was pickled with the featurizer
+            pipeline_file=os.path.join(model_dir, 'scv_pipeline.pcl')
+            if featurizer.vectorizer is None and os.path.exists(pipeline_file):
+                import dill
+                with open(pipeline_file, 'rb') as f:
+                    featurizer.vectorizer = dill.load(f)
             return featurizer
         else:
             logger.warning("Failed to load featurizer. Maybe path {} "
@@ -1,9 +1,10 @@
 import logging
 import os
-import re, joblib
+import re
 from typing import Any, Dict, List, Optional, Text
 from kolibri.features.features import Features
-from sklearn.feature_extraction.text import TfidfVectorizer
+from kolibri.utils.file import dump_artifact, load_artifact
+from sklearn.feature_extraction.text import TfidfTransformer, TfidfVectorizer
 from string import punctuation
 logger = logging.getLogger(__name__)
 
@@ -100,29 +101,105 @@ class TFIDFFeaturizer(Features):
         self.use_bigram_model=self.component_config["use_bigram_model"]
         # declare class instance for CountVectorizer
         self.vectorizer = None
+        # the weighting of the vectorizer, for `masked_features`
+        self._transformer = None
 
     def _identity_tokenizer(self, text):
         return text
 
-    def _get_document_text(self, document):
+    def _lemma_term(self, t):
+        if self.lowercase:
+            return t.lemma.lower() if t.abstract is None else t.abstract
+        return t.lemma if t.abstract is not None else t.abstract
+
+    def _stem_term(self, t):
+        if self.lowercase:
+            return t.stem.lower() if t.abstract is None else t.abstract
+        return t.stem if t.abstract is None else t.abstract
+
+    def _text_term(self, t):
+        if self.lowercase:
+            return t.text.lower() if t.abstract is None else t.abstract
+        return t.text if t.abstract is None else t.abstract
+
+    def _get_feature_tokens(self, document):
+        """Returns the tokens the vectorizer sees for `document` and the
+        function turning one of them into a term, or (None, None)."""
         if document.nlp_doc and len(document.nlp_doc.tokens)>0:  # if lemmatize is possible
             if document.nlp_doc.tokens[0].lemma:
-                tokens = [t for t in document.nlp_doc.tokens if not t.is_stopword and t.text not in punctuation]
-                if self.lowercase:
-                    return [t.lemma.lower() if t.abstract is None else t.abstract for t in tokens]
-                return [t.lemma if t.abstract is not None else t.abstract for t in tokens]
+                return document.nlp_doc.tokens, self._lemma_term
             elif document.nlp_doc.tokens[0].stem:
-                tokens = [t for t in document.nlp_doc.tokens if not t.is_stopword and t.text not in punctuation]
-                if self.lowercase:
-                    return [t.stem.lower() if t.abstract is None else t.abstract for t in tokens]
-                return [t.stem if t.abstract is None else t.abstract for t in tokens]
+                return document.nlp_doc.tokens, self._stem_term
         elif document.tokens:  # if directly tokens is provided
-            tokens = [t for t in document.tokens if not t.is_stopword and t.text not in punctuation]
-            if self.lowercase:
-                return [t.text.lower() if t.abstract is None else t.abstract for t in tokens]
-            return [t.text if t.abstract is None else t.abstract for t in tokens]
-        else:
+            return document.tokens, self._text_term
+        return None, None
+
+    @staticmethod
+    def _is_feature_token(t):
+        return not t.is_stopword and t.text not in punctuation
+
+    def _get_document_text(self, document):
+        tokens, term = self._get_feature_tokens(document)
+        if tokens is None:
             return document.text
+        return [term(t) for t in tokens if self._is_feature_token(t)]
+
+    def masked_features(self, document, token_masks):
+        """Features of `document` for several subsets of its tokens.
+
+        Only the term counts change between subsets, so the vocabulary
+        lookup is done once and each subset costs a sparse product.
+
+        Args:
+            document: a document already processed by this featurizer's
+                predecessors.
+            token_masks: array of shape (n_samples, n_tokens), 1 where the
+                token returned by `_get_feature_tokens` is kept.
+
+        Returns:
+            numpy array of shape (n_samples, n_features).
+
+        Raises:
+            ValueError: if `document` has no tokens, its features are
+                computed from its text.
+        """
+        import numpy as np
+        import scipy.sparse as sp
+
+        tokens, term = self._get_feature_tokens(document)
+        if tokens is None:
+            raise ValueError("The document has no tokens to mask.")
+        vocabulary = self.vectorizer.vocabulary_
+        rows, cols = [], []
+        for i, t in enumerate(tokens):
+            if self._is_feature_token(t):
+                col = vocabulary.get(term(t))
+                if col is not None:
+                    rows.append(i)
+                    cols.append(col)
+        token_terms = sp.csr_matrix((np.ones(len(rows)), (rows, cols)),
+                                    shape=(len(tokens), len(vocabulary)))
+        counts = sp.csr_matrix(token_masks, dtype=np.float64) @ token_terms
+        bags = self._tfidf_transformer().transform(counts, copy=False).toarray()
+
+        existing = document.get("text_features")
+        if existing is not None:
+            return np.hstack((np.tile(existing, (bags.shape[0], 1)), bags))
+        return bags
+
+    def _tfidf_transformer(self):
+        """A `TfidfTransformer` weighting counts as the vectorizer does."""
+        import scipy.sparse as sp
+
+        if getattr(self, "_transformer", None) is None:
+            transformer = TfidfTransformer(norm=self.vectorizer.norm, use_idf=self.vectorizer.use_idf,
+                                           smooth_idf=self.vectorizer.smooth_idf,
+                                           sublinear_tf=self.vectorizer.sublinear_tf)
+            transformer.fit(sp.csr_matrix((1, len(self.vectorizer.vocabulary_))))
+            if self.vectorizer.use_idf:
+                transformer.idf_ = self.vectorizer.idf_
+            self._transformer = transformer
+        return self._transformer
 
     def train(self, training_data, cfg=None, **kwargs):
         """Take parameters from config and
@@ -133,6 +210,7 @@ class TFIDFFeaturizer(Features):
  #       lem_exs = [self._get_document_text(example)
  #                  for example in training_data.training_examples]
 
+        self._transformer = None
         self.vectorizer = TfidfVectorizer(min_df=self.min_df, sublinear_tf=True, max_df=self.max_df, tokenizer=self._get_document_text, lowercase=False)
         try:
             X = self.vectorizer.fit_transform(training_data.training_examples).toarray()
@@ -164,7 +242,9 @@ class TFIDFFeaturizer(Features):
         Returns the metadata necessary to load the model again."""
 
         featurizer_file = os.path.join(model_dir, self.name + ".pkl")
-        joblib.dump(self, featurizer_file)
+        persisted = self._persisted_copy()
+        persisted._transformer = None
+        dump_artifact(persisted, featurizer_file)
         return {"featurizer_file": self.name + ".pkl"}
 
     @classmethod
@@ -181,7 +261,7 @@ class TFIDFFeaturizer(Features):
         if model_dir and meta.get("featurizer_file"):
             file_name = meta.get("featurizer_file")
             featurizer_file = os.path.join(model_dir, file_name)
-            return joblib.load(featurizer_file)
+            return load_artifact(featurizer_file, model_metadata.mmap_mode)
         else:
             logger.warning("Failed to load featurizer. Maybe path {} "
                            "doesn't exist".format(os.path.abspath(model_dir)))
@@ -22,7 +22,12 @@ class Transform2WordVectors (BaseEstimator, TransformerMixin):
             return sparseX
         else:
 
-            wordVectors = np.array([self.wvObject.encode(v) for v in self.vocabulary])
+            # the rows follow the columns of the count matrix
+            words = sorted(self.vocabulary, key=self.vocabulary.get)
+            if hasattr(self.wvObject, 'lookup'):
+                wordVectors = self.wvObject.lookup(words)
+            else:
+                wordVectors = np.array([self.wvObject.encode(v) for v in words])
             reducedMatrix = sparseX.dot(wordVectors)
         return reducedMatrix
 
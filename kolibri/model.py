@@ -5,6 +5,8 @@ from kolibri  import version as ver
 from .errors import *
 from typing import Any
 from typing import Dict
+from typing import Iterable
+from typing import Iterator
 from typing import List
 from typing import Optional
 from typing import Text
@@ -71,6 +73,14 @@ class Metadata(object):
 
         return self.get('language')
 
+    @property
+    def mmap_mode(self):
+        # type: () -> Optional[Text]
+        """Mode in which the components memory map their numpy arrays
+        (see `kolibri.utils.file.load_artifact`), None loads them in memory."""
+
+        return self.get('mmap_mode')
+
     def persist(self, model_dir):
         # type: (Text) -> None
         """Persists the metadata of a model to a given directory."""
@@ -173,6 +183,8 @@ class Trainer(object):
         metadata = {
             "language": self.config["language"],
             "pipeline": [],
+            # artifacts are stored uncompressed and can be memory mapped
+            "mmap_mode": "r",
         }
 
         if project_name is None:
@@ -236,19 +248,24 @@ class Interpreter(object):
                 "".format(model_version, ver.__version__))
 
     @staticmethod
-    def load(model_dir, component_builder=None, skip_validation=False):
+    def load(model_dir, component_builder=None, skip_validation=False, mmap_mode=None):
         """Create an interpreter based on a persisted model.
 
         Args:
             model_dir (str): The path of the model to load
             component_builder (ComponentBuilder): The
                 :class:`ComponentBuilder` to use.
+            mmap_mode (str): Overrides the memory mapping mode stored in
+                the model metadata ('r' to share the arrays of the model
+                between processes, False to load them in memory).
 
         Returns:
             Interpreter: An interpreter that uses the loaded model.
         """
 
         model_metadata = Metadata.load(model_dir)
+        if mmap_mode is not None:
+            model_metadata.metadata["mmap_mode"] = mmap_mode or None
 
         Interpreter.ensure_model_compatibility(model_metadata)
         return Interpreter.create(model_metadata,
@@ -319,12 +336,59 @@ class Interpreter(object):
         for component in self.pipeline:
             component.process(document, **self.context)
 
+        return self._output(document, only_output_properties)
+
+    def _output(self, document, only_output_properties=True):
+        if document is None:
+            output = self.default_output_attributes()
+            output["text"] = ""
+            return output
+
         output = self.default_output_attributes()
         output.update(document.as_dict(
                 only_output_properties=only_output_properties))
 
         return output
 
+    def parse_stream(self, texts, replicas=None, queue_size=64, chunk_size=16,
+                     only_output_properties=True):
+        # type: (Iterable[Text], Optional[Dict[Text, int]], int, int, bool) -> Iterator[Dict[Text, Any]]
+        """Parses an iterable of texts, possibly endless, and yields the
+        results in input order.
+
+        The components run concurrently as stages connected by queues of
+        `queue_size` documents, so the memory used does not depend on the
+        number of texts. `replicas` maps the names of CPU heavy components
+        to a number of worker processes running them, in chunks of at most
+        `chunk_size` documents; the throughput is then bounded by the
+        slowest stage divided by its replicas."""
+        from kolibri.streaming import StreamPipeline
+
+        documents = (Document(text, self.default_output_attributes()) if text else None
+                     for text in texts)
+        pipeline = StreamPipeline(self.pipeline, self.context, replicas, queue_size, chunk_size)
+        for document in pipeline.run(documents):
+            yield self._output(document, only_output_properties)
+
+    def most_similar(self, text, k=10, n_probe=None):
+        # type: (Text, int, Optional[int]) -> List[Dict[Text, Any]]
+        """Returns the `k` training examples the most similar to a text,
+        found by the nearest neighbours index of the pipeline.
+
+        Only the components before the index process the text."""
+        index = next((c for c in self.pipeline if hasattr(c, "most_similar")), None)
+        if index is None:
+            raise ValueError("The model has no nearest neighbours component, "
+                             "add 'classifier_ann' to its pipeline.")
+        if not text:
+            return []
+        document = Document(text, self.default_output_attributes())
+        for component in self.pipeline:
+            if component is index:
+                break
+            component.process(document, **self.context)
+        return index.most_similar(document, k, n_probe)
+
     def get_component(self, component):
         for c in self.pipeline:
             if c.name == component:
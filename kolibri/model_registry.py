@@ -0,0 +1,328 @@
+import gc
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Text
+
+from kolibri.model import Interpreter
+from kolibri.pipeComponent import ComponentBuilder
+from kolibri.resources import resident_memory
+
+logger = logging.getLogger(__name__)
+
+
+def _model_signature(model_dir):
+    """Identifies the content of a model directory: where it points to and
+    when its metadata was written."""
+    path = os.path.realpath(model_dir)
+    try:
+        mtime = os.path.getmtime(os.path.join(path, "metadata.json"))
+    except OSError:
+        mtime = None
+    return path, mtime
+
+
+class _ModelEntry(object):
+    """A registered model and its statistics."""
+
+    def __init__(self, name, model_dir):
+        self.name = name
+        self.model_dir = model_dir
+        self.signature = None
+        self.interpreter = None
+        # serializes the loads of this model, other models are not blocked
+        self.lock = threading.Lock()
+        self.memory = 0
+        self.load_time = None
+        self.evict_time = None
+        self.last_used = None
+        self.loads = 0
+        self.evictions = 0
+        self.parses = 0
+
+    def as_dict(self):
+        return {
+            "name": self.name,
+            "model_dir": self.model_dir,
+            "loaded": self.interpreter is not None,
+            "memory_mb": self.memory / (1024. * 1024.),
+            "load_time": self.load_time,
+            "evict_time": self.evict_time,
+            "last_used": self.last_used,
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "parses": self.parses
+        }
+
+
+class ModelRegistry(object):
+    """Serves many models from one process.
+
+    Models are registered by name and loaded on their first use. All the
+    models are loaded with the same `ComponentBuilder`, so the components
+    that define a `cache_key` (nlp, embeddings) are loaded once and shared.
+    When more than `max_models` models are loaded, or when the memory of
+    the loaded models exceeds `memory_budget` bytes, the least recently
+    used models are evicted; they are loaded again when next used.
+
+    The memory of a model is the growth of the resident memory of the
+    process while it loads, so the first model loading a shared component
+    is charged for it. With a `memory_budget` the loads are serialized, so
+    that concurrent loads are not charged to each other. A shared
+    component is dropped from the cache when no loaded model uses it.
+
+    `reload` loads a new version of a model next to the current one and
+    swaps them in one step; parses running on the previous version finish
+    on it."""
+
+    def __init__(self,
+                 models=None,  # type: Optional[Dict[Text, Text]]
+                 memory_budget=None,  # type: Optional[int]
+                 max_models=None,  # type: Optional[int]
+                 component_builder=None,  # type: Optional[ComponentBuilder]
+                 mmap_mode=None  # type: Optional[Text]
+                 ):
+        # type: (...) -> None
+        self.memory_budget = memory_budget
+        self.max_models = max_models
+        self.mmap_mode = mmap_mode
+        if component_builder is None:
+            component_builder = ComponentBuilder(use_cache=True)
+        self.component_builder = component_builder
+        # in least recently used order
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        # serializes the loads whose memory is measured
+        self._measure_lock = threading.Lock()
+        self._loading = 0
+        for name, model_dir in (models or {}).items():
+            self.register(name, model_dir)
+
+    @classmethod
+    def from_directory(cls, path, **kwargs):
+        # type: (Text, **Any) -> ModelRegistry
+        """Registers every model directory found in `path` under its
+        directory name."""
+        models = {}
+        for name in sorted(os.listdir(path)):
+            model_dir = os.path.join(path, name)
+            if os.path.isfile(os.path.join(model_dir, "metadata.json")):
+                models[name] = model_dir
+        return cls(models, **kwargs)
+
+    def register(self, name, model_dir):
+        # type: (Text, Text) -> None
+        """Registers a model, it is loaded on its first use. Registering an
+        existing name with another directory swaps the model on its next
+        load, see `reload` to swap it immediately."""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                self._entries[name] = _ModelEntry(name, model_dir)
+            else:
+                entry.model_dir = model_dir
+
+    def unregister(self, name):
+        # type: (Text) -> None
+        with self._lock:
+            entry = self._entries.pop(name)
+            evicted = [entry] if self._unload(entry) else []
+        self._release(evicted)
+
+    def models(self):
+        # type: () -> List[Text]
+        with self._lock:
+            return list(self._entries)
+
+    def __contains__(self, name):
+        return name in self._entries
+
+    def _entry(self, name):
+        try:
+            return self._entries[name]
+        except KeyError:
+            raise KeyError("No model is registered as '{}'.".format(name))
+
+    def get(self, name):
+        # type: (Text) -> Interpreter
+        """Returns the interpreter of a model, loading it if needed."""
+        with self._lock:
+            entry = self._entry(name)
+            self._entries.move_to_end(name)
+            entry.last_used = time.time()
+            interpreter = entry.interpreter
+        if interpreter is not None:
+            return interpreter
+
+        with entry.lock:
+            # another thread may have loaded it in the meantime
+            interpreter = entry.interpreter
+            if interpreter is None:
+                interpreter, signature = self._load(entry, entry.model_dir)
+                with self._lock:
+                    self._loading -= 1
+                    entry.interpreter, entry.signature = interpreter, signature
+                    evicted = self._evict(keep=name)
+                self._release(evicted)
+        return interpreter
+
+    def parse(self, name, text, **kwargs):
+        # type: (Text, Text, **Any) -> Dict[Text, Any]
+        """Parses a text with a model."""
+        interpreter = self.get(name)
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None:
+                entry.parses += 1
+        return interpreter.parse(text, **kwargs)
+
+    def reload(self, name, model_dir=None):
+        # type: (Text, Optional[Text]) -> Interpreter
+        """Loads a model again, from `model_dir` if given, and swaps it in
+        once it is loaded. The model is served by its previous version
+        until then."""
+        with self._lock:
+            entry = self._entry(name)
+        with entry.lock:
+            model_dir = model_dir or entry.model_dir
+            interpreter, signature = self._load(entry, model_dir)
+            with self._lock:
+                self._loading -= 1
+                replaced = entry.interpreter is not None
+                entry.interpreter, entry.signature = interpreter, signature
+                entry.model_dir = model_dir
+                self._entries.move_to_end(name)
+                evicted = self._evict(keep=name)
+            self._release(evicted, collect=replaced)
+        return interpreter
+
+    def refresh(self):
+        # type: () -> List[Text]
+        """Reloads the loaded models whose directory changed, e.g. when a
+        `current` symlink is pointed to a new version, and returns their
+        names. Meant to be called periodically."""
+        with self._lock:
+            changed = [entry.name for entry in self._entries.values()
+                       if entry.interpreter is not None
+                       and _model_signature(entry.model_dir) != entry.signature]
+        for name in changed:
+            logger.info("Model '{}' changed on disk, reloading it.".format(name))
+            self.reload(name)
+        return changed
+
+    def evict(self, name):
+        # type: (Text) -> None
+        """Unloads a model, it is loaded again on its next use."""
+        with self._lock:
+            entry = self._entry(name)
+            evicted = [entry] if self._unload(entry) else []
+        self._release(evicted)
+
+    def _load(self, entry, model_dir):
+        """Loads a model. Counts it in `_loading` until the caller sets the
+        interpreter, in the same `_lock` block, so that `_release` never
+        prunes the components of a model that is not set yet."""
+        with self._lock:
+            self._loading += 1
+        try:
+            if self.memory_budget is None:
+                return self._measured_load(entry, model_dir)
+            with self._measure_lock:
+                return self._measured_load(entry, model_dir)
+        except BaseException:
+            with self._lock:
+                self._loading -= 1
+            raise
+
+    def _measured_load(self, entry, model_dir):
+        gc.collect()
+        memory = resident_memory()
+        start = time.perf_counter()
+        signature = _model_signature(model_dir)
+        interpreter = Interpreter.load(model_dir, self.component_builder, mmap_mode=self.mmap_mode)
+        entry.load_time = time.perf_counter() - start
+        entry.memory = max(resident_memory() - memory, 0)
+        entry.loads += 1
+        logger.info("Loaded model '{}' from '{}' in {:.2f}s ({:.1f} MB)."
+                    "".format(entry.name, model_dir, entry.load_time, entry.memory / (1024. * 1024.)))
+        return interpreter, signature
+
+    def _unload(self, entry):
+        """Drops the interpreter of a model, under `_lock`. Returns whether
+        it was loaded; `_release` frees it once the lock is released."""
+        if entry.interpreter is None:
+            return False
+        entry.interpreter = None
+        entry.evictions += 1
+        return True
+
+    def _release(self, evicted, collect=False):
+        """Frees the models unloaded under the lock, without holding it:
+        drops the cached components that no loaded model uses and collects
+        the garbage."""
+        with self._lock:
+            if self._loading:
+                # the components of a model being loaded are not in use yet
+                in_use = None
+            else:
+                in_use = [component for entry in self._entries.values() if entry.interpreter is not None
+                          for component in entry.interpreter.pipeline]
+        if in_use is not None:
+            self.component_builder.prune_cache(in_use)
+            del in_use
+        if not evicted and not collect:
+            return
+        start = time.perf_counter()
+        gc.collect()
+        evict_time = time.perf_counter() - start
+        for entry in evicted:
+            entry.evict_time = evict_time
+            logger.info("Evicted model '{}' in {:.2f}s ({:.1f} MB)."
+                        "".format(entry.name, evict_time, entry.memory / (1024. * 1024.)))
+
+    def loaded_memory(self):
+        # type: () -> int
+        """The memory of the loaded models in bytes."""
+        with self._lock:
+            return sum(entry.memory for entry in self._entries.values()
+                       if entry.interpreter is not None)
+
+    def _over_budget(self):
+        loaded = [entry for entry in self._entries.values() if entry.interpreter is not None]
+        if self.max_models is not None and len(loaded) > self.max_models:
+            return True
+        return (self.memory_budget is not None
+                and sum(entry.memory for entry in loaded) > self.memory_budget)
+
+    def _evict(self, keep=None):
+        """Evicts the least recently used models until the loaded models
+        fit the budget, `keep` is never evicted. Called under `_lock`,
+        returns the evicted entries to `_release`."""
+        evicted = []
+        while self._over_budget():
+            candidates = [entry for entry in self._entries.values()
+                          if entry.interpreter is not None and entry.name != keep]
+            if not candidates:
+                break
+            self._unload(candidates[0])
+            evicted.append(candidates[0])
+        return evicted
+
+    def stats(self):
+        # type: () -> Dict[Text, Any]
+        """Returns the load and eviction latency, memory and usage of each
+        model, and the resident memory of the process."""
+        with self._lock:
+            models = [entry.as_dict() for entry in self._entries.values()]
+        return {
+            "resident_memory_mb": resident_memory() / (1024. * 1024.),
+            "loaded_memory_mb": self.loaded_memory() / (1024. * 1024.),
+            "cached_components": len(self.component_builder.component_cache),
+            "models": models
+        }
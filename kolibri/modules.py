@@ -16,6 +16,7 @@ from kolibri.features import TFIDFFeaturizer
 from kolibri.features.embedding_featurizer import EmbeddingsFeaturizer
 from kolibri.features.supervised_featurizer import CBTWFeaturizer
 from kolibri.classifier.sklearn_classifier import SkLearnClassifier
+from kolibri.classifier.ann_classifier import ANNClassifier
 from kolibri.data.cleaner.email_ import EmailCleaner
 from kolibri.entities.crf_entity_extractor import CRFEntityExtractor
 from kolibri.entities.lstm_entity_extractor import LSTMEntityExtractor
@@ -27,13 +28,15 @@ from kolibri.tools.std_nlp import StdNLP
 from kolibri.embeddings.w2v import CustomWord2Vec
 from kolibri.tokenizer.nlp_tokenizer import NlpTokenizer
 from kolibri.cluster.topics_lda import LdaMallet
+from kolibri.cluster.topics_online_lda import LdaTopics
 from kolibri.classifier.ecoc.ecoc_classifier import ECOC
 # Classes of all known components. If a new component should be added,
 # its class name should be listed here.
 component_classes = [
 EmailCleaner, WordTokenizer, TFIDFFeaturizer, SkLearnClassifier,
 StdNLP, NlpTokenizer, EmbeddingsFeaturizer,CRFEntityExtractor,EntitySynonymMapper, SentenceTokenizer, LSTMEntityExtractor,
-LdaMallet, StructuredTokenizer, ECOC, CBTWFeaturizer, CustomWord2Vec, TDIDFSVDFeaturizer
+LdaMallet, LdaTopics, StructuredTokenizer, ECOC, CBTWFeaturizer, CustomWord2Vec, TDIDFSVDFeaturizer,
+ANNClassifier
 #    TFIDFFeaturizer, SkLearnClassifier, , NlpFeaturizer,,, StdNLP, NlpTokenizer
 ]
 
@@ -1,11 +1,8 @@
-from kolibri.tokenizer import StructuredTokenizer
-from kolibri.lemmatizer.fr.french_lefff_lemmatizer import FrenchLefffLemmatizer
-from kolibri.lemmatizer.en.formlemmatizer import FormWordNetLematizer
 from kolibri import Sent, Doc
 from kolibri.pos_tagger.pos_tagger import pos_tag
 from kolibri.features.word2vec.word2vec import get_embedding
 from kolibri.tokenizer.sentence_tokenizer import split_single
-from kolibri.stemmer import WordStemer
+from kolibri.resources import resources
 import logging
 
 
@@ -16,16 +13,12 @@ class Nlp:
 
     def __init__(self, language='en', logging_level=logging.WARNING):
         self.logging_level = logging_level
-        self.default_properties = self.DEFAULT_PROPERTIES
-        self.default_properties["language"]=language
+        self.default_properties = dict(self.DEFAULT_PROPERTIES, language=language)
         self.default_output_format = self.DEFAULT_OUTPUT_FORMAT
-        self.tokenizer = StructuredTokenizer(self.default_properties)
-        self.stemmer=WordStemer(language)
-        self.lemmatizer=None
-        if language=='fr':
-            self.lemmatizer=FrenchLefffLemmatizer()
-        if language=='en':
-            self.lemmatizer=FormWordNetLematizer()
+        # the lexicons are shared with the other pipelines of the language
+        self.tokenizer = resources.get(language, "tokenizer")
+        self.stemmer = resources.get(language, "stemmer")
+        self.lemmatizer = resources.get(language, "lemmatizer")
 
         self.language=language
         logging.basicConfig(level=self.logging_level)
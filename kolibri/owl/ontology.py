@@ -1,7 +1,13 @@
+import logging
+import os
+
 from rdflib import Graph, RDF, RDFS, OWL, BNode, URIRef
 import urllib.request as url
 
 from kolibri.owl.entities import *
+from kolibri.owl.snapshot import default_snapshot_path, read_snapshot, source_signature, write_snapshot
+
+logger = logging.getLogger(__name__)
 
 
 class Ontology:
@@ -45,6 +51,19 @@ class Ontology:
         self.annotation_properties = set()
         self.data_properties = set()
 
+    @property
+    def graph(self):
+        #the graph of an ontology loaded from a snapshot is rebuilt on first use
+        if self._snapshot is not None:
+            self._graph = self._snapshot.graph()
+            self._snapshot = None
+        return self._graph
+
+    @graph.setter
+    def graph(self, graph):
+        self._graph = graph
+        self._snapshot = None
+
     #read-only properties
     @property
     def entities(self):
@@ -109,7 +128,7 @@ class Ontology:
             entity.sync_from_ontology()
 
 
-    def load(self, location=None, format=None, **args):
+    def load(self, location=None, format=None, snapshot=None, **args):
         """
         loads the ontology into the graph.  params are identical to rdflib.Graph.parse
         :param source:
@@ -118,16 +137,64 @@ class Ontology:
         :param location:
         :param file:
         :param data:
+        :param snapshot: path of a compiled snapshot of the ontology, or True for '<location>.snapshot.npz'.
+            the snapshot is read instead of parsing the file when the file did not change since it was written,
+            otherwise the file is parsed and the snapshot written again; see kolibri.owl.snapshot
         :param args:
         :return:
         """
 
+        snapshot_path, signature = None, None
+        if snapshot:
+            if location and os.path.isfile(location):
+                snapshot_path = default_snapshot_path(location) if snapshot is True else snapshot
+                signature = source_signature(location)
+            else:
+                logger.warning("Only ontologies loaded from a local file can be snapshot, parsing '{}'."
+                               "".format(location))
+
+        if snapshot_path:
+            compiled = read_snapshot(snapshot_path, signature)
+            if compiled is not None:
+                self.load_snapshot(compiled)
+                return
+
         self.graph = Graph()
 
         self._parse(location, format, **args)
 
         self.sync_from_graph()
 
+        if snapshot_path:
+            try:
+                write_snapshot(self, snapshot_path, signature)
+            except (IOError, OSError) as e:
+                logger.warning("Could not write the ontology snapshot '{}': {}".format(snapshot_path, e))
+
+    def load_snapshot(self, snapshot):
+        """
+        loads the ontology from a snapshot written by save_snapshot, or from a read OntologySnapshot
+        :param snapshot:
+        :return:
+        """
+        if isinstance(snapshot, str):
+            path = snapshot
+            snapshot = read_snapshot(path)
+            if snapshot is None:
+                raise ValueError("No readable ontology snapshot at '{}'.".format(path))
+
+        snapshot.populate(self)
+        self._graph = None
+        self._snapshot = snapshot
+
+    def save_snapshot(self, filename):
+        """
+        writes the snapshot of the ontology, it can be loaded with load_snapshot
+        :param filename:
+        :return:
+        """
+        write_snapshot(self, filename)
+
     def _parse(self, location=None, format=None, **args):
         """
         parses the ontology using rdflib.Graph.parse().  First, uses rdflib's guess_format, then tries all of them
@@ -0,0 +1,305 @@
+"""Compiled snapshots of parsed ontologies.
+
+Parsing a large RDF/XML ontology with rdflib, then resolving the labels,
+parents and qnames of each of its entities, takes far longer than reading a
+few arrays back. A snapshot holds a loaded `Ontology` as numpy arrays:
+
+- the term dictionary: the text and kind of every URI, blank node and
+  literal, and the datatype and language of the literals,
+- the triples, as rows of three term ids,
+- the entity tables: the kind, term, qname and main label of each entity,
+  and its labels, comments, definitions, annotations, triples, parents and
+  children as ids into the other tables.
+
+`Ontology.load(location, snapshot=True)` writes the snapshot next to the
+source after parsing it, and reads the snapshot instead of parsing on the
+next loads, as long as the size and modification time of the source did not
+change. The rdflib graph of an ontology read from a snapshot is only rebuilt
+when it is first used.
+"""
+import logging
+import os
+
+import numpy as np
+from rdflib import BNode, Graph, Literal, URIRef
+
+from kolibri.owl.entities import Class, Individual, ObjectProperty, AnnotationProperty, DataProperty
+
+logger = logging.getLogger(__name__)
+
+# written in the snapshot, snapshots of another version are rebuilt
+SNAPSHOT_VERSION = 1
+
+SNAPSHOT_EXTENSION = ".snapshot.npz"
+
+# the kinds of terms
+URI, BLANK, LITERAL = 0, 1, 2
+
+# the entity sets of an ontology and the class of their entities
+ENTITY_KINDS = [
+    ("classes", Class),
+    ("individuals", Individual),
+    ("object_properties", ObjectProperty),
+    ("annotation_properties", AnnotationProperty),
+    ("data_properties", DataProperty),
+]
+
+# the entity attributes holding a set of terms
+TERM_ATTRIBUTES = ["labels", "comments", "definitions"]
+# the entity attributes holding a set of entities
+ENTITY_ATTRIBUTES = ["parents", "children"]
+
+
+def default_snapshot_path(location):
+    return location + SNAPSHOT_EXTENSION
+
+
+def source_signature(location):
+    """Identifies the content of a source file by its path, size and
+    modification time."""
+    stat = os.stat(location)
+    return os.path.realpath(location), stat.st_size, stat.st_mtime_ns
+
+
+def _pack_strings(strings):
+    """Joins strings into one utf-8 buffer and the offsets of each string
+    in the decoded text."""
+    offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+    np.cumsum([len(s) for s in strings], out=offsets[1:])
+    text = "".join(strings).encode("utf-8", "surrogatepass")
+    return np.frombuffer(text, dtype=np.uint8), offsets
+
+
+def _unpack_strings(buffer, offsets):
+    text = buffer.tobytes().decode("utf-8", "surrogatepass")
+    offsets = offsets.tolist()
+    return [text[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+def _pack_lists(lists):
+    """Flattens lists of ids into their values and the offsets of each
+    list."""
+    offsets = np.zeros(len(lists) + 1, dtype=np.int64)
+    np.cumsum([len(values) for values in lists], out=offsets[1:])
+    values = np.fromiter((value for values in lists for value in values), dtype=np.int32, count=offsets[-1])
+    return values, offsets
+
+
+def _unpack_lists(values, offsets):
+    values, offsets = values.tolist(), offsets.tolist()
+    return [values[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+class _TermIds(object):
+    """Assigns consecutive ids to the terms of a graph."""
+
+    def __init__(self):
+        self.ids = {}
+        self.terms = []
+
+    def __call__(self, term):
+        term_id = self.ids.get(term)
+        if term_id is None:
+            term_id = self.ids[term] = len(self.terms)
+            self.terms.append(term)
+        return term_id
+
+
+def _term_arrays(term_ids):
+    """Encodes the terms as their texts, kinds, datatype ids and
+    languages."""
+    kinds, datatypes, languages = [], [], []
+    terms = term_ids.terms
+    # the datatypes of the literals are appended to the terms as they come
+    i = 0
+    while i < len(terms):
+        term = terms[i]
+        datatype, language = -1, ""
+        if isinstance(term, Literal):
+            kind = LITERAL
+            if term.language:
+                language = term.language
+            elif term.datatype is not None:
+                datatype = term_ids(term.datatype)
+        elif isinstance(term, BNode):
+            kind = BLANK
+        elif isinstance(term, URIRef):
+            kind = URI
+        else:
+            raise TypeError("Can not write a term of type {} in a snapshot.".format(type(term).__name__))
+        kinds.append(kind)
+        datatypes.append(datatype)
+        languages.append(language)
+        i += 1
+    values, value_offsets = _pack_strings([str(term) for term in terms])
+    languages, language_offsets = _pack_strings(languages)
+    return {
+        "term_values": values,
+        "term_value_offsets": value_offsets,
+        "term_kinds": np.array(kinds, dtype=np.int8),
+        "term_datatypes": np.array(datatypes, dtype=np.int32),
+        "term_languages": languages,
+        "term_language_offsets": language_offsets
+    }
+
+
+def write_snapshot(ontology, filename, signature=None):
+    """Writes the snapshot of a loaded ontology.
+
+    :param signature: the `source_signature` of the file the ontology was
+        loaded from, the snapshot is only read back for the same signature."""
+    graph = ontology.graph
+    term_ids = _TermIds()
+    triples = list(graph)
+    triple_rows = {triple: row for row, triple in enumerate(triples)}
+    triple_ids = np.array([[term_ids(s), term_ids(p), term_ids(o)] for s, p, o in triples],
+                          dtype=np.int32).reshape(-1, 3)
+
+    entities = [(kind, entity) for kind, (name, _) in enumerate(ENTITY_KINDS)
+                for entity in getattr(ontology, name)]
+    entity_rows = {id(entity): row for row, (_, entity) in enumerate(entities)}
+
+    arrays = {
+        "version": np.array(SNAPSHOT_VERSION),
+        "source": np.array(signature[0] if signature else ""),
+        "source_size": np.array(signature[1] if signature else -1, dtype=np.int64),
+        "source_mtime": np.array(signature[2] if signature else -1, dtype=np.int64),
+        "triples": triple_ids,
+        "uri": np.array(term_ids(ontology.uri) if ontology.uri is not None else -1, dtype=np.int32),
+        "entity_kinds": np.array([kind for kind, _ in entities], dtype=np.int8),
+        "entity_terms": np.array([term_ids(entity.uri) for _, entity in entities], dtype=np.int32),
+    }
+    for name in TERM_ATTRIBUTES:
+        arrays[name], arrays[name + "_offsets"] = _pack_lists(
+            [[term_ids(term) for term in getattr(entity, name)] for _, entity in entities])
+    for name in ENTITY_ATTRIBUTES:
+        arrays[name], arrays[name + "_offsets"] = _pack_lists(
+            [[entity_rows[id(other)] for other in getattr(entity, name)] for _, entity in entities])
+    arrays["triples_of"], arrays["triples_of_offsets"] = _pack_lists(
+        [[triple_rows[triple] for triple in entity.triples] for _, entity in entities])
+    # the annotations are pairs of property and value
+    annotations = [list(entity.annotations) for _, entity in entities]
+    arrays["annotation_properties"], arrays["annotations_offsets"] = _pack_lists(
+        [[term_ids(prop) for prop, _ in pairs] for pairs in annotations])
+    arrays["annotation_values"], _ = _pack_lists(
+        [[term_ids(value) for _, value in pairs] for pairs in annotations])
+    arrays["qnames"], arrays["qname_offsets"] = _pack_strings(
+        [getattr(entity, "qname", "") or "" for _, entity in entities])
+    arrays["main_labels"], arrays["main_label_offsets"] = _pack_strings(
+        [getattr(entity, "main_label", "") or "" for _, entity in entities])
+    namespaces = list(graph.namespaces())
+    arrays["prefixes"], arrays["prefix_offsets"] = _pack_strings([prefix for prefix, _ in namespaces])
+    arrays["namespaces"], arrays["namespace_offsets"] = _pack_strings([str(ns) for _, ns in namespaces])
+    arrays.update(_term_arrays(term_ids))
+
+    # written aside and moved in place, a concurrent load never reads half a snapshot
+    temporary = "{}.{}.tmp".format(filename, os.getpid())
+    try:
+        with open(temporary, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(temporary, filename)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+def read_snapshot(filename, signature=None):
+    """Reads a snapshot, returns None if it does not exist, was written by
+    another version or for another `source_signature`."""
+    if not os.path.isfile(filename):
+        return None
+    try:
+        with np.load(filename, allow_pickle=False) as data:
+            arrays = {name: data[name] for name in data.files}
+    except (IOError, OSError, ValueError) as e:
+        logger.warning("Could not read the ontology snapshot '{}': {}".format(filename, e))
+        return None
+    if int(arrays["version"]) != SNAPSHOT_VERSION:
+        logger.info("The ontology snapshot '{}' has another version, it is rebuilt.".format(filename))
+        return None
+    if signature is not None and (str(arrays["source"]), int(arrays["source_size"]),
+                                  int(arrays["source_mtime"])) != tuple(signature):
+        logger.info("The source of the ontology snapshot '{}' changed, it is rebuilt.".format(filename))
+        return None
+    return OntologySnapshot(arrays)
+
+
+class OntologySnapshot(object):
+    """The arrays of a snapshot, decoded into rdflib terms and owl
+    entities."""
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self.terms = self._decode_terms()
+
+    def _decode_terms(self):
+        arrays = self.arrays
+        values = _unpack_strings(arrays["term_values"], arrays["term_value_offsets"])
+        languages = _unpack_strings(arrays["term_languages"], arrays["term_language_offsets"])
+        kinds = arrays["term_kinds"].tolist()
+        datatypes = arrays["term_datatypes"].tolist()
+        terms = [None] * len(values)
+        # the datatypes first, the literals refer to them
+        for i, kind in enumerate(kinds):
+            if kind == URI:
+                terms[i] = URIRef(values[i])
+            elif kind == BLANK:
+                terms[i] = BNode(values[i])
+        for i, kind in enumerate(kinds):
+            if kind == LITERAL:
+                if languages[i]:
+                    terms[i] = Literal(values[i], lang=languages[i])
+                else:
+                    datatype = datatypes[i]
+                    terms[i] = Literal(values[i], datatype=terms[datatype] if datatype >= 0 else None)
+        return terms
+
+    def triples(self):
+        terms = self.terms
+        return [(terms[s], terms[p], terms[o]) for s, p, o in self.arrays["triples"].tolist()]
+
+    def graph(self):
+        """Rebuilds the rdflib graph of the ontology."""
+        arrays = self.arrays
+        graph = Graph()
+        prefixes = _unpack_strings(arrays["prefixes"], arrays["prefix_offsets"])
+        namespaces = _unpack_strings(arrays["namespaces"], arrays["namespace_offsets"])
+        for prefix, namespace in zip(prefixes, namespaces):
+            graph.bind(prefix, URIRef(namespace), override=True)
+        graph.addN((s, p, o, graph) for s, p, o in self.triples())
+        return graph
+
+    def populate(self, ontology):
+        """Sets the uri and entities of an ontology from the snapshot, as
+        `Ontology.sync_from_graph` would have."""
+        arrays, terms = self.arrays, self.terms
+        uri = int(arrays["uri"])
+        ontology.uri = terms[uri] if uri >= 0 else None
+
+        entities = []
+        for kind, term in zip(arrays["entity_kinds"].tolist(), arrays["entity_terms"].tolist()):
+            entities.append(ENTITY_KINDS[kind][1](uri=terms[term], ontology=ontology))
+
+        for name in TERM_ATTRIBUTES:
+            for entity, ids in zip(entities, _unpack_lists(arrays[name], arrays[name + "_offsets"])):
+                setattr(entity, name, set(terms[i] for i in ids))
+        for name in ENTITY_ATTRIBUTES:
+            for entity, rows in zip(entities, _unpack_lists(arrays[name], arrays[name + "_offsets"])):
+                setattr(entity, name, set(entities[row] for row in rows))
+
+        triples = self.triples()
+        for entity, rows in zip(entities, _unpack_lists(arrays["triples_of"], arrays["triples_of_offsets"])):
+            entity.triples = set(triples[row] for row in rows)
+        properties = _unpack_lists(arrays["annotation_properties"], arrays["annotations_offsets"])
+        values = _unpack_lists(arrays["annotation_values"], arrays["annotations_offsets"])
+        for entity, props, vals in zip(entities, properties, values):
+            entity.annotations = set((terms[p], terms[v]) for p, v in zip(props, vals))
+        qnames = _unpack_strings(arrays["qnames"], arrays["qname_offsets"])
+        main_labels = _unpack_strings(arrays["main_labels"], arrays["main_label_offsets"])
+        for entity, qname, main_label in zip(entities, qnames, main_labels):
+            entity.qname = qname
+            entity.main_label = main_label
+
+        kinds = arrays["entity_kinds"].tolist()
+        for kind, (name, _) in enumerate(ENTITY_KINDS):
+            setattr(ontology, name, set(entity for entity, k in zip(entities, kinds) if k == kind))
@@ -1,4 +1,5 @@
 
+from functools import lru_cache
 from string import ascii_lowercase
 
 from rdflib import Literal
@@ -21,6 +22,9 @@ NAMESPACES_DEFAULT = [
 ]
 
 
+# size of the cache of uri2niceString with the default namespaces
+NICE_STRING_CACHE_SIZE = 1 << 16
+
 # Default tag to use as a language tag for literal assigments of text strings
 DEFAULT_LANGUAGE_TAG = "en"
 
@@ -169,10 +173,19 @@ def uri2niceString(aUri, namespaces=None):
     ('rdf', rdflib.URIRef('http://www.w3.org/1999/02/22-rdf-syntax-ns#'))
     (u'xsd', rdflib.URIRef('http://www.w3.org/2001/XMLSchema#'))]
 
+    The strings of the default namespaces are cached by uri, other
+    namespaces would cost more to compare than the string itself.
     """
-    if not namespaces:
-        namespaces = NAMESPACES_DEFAULT
+    if namespaces:
+        return _uri2niceString(aUri, namespaces)
+    try:
+        return _default_uri2niceString(aUri)
+    except TypeError:
+        # not hashable
+        return _uri2niceString(aUri, NAMESPACES_DEFAULT)
+
 
+def _uri2niceString(aUri, namespaces):
     if not aUri:
         stringa = ""
     elif type(aUri) == rdflib.term.URIRef:
@@ -206,56 +219,9 @@ def uri2niceString(aUri, namespaces=None):
     return stringa
 
 
-
-def uri2niceString(aUri, namespaces=None):
-    """
-    From a URI, returns a nice string representation that uses also the namespace symbols
-    Cuts the uri of the namespace, and replaces it with its shortcut (for base, attempts to infer it or leaves it blank)
-
-    Namespaces are a list
-
-    [('xml', rdflib.URIRef('http://www.w3.org/XML/1998/namespace'))
-    ('', rdflib.URIRef('http://cohereweb.net/ontology/cohere.owl#'))
-    (u'owl', rdflib.URIRef('http://www.w3.org/2002/07/owl#'))
-    ('rdfs', rdflib.URIRef('http://www.w3.org/2000/01/rdf-schema#'))
-    ('rdf', rdflib.URIRef('http://www.w3.org/1999/02/22-rdf-syntax-ns#'))
-    (u'xsd', rdflib.URIRef('http://www.w3.org/2001/XMLSchema#'))]
-
-    """
-    if not namespaces:
-        namespaces = NAMESPACES_DEFAULT
-
-    if not aUri:
-        stringa = ""
-    elif type(aUri) == rdflib.term.URIRef:
-        # we have a URI: try to create a qName
-        stringa = aUri.toPython()
-        for aNamespaceTuple in namespaces:
-            try:  # check if it matches the available NS
-                if stringa.find(aNamespaceTuple[1].__str__()) == 0:
-                    if aNamespaceTuple[0]:  # for base NS, it's empty
-                        stringa = aNamespaceTuple[0] + ":" + stringa[len(
-                            aNamespaceTuple[1].__str__()):]
-                    else:
-                        prefix = inferNamespacePrefix(aNamespaceTuple[1])
-                        if prefix:
-                            stringa = prefix + ":" + stringa[len(
-                                aNamespaceTuple[1].__str__()):]
-                        else:
-                            stringa = ":" + stringa[len(aNamespaceTuple[1].
-                                                        __str__()):]
-            except:
-                stringa = "error"
-
-    elif type(aUri) == rdflib.term.Literal:
-        stringa = "\"%s\"" % aUri  # no string casting so to prevent encoding errors
-    else:
-        # print(type(aUri))
-        if type(aUri) == type(u''):
-            stringa = aUri
-        else:
-            stringa = aUri.toPython()
-    return stringa
+@lru_cache(maxsize=NICE_STRING_CACHE_SIZE, typed=True)
+def _default_uri2niceString(aUri):
+    return _uri2niceString(aUri, NAMESPACES_DEFAULT)
 
 
 def niceString2uri(aUriString, namespaces=None):
@@ -287,6 +253,7 @@ def niceString2uri(aUriString, namespaces=None):
     # we dont handle the 'base' URI case
     return rdflib.term.URIRef(aUriString)
 
+
 def inferNamespacePrefix(aUri):
     """
     From a URI returns the last bit and simulates a namespace prefix when rendering the ontology.
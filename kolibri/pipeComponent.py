@@ -1,14 +1,17 @@
 #import config, logging
 from typing import Any
 from typing import Dict
+from typing import Iterable
 from typing import List
 from typing import Optional
 from typing import Set
 from typing import Tuple
 from typing import Hashable
+from collections import OrderedDict
 from kolibri.config import ModelConfig, override_defaults
 from .errors import *
 import logging
+import threading
 logger = logging.getLogger(__name__)
 
 
@@ -303,13 +306,17 @@ class Component(object):
 class ComponentBuilder(object):
     """Creates trainers and interpreters based on configurations.
 
-    Caches components for reuse."""
+    Caches components for reuse. With a `cache_size`, the least recently
+    used components are dropped from the cache once it holds more than
+    `cache_size` components (the models using them keep their reference)."""
 
-    def __init__(self, use_cache=True):
+    def __init__(self, use_cache=True, cache_size=None):
         self.use_cache = use_cache
+        self.cache_size = cache_size
         # Reuse nlp and featurizers where possible to save memory,
         # every component that implements a cache-key will be cached
-        self.component_cache = {}
+        self.component_cache = OrderedDict()
+        self._cache_lock = threading.RLock()
 
     def __get_cached_component(self, component_name, model_metadata):
         # type: (Text, Metadata) -> Tuple[Optional[Component], Optional[Text]]
@@ -321,21 +328,41 @@ class ComponentBuilder(object):
 
         component_class = modules.get_component_class(component_name)
         cache_key = component_class.cache_key(model_metadata)
-        if (cache_key is not None
-                and self.use_cache
-                and cache_key in self.component_cache):
-            return self.component_cache[cache_key], cache_key
-        else:
-            return None, cache_key
+        with self._cache_lock:
+            if (cache_key is not None
+                    and self.use_cache
+                    and cache_key in self.component_cache):
+                self.component_cache.move_to_end(cache_key)
+                return self.component_cache[cache_key], cache_key
+            else:
+                return None, cache_key
 
     def __add_to_cache(self, component, cache_key):
         # type: (Component, Text) -> None
         """Add a component to the cache."""
 
         if cache_key is not None and self.use_cache:
-            self.component_cache[cache_key] = component
-            logger.info("Added '{}' to component cache. Key '{}'."
-                        "".format(component.name, cache_key))
+            with self._cache_lock:
+                self.component_cache[cache_key] = component
+                self.component_cache.move_to_end(cache_key)
+                logger.info("Added '{}' to component cache. Key '{}'."
+                            "".format(component.name, cache_key))
+                while self.cache_size is not None and len(self.component_cache) > self.cache_size:
+                    key, _ = self.component_cache.popitem(last=False)
+                    logger.info("Removed '{}' from component cache.".format(key))
+
+    def prune_cache(self, in_use):
+        # type: (Iterable[Component]) -> List[Text]
+        """Drops the cached components that are not in `in_use`, e.g. the
+        components of the models still loaded, and returns their keys."""
+        in_use = {id(component) for component in in_use}
+        with self._cache_lock:
+            removed = [key for key, component in self.component_cache.items()
+                       if id(component) not in in_use]
+            for key in removed:
+                del self.component_cache[key]
+                logger.info("Removed '{}' from component cache.".format(key))
+        return removed
 
     def load_component(self,
                        component_name,
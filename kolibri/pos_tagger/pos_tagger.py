@@ -1,17 +1,11 @@
-from kolibri.pos_tagger import POSTagger
-from nltk import pos_tag as nltk_pos_tag
-
-
-french_tagger=POSTagger()
-english_tagger=nltk_pos_tag
-
+from kolibri.resources import resources
 
 
 def pos_tag(doc, language):
     if language=='fr':
-        return french_tagger(doc)
+        return resources.get('fr', 'pos_tagger')(doc)
     elif language=='en':
-        tags=nltk_pos_tag([t.text for t in doc.tokens])
+        tags=resources.get('en', 'pos_tagger')([t.text for t in doc.tokens])
         for i, t in enumerate(tags):
             doc.tokens[i].pos=t[1]
         return doc
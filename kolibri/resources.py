@@ -0,0 +1,214 @@
+"""Process-wide language resources.
+
+Stopword lists, stemmers, lemmatizers, POS taggers, tokenizers and `Nlp`
+pipelines are built once per (language, kind) and shared by reference by
+every component and model of the process:
+
+    >>> from kolibri.resources import resources
+    >>> stemmer = resources.get("fr", "stemmer")
+
+Building them before starting worker processes (`resources.preload`) lets
+the workers share their pages copy-on-write instead of each building its
+own copy. `resources.stats()` reports the memory each resource took and
+the memory saved by sharing it.
+"""
+import gc
+import logging
+import resource
+import threading
+import time
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import Optional
+from typing import Text
+
+logger = logging.getLogger(__name__)
+
+
+def resident_memory():
+    # type: () -> int
+    """Returns the resident memory of the current process in bytes.
+
+    Reads /proc on Linux, elsewhere falls back to the peak resident
+    memory reported by `getrusage`."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except (IOError, OSError, IndexError, ValueError):
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return usage if usage > 1 << 32 else usage * 1024
+
+
+def _stopwords(language):
+    from kolibri.stopwords import stopword_set
+    return stopword_set(language)
+
+
+def _stemmer(language):
+    from kolibri.stemmer import WordStemer
+    return WordStemer(language)
+
+
+def _lemmatizer(language):
+    if language == "fr":
+        from kolibri.lemmatizer.fr.french_lefff_lemmatizer import FrenchLefffLemmatizer
+        return FrenchLefffLemmatizer()
+    if language == "en":
+        from kolibri.lemmatizer.en.formlemmatizer import FormWordNetLematizer
+        return FormWordNetLematizer()
+    return None
+
+
+def _pos_tagger(language):
+    if language == "fr":
+        from kolibri.pos_tagger.fr.melt_tagger import POSTagger
+        return POSTagger()
+    if language == "en":
+        from nltk import pos_tag
+        return pos_tag
+    return None
+
+
+def _tokenizer(language):
+    from kolibri.tokenizer import StructuredTokenizer
+    return StructuredTokenizer({"language": language})
+
+
+def _nlp(language):
+    from kolibri.nlp import Nlp
+    return Nlp(language)
+
+
+class _Entry(object):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.built = False
+        self.value = None
+        self.build_time = None
+        self.memory = 0
+        self.references = 0
+
+
+class ResourceManager(object):
+    """Builds each resource once per (language, kind) and shares it.
+
+    The kinds are registered with a factory taking the language; the
+    default kinds are "stopwords", "stemmer", "lemmatizer", "pos_tagger",
+    "tokenizer" and "nlp"."""
+
+    def __init__(self):
+        self._factories = {}  # type: Dict[Text, Callable[[Text], Any]]
+        self._entries = {}  # type: Dict[tuple, _Entry]
+        self._lock = threading.Lock()
+        # the memory of the resources built while building another one,
+        # not to count it twice
+        self._building = threading.local()
+
+    def register(self, kind, factory):
+        # type: (Text, Callable[[Text], Any]) -> None
+        """Registers the factory building a kind of resource."""
+        self._factories[kind] = factory
+
+    def get(self, language, kind):
+        # type: (Text, Text) -> Any
+        """Returns the resource of a language, building it on first use."""
+        if kind not in self._factories:
+            raise KeyError("Unknown resource kind '{}'.".format(kind))
+        key = (language, kind)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry()
+        with entry.lock:
+            if not entry.built:
+                self._build(entry, language, kind)
+            entry.references += 1
+            return entry.value
+
+    def _build(self, entry, language, kind):
+        stack = getattr(self._building, "stack", None)
+        if stack is None:
+            stack = self._building.stack = []
+        stack.append(0)
+        start = time.perf_counter()
+        memory = resident_memory()
+        try:
+            entry.value = self._factories[kind](language)
+        finally:
+            nested = stack.pop()
+        used = max(resident_memory() - memory, 0)
+        entry.memory = max(used - nested, 0)
+        entry.build_time = time.perf_counter() - start
+        entry.built = True
+        if stack:
+            stack[-1] += used
+        logger.info("Built the {} resource '{}' in {:.2f}s ({:.1f} MB)."
+                    "".format(language, kind, entry.build_time, entry.memory / (1024. * 1024.)))
+
+    def preload(self, languages, kinds=None, freeze=True):
+        # type: (Iterable[Text], Optional[Iterable[Text]], bool) -> None
+        """Builds the resources of `languages` before worker processes are
+        forked, so that the workers share them. With `freeze`, the objects
+        built so far are moved out of the garbage collector's reach (Python
+        3.7+), which would otherwise write to their pages in every worker."""
+        kinds = list(kinds or self._factories)
+        for language in languages:
+            for kind in kinds:
+                self.get(language, kind)
+                # preloading does not count as a reference
+                self._entries[(language, kind)].references -= 1
+        if freeze and hasattr(gc, "freeze"):
+            gc.collect()
+            gc.freeze()
+
+    def loaded(self, language, kind):
+        # type: (Text, Text) -> bool
+        entry = self._entries.get((language, kind))
+        return entry is not None and entry.built
+
+    def clear(self):
+        """Drops the references of the manager to the resources."""
+        with self._lock:
+            self._entries = {}
+
+    def stats(self):
+        # type: () -> Dict[Text, Any]
+        """Returns the build time, memory and number of references of each
+        resource, and the memory saved by sharing them: every reference
+        after the first one would otherwise have built a copy."""
+        resources = []
+        saved = 0
+        for (language, kind), entry in sorted(self._entries.items(), key=lambda item: str(item[0])):
+            if not entry.built:
+                continue
+            saved += entry.memory * max(entry.references - 1, 0)
+            resources.append({
+                "language": language,
+                "kind": kind,
+                "build_time": entry.build_time,
+                "memory_mb": entry.memory / (1024. * 1024.),
+                "references": entry.references
+            })
+        return {
+            "resources": resources,
+            "memory_mb": sum(r["memory_mb"] for r in resources),
+            "memory_saved_mb": saved / (1024. * 1024.)
+        }
+
+
+resources = ResourceManager()
+resources.register("stopwords", _stopwords)
+resources.register("stemmer", _stemmer)
+resources.register("lemmatizer", _lemmatizer)
+resources.register("pos_tagger", _pos_tagger)
+resources.register("tokenizer", _tokenizer)
+resources.register("nlp", _nlp)
+
+
+def get_resource(language, kind):
+    # type: (Text, Text) -> Any
+    """Returns the shared resource of a language, see `ResourceManager`."""
+    return resources.get(language, kind)
@@ -0,0 +1,388 @@
+"""Serves a persisted model over HTTP.
+
+Concurrent requests are queued and coalesced into micro-batches of at most
+`max_batch_size` texts, waiting at most `max_wait` seconds for a batch to
+fill. The batches are parsed by a pool of worker processes that each load
+the model once. When `max_queue` texts are waiting, new requests are
+rejected with a 503 so that clients back off instead of piling up; a
+request of more than `max_queue` texts is rejected with a 413. A text that
+fails to parse gets its own error, the other texts of its batch are parsed.
+
+    python -m kolibri.server path/to/model --port 5005 --workers 4
+
+Endpoints:
+    POST /parse    {"text": "..."} or {"texts": ["...", ...]}, the result of
+                   a failed text of "texts" is {"error": "..."}
+    GET  /metrics  queue depth, batch sizes and latency percentiles
+    GET  /health
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Text
+from typing import Tuple
+from typing import Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# the interpreter of a worker process
+_interpreter = None
+
+
+def _init_worker(model_dir, mmap_mode):
+    global _interpreter
+    from kolibri.model import Interpreter
+
+    _interpreter = Interpreter.load(model_dir, mmap_mode=mmap_mode)
+
+
+def _json_default(obj):
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    return str(obj)
+
+
+def _parse_batch(texts):
+    # type: (List[Text]) -> List[Tuple[Optional[Text], Optional[Text]]]
+    """Parses a batch of texts in a worker. Returns the error or the json
+    result of each text, json so that they are cheap to send back."""
+    results = []
+    for text in texts:
+        try:
+            results.append((None, json.dumps(_interpreter.parse(text), default=_json_default,
+                                             ensure_ascii=False)))
+        except Exception as e:
+            logger.exception("Failed to parse a text.")
+            results.append(("{}: {}".format(type(e).__name__, e), None))
+    return results
+
+
+class ServerMetrics(object):
+    """Counts the requests and keeps the latencies of the last `window`
+    texts."""
+
+    def __init__(self, window=10000):
+        self.started = time.time()
+        self.requests = 0
+        self.texts = 0
+        self.rejected = 0
+        self.errors = 0
+        self.batches = 0
+        self.batched_texts = 0
+        self.latencies = deque(maxlen=window)
+        self.queue_waits = deque(maxlen=window)
+
+    def as_dict(self, queue_depth, in_flight):
+        # type: (int, int) -> Dict[Text, Any]
+        def percentiles(values):
+            if not values:
+                return {"p50": None, "p90": None, "p99": None}
+            p50, p90, p99 = np.percentile(np.asarray(values) * 1000., [50, 90, 99])
+            return {"p50": p50, "p90": p90, "p99": p99}
+
+        return {
+            "uptime": time.time() - self.started,
+            "requests": self.requests,
+            "texts": self.texts,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "batches": self.batches,
+            "mean_batch_size": self.batched_texts / self.batches if self.batches else 0.,
+            "queue_depth": queue_depth,
+            "batches_in_flight": in_flight,
+            "latency_ms": percentiles(self.latencies),
+            "queue_wait_ms": percentiles(self.queue_waits)
+        }
+
+
+class QueueFullError(Exception):
+    """Raised when the server has too many texts waiting."""
+
+
+class RequestTooLargeError(Exception):
+    """Raised for a request of more texts than the queue holds."""
+
+
+class ParseError(Exception):
+    """Raised for a text the model failed to parse."""
+
+
+class MicroBatcher(object):
+    """Coalesces the texts submitted concurrently into batches and parses
+    them in a process pool, at most one batch per worker at a time."""
+
+    def __init__(self,
+                 model_dir,  # type: Text
+                 workers=1,  # type: int
+                 max_batch_size=32,  # type: int
+                 max_wait=0.005,  # type: float
+                 max_queue=1024,  # type: int
+                 mmap_mode="r"  # type: Optional[Text]
+                 ):
+        # type: (...) -> None
+        self.model_dir = model_dir
+        self.workers = workers
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self.mmap_mode = mmap_mode
+        self.metrics = ServerMetrics()
+        self._queue = None
+        self._slots = None
+        self._executor = None
+        self._collector = None
+        self._in_flight = 0
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._slots = asyncio.Semaphore(self.workers)
+        self._executor = ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                             initargs=(self.model_dir, self.mmap_mode))
+        # load the model in every worker before accepting requests
+        await asyncio.gather(*[loop.run_in_executor(self._executor, _parse_batch, [])
+                               for _ in range(self.workers)])
+        self._collector = asyncio.ensure_future(self._collect())
+
+    async def stop(self):
+        if self._collector is not None:
+            self._collector.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def submit(self, texts):
+        # type: (List[Text]) -> List[Union[Text, Exception]]
+        """Queues texts and returns their json parse results, or the
+        exception of the texts that failed."""
+        if len(texts) > self.max_queue:
+            self.metrics.rejected += 1
+            raise RequestTooLargeError("at most {} texts per request".format(self.max_queue))
+        if self._queue.qsize() + len(texts) > self.max_queue:
+            self.metrics.rejected += 1
+            raise QueueFullError("{} texts are waiting".format(self._queue.qsize()))
+        loop = asyncio.get_running_loop()
+        now = time.perf_counter()
+        futures = []
+        for text in texts:
+            future = loop.create_future()
+            self._queue.put_nowait((text, future, now))
+            futures.append(future)
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        self.metrics.requests += 1
+        self.metrics.texts += len(texts)
+        self.metrics.latencies.extend([time.perf_counter() - now] * len(texts))
+        return results
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # wait for a free worker first, the texts keep queuing meanwhile
+            await self._slots.acquire()
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # take what queued while waiting, without waiting longer
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            asyncio.ensure_future(self._dispatch(batch))
+
+    async def _dispatch(self, batch):
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        self.metrics.batches += 1
+        self.metrics.batched_texts += len(batch)
+        self.metrics.queue_waits.extend(start - queued for _, _, queued in batch)
+        self._in_flight += 1
+        try:
+            results = await loop.run_in_executor(self._executor, _parse_batch,
+                                                 [text for text, _, _ in batch])
+        except Exception as e:
+            logger.exception("Failed to parse a batch of {} texts.".format(len(batch)))
+            self.metrics.errors += 1
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for (_, future, _), (error, result) in zip(batch, results):
+                if error is not None:
+                    self.metrics.errors += 1
+                if future.done():
+                    continue
+                if error is not None:
+                    future.set_exception(ParseError(error))
+                else:
+                    future.set_result(result)
+        finally:
+            self._in_flight -= 1
+            self._slots.release()
+
+
+class HTTPServer(object):
+    """A minimal HTTP/1.1 server with keep-alive, for the json endpoints
+    of the `MicroBatcher`."""
+
+    max_body = 16 * 1024 * 1024
+
+    def __init__(self, batcher, host="127.0.0.1", port=5005):
+        # type: (MicroBatcher, Text, int) -> None
+        self.batcher = batcher
+        self.host = host
+        self.port = port
+        self._server = None
+
+    async def start(self):
+        await self.batcher.start()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        logger.info("Serving '{}' on http://{}:{} with {} workers."
+                    "".format(self.batcher.model_dir, self.host, self.port, self.batcher.workers))
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        await self.batcher.stop()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, version = request_line.decode("latin-1").split(None, 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                if length > self.max_body:
+                    await self._respond(writer, 413, {"error": "request too large"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                keep_alive = headers.get("connection", "").lower() != "close" \
+                    and not version.startswith("HTTP/1.0")
+                status, payload = await self._route(method, path.split("?")[0], body)
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method, path, body):
+        if path == "/health":
+            return 200, {"status": "ok"}
+        if path == "/metrics":
+            return 200, self.batcher.metrics.as_dict(self.batcher.queue_depth,
+                                                     self.batcher._in_flight)
+        if path != "/parse":
+            return 404, {"error": "not found"}
+        if method != "POST":
+            return 405, {"error": "use POST"}
+        try:
+            data = json.loads(body.decode("utf-8"))
+            single = "texts" not in data
+            texts = [data["text"]] if single else list(data["texts"])
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return 400, {"error": "expected {\"text\": ...} or {\"texts\": [...]}"}
+        try:
+            results = await self.batcher.submit(texts)
+        except RequestTooLargeError as e:
+            return 413, {"error": "too many texts, {}".format(e)}
+        except QueueFullError as e:
+            return 503, {"error": "server busy, {}".format(e)}
+        except Exception as e:
+            return 500, {"error": str(e)}
+        if single:
+            if isinstance(results[0], Exception):
+                return 500, {"error": str(results[0])}
+            return 200, results[0]
+        # the results are already json
+        return 200, "[" + ",".join(json.dumps({"error": str(result)}) if isinstance(result, Exception)
+                                   else result for result in results) + "]"
+
+    @staticmethod
+    async def _respond(writer, status, payload, keep_alive):
+        reasons = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                   413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+        if not isinstance(payload, str):
+            payload = json.dumps(payload, default=_json_default)
+        body = payload.encode("utf-8")
+        head = ("HTTP/1.1 {} {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\n"
+                "Connection: {}\r\n{}\r\n").format(status, reasons[status], len(body),
+                                                  "keep-alive" if keep_alive else "close",
+                                                  "Retry-After: 1\r\n" if status == 503 else "")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+
+def serve(model_dir, host="127.0.0.1", port=5005, **kwargs):
+    # type: (Text, Text, int, **Any) -> None
+    """Serves a model until interrupted, `kwargs` configure the
+    `MicroBatcher`."""
+    server = HTTPServer(MicroBatcher(model_dir, **kwargs), host, port)
+
+    async def run():
+        await server.start()
+        try:
+            # until the task is cancelled by the interruption
+            await asyncio.Event().wait()
+        finally:
+            await server.stop()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serves a persisted model over HTTP.")
+    parser.add_argument("model_dir", help="directory of the persisted model")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5005)
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes")
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait", type=float, default=5.,
+                        help="milliseconds to wait for a batch to fill")
+    parser.add_argument("--max-queue", type=int, default=1024,
+                        help="texts waiting before requests are rejected")
+    parser.add_argument("--mmap", default="r", help="mmap mode of the arrays, 'none' loads them in memory")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    serve(args.model_dir, args.host, args.port, workers=args.workers,
+          max_batch_size=args.max_batch_size, max_wait=args.max_wait / 1000.,
+          max_queue=args.max_queue, mmap_mode=False if args.mmap.lower() == "none" else args.mmap)
+
+
+if __name__ == "__main__":
+    main()
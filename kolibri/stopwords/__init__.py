@@ -1,5 +1,10 @@
 import json
 import os, logging
+import threading
+import unicodedata
+
+import numpy as np
+
 from kolibri.settings import resources_path
 from kolibri.utils.downloader import Downloader
 DATA_DIR = resources_path
@@ -35,13 +40,23 @@ class Stopwords(Downloader):
 class StopWordError(Exception):
     pass
 
-sw=Stopwords()
+_sw = None
+
+
+def _stopwords():
+    # the resources are only downloaded when a list is first needed
+    global _sw
+    if _sw is None:
+        _sw = Stopwords()
+    return _sw
+
 
 def get_stop_words(language, cache=True, aggressive=False):
     """
     :type language: basestring
     :rtype: list
     """
+    sw = _stopwords()
     try:
         language = sw.LANGUAGE_MAPPING[language]
     except KeyError:
@@ -50,11 +65,11 @@ def get_stop_words(language, cache=True, aggressive=False):
                 language
             ))
 
-    if cache and language in STOP_WORDS_CACHE:
-        return STOP_WORDS_CACHE[language]
     language_name=language
     if aggressive:
-        language_name+"-aggressive"
+        language_name += "-aggressive"
+    if cache and language_name in STOP_WORDS_CACHE:
+        return STOP_WORDS_CACHE[language_name]
     language_filename = os.path.join(STOP_WORDS_DIR, language_name + '.txt')
     try:
         with open(language_filename, 'rb') as language_file:
@@ -68,10 +83,92 @@ def get_stop_words(language, cache=True, aggressive=False):
         )
 
     if cache:
-        STOP_WORDS_CACHE[language] = stop_words
+        STOP_WORDS_CACHE[language_name] = stop_words
 
     return stop_words
 
 
+def strip_accents(word):
+    """Removes the combining marks of a word: 'été' -> 'ete'."""
+    decomposed = unicodedata.normalize('NFKD', word)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+class StopwordSet(object):
+    """Constant time stopword membership.
+
+    The case folded and accent stripped variants of the words are computed
+    once, so a lookup is a hash of the token instead of lower casing it and
+    scanning a list. Tokens are case insensitive; with `accents=False`,
+    'deja' also matches the stopword 'déjà'.
+    """
+
+    def __init__(self, words=(), accents=True):
+        self.words = frozenset(words)
+        self.accents = accents
+        self.folded = frozenset(w.casefold() for w in self.words)
+        self.stripped = frozenset(strip_accents(w) for w in self.folded)
+        self._lookup = self.folded if accents else self.stripped
+
+    def _fold(self, token):
+        token = token.casefold()
+        return token if self.accents else strip_accents(token)
+
+    def __contains__(self, token):
+        try:
+            return token in self._lookup or self._fold(token) in self._lookup
+        except (TypeError, AttributeError):
+            # not a string
+            return False
+
+    def __len__(self):
+        return len(self.words)
+
+    def __iter__(self):
+        return iter(self.words)
+
+    def __bool__(self):
+        return bool(self.words)
+
+    def mask(self, tokens):
+        """Returns a boolean array, True where the token is a stopword.
+        The tokens can be strings or `Token`s."""
+        tokens = [getattr(t, 'text', t) for t in tokens]
+        return np.fromiter((t in self for t in tokens), dtype=bool, count=len(tokens))
+
+    def filter(self, tokens):
+        """Returns the tokens that are not stopwords."""
+        return [t for t in tokens if getattr(t, 'text', t) not in self]
+
+    def union(self, words):
+        """Returns a new set with `words` added."""
+        return StopwordSet(self.words.union(words), accents=self.accents)
+
+
+_STOPWORD_SETS = {}
+_STOPWORD_SETS_LOCK = threading.Lock()
+
+
+def stopword_set(language=None, extra=None, aggressive=False, accents=True):
+    """Returns the `StopwordSet` of a language merged with the `extra`
+    words of a configuration, built once per combination. A string
+    `extra` is a language code, whose stopwords are added.
+
+    :type language: basestring
+    :type extra: list or basestring
+    :rtype: StopwordSet
+    """
+    if isinstance(extra, str):
+        extra = get_stop_words(extra, aggressive=aggressive)
+    extra = frozenset(extra or ())
+    key = (language, extra, aggressive, accents)
+    with _STOPWORD_SETS_LOCK:
+        words = _STOPWORD_SETS.get(key)
+        if words is None:
+            base = get_stop_words(language, aggressive=aggressive) if language else []
+            words = _STOPWORD_SETS[key] = StopwordSet(extra.union(base), accents=accents)
+    return words
+
+
 
 
@@ -0,0 +1,218 @@
+"""Runs the components of a pipeline as concurrent stages.
+
+Every component runs in its own thread and the stages are connected by
+bounded queues, so a slow component does not stop the others from working
+on the next documents and at most `queue_size` documents wait between two
+stages, whatever the length of the input. A component can be replicated
+over worker processes: its stage sends chunks of documents to a process
+pool and passes the results on in the order they came in."""
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait
+from queue import Queue, Empty, Full
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Text
+
+from kolibri.document import Document
+from kolibri.pipeComponent import Component
+
+logger = logging.getLogger(__name__)
+
+# marks the end of the stream in the queues
+_END = object()
+
+_POLL_INTERVAL = 0.1
+
+
+class _Failure(object):
+    """Carries the error of a stage to the end of the pipeline."""
+
+    def __init__(self, error):
+        self.error = error
+
+
+def _put(queue, item, stop):
+    """Puts an item in a queue, gives up when the pipeline is stopped."""
+    while not stop.is_set():
+        try:
+            queue.put(item, timeout=_POLL_INTERVAL)
+            return True
+        except Full:
+            continue
+    return False
+
+
+def _get(queue, stop):
+    """Gets an item from a queue, returns `_END` when the pipeline is
+    stopped."""
+    while not stop.is_set():
+        try:
+            return queue.get(timeout=_POLL_INTERVAL)
+        except Empty:
+            continue
+    return _END
+
+
+def _process_documents(component, documents, context):
+    # empty texts are not processed, as in `Interpreter.parse`
+    for document in documents:
+        if document is not None:
+            component.process(document, **context)
+    return documents
+
+
+# the component of a stage worker process
+_worker_component = None
+_worker_context = None
+
+
+def _init_worker(component, context):
+    global _worker_component, _worker_context
+    _worker_component = component
+    _worker_context = context
+
+
+def _process_chunk(documents):
+    return _process_documents(_worker_component, documents, _worker_context)
+
+
+class StreamPipeline(object):
+    """Streams documents through a list of components.
+
+    Args:
+        pipeline: the components, in processing order.
+        context: the context passed to `Component.process`.
+        replicas: the number of processes of the components to replicate,
+            by component name. The other components run in a thread.
+        queue_size: the number of documents that can wait before a stage.
+        chunk_size: the largest number of documents sent at once to a
+            worker process.
+    """
+
+    def __init__(self,
+                 pipeline,  # type: List[Component]
+                 context=None,  # type: Optional[Dict[Text, Any]]
+                 replicas=None,  # type: Optional[Dict[Text, int]]
+                 queue_size=64,  # type: int
+                 chunk_size=16  # type: int
+                 ):
+        # type: (...) -> None
+        self.pipeline = pipeline
+        self.context = context or {}
+        self.replicas = replicas or {}
+        self.queue_size = queue_size
+        self.chunk_size = chunk_size
+
+    def run(self, documents):
+        # type: (Iterable[Optional[Document]]) -> Iterator[Optional[Document]]
+        """Yields the processed documents in input order. Stopping the
+        iteration stops the stages."""
+        stop = threading.Event()
+        queues = [Queue(self.queue_size) for _ in range(len(self.pipeline) + 1)]
+        threads = [threading.Thread(target=self._feed, args=(documents, queues[0], stop))]
+        for i, component in enumerate(self.pipeline):
+            replicas = self.replicas.get(component.name, 1)
+            if replicas > 1:
+                target, args = self._process_stage, (component, replicas)
+            else:
+                target, args = self._thread_stage, (component,)
+            threads.append(threading.Thread(target=target,
+                                            args=args + (queues[i], queues[i + 1], stop),
+                                            name="kolibri-stage-{}".format(component.name)))
+        for thread in threads:
+            # the input may block forever, e.g. when tailing a file
+            thread.daemon = True
+            thread.start()
+
+        try:
+            while True:
+                item = queues[-1].get()
+                if item is _END:
+                    return
+                if isinstance(item, _Failure):
+                    raise item.error
+                yield item
+        finally:
+            stop.set()
+            for thread in threads[1:]:
+                thread.join()
+
+    @staticmethod
+    def _feed(documents, outbox, stop):
+        try:
+            for document in documents:
+                if not _put(outbox, document, stop):
+                    return
+            item = _END
+        except Exception as e:
+            item = _Failure(e)
+        _put(outbox, item, stop)
+
+    def _thread_stage(self, component, inbox, outbox, stop):
+        while True:
+            item = _get(inbox, stop)
+            if item is not _END and not isinstance(item, _Failure):
+                try:
+                    if item is not None:
+                        component.process(item, **self.context)
+                except Exception as e:
+                    logger.exception("Component '{}' failed.".format(component.name))
+                    item = _Failure(e)
+            if not _put(outbox, item, stop) or item is _END or isinstance(item, _Failure):
+                return
+
+    def _process_stage(self, component, replicas, inbox, outbox, stop):
+        executor = ProcessPoolExecutor(replicas, initializer=_init_worker,
+                                       initargs=(component, self.context))
+        pending = deque()
+        last = None
+        try:
+            while last is None or pending:
+                # pass the finished chunks on, in order
+                while pending and pending[0].done():
+                    try:
+                        documents = pending.popleft().result()
+                    except Exception as e:
+                        logger.exception("Component '{}' failed.".format(component.name))
+                        _put(outbox, _Failure(e), stop)
+                        return
+                    for document in documents:
+                        if not _put(outbox, document, stop):
+                            return
+                if stop.is_set():
+                    return
+                if last is None and len(pending) < 2 * replicas:
+                    if pending:
+                        # do not wait for new documents while results are pending
+                        try:
+                            item = inbox.get_nowait()
+                        except Empty:
+                            wait([pending[0]], timeout=0.005)
+                            continue
+                    else:
+                        item = _get(inbox, stop)
+                    chunk = []
+                    while True:
+                        if item is _END or isinstance(item, _Failure):
+                            last = item
+                            break
+                        chunk.append(item)
+                        if len(chunk) >= self.chunk_size:
+                            break
+                        try:
+                            item = inbox.get_nowait()
+                        except Empty:
+                            break
+                    if chunk:
+                        pending.append(executor.submit(_process_chunk, chunk))
+                elif pending:
+                    wait([pending[0]], timeout=_POLL_INTERVAL)
+            _put(outbox, last, stop)
+        finally:
+            executor.shutdown(wait=True)
@@ -1,7 +1,8 @@
 import regex as re
 from kolibri.tokenizer.tokenizer import Tokenizer
 from kolibri.tokenizer.token_ import *
-from kolibri.stopwords import get_stop_words
+from kolibri.resources import resources
+from kolibri.stopwords import stopword_set
 
 class RegexpTokenizer(Tokenizer):
     """
@@ -24,7 +25,10 @@ class RegexpTokenizer(Tokenizer):
         self.stopwords = None
         if "language" in config:
             self.language=config['language']
-            self.stopwords=get_stop_words(self.language)
+            self.stopwords=resources.get(self.language, "stopwords")
+            if config.get("stop_words"):
+                self.stopwords=stopword_set(self.language, config["stop_words"])
+
     def _check_regexp(self):
         if self._regexp is None:
             self._regexp = re.compile(self._pattern, self._flags)
@@ -42,7 +46,7 @@ class RegexpTokenizer(Tokenizer):
             running_offset = word_offset + word_len
             token=Token(text=word, start=word_offset, index=i)
             if self.stopwords:
-                token.is_stopword=word.lower() in self.stopwords
+                token.is_stopword=word in self.stopwords
             tokens.append(token)
         return tokens
 
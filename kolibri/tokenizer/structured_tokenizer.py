@@ -6,7 +6,8 @@ __author__ = 'mohamedbenhaddou'
 import regex as re
 from kolibri.pipeComponent import Component
 from kolibri.tokenizer.token_ import Token
-from kolibri.stopwords import get_stop_words
+from kolibri.resources import resources
+from kolibri.stopwords import stopword_set
 from gensim.models.phrases import Phrases, Phraser
 types_abstraction={
         'NUM' :  '__NUMBER__',
@@ -53,7 +54,9 @@ class StructuredTokenizer(Component):
         self.stopwords = None
         if "language" in self.component_config:
             self.language = self.component_config['language']
-            self.stopwords = get_stop_words(self.language)
+            self.stopwords = resources.get(self.language, "stopwords")
+            if self.component_config.get("stop_words"):
+                self.stopwords = stopword_set(self.language, self.component_config["stop_words"])
 
 
         WORD = r"(?P<WORD>[^.'\s,#:!;/\({\[\]\)}?-]+|(?:'s|'t))"  # catch all
@@ -140,7 +143,7 @@ class StructuredTokenizer(Component):
             if token.get('type') != 'WS':
                 token.index = counter
                 if self.stopwords:
-                    token.is_stopword = token.text.lower() in self.stopwords
+                    token.is_stopword = token.text in self.stopwords
                 token.abstract=types_abstraction.get(token.get('type'), None)
                 counter += 1
                 tokens.append(token)
@@ -14,10 +14,12 @@ import nltk
 from nltk.corpus import wordnet
 from stop_words import get_stop_words
 
+from kolibri.stopwords import StopwordSet
+
 MODULE_PATH = os.path.dirname(os.path.abspath(__file__))
 
 # Stopwords
-STOPWORDS = get_stop_words('en')
+STOPWORDS = StopwordSet(get_stop_words('en'))
 # Collocations
 COLLOCATION_SIZE = 10000
 # BIGRAM_COLLOCATIONS = pickle.load(
@@ -61,7 +63,7 @@ def get_tokens(text, lowercase=False, stopword=False, preserve_line=True) -> Gen
     """
     if stopword:
         for token in nltk.word_tokenize(text, preserve_line=preserve_line):
-            if token.lower() in STOPWORDS:
+            if token in STOPWORDS:
                 continue
             if lowercase:
                 yield token.lower()
@@ -134,7 +136,7 @@ def get_lemmas(text, lowercase=False, stopword=False, lemmatizer=DEFAULT_LEMMATI
             token = pos[i][0]
             wn_pos = get_wordnet_pos(pos[i][1])
 
-            if token.lower() in STOPWORDS:
+            if token in STOPWORDS:
                 continue
 
             if lowercase:
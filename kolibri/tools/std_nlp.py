@@ -11,7 +11,7 @@ from kolibri.pipeComponent import Component
 from kolibri.config import ModelConfig
 from kolibri.document import Document
 from kolibri.data import TrainingData
-from kolibri.nlp import Nlp
+from kolibri.resources import resources
 
 logger = logging.getLogger(__name__)
 
@@ -64,7 +64,7 @@ class StdNLP(Component):
         logger.info("Trying to load nlp model with "
                     "name '{}'".format(nlp_model_name))
 
-        nlp = Nlp(cfg.language)
+        nlp = resources.get(nlp_model_name, "nlp")
 
         return StdNLP(component_conf, nlp)
 
@@ -74,11 +74,14 @@ class StdNLP(Component):
 
         component_meta = model_metadata.for_component(cls.name)
 
+        return cls.name + "-" + cls._language(component_meta, model_metadata)
+
+    @staticmethod
+    def _language(component_meta, model_metadata):
         # Fallback, use the language name, e.g. "en",
         # as the model name if no explicit name is defined
-        nlp_model_name = component_meta.get("model", model_metadata.language)
-
-        return cls.name + "-" + nlp_model_name
+        return (component_meta.get("language") or component_meta.get("model")
+                or model_metadata.language or "en")
 
     def provide_context(self):
         # type: () -> Dict[Text, Any]
@@ -128,9 +131,9 @@ class StdNLP(Component):
             return cached_component
 
         component_meta = model_metadata.for_component(cls.name)
-        model_name = component_meta.get("model")
+        model_name = cls._language(component_meta, model_metadata)
 
-        nlp = Nlp('en')
+        nlp = resources.get(model_name, "nlp")
         cls.ensure_proper_language_model(nlp)
         return cls(component_meta, nlp)
 
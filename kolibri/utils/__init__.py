@@ -7,7 +7,7 @@ from .file import binary_search_file
 from .probability import *
 import requests
 from requests.exceptions import InvalidURL
-from .dict import Dict
+from .dict import Dict, AttributeDict
 from kolibri.utils.file import create_temporary_file
 import subprocess
 from kolibri.utils._collections import *
@@ -1,4 +1,5 @@
 import copy
+import json
 
 
 class Dict(dict):
@@ -125,3 +126,77 @@ class Dict(dict):
         else:
             self[key] = default
             return default
+
+
+def _json_default(value):
+    """Serializes the values json does not know: sets, numpy arrays and
+    scalars, tokens."""
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    for method in ("to_dict", "tojson", "tolist"):
+        if hasattr(value, method):
+            return getattr(value, method)()
+    raise TypeError("Object of type {} is not JSON serializable".format(type(value).__name__))
+
+
+class AttributeDict(dict):
+    """A dict whose keys are also read and written as attributes.
+
+    Unlike `Dict`, values are stored as they are given: nested dicts and
+    lists are neither copied nor converted, and a missing key reads as None
+    instead of creating a child. Nested values are converted only on
+    request, by `to_dict(deep=True)`."""
+
+    __slots__ = ()
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            if name[:2] == "__":
+                raise AttributeError(name)
+            return None
+
+    def __setattr__(self, name, value):
+        if hasattr(self.__class__, name):
+            raise AttributeError("'{0}' object attribute "
+                                 "'{1}' is read-only".format(self.__class__.__name__, name))
+        self[name] = value
+
+    def __delattr__(self, name):
+        try:
+            del self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def set(self, name, value):
+        self[name] = value
+
+    def to_dict(self, deep=False):
+        """Returns the items as a dict, sharing the values with this one.
+        With `deep`, nested attribute dicts, lists and tuples are copied and
+        converted to plain dicts."""
+        if not deep:
+            return dict(self)
+        return {key: _to_plain(value) for key, value in self.items()}
+
+    def to_json(self, **kwargs):
+        """Serializes the items to json without converting them first."""
+        kwargs.setdefault("default", _json_default)
+        return json.dumps(self, **kwargs)
+
+    def copy(self):
+        return copy.copy(self)
+
+    def deepcopy(self):
+        return copy.deepcopy(self)
+
+
+def _to_plain(value):
+    if isinstance(value, dict):
+        return {key: _to_plain(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return type(value)(_to_plain(item) for item in value)
+    if type(value) is tuple:
+        return tuple(_to_plain(item) for item in value)
+    return value
@@ -20,7 +20,7 @@ from io import BytesIO
 from six import add_metaclass
 from six import string_types, text_type
 from six.moves.urllib.request import urlopen, url2pathname
-from typing import Text, Any
+from typing import Text, Any, Optional
 
 from collections import Mapping
 
@@ -898,3 +898,29 @@ def any2utf8(text, errors='strict', encoding='utf8'):
 
 
 
+
+def dump_artifact(obj, filename):
+    # type: (Any, Text) -> None
+    """Persist a model artifact with joblib.
+
+    The numpy arrays held by `obj` are written uncompressed and aligned so
+    that `load_artifact` can memory map them instead of copying them into
+    the process."""
+
+    import joblib
+
+    joblib.dump(obj, filename, compress=0)
+
+
+def load_artifact(filename, mmap_mode=None):
+    # type: (Text, Optional[Text]) -> Any
+    """Load an artifact written by `dump_artifact` (or plain `joblib.dump`).
+
+    With `mmap_mode='r'` the numpy arrays are read-only memory maps over the
+    file: loading does not copy them and the pages are shared by all the
+    processes serving the same model. Compressed artifacts are loaded in
+    memory as before."""
+
+    import joblib
+
+    return joblib.load(filename, mmap_mode=mmap_mode or None)
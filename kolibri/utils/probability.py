@@ -6,6 +6,7 @@ from collections import defaultdict, Counter
 from functools import reduce
 from abc import ABCMeta, abstractmethod
 
+import numpy as np
 from six import itervalues, text_type
 
 _NINF = float('-1e300')
@@ -55,10 +56,11 @@ class FreqDist(Counter):
             distribution with.
         :type samples: Sequence
         """
-        Counter.__init__(self, samples)
-
-        # Cached number of samples in this FreqDist
+        # Cached number of samples in this FreqDist, and the number of
+        # samples of each frequency
         self._N = None
+        self._Nr_cache = None
+        Counter.__init__(self, samples)
 
     def N(self):
         """
@@ -78,6 +80,7 @@ class FreqDist(Counter):
         Override ``Counter.__setitem__()`` to invalidate the cached N
         """
         self._N = None
+        self._Nr_cache = None
         super(FreqDist, self).__setitem__(key, val)
 
     def __delitem__(self, key):
@@ -85,6 +88,7 @@ class FreqDist(Counter):
         Override ``Counter.__delitem__()`` to invalidate the cached N
         """
         self._N = None
+        self._Nr_cache = None
         super(FreqDist, self).__delitem__(key)
 
     def update(self, *args, **kwargs):
@@ -92,6 +96,7 @@ class FreqDist(Counter):
         Override ``Counter.update()`` to invalidate the cached N
         """
         self._N = None
+        self._Nr_cache = None
         super(FreqDist, self).update(*args, **kwargs)
 
     def setdefault(self, key, val):
@@ -99,6 +104,7 @@ class FreqDist(Counter):
         Override ``Counter.setdefault()`` to invalidate the cached N
         """
         self._N = None
+        self._Nr_cache = None
         super(FreqDist, self).setdefault(key, val)
 
     def B(self):
@@ -119,7 +125,24 @@ class FreqDist(Counter):
         return [item for item in self if self[item] == 1]
 
     def Nr(self, r, bins=None):
-        return self.r_Nr(bins)[r]
+        if r == 0:
+            return bins - self.B() if bins is not None else 0
+        return self._r_Nr_table().get(r, 0)
+
+    def _r_Nr_table(self):
+        """The cached mapping of each frequency r > 0 to Nr."""
+        if self._Nr_cache is None:
+            counts = np.fromiter(self.values(), dtype=np.int64, count=len(self))
+            r, nr = np.unique(counts, return_counts=True)
+            self._Nr_cache = {r: nr for r, nr in zip(r.tolist(), nr.tolist()) if r != 0}
+        return self._Nr_cache
+
+    def counts(self, samples):
+        """
+        Return the counts of a list of samples as an array.
+        :rtype: numpy.ndarray
+        """
+        return np.fromiter((self.get(sample, 0) for sample in samples), dtype=np.int64)
 
     def r_Nr(self, bins=None):
         """
@@ -132,9 +155,7 @@ class FreqDist(Counter):
         :rtype: int
         """
 
-        _r_Nr = defaultdict(int)
-        for count in self.values():
-            _r_Nr[count] += 1
+        _r_Nr = defaultdict(int, self._r_Nr_table())
 
         # Special case for Nr[0]:
         _r_Nr[0] = bins - self.B() if bins is not None else 0
@@ -363,6 +384,290 @@ class FreqDist(Counter):
         return '<FreqDist with %d samples and %d outcomes>' % (len(self), self.N())
 
 
+class ArrayFreqDist(object):
+    """
+    A frequency distribution of tokens or n-grams of tokens, stored as
+    sorted numpy arrays instead of a ``Counter``.  Each token gets an
+    integer id and an n-gram is packed in a single int64 key, the id of
+    each token using ``63 // n`` bits (the vocabulary of a trigram
+    distribution is therefore limited to 2**21 types).  The keys are
+    sorted, so lookups are binary searches, the n-grams sharing their
+    first tokens are contiguous and the counts of many samples are
+    looked up in one vectorized call with ``counts``.
+    ``ArrayFreqDist`` implements the read-only ``FreqDist`` interface
+    (``N``, ``B``, ``Nr``, ``r_Nr``, ``hapaxes``, ``freq``, ``max``,
+    ``most_common``, indexing and iteration), so it can be given to the
+    probability estimators in place of a ``FreqDist``.
+        >>> fdist = ArrayFreqDist.from_documents(sents, n=3) # doctest: +SKIP
+        >>> fdist[('the', 'dog', 'barks')] # doctest: +SKIP
+        2
+    """
+
+    CHUNK_SIZE = 10000000
+
+    def __init__(self, keys, counts, vocab, order=1):
+        """
+        :param keys: The sorted unique packed sample keys.
+        :type keys: numpy.ndarray of int64
+        :param counts: The count of each key.
+        :type counts: numpy.ndarray of int64
+        :param vocab: The token of each id.
+        :type vocab: list(str)
+        :param order: The number of tokens in a sample.
+        :type order: int
+        """
+        self._keys = keys
+        self._counts = counts
+        self._vocab = vocab
+        self._token2id = None
+        self._order = order
+        self._bits = 63 // order
+        self._mask = (1 << self._bits) - 1
+        self._N = None
+        self._Nr_cache = None
+
+    @classmethod
+    def from_documents(cls, documents, n=1, vocab=None, chunk_size=None):
+        """
+        Count the n-grams of a sequence of documents; n-grams do not span
+        two documents.
+        :param documents: The documents, each one a sequence of tokens.
+        :param n: The order of the n-grams.
+        :param vocab: The tokens known in advance (more are added as
+            they are found).
+        :param chunk_size: The number of tokens counted at once.
+        :rtype: ArrayFreqDist
+        """
+        chunk_size = chunk_size or cls.CHUNK_SIZE
+        vocab = list(vocab) if vocab is not None else []
+        token2id = {token: i for i, token in enumerate(vocab)}
+        bits = 63 // n
+        keys, counts = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        chunk = []
+        chunk_tokens = 0
+
+        def count(chunk, keys, counts):
+            if len(token2id) > (1 << bits):
+                raise ValueError('%d types do not fit the %d bits of a token id in %d-grams'
+                                 % (len(token2id), bits, n))
+            chunk_keys = [cls._pack(ids, n, bits) for ids in chunk]
+            chunk_keys = np.concatenate(chunk_keys) if chunk_keys else np.empty(0, dtype=np.int64)
+            chunk_keys, chunk_counts = np.unique(chunk_keys, return_counts=True)
+            return cls._merge(np.concatenate((keys, chunk_keys)),
+                              np.concatenate((counts, chunk_counts.astype(np.int64))))
+
+        for document in documents:
+            ids = np.empty(len(document), dtype=np.int64)
+            for i, token in enumerate(document):
+                token_id = token2id.get(token)
+                if token_id is None:
+                    token_id = token2id[token] = len(vocab)
+                    vocab.append(token)
+                ids[i] = token_id
+            chunk.append(ids)
+            chunk_tokens += len(ids)
+            if chunk_tokens >= chunk_size:
+                keys, counts = count(chunk, keys, counts)
+                chunk, chunk_tokens = [], 0
+        keys, counts = count(chunk, keys, counts)
+        fdist = cls(keys, counts, vocab, n)
+        fdist._token2id = token2id
+        return fdist
+
+    @classmethod
+    def from_ngrams(cls, tokens, n=1, vocab=None, chunk_size=None):
+        """
+        Count the n-grams of a single sequence of tokens.
+        :rtype: ArrayFreqDist
+        """
+        return cls.from_documents([tokens], n, vocab, chunk_size)
+
+    @staticmethod
+    def _pack(ids, n, bits):
+        """The packed keys of the n-grams of an array of token ids."""
+        length = len(ids) - n + 1
+        if length <= 0:
+            return np.empty(0, dtype=np.int64)
+        keys = ids[:length].copy()
+        for k in range(1, n):
+            keys <<= bits
+            keys |= ids[k:k + length]
+        return keys
+
+    @staticmethod
+    def _merge(keys, counts):
+        """Sum the counts of the duplicate keys."""
+        if len(keys) == 0:
+            return keys, counts
+        order = np.argsort(keys, kind='mergesort')
+        keys, counts = keys[order], counts[order]
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(keys)) + 1))
+        return keys[starts], np.add.reduceat(counts, starts)
+
+    @property
+    def token2id(self):
+        if self._token2id is None:
+            self._token2id = {token: i for i, token in enumerate(self._vocab)}
+        return self._token2id
+
+    def encode(self, samples):
+        """
+        Return the packed keys of a list of samples, -1 for the samples
+        with an unknown token.
+        :rtype: numpy.ndarray
+        """
+        get = self.token2id.get
+        if self._order == 1:
+            return np.fromiter((get(sample, -1) for sample in samples), dtype=np.int64)
+        ids = np.array([[get(token, -1) for token in sample] for sample in samples],
+                       dtype=np.int64).reshape(-1, self._order)
+        keys = ids[:, 0].copy()
+        for k in range(1, self._order):
+            keys <<= self._bits
+            keys |= ids[:, k] & self._mask
+        keys[(ids < 0).any(axis=1)] = -1
+        return keys
+
+    def decode(self, keys):
+        """
+        Return the samples of a list of packed keys.
+        :rtype: list
+        """
+        keys = np.asarray(keys, dtype=np.int64)
+        vocab = self._vocab
+        if self._order == 1:
+            return [vocab[k] for k in keys.tolist()]
+        columns = [((keys >> (self._bits * (self._order - 1 - k))) & self._mask).tolist()
+                   for k in range(self._order)]
+        return [tuple(vocab[i] for i in ids) for ids in zip(*columns)]
+
+    def _find(self, keys):
+        """The positions of ``keys`` in the table, and whether they are in it."""
+        positions = np.searchsorted(self._keys, keys)
+        positions = np.minimum(positions, max(len(self._keys) - 1, 0))
+        if len(self._keys) == 0:
+            return positions, np.zeros(len(keys), dtype=bool)
+        return positions, self._keys[positions] == keys
+
+    def counts(self, samples):
+        """
+        Return the counts of a list of samples as an array.
+        :rtype: numpy.ndarray
+        """
+        return self.key_counts(self.encode(samples))
+
+    def key_counts(self, keys):
+        """
+        Return the counts of a list of packed keys as an array.
+        :rtype: numpy.ndarray
+        """
+        positions, found = self._find(np.asarray(keys, dtype=np.int64))
+        if len(self._counts) == 0:
+            return np.zeros(len(found), dtype=np.int64)
+        return np.where(found, self._counts[positions], 0)
+
+    def __getitem__(self, sample):
+        return int(self.counts([sample])[0])
+
+    def get(self, sample, default=None):
+        count = self[sample]
+        return count if count else default
+
+    def __contains__(self, sample):
+        return self[sample] > 0
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __iter__(self):
+        return iter(self.decode(self._keys))
+
+    def keys(self):
+        return self.decode(self._keys)
+
+    def values(self):
+        return self._counts.tolist()
+
+    def items(self):
+        return list(zip(self.decode(self._keys), self._counts.tolist()))
+
+    def N(self):
+        """
+        Return the total number of sample outcomes.
+        :rtype: int
+        """
+        if self._N is None:
+            self._N = int(self._counts.sum())
+        return self._N
+
+    def B(self):
+        """
+        Return the number of samples with counts greater than zero.
+        :rtype: int
+        """
+        return len(self._keys)
+
+    def hapaxes(self):
+        """
+        Return a list of all samples that occur once.
+        :rtype: list
+        """
+        return self.decode(self._keys[self._counts == 1])
+
+    def _r_Nr_table(self):
+        if self._Nr_cache is None:
+            nr = np.bincount(self._counts) if len(self._counts) else np.zeros(1, dtype=np.int64)
+            r = np.flatnonzero(nr)
+            self._Nr_cache = {rr: n for rr, n in zip(r.tolist(), nr[r].tolist()) if rr != 0}
+        return self._Nr_cache
+
+    Nr = FreqDist.Nr
+    r_Nr = FreqDist.r_Nr
+    freq = FreqDist.freq
+
+    def freqs(self, samples):
+        """
+        Return the frequencies of a list of samples as an array.
+        :rtype: numpy.ndarray
+        """
+        n = self.N()
+        return self.counts(samples) / n if n else np.zeros(len(samples))
+
+    def most_common(self, n=None):
+        """
+        Return the ``n`` most common samples and their counts, from the
+        most common to the least.
+        :rtype: list(tuple)
+        """
+        order = np.argsort(-self._counts, kind='mergesort')
+        if n is not None:
+            order = order[:n]
+        return list(zip(self.decode(self._keys[order]), self._counts[order].tolist()))
+
+    def max(self):
+        if len(self) == 0:
+            raise ValueError(
+                'A FreqDist must have at least one sample before max is defined.'
+            )
+        return self.decode(self._keys[[int(np.argmax(self._counts))]])[0]
+
+    def to_freqdist(self):
+        """
+        Return the counts as a ``FreqDist``.
+        :rtype: FreqDist
+        """
+        return FreqDist(dict(self.items()))
+
+    def __repr__(self):
+        items = ['{0!r}: {1!r}'.format(*item) for item in self.most_common(10)]
+        if len(self) > 10:
+            items.append('...')
+        return 'ArrayFreqDist({{{0}}})'.format(', '.join(items))
+
+    def __str__(self):
+        return '<ArrayFreqDist with %d samples and %d outcomes>' % (len(self), self.N())
+
+
 ##//////////////////////////////////////////////////////
 ##  Probability Distributions
 ##//////////////////////////////////////////////////////
@@ -403,6 +708,18 @@ class ProbDistI(object):
         :rtype: float
         """
 
+    def probs(self, samples):
+        """
+        Return the probabilities of a list of samples as an array.
+        Distributions based on a frequency distribution look up the
+        counts of all the samples at once.
+        :param samples: The samples whose probabilities should be
+            returned.
+        :type samples: list
+        :rtype: numpy.ndarray
+        """
+        return np.fromiter((self.prob(sample) for sample in samples), dtype=float)
+
     def logprob(self, sample):
         """
         Return the base 2 logarithm of the probability for a given sample.
@@ -666,6 +983,12 @@ class MLEProbDist(ProbDistI):
     def prob(self, sample):
         return self._freqdist.freq(sample)
 
+    def probs(self, samples):
+        n = self._freqdist.N()
+        if n == 0:
+            return np.zeros(len(samples))
+        return self._freqdist.counts(samples) / n
+
     def max(self):
         return self._freqdist.max()
 
@@ -757,6 +1080,9 @@ class LidstoneProbDist(ProbDistI):
         c = self._freqdist[sample]
         return (c + self._gamma) / self._divisor
 
+    def probs(self, samples):
+        return (self._freqdist.counts(samples) + self._gamma) / self._divisor
+
     def max(self):
         # For Lidstone distributions, probability is monotonic with
         # frequency, so the most probable sample is the one that
@@ -1133,6 +1459,10 @@ class WittenBellProbDist(ProbDistI):
         c = self._freqdist[sample]
         return c / (self._N + self._T) if c != 0 else self._P0
 
+    def probs(self, samples):
+        c = self._freqdist.counts(samples)
+        return np.where(c != 0, c / max(self._N + self._T, 1), self._P0)
+
     def max(self):
         return self._freqdist.max()
 
@@ -1458,13 +1788,16 @@ class KneserNeyProbDist(ProbDistI):
     been seen in training. Extends the ProbDistI interface, requires a trigram
     FreqDist instance to train on. Optionally, a different from default discount
     text can be specified. The default discount is set to 0.75.
+    Given a trigram ``ArrayFreqDist``, the bigram counts and the helper
+    counts are computed on the packed keys with numpy, and ``probs``
+    scores a list of trigrams at once.
     """
 
     def __init__(self, freqdist, bins=None, discount=0.75):
         """
         :param freqdist: The trigram frequency distribution upon which to base
             the estimation
-        :type freqdist: FreqDist
+        :type freqdist: FreqDist or ArrayFreqDist
         :param bins: Included for compatibility with nltk.tag.hmm
         :type bins: int or float
         :param discount: The discount applied when retrieving counts of
@@ -1481,9 +1814,15 @@ class KneserNeyProbDist(ProbDistI):
         # cache for probability calculation
         self._cache = {}
 
+        self._trigrams = freqdist
+        if isinstance(freqdist, ArrayFreqDist):
+            if freqdist._order != 3:
+                raise ValueError('Expected a trigram ArrayFreqDist.')
+            self._init_arrays(freqdist)
+            return
+
         # internal bigram and trigram frequency distributions
         self._bigrams = defaultdict(int)
-        self._trigrams = freqdist
 
         # helper dictionaries used to calculate probabilities
         self._wordtypes_after = defaultdict(float)
@@ -1495,6 +1834,56 @@ class KneserNeyProbDist(ProbDistI):
             self._trigrams_contain[w1] += 1
             self._wordtypes_before[(w1, w2)] += 1
 
+    def _init_arrays(self, freqdist):
+        """The bigram and helper counts of a trigram ``ArrayFreqDist``."""
+        keys, counts, bits = freqdist._keys, freqdist._counts, freqdist._bits
+        # the trigrams sharing (w0, w1) are contiguous in the sorted keys
+        prefixes = keys >> bits
+        starts = np.flatnonzero(np.diff(prefixes)) + 1
+        starts = np.concatenate(([0], starts)) if len(keys) else starts
+        self._bigram_keys = prefixes[starts]
+        self._bigram_counts = np.add.reduceat(counts, starts) if len(keys) else counts
+        self._wordtypes_after = np.diff(np.append(starts, len(keys)))
+        self._trigrams_contain = np.bincount(prefixes & freqdist._mask,
+                                             minlength=len(freqdist._vocab))
+        self._before_keys, self._wordtypes_before = np.unique(
+            keys & ((1 << 2 * bits) - 1), return_counts=True)
+
+    @staticmethod
+    def _lookup(table, keys):
+        """The positions of ``keys`` in a sorted table and whether they are found."""
+        positions = np.minimum(np.searchsorted(table, keys), len(table) - 1)
+        return positions, table[positions] == keys
+
+    def probs(self, trigrams):
+        if not isinstance(self._trigrams, ArrayFreqDist):
+            return super(KneserNeyProbDist, self).probs(trigrams)
+        fdist = self._trigrams
+        if len(fdist) == 0:
+            return np.zeros(len(trigrams))
+        bits, mask = fdist._bits, fdist._mask
+        keys = fdist.encode(trigrams)
+        known = keys >= 0
+        c = fdist.key_counts(keys)
+
+        bigram, has_bigram = self._lookup(self._bigram_keys, keys >> bits)
+        before, has_before = self._lookup(self._before_keys, keys & ((1 << 2 * bits) - 1))
+        has_bigram &= known
+        has_before &= known
+
+        bigram_counts = np.where(has_bigram, self._bigram_counts[bigram], 1)
+        aftr = np.where(has_bigram, self._wordtypes_after[bigram], 0)
+        bfr = np.where(has_before, self._wordtypes_before[before], 0)
+        contain = self._trigrams_contain[np.where(known, (keys >> bits) & mask, 0)]
+
+        seen = c > 0
+        backoff = ~seen & has_bigram & has_before
+        prob = np.zeros(len(keys))
+        prob[seen] = (c[seen] - self.discount()) / bigram_counts[seen]
+        prob[backoff] = (aftr[backoff] * self.discount()) / bigram_counts[backoff] \
+            * bfr[backoff] / (contain[backoff] - aftr[backoff])
+        return prob
+
     def prob(self, trigram):
         # sample must be a triple
         if len(trigram) != 3:
@@ -1504,6 +1893,10 @@ class KneserNeyProbDist(ProbDistI):
 
         if trigram in self._cache:
             return self._cache[trigram]
+        elif isinstance(self._trigrams, ArrayFreqDist):
+            prob = float(self.probs([trigram])[0])
+            self._cache[trigram] = prob
+            return prob
         else:
             # if the sample trigram was seen during training
             if trigram in self._trigrams:
@@ -1871,6 +2264,86 @@ class ConditionalFreqDist(defaultdict):
         return '<ConditionalFreqDist with %d conditions>' % len(self)
 
 
+class ArrayConditionalFreqDist(object):
+    """
+    The conditional frequency distribution of the last token of the
+    n-grams of an ``ArrayFreqDist``, given their first tokens.  The
+    n-grams of a condition are a contiguous slice of the sorted keys, so
+    the distribution of a condition is an order 1 ``ArrayFreqDist``
+    view of that slice and nothing is copied per condition.
+        >>> trigrams = ArrayFreqDist.from_documents(sents, n=3) # doctest: +SKIP
+        >>> cfdist = ArrayConditionalFreqDist(trigrams) # doctest: +SKIP
+        >>> cfdist[('the', 'dog')].most_common(1) # doctest: +SKIP
+        [('barks', 2)]
+    """
+
+    def __init__(self, fdist):
+        """
+        :param fdist: The n-gram counts, n >= 2.
+        :type fdist: ArrayFreqDist
+        """
+        if fdist._order < 2:
+            raise ValueError('Expected an ArrayFreqDist of order 2 or more.')
+        self._fdist = fdist
+        conditions = fdist._keys >> fdist._bits
+        starts = np.flatnonzero(np.diff(conditions)) + 1
+        if len(conditions):
+            starts = np.concatenate(([0], starts))
+        self._conditions = conditions[starts]
+        self._bounds = np.append(starts, len(conditions))
+        self._condition_fdist = ArrayFreqDist(self._conditions, None, fdist._vocab,
+                                              fdist._order - 1)
+        # the conditions keep the id width of the n-grams
+        self._condition_fdist._bits = fdist._bits
+        self._condition_fdist._mask = fdist._mask
+        self._condition_fdist._token2id = fdist._token2id
+
+    def _index(self, condition):
+        if self._fdist._order > 2:
+            condition = tuple(condition)
+        key = self._condition_fdist.encode([condition])
+        positions, found = self._condition_fdist._find(key)
+        return int(positions[0]) if found[0] else None
+
+    def __getitem__(self, condition):
+        index = self._index(condition)
+        fdist = self._fdist
+        if index is None:
+            keys = counts = np.empty(0, dtype=np.int64)
+        else:
+            start, end = self._bounds[index], self._bounds[index + 1]
+            keys, counts = fdist._keys[start:end] & fdist._mask, fdist._counts[start:end]
+        result = ArrayFreqDist(keys, counts, fdist._vocab)
+        result._token2id = fdist._token2id
+        return result
+
+    def __contains__(self, condition):
+        return self._index(condition) is not None
+
+    def __len__(self):
+        return len(self._conditions)
+
+    def __iter__(self):
+        return iter(self.conditions())
+
+    def conditions(self):
+        """
+        Return a list of the conditions of this distribution.
+        :rtype: list
+        """
+        return self._condition_fdist.decode(self._conditions)
+
+    def N(self):
+        """
+        Return the total number of sample outcomes.
+        :rtype: int
+        """
+        return self._fdist.N()
+
+    def __repr__(self):
+        return '<ArrayConditionalFreqDist with %d conditions>' % len(self)
+
+
 class ConditionalProbDistI(dict):
     """
     A collection of probability distributions for a single experiment
@@ -2251,6 +2724,8 @@ if __name__ == '__main__':
     demo(5, 5000)
 
 __all__ = [
+    'ArrayConditionalFreqDist',
+    'ArrayFreqDist',
     'ConditionalFreqDist',
     'ConditionalProbDist',
     'ConditionalProbDistI',
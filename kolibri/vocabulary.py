@@ -1,18 +1,68 @@
+import json
 import os
+import sys
 from collections import Counter, defaultdict
+from collections.abc import Mapping
+from itertools import repeat
+
+import numpy as np
 from six import string_types, iteritems, itervalues
 
+
+def encode_tokens(tokens):
+    """Pack a list of strings into a utf-8 byte array and the offsets
+    of each string in it.
+
+    Args:
+        tokens (list): strings to pack.
+
+    Returns:
+        tuple: (numpy uint8 array, numpy int64 array of len(tokens) + 1 offsets).
+    """
+    data = [t.encode("utf-8") for t in tokens]
+    offsets = np.zeros(len(data) + 1, dtype=np.int64)
+    np.cumsum(np.fromiter(map(len, data), dtype=np.int64, count=len(data)), out=offsets[1:])
+    return np.frombuffer(b"".join(data), dtype=np.uint8), offsets
+
+
+def decode_tokens(blob, offsets):
+    """Inverse of `encode_tokens`, the strings are interned."""
+    raw = bytes(blob)
+    offsets = offsets.tolist()
+    return [sys.intern(raw[start:end].decode("utf-8")) for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+class _Index2Token(Mapping):
+    """Read-only id -> token view over the list of tokens of a vocabulary."""
+
+    def __init__(self, id2token):
+        self._id2token = id2token
+
+    def __getitem__(self, idx):
+        if not 0 <= idx < len(self._id2token):
+            raise KeyError(idx)
+        return self._id2token[idx]
+
+    def __iter__(self):
+        return iter(range(len(self._id2token)))
+
+    def __len__(self):
+        return len(self._id2token)
+
+
 class Vocabulary(object):
     """A vocabulary that maps tokens to ints (storing a vocabulary).
 
     Attributes:
         _token_count: A collections.Counter object holding the frequencies of tokens
             in the data used to build the Vocabulary.
-        token2id: A collections.defaultdict instance mapping token strings to
-            numerical identifiers.
+        token2id: A dict mapping the (interned) token strings to numerical
+            identifiers.
         _id2token: A list of token strings indexed by their numerical identifiers.
     """
 
+    binary_file = "vocabulary.npz"
+
     def __init__(self, max_size=None, lower=True, unk_token=True, remove_stopwords=False, specials=('<pad>',)):
         """Create a Vocabulary object.
 
@@ -91,8 +141,29 @@ class Vocabulary(object):
         """
         if isinstance(doc, string_types):
             raise TypeError("doc2idx expects an array of unicode tokens on input, not a single string")
-        doc = map(self.process_token, doc)
-        return [self.token_to_id(token) for token in doc]
+        return self.tokens_to_ids(doc).tolist()
+
+    def tokens_to_ids(self, tokens, unknown=None):
+        """Get the ids of a list of tokens in one pass.
+
+        Args:
+            tokens (list): tokens (str or Token) to look up.
+            unknown (int): id of the tokens missing from the vocabulary,
+                defaults to the last id like `token_to_id`.
+
+        Returns:
+            numpy array: int ids of the tokens.
+        """
+        if unknown is None:
+            unknown = len(self.token2id) - 1
+        texts = self._process_tokens(tokens)
+        return np.fromiter(map(self.token2id.get, texts, repeat(unknown)), dtype=np.int64, count=len(texts))
+
+    def _process_tokens(self, tokens):
+        texts = [t if isinstance(t, str) else t.text for t in tokens]
+        if self._lower:
+            texts = [t.lower() for t in texts]
+        return texts
 
     def id2doc(self, ids):
         """Get the token list.
@@ -109,6 +180,8 @@ class Vocabulary(object):
     def doc2bow(self, document, allow_update=False, return_missing=False):
         """Convert `document` into the bag-of-words (BoW) format = list of `(token_id, token_count)` tuples.
 
+        The token texts are looked up as they are: unlike `doc2id`, they are not lowercased by `process_token`.
+
         Parameters
         ----------
         doc : list of str
@@ -128,11 +201,17 @@ class Vocabulary(object):
 
         """
 
-        doc=[t.text for t in document.tokens]
-
-        if isinstance(doc, string_types):
+        if isinstance(document, string_types):
             raise TypeError("doc2bow expects an array of unicode tokens on input, not a single string")
 
+        doc = [t if isinstance(t, str) else t.text for t in document.tokens]
+
+        if not allow_update and not return_missing:
+            ids = np.fromiter(map(self.token2id.get, doc, repeat(-1)), dtype=np.int64, count=len(doc))
+            ids, counts = np.unique(ids[ids >= 0], return_counts=True)
+            # tokenids in ascending id order
+            return list(zip(ids.tolist(), counts.tolist()))
+
         # Construct (word, frequency) mapping.
         counter = defaultdict(int)
         for w in doc:
@@ -146,6 +225,7 @@ class Vocabulary(object):
                     # new id = number of ids made so far;
                     # NOTE this assumes there are no gaps in the id sequence!
                     token2id[w] = len(token2id)
+                    self._id2token.append(w)
         result = {token2id[w]: freq for w, freq in iteritems(counter) if w in token2id}
 
         if allow_update:
@@ -153,6 +233,8 @@ class Vocabulary(object):
             self.num_pos += sum(itervalues(counter))
             self.num_nnz += len(result)
             # keep track of document and collection frequencies
+            if not hasattr(self, "cfs"):
+                self.cfs, self.dfs = {}, {}
             for tokenid, freq in iteritems(result):
                 self.cfs[tokenid] = self.cfs.get(tokenid, 0) + freq
                 self.dfs[tokenid] = self.dfs.get(tokenid, 0) + 1
@@ -172,6 +254,7 @@ class Vocabulary(object):
         token_freq = self._token_count.most_common(self._max_size)
         idx = len(self.vocab)
         for token, _ in token_freq:
+            token = sys.intern(token)
             self.token2id[token] = idx
             self._id2token.append(token)
             idx += 1
@@ -180,7 +263,60 @@ class Vocabulary(object):
             self.token2id[unk] = idx
             self._id2token.append(unk)
 
-        self.id2token={v:k for k, v in self.token2id.items()}
+    @property
+    def id2token(self):
+        """Mapping of the ids to their token, a view over `_id2token`."""
+        return _Index2Token(self._id2token)
+
+    def save(self, file_path):
+        """Save the vocabulary in a binary (numpy .npz) file.
+
+        Args:
+            file_path (str): path of the file, or of a directory in which
+                `binary_file` is written.
+        """
+        if os.path.isdir(file_path):
+            file_path = os.path.join(file_path, self.binary_file)
+        ids = np.fromiter(self.token2id.values(), dtype=np.int64, count=len(self.token2id))
+        tokens, token_offsets = encode_tokens(list(self.token2id))
+        counted, count_offsets = encode_tokens(list(self._token_count))
+        counts = np.fromiter(self._token_count.values(), dtype=np.int64, count=len(self._token_count))
+        params = {"max_size": self._max_size, "lower": self._lower, "unk_token": self._unk,
+                  "remove_stopwords": self.can_remove_stopwords, "num_docs": self.num_docs,
+                  "num_pos": self.num_pos, "num_nnz": self.num_nnz}
+        with open(file_path, "wb") as f:
+            np.savez(f, tokens=tokens, token_offsets=token_offsets, ids=ids, counted=counted,
+                     count_offsets=count_offsets, counts=counts,
+                     id2token=np.array([len(self._id2token)], dtype=np.int64),
+                     params=np.frombuffer(json.dumps(params).encode("utf-8"), dtype=np.uint8))
+
+    @classmethod
+    def load(cls, file_path):
+        """Load a vocabulary saved with `save`.
+
+        Args:
+            file_path (str): path of the file, or of the directory it was saved in.
+
+        Returns:
+            Vocabulary: the loaded vocabulary.
+        """
+        if os.path.isdir(file_path):
+            file_path = os.path.join(file_path, cls.binary_file)
+        with np.load(file_path, allow_pickle=False) as data:
+            params = json.loads(bytes(data["params"]).decode("utf-8"))
+            vocab = cls(max_size=params["max_size"], lower=params["lower"], unk_token=params["unk_token"],
+                        remove_stopwords=params["remove_stopwords"], specials=())
+            vocab.num_docs, vocab.num_pos, vocab.num_nnz = params["num_docs"], params["num_pos"], params["num_nnz"]
+            tokens = decode_tokens(data["tokens"], data["token_offsets"])
+            vocab.token2id = dict(zip(tokens, data["ids"].tolist()))
+            id2token = [None] * int(data["id2token"][0])
+            for token, idx in vocab.token2id.items():
+                if idx < len(id2token):
+                    id2token[idx] = token
+            vocab._id2token = id2token
+            vocab._token_count = Counter(dict(zip(decode_tokens(data["counted"], data["count_offsets"]),
+                                                  data["counts"].tolist())))
+        return vocab
 
     def process_token(self, token):
         """Process token before following methods:
@@ -250,3 +386,36 @@ class Vocabulary(object):
         return self._id2token
 
 
+def _vocabulary_from_arrays(blob, offsets, ids):
+    return CompactVocabulary(zip(decode_tokens(blob, offsets), ids.tolist()))
+
+
+class CompactVocabulary(dict):
+    """Token -> id dict that is persisted as arrays.
+
+    Only the on-disk format is compact. Pickled, e.g. by
+    `kolibri.utils.file.dump_artifact`, it is the tokens packed in one
+    utf-8 buffer with their offsets (see `encode_tokens`) and the array of
+    their ids: no python object per token, so it is small and fast to load.
+    On load the dict is rebuilt from these arrays, so every process holds its
+    own copy, which is not shared between the workers of a server. A token
+    lookup then costs one dict lookup.
+    """
+
+    def __reduce__(self):
+        blob, offsets = encode_tokens(list(self))
+        ids = np.fromiter(self.values(), dtype=np.int64, count=len(self))
+        return _vocabulary_from_arrays, (blob, offsets, ids)
+
+    def lookup(self, tokens, default=-1):
+        """Get the ids of a list of tokens.
+
+        Args:
+            tokens (list): tokens to look up.
+            default (int): id returned for the unknown tokens.
+
+        Returns:
+            numpy array: ids of the tokens.
+        """
+        get = self.get
+        return np.fromiter((get(t, default) for t in tokens), dtype=np.int64, count=len(tokens))
@@ -0,0 +1,121 @@
+import numpy as np
+import pytest
+
+from kolibri import settings
+from kolibri.classifier.ann_classifier import ANNClassifier
+from kolibri.classifier.ann_classifier import IVFIndex
+from kolibri.document import Document
+from kolibri.model import Interpreter
+from kolibri.pipeComponent import Component
+from kolibri.utils.file import dump_artifact, load_artifact
+
+
+@pytest.fixture(scope="module")
+def vectors():
+    # clustered vectors, as the features of texts on a few topics
+    rng = np.random.RandomState(0)
+    centers = rng.standard_normal((8, 16))
+    return (centers[rng.randint(8, size=600)] + 0.3 * rng.standard_normal((600, 16))).astype(np.float32)
+
+
+def exact_search(vectors, queries, k):
+    vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    return np.argsort(-queries.dot(vectors.T), axis=1, kind="mergesort")[:, :k]
+
+
+def recall(ids, expected):
+    return np.mean([len(set(found) & set(exact)) / float(len(exact)) for found, exact in zip(ids, expected)])
+
+
+def test_search_is_exact_when_probing_all_lists(vectors):
+    index = IVFIndex(n_lists=10).build(vectors[:500])
+    queries = vectors[500:]
+    expected = exact_search(vectors[:500], queries, 5)
+    scores, ids = index.search(queries, k=5, n_probe=10)
+    assert recall(ids, expected) == 1.
+    assert np.all(np.diff(scores, axis=1) <= 1e-6)
+    # probing a few lists of clustered vectors still finds most neighbours
+    assert recall(index.search(queries, k=5, n_probe=3)[1], expected) > 0.8
+
+
+def test_added_vectors_are_found(vectors):
+    index = IVFIndex(n_lists=10).build(vectors[:300])
+    ids = index.add(vectors[300:])
+    assert list(ids) == list(range(300, 600))
+    assert len(index) == 600
+    assert sum(len(ids) for ids in index._lists) == 600
+    _, found = index.search(vectors[300:], k=1, n_probe=10)
+    assert list(found[:, 0]) == list(range(300, 600))
+
+
+def test_add_to_an_empty_index(vectors):
+    index = IVFIndex(n_lists=4)
+    scores, ids = index.search(vectors[:2], k=3)
+    assert np.all(ids == -1) and np.all(np.isneginf(scores))
+
+    assert list(index.add(vectors[:100])) == list(range(100))
+    assert len(index._lists) == 4
+    index.add(vectors[100:110])
+    _, found = index.search(vectors[105], k=1, n_probe=4)
+    assert found[0, 0] == 105
+
+
+def test_memory_mapped_index_can_grow(tmp_path, vectors):
+    filename = str(tmp_path / "index.pkl")
+    dump_artifact(IVFIndex(n_lists=10).build(vectors[:500]), filename)
+    index = load_artifact(filename, "r")
+    assert isinstance(index._vectors, np.memmap)
+    assert isinstance(index._lists[0].base, np.memmap)
+    expected = exact_search(vectors[:500], vectors[500:], 5)
+    assert recall(index.search(vectors[500:], k=5, n_probe=10)[1], expected) == 1.
+
+    index.add(vectors[500:])
+    assert len(index) == 600
+    _, found = index.search(vectors[500:], k=1, n_probe=10)
+    assert list(found[:, 0]) == list(range(500, 600))
+
+
+class Featurizer(Component):
+    """Counts the letters of the text."""
+    name = "letters"
+
+    def __init__(self, component_config=None):
+        super(Featurizer, self).__init__(component_config)
+        self.processed = 0
+
+    def process(self, document, **kwargs):
+        self.processed += 1
+        features = np.zeros(26, dtype=np.float32)
+        for letter in document.text:
+            if "a" <= letter <= "z":
+                features[ord(letter) - ord("a")] += 1
+        document.text_features = features
+
+
+class Unreachable(Component):
+    name = "after_the_index"
+
+    def process(self, document, **kwargs):
+        raise AssertionError("Only the components before the index process the text.")
+
+
+def test_most_similar_runs_the_components_before_the_index(monkeypatch):
+    monkeypatch.setitem(settings.modeling, "TARGET_RANKING_LENGTH", 10)
+    featurizer = Featurizer()
+    classifier = ANNClassifier()
+    texts = ["aaa", "aab", "zzz", "zzy"]
+    documents = [Document(text) for text in texts]
+    for document in documents:
+        featurizer.process(document)
+    classifier.add_documents(documents, targets=["a", "a", "z", "z"])
+    interpreter = Interpreter([featurizer, classifier, Unreachable()], {})
+
+    similar = interpreter.most_similar("zz", k=2)
+    assert featurizer.processed == len(texts) + 1
+    assert [s["text"] for s in similar] == ["zzz", "zzy"]
+    assert [s["target"] for s in similar] == ["z", "z"]
+    assert similar[0]["similarity"] == pytest.approx(1.)
+    assert interpreter.most_similar("") == []
+    with pytest.raises(ValueError):
+        Interpreter([featurizer], {}).most_similar("zz")
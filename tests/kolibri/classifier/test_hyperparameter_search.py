@@ -0,0 +1,50 @@
+import multiprocessing
+import time
+
+import numpy as np
+import pytest
+from sklearn.datasets import make_classification
+from sklearn.linear_model import LogisticRegression
+
+from kolibri.classifier.hyperparameter_search import SuccessiveHalvingSearch
+from kolibri.classifier.sklearn_classifier import SkLearnClassifier
+
+# a logistic regression that does not converge before the end of the tests
+SLOW_GRID = {"solver": ["saga"], "tol": [0.], "max_iter": [10 ** 8], "C": [1., 10.]}
+
+
+@pytest.fixture(scope="module")
+def data():
+    return make_classification(n_samples=600, n_features=20, n_informative=5, n_classes=3,
+                               random_state=0)
+
+
+def test_search_finds_parameters(data):
+    X, y = data
+    search = SuccessiveHalvingSearch("lrg_l2", param_grid={"C": [0.01, 1., 100.]}, n_jobs=1).fit(X, y)
+    assert search.best_params_["C"] in (0.01, 1., 100.)
+    assert search.stopped_ is None
+    assert isinstance(search.best_estimator(), LogisticRegression)
+
+
+@pytest.mark.parametrize("n_jobs", [1, 2])
+def test_time_budget_stops_running_evaluations(data, n_jobs):
+    X, y = data
+    # e.g. the reusable joblib workers of other tests
+    running = set(multiprocessing.active_children())
+    start = time.perf_counter()
+    search = SuccessiveHalvingSearch("lrg_l2", param_grid=SLOW_GRID, time_budget=1., n_jobs=n_jobs).fit(X, y)
+    assert time.perf_counter() - start < 10.
+    assert search.stopped_ == "time_budget"
+    assert search.best_params_ is None
+    assert set(multiprocessing.active_children()) <= running
+
+
+def test_classifier_falls_back_to_configured_model(data):
+    X, y = data
+    classifier = SkLearnClassifier({"models": ["lrg_l2"],
+                                    "hyperparameter_search": {"param_grid": SLOW_GRID, "time_budget": 1.}})
+    model = classifier._search_classifier(["lrg_l2"], X, np.asarray(y))
+    assert isinstance(model, LogisticRegression)
+    assert model.max_iter != SLOW_GRID["max_iter"][0]
+    assert classifier.component_config["hyperparameter_search_report"]["stopped"] == "time_budget"
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.linear_model import SGDClassifier
+from sklearn.naive_bayes import MultinomialNB
+from sklearn.svm import LinearSVC
+
+from kolibri.classifier.linear_scorer import LinearScorer
+from kolibri.classifier.linear_scorer import export_linear_model
+
+TEXTS = [
+    "the invoice is late", "please pay the invoice", "payment received thanks",
+    "where is my parcel", "the parcel was delivered", "delivery delayed again",
+    "reset my password", "cannot login to my account", "password expired",
+    "invoice amount is wrong", "parcel lost in transit", "account locked after login",
+] * 3
+LABELS = ["billing", "billing", "billing", "shipping", "shipping", "shipping",
+          "account", "account", "account", "billing", "shipping", "account"] * 3
+QUERIES = ["my invoice is late", "the parcel is lost", "login password", "unknown words only", ""]
+
+
+def scorer(tmp_path, vectorizer, classifier, labels=LABELS):
+    X = vectorizer.fit_transform(TEXTS)
+    classifier.fit(X, labels)
+    filename = str(tmp_path / "linear.npz")
+    export_linear_model(vectorizer, classifier, filename)
+    return LinearScorer.load(filename)
+
+
+@pytest.mark.parametrize("classifier", [
+    LogisticRegression(C=10.),
+    SGDClassifier(loss="log_loss", random_state=0),
+    MultinomialNB(alpha=0.1),
+    CalibratedClassifierCV(LinearSVC(), cv=3),
+], ids=["lr", "sgd", "nb", "calibrated_svm"])
+@pytest.mark.parametrize("n_classes", [2, 3])
+def test_matches_sklearn(tmp_path, classifier, n_classes):
+    labels = LABELS if n_classes == 3 else [label == "billing" for label in LABELS]
+    vectorizer = TfidfVectorizer(sublinear_tf=True)
+    numpy_scorer = scorer(tmp_path, vectorizer, classifier, labels)
+    expected = classifier.predict_proba(vectorizer.transform(QUERIES))
+    np.testing.assert_allclose(numpy_scorer.predict_proba(QUERIES), expected, atol=1e-6)
+    assert numpy_scorer.predict(QUERIES) == [str(c) for c in classifier.predict(vectorizer.transform(QUERIES))]
+
+
+def test_scores_terms(tmp_path):
+    vectorizer = TfidfVectorizer(tokenizer=str.split, lowercase=False, token_pattern=None)
+    classifier = LogisticRegression(C=10.)
+    numpy_scorer = scorer(tmp_path, vectorizer, classifier)
+    expected = classifier.predict_proba(vectorizer.transform(QUERIES))
+    np.testing.assert_allclose(numpy_scorer.predict_proba([q.split() for q in QUERIES]), expected,
+                               atol=1e-6)
+
+
+@pytest.mark.parametrize("vectorizer", [
+    TfidfVectorizer(tokenizer=str.split, token_pattern=None),
+    TfidfVectorizer(stop_words=["the", "is"]),
+    TfidfVectorizer(ngram_range=(1, 2)),
+], ids=["tokenizer", "stop_words", "ngrams"])
+def test_rejects_texts_it_can_not_tokenize(tmp_path, vectorizer):
+    numpy_scorer = scorer(tmp_path, vectorizer, LogisticRegression())
+    with pytest.raises(ValueError):
+        numpy_scorer.predict_proba_one("the invoice is late")
+    numpy_scorer.predict_proba_one(["invoice", "late"])
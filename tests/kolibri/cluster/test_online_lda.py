@@ -0,0 +1,53 @@
+import pickle
+
+import numpy as np
+import pytest
+import scipy.sparse as sp
+
+from kolibri.cluster import online_lda
+from kolibri.cluster.online_lda import OnlineLda
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    rng = np.random.RandomState(0)
+    return sp.csr_matrix(rng.poisson(0.3, (200, 50)).astype(np.float64))
+
+
+@pytest.fixture
+def pools(monkeypatch):
+    """Counts the joblib pools created by the model."""
+    created = []
+
+    class Parallel(online_lda.Parallel):
+        def __init__(self, *args, **kwargs):
+            created.append(self)
+            super(Parallel, self).__init__(*args, **kwargs)
+
+    monkeypatch.setattr(online_lda, "Parallel", Parallel)
+    return created
+
+
+def test_transform_single_documents_inline(corpus, pools):
+    model = OnlineLda(num_topics=3, workers=1, random_state=0).fit(corpus)
+    model.workers = 2
+    del pools[:]
+    inferred = [model.transform(corpus[i]) for i in range(3)]
+    assert pools == []
+    assert model.get_document_topics([(0, 1.), (3, 2.)])
+    assert pools == []
+    np.testing.assert_allclose(np.vstack(inferred).sum(axis=1), 1.)
+
+
+def test_transform_batches_reuse_one_pool(corpus, pools):
+    model = OnlineLda(num_topics=3, workers=2, random_state=0).fit(corpus)
+    del pools[:]
+    first = model.transform(corpus)
+    second = model.transform(corpus)
+    assert len(pools) == 1
+    np.testing.assert_allclose(first, second)
+    assert first.shape == (corpus.shape[0], 3)
+
+    restored = pickle.loads(pickle.dumps(model))
+    assert restored._parallel is None
+    np.testing.assert_allclose(restored.transform(corpus), first)
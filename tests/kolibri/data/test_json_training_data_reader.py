@@ -0,0 +1,42 @@
+import json
+
+import pytest
+from jsonschema import ValidationError
+
+from kolibri.data.format.json import JsonReader
+from kolibri.data.format.kolibri import KolibriReader
+
+
+class TestKolibriReader:
+    examples = [{"text": "hello world", "class": "greet"},
+                {"text": "goodbye", "class": "bye",
+                 "entities": [{"start": 0, "end": 7, "entity": "word"}]}]
+
+    def test_reads_training_data_object(self, tmp_path):
+        path = tmp_path / "data.klb"
+        path.write_text(json.dumps({"kolibri_nlu_data": {"common_examples": self.examples}}))
+        documents = KolibriReader().reads(str(path))
+        assert [d.raw_text for d in documents] == ["hello world", "goodbye"]
+        assert [d.target for d in documents] == ["greet", "bye"]
+
+    def test_reads_json_lines(self, tmp_path):
+        path = tmp_path / "data.jsonl"
+        path.write_text("\n".join(json.dumps(e) for e in self.examples))
+        documents = list(KolibriReader().iter_documents(str(path)))
+        assert [d.target for d in documents] == ["greet", "bye"]
+
+    def test_validates_each_example(self, tmp_path):
+        path = tmp_path / "data.klb"
+        path.write_text(json.dumps({"kolibri_nlu_data": {"common_examples": [{"text": ""}]}}))
+        with pytest.raises(ValidationError):
+            KolibriReader().reads(str(path))
+
+
+class TestJsonReader:
+    def test_reads_markdown_annotations(self, tmp_path):
+        path = tmp_path / "data.json"
+        path.write_text(json.dumps(["book a [table](thing) for [two](number:2)"]))
+        document = JsonReader().reads(str(path))[0]
+        assert document.raw_text == "book a table for two"
+        assert [(e["start"], e["end"], e["text"]) for e in document.entities] == [(7, 12, "table"),
+                                                                                  (17, 20, "2")]
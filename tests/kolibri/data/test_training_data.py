@@ -0,0 +1,63 @@
+from kolibri.data.training_data import TrainingData
+from kolibri.data.writer_reader import DataReader
+from kolibri.document import Document
+
+EXAMPLES = [
+    {"text": "pay the invoice", "target": "billing",
+     "entities": [{"start": 8, "end": 15, "value": "invoice", "entity": "document"}]},
+    {"text": "hello", "target": "greet"},
+    {"text": "send the invoice to Paris", "target": "billing",
+     "entities": [{"start": 9, "end": 16, "value": "invoice", "entity": "document"},
+                  {"start": 20, "end": 25, "value": "Paris", "entity": "city"}]},
+    {"text": "no class"},
+]
+
+
+def documents():
+    return [Document.build(ex["text"], ex.get("target"), ex.get("entities")) for ex in EXAMPLES]
+
+
+def test_reader_builds_indexed_training_data():
+    data = DataReader().read_from_json({"kolibri_nlu_data": {"common_examples": EXAMPLES}})
+    assert [ex.text for ex in data.training_examples] == [ex["text"] for ex in EXAMPLES]
+    assert data.classes == {"billing", "greet"}
+    assert data.entities == {"document", "city"}
+
+
+def test_indexes_by_class_and_entity_type():
+    data = TrainingData(training_examples=documents())
+    assert data.examples_per_class == {"billing": 2, "greet": 1, None: 1}
+    assert [ex.text for ex in data.class_examples] == [ex["text"] for ex in EXAMPLES[:3]]
+    assert data.examples_per_entity == {"document": 2, "city": 1}
+    assert [e["value"] for e in data.sorted_entities] == ["Paris", "invoice", "invoice"]
+    assert [ex.text for ex in data.sorted_class_examples()] == \
+        ["pay the invoice", "send the invoice to Paris", "hello"]
+
+
+def test_appended_examples_are_indexed_on_access():
+    data = TrainingData(training_examples=documents()[:2])
+    assert data.classes == {"billing", "greet"}
+    data.training_examples.append(Document.build("where is Paris", "travel",
+                                                 [{"start": 9, "end": 14, "value": "Paris", "entity": "city"}]))
+    data.add_examples([Document.build("bye", "greet")])
+    assert data.examples_per_class == {"billing": 1, "greet": 2, "travel": 1}
+    assert data.entities == {"document", "city"}
+
+
+def test_invalidate_after_an_in_place_edit():
+    data = TrainingData(training_examples=documents())
+    assert data.classes == {"billing", "greet"}
+    data.training_examples[1].target = "salutation"
+    data.training_examples[0].entities = []
+    # the indexes still describe the examples as they were indexed
+    assert data.classes == {"billing", "greet"}
+    data.invalidate()
+    assert data.classes == {"billing", "salutation"}
+    assert data.examples_per_entity == {"document": 1, "city": 1}
+
+
+def test_remove_entity_type():
+    data = TrainingData(training_examples=documents())
+    data.remove_entity_type("document")
+    assert data.entities == {"city"}
+    assert [e["entity"] for e in data.training_examples[2].entities] == ["city"]
@@ -81,6 +81,32 @@ class TestVocabulary (KolibriTestCase):
         assert vocab.get_index_to_token_vocabulary("a") == vocab2.get_index_to_token_vocabulary("a")
         assert vocab.get_index_to_token_vocabulary("b") == vocab2.get_index_to_token_vocabulary("b")
 
+    def test_saving_and_loading_text_files(self):
+
+        vocab_dir = self.TEST_DIR / "vocab_save_text"
+
+        vocab = Vocabulary(non_padded_namespaces=["a"])
+        vocab.add_tokens_to_namespace(["a0", "a1"], namespace="a")
+        vocab.add_tokens_to_namespace(["b2", "b3"], namespace="b")
+
+        vocab.save_to_files(vocab_dir, binary=False)
+        vocab2 = Vocabulary.from_files(vocab_dir)
+
+        assert vocab.get_index_to_token_vocabulary("a") == vocab2.get_index_to_token_vocabulary("a")
+        assert vocab.get_index_to_token_vocabulary("b") == vocab2.get_index_to_token_vocabulary("b")
+
+    def test_get_token_indices(self):
+        vocab = Vocabulary(non_padded_namespaces=["a"])
+        vocab.add_tokens_to_namespace(["a0", "a1"], namespace="a")
+        vocab.add_tokens_to_namespace(["b2", "b3"], namespace="b")
+
+        tokens = ["b3", "b2", "unknown", "b3"]
+        assert vocab.get_token_indices(tokens, "b") == [vocab.get_token_index(t, "b") for t in tokens]
+        assert vocab.get_token_indices(["a1", "a0"], "a") == [1, 0]
+        # non-padded namespaces have no OOV token
+        with pytest.raises(KeyError):
+            vocab.get_token_indices(["a0", "unknown"], "a")
+
     # def test_from_params(self):
     #     # Save a vocab to check we can load it from_params.
     #     vocab_dir = self.TEST_DIR / "vocab_save"
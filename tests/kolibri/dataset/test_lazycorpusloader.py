@@ -0,0 +1,18 @@
+import nltk.data
+
+from kolibri.dataset import lazycorpusloader
+from kolibri.dataset import LazyCorpusLoader
+from kolibri.dataset import PlaintextCorpusReader
+
+
+def test_loads_a_corpus_of_the_data_directory(tmp_path, monkeypatch):
+    monkeypatch.setattr(lazycorpusloader, "resources_path", str(tmp_path))
+    monkeypatch.setattr(nltk.data, "path", list(nltk.data.path))
+    corpus_dir = tmp_path / "data" / "corpora" / "toy"
+    corpus_dir.mkdir(parents=True)
+    (corpus_dir / "a.txt").write_text("Hello world, hello again.\n")
+
+    toy = LazyCorpusLoader("toy", PlaintextCorpusReader, r".*\.txt")
+    assert toy.fileids() == ["a.txt"]
+    assert toy.raw() == "Hello world, hello again.\n"
+    assert [token.text for token in toy.words()] == ["Hello", "world", "hello", "again"]
@@ -0,0 +1,133 @@
+import glob
+import os
+
+import pytest
+
+from kolibri.dataset.utils import ShardedCorpusView, StreamBackedCorpusView
+
+
+class LineTokenizer(object):
+    def __init__(self, max_tokens=None):
+        self.max_tokens = max_tokens
+
+    def tokenize(self, line):
+        return line.split()[:self.max_tokens]
+
+
+class WordReader(object):
+    def __init__(self, max_tokens=None):
+        self._word_tokenizer = LineTokenizer(max_tokens)
+
+    def _read_word_block(self, stream):
+        words = []
+        for i in range(10):
+            words.extend(self._word_tokenizer.tokenize(stream.readline()))
+        return words
+
+
+def write_corpus(path, n_lines=100):
+    path.write_text("".join("a b c d e\n" for _ in range(n_lines)))
+    return str(path)
+
+
+def index_files(path):
+    return glob.glob(path + ".*.idx.npy")
+
+
+class TestPersistedIndex:
+    def test_is_opt_in(self, tmp_path):
+        path = write_corpus(tmp_path / "corpus.txt")
+        view = StreamBackedCorpusView(path, WordReader()._read_word_block)
+        assert len(view) == 500
+        assert index_files(path) == []
+
+    def test_is_reused(self, tmp_path):
+        path = write_corpus(tmp_path / "corpus.txt")
+        assert len(StreamBackedCorpusView(path, WordReader()._read_word_block, persist_index=True)) == 500
+        assert len(index_files(path)) == 1
+
+        view = StreamBackedCorpusView(path, WordReader()._read_word_block, persist_index=True)
+        assert view._len == 500
+        assert view[437] == "c"
+
+    def test_two_readers_of_the_same_file(self, tmp_path):
+        path = write_corpus(tmp_path / "corpus.txt")
+        words = StreamBackedCorpusView(path, WordReader()._read_word_block, persist_index=True)
+        assert len(words) == 500
+
+        first_words = StreamBackedCorpusView(path, WordReader(3)._read_word_block, persist_index=True)
+        assert first_words._len is None
+        assert len(first_words) == 300
+        assert list(first_words[297:]) == ["a", "b", "c"]
+        assert len(index_files(path)) == 2
+
+        assert len(StreamBackedCorpusView(path, WordReader()._read_word_block, persist_index=True)) == 500
+        assert len(StreamBackedCorpusView(path, WordReader(3)._read_word_block, persist_index=True)) == 300
+
+    def test_stale_index_is_rebuilt(self, tmp_path):
+        path = write_corpus(tmp_path / "corpus.txt")
+        assert len(StreamBackedCorpusView(path, WordReader()._read_word_block, persist_index=True)) == 500
+
+        write_corpus(tmp_path / "corpus.txt", n_lines=60)
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        view = StreamBackedCorpusView(path, WordReader()._read_word_block, persist_index=True)
+        assert view._len is None
+        assert len(view) == 300
+        assert view[299] == "e"
+
+        assert StreamBackedCorpusView(path, WordReader()._read_word_block, persist_index=True)._len == 300
+
+    def test_index_key(self, tmp_path):
+        path = write_corpus(tmp_path / "corpus.txt")
+        reader = WordReader()._read_word_block
+        assert len(StreamBackedCorpusView(path, reader, persist_index=True, index_key="v1")) == 500
+
+        assert StreamBackedCorpusView(path, reader, persist_index=True, index_key="v1")._len == 500
+        assert StreamBackedCorpusView(path, reader, persist_index=True, index_key="v2")._len is None
+
+
+class TestShardedCorpusView:
+    words = ["w%d" % (i % 7) for i in range(23)]
+    sents = [["s%d" % i, "x", "y%d" % (i % 3)][:i % 4] for i in range(23)]
+    paras = [[["p%d" % i, "x"], ["y"]] for i in range(7)] + [[], [["z"]]] * 4
+
+    @pytest.mark.parametrize("items", [words, sents, paras])
+    def test_round_trip(self, tmp_path, items):
+        ShardedCorpusView.write(items, str(tmp_path), shard_size=4)
+        view = ShardedCorpusView(str(tmp_path))
+        assert len(view) == len(items)
+        assert list(view) == items
+        assert list(view.iterate_from(9)) == items[9:]
+
+    @pytest.mark.parametrize("items", [words, sents, paras])
+    def test_random_access(self, tmp_path, items):
+        ShardedCorpusView.write(items, str(tmp_path), shard_size=4)
+        view = ShardedCorpusView(str(tmp_path))
+        for i in [13, 0, len(items) - 1, 5, 4, 3, 9, -1, -len(items)]:
+            assert view[i] == items[i]
+        assert list(view[5:11]) == items[5:11]
+        with pytest.raises(IndexError):
+            view[len(items)]
+
+    def test_leading_empty_items_are_sharded(self, tmp_path):
+        items = [[]] * 6 + self.sents
+        ShardedCorpusView.write(items, str(tmp_path), shard_size=4)
+        view = ShardedCorpusView(str(tmp_path))
+        assert len(glob.glob(str(tmp_path / "shard-*.ids.npy"))) > 1
+        assert list(view) == items
+
+    def test_random_access_decodes_one_item(self, tmp_path):
+        ShardedCorpusView.write(self.sents, str(tmp_path), shard_size=100)
+        view = ShardedCorpusView(str(tmp_path))
+        assert view[7] == self.sents[7]
+        assert view._decoded == (None, None)
+
+    def test_ids_and_batches(self, tmp_path):
+        ShardedCorpusView.write(self.sents, str(tmp_path), shard_size=10)
+        view = ShardedCorpusView(str(tmp_path))
+        assert [view.vocab[t] for t in view.ids(6)] == self.sents[6]
+        sents = []
+        for ids, (offsets,) in view.batches(batch_size=4):
+            sents.extend([view.vocab[t] for t in ids[a:b]] for a, b in zip(offsets[:-1], offsets[1:]))
+        assert sents == self.sents
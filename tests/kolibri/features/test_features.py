@@ -0,0 +1,95 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from lime.lime_text import IndexedString
+from sklearn.decomposition import TruncatedSVD
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.pipeline import Pipeline
+
+from kolibri.data.training_data import TrainingData
+from kolibri.document import Document
+from kolibri.explainer.LimExplainer import Explainer
+from kolibri.features.features import Features
+from kolibri.features.tf_idf_featurizer import TFIDFFeaturizer
+from kolibri.tokenizer.token_ import Token
+from kolibri.utils.file import dump_artifact, load_artifact
+from kolibri.vocabulary import CompactVocabulary
+
+DOCUMENTS = ["the cat sat", "the dog ran", "a cat and a dog"]
+
+
+class TestCompactVocabulary:
+    def test_persisted_as_packed_tokens(self, tmp_path):
+        token2id = {"token%d" % i: i for i in range(2000)}
+        token2id["x" * 300] = 2000
+        filename = str(tmp_path / "vocabulary.pkl")
+        dump_artifact(CompactVocabulary(token2id), filename)
+        loaded = load_artifact(filename, "r")
+        assert type(loaded) is CompactVocabulary
+        assert loaded == token2id
+        assert (tmp_path / "vocabulary.pkl").stat().st_size < 100000
+
+    def test_lookup(self):
+        vocabulary = CompactVocabulary({"a": 1, "b": 0})
+        assert vocabulary["a"] == 1
+        assert list(vocabulary.lookup(["b", "c", "a"])) == [0, -1, 1]
+
+
+class TestCompactVectorizer:
+    def test_compacts_a_copy(self, tmp_path):
+        tfidf = TfidfVectorizer()
+        pipeline = Pipeline([("tfidf", tfidf), ("svd", TruncatedSVD(2))]).fit(DOCUMENTS)
+        compacted = Features._compact_vectorizer(pipeline)
+        assert type(tfidf.vocabulary_) is dict
+        assert pipeline.steps[0][1] is tfidf
+        assert type(compacted.steps[0][1].vocabulary_) is CompactVocabulary
+
+        filename = str(tmp_path / "pipeline.pkl")
+        dump_artifact(compacted, filename)
+        np.testing.assert_allclose(load_artifact(filename, "r").transform(DOCUMENTS),
+                                   pipeline.transform(DOCUMENTS))
+
+
+def tokenized(text):
+    document = Document(text)
+    document.tokens, start = [], 0
+    for i, word in enumerate(text.split()):
+        document.tokens.append(Token(word, start, i))
+        start += len(word) + 1
+    return document
+
+
+@pytest.fixture
+def featurizer():
+    featurizer = TFIDFFeaturizer({"min_df": 1, "max_df": 1.0})
+    featurizer.train(TrainingData(training_examples=[tokenized(text) for text in DOCUMENTS]))
+    return featurizer
+
+
+class TestMaskedFeatures:
+    def test_matches_the_features_of_the_masked_texts(self, featurizer):
+        document = tokenized("the cat and the dog")
+        masks = np.array([[1, 1, 1, 1, 1], [0, 1, 0, 0, 1], [1, 0, 1, 1, 0], [0, 0, 0, 0, 0]])
+        expected = []
+        for mask in masks:
+            words = [w for w, kept in zip(document.text.split(), mask) if kept]
+            expected.append(featurizer.vectorizer.transform([tokenized(" ".join(words))]).toarray()[0])
+        np.testing.assert_allclose(featurizer.masked_features(document, masks), expected)
+
+    def test_rejects_documents_without_tokens(self, featurizer):
+        with pytest.raises(ValueError):
+            featurizer.masked_features(Document("the cat"), np.ones((2, 2)))
+
+    def test_explainer_falls_back_to_texts_without_tokens(self, featurizer):
+        class Scorer(object):
+            def predict_prob(self, X):
+                return np.hstack((X[:, :1], 1 - X[:, :1]))
+
+        explainer = Explainer()
+        explainer.model = SimpleNamespace(default_output_attributes=lambda: {}, context={})
+        explainer.featurizer, explainer.classifier_component = featurizer, Scorer()
+        explainer.begining_of_pipline = [featurizer]
+        classifier_fn = explainer._predict_masks("the cat sat")
+        masks = np.array([[1, 1, 1], [1, 0, 1]])
+        assert classifier_fn(masks, IndexedString("the cat sat")).shape == (2, 2)
@@ -0,0 +1,143 @@
+import os
+import time
+
+import pytest
+
+pytest.importorskip("rdflib")
+
+from kolibri.owl import Ontology
+from kolibri.owl import URIRef
+from kolibri.owl.snapshot import default_snapshot_path
+
+TURTLE = """
+@prefix : <http://example.org/shop#> .
+@prefix owl: <http://www.w3.org/2002/07/owl#> .
+@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+@prefix skos: <http://www.w3.org/2004/02/skos/core#> .
+@prefix xsd: <http://www.w3.org/2001/XMLSchema#> .
+
+<http://example.org/shop> a owl:Ontology .
+
+:Product a owl:Class ;
+    rdfs:label "product"@en ;
+    rdfs:comment "Anything that can be sold."@en, "Tout ce qui se vend."@fr .
+:Book a owl:Class ;
+    rdfs:subClassOf :Product ;
+    rdfs:label "book"@en ;
+    skos:altLabel "novel" .
+:Ebook a owl:Class ;
+    rdfs:subClassOf :Book .
+
+:soldBy a owl:ObjectProperty ;
+    rdfs:label "sold by" .
+:publishedBy a owl:ObjectProperty ;
+    rdfs:subPropertyOf :soldBy .
+:price a owl:DatatypeProperty .
+:note a owl:AnnotationProperty .
+
+:dune a owl:NamedIndividual, :Book ;
+    rdfs:label "Dune" ;
+    :price "9.99"^^xsd:decimal ;
+    :note "a classic" .
+"""
+
+KINDS = ["classes", "individuals", "object_properties", "annotation_properties", "data_properties"]
+
+
+def write_ontology(path, text=TURTLE):
+    with open(str(path), "w") as f:
+        f.write(text)
+    return str(path)
+
+
+def load(location, **kwargs):
+    ontology = Ontology()
+    ontology.load(location=location, format="turtle", **kwargs)
+    return ontology
+
+
+def describe(ontology):
+    """The entities of an ontology and what they hold, keyed by uri."""
+    entities = {}
+    for kind in KINDS:
+        for entity in getattr(ontology, kind):
+            entities[entity.uri] = {
+                "kind": kind,
+                "labels": entity.labels,
+                "comments": entity.comments,
+                "definitions": entity.definitions,
+                "parents": set(parent.uri for parent in entity.parents),
+                "children": set(child.uri for child in entity.children),
+                "qname": entity.qname,
+                "main_label": entity.main_label,
+                "triples": entity.triples,
+                "annotations": entity.annotations,
+            }
+    return ontology.uri, entities
+
+
+@pytest.fixture
+def parses(monkeypatch):
+    """Counts the parses of the source files."""
+    count = [0]
+    parse = Ontology._parse
+
+    def counting_parse(self, *args, **kwargs):
+        count[0] += 1
+        return parse(self, *args, **kwargs)
+
+    monkeypatch.setattr(Ontology, "_parse", counting_parse)
+    return count
+
+
+def test_snapshot_has_the_parsed_entities(tmp_path, parses):
+    location = write_ontology(tmp_path / "shop.ttl")
+    parsed = load(location)
+    assert not os.path.exists(default_snapshot_path(location))
+
+    load(location, snapshot=True)
+    assert os.path.exists(default_snapshot_path(location))
+    snapshot = load(location, snapshot=True)
+    assert parses[0] == 2
+
+    assert describe(snapshot) == describe(parsed)
+    book = next(c for c in snapshot.classes if c.main_label == "book")
+    assert [parent.main_label for parent in book.parents] == ["product"]
+    assert [child.uri.split("#")[-1] for child in book.children] == ["Ebook"]
+
+
+def test_graph_is_rebuilt_on_first_use(tmp_path):
+    location = write_ontology(tmp_path / "shop.ttl")
+    parsed = load(location, snapshot=True)
+    snapshot = load(location, snapshot=True)
+    assert snapshot._graph is None
+
+    graph = snapshot.graph
+    assert snapshot._graph is graph
+    assert set(graph) == set(parsed.graph)
+    assert dict(graph.namespaces()) == dict(parsed.graph.namespaces())
+    assert snapshot.graph is graph
+
+
+def test_snapshot_is_rebuilt_when_the_source_changes(tmp_path, parses):
+    location = write_ontology(tmp_path / "shop.ttl")
+    load(location, snapshot=True)
+    load(location, snapshot=True)
+    assert parses[0] == 1
+
+    # same size, other modification time
+    later = time.time() + 10
+    os.utime(location, (later, later))
+    load(location, snapshot=True)
+    assert parses[0] == 2
+    load(location, snapshot=True)
+    assert parses[0] == 2
+
+    # other size
+    write_ontology(location, TURTLE + ":Magazine a owl:Class .\n")
+    os.utime(location, (later, later))
+    snapshot = load(location, snapshot=True)
+    assert parses[0] == 3
+    assert URIRef("http://example.org/shop#Magazine") in [c.uri for c in snapshot.classes]
+    assert describe(load(location, snapshot=True)) == describe(snapshot)
+    assert parses[0] == 3
@@ -0,0 +1,164 @@
+import json
+import os
+import time
+
+import pytest
+
+from kolibri import model_registry
+from kolibri.model_registry import ModelRegistry
+
+MB = 1024 * 1024
+
+
+class FakeComponent(object):
+
+    def __init__(self, name):
+        self.name = name
+
+
+class FakeInterpreter(object):
+
+    def __init__(self, model_dir, pipeline):
+        self.model_dir = model_dir
+        self.pipeline = pipeline
+
+    def parse(self, text, **kwargs):
+        return {"text": text, "model_dir": self.model_dir}
+
+
+@pytest.fixture
+def memory(monkeypatch):
+    """Loads the fake models: each model grows the resident memory by its
+    `size` and shares the component named by its `shared` key."""
+    resident = [0]
+
+    def load(model_dir, component_builder=None, mmap_mode=None):
+        with open(os.path.join(model_dir, "metadata.json")) as f:
+            metadata = json.load(f)
+        resident[0] += metadata["size"]
+        shared = component_builder.component_cache.setdefault(
+                metadata["shared"], FakeComponent(metadata["shared"]))
+        return FakeInterpreter(model_dir, [shared, FakeComponent(model_dir)])
+
+    monkeypatch.setattr(model_registry.Interpreter, "load", staticmethod(load))
+    monkeypatch.setattr(model_registry, "resident_memory", lambda: resident[0])
+    return resident
+
+
+def write_model(path, size=MB, shared="nlp"):
+    os.makedirs(str(path), exist_ok=True)
+    with open(os.path.join(str(path), "metadata.json"), "w") as f:
+        json.dump({"size": size, "shared": shared}, f)
+    return str(path)
+
+
+def loaded(registry):
+    return [model["name"] for model in registry.stats()["models"] if model["loaded"]]
+
+
+def test_evicts_least_recently_used_over_max_models(tmp_path, memory):
+    registry = ModelRegistry({name: write_model(tmp_path / name) for name in "abc"}, max_models=2)
+    registry.get("a")
+    registry.get("b")
+    registry.get("a")
+    registry.get("c")
+    assert loaded(registry) == ["a", "c"]
+    stats = {model["name"]: model for model in registry.stats()["models"]}
+    assert stats["b"]["evictions"] == 1
+    assert stats["b"]["evict_time"] is not None
+
+    registry.get("b")
+    assert stats["b"]["loads"] == 1
+    assert registry.stats()["models"][-1]["loads"] == 2
+    assert loaded(registry) == ["c", "b"]
+
+
+def test_evicts_over_memory_budget(tmp_path, memory):
+    registry = ModelRegistry({"a": write_model(tmp_path / "a", size=2 * MB),
+                              "b": write_model(tmp_path / "b", size=2 * MB)},
+                             memory_budget=3 * MB)
+    registry.get("a")
+    registry.get("b")
+    assert loaded(registry) == ["b"]
+    assert registry.loaded_memory() == 2 * MB
+
+
+def test_drops_cached_components_of_evicted_models(tmp_path, memory):
+    registry = ModelRegistry({"a": write_model(tmp_path / "a", shared="nlp-en"),
+                              "b": write_model(tmp_path / "b", shared="nlp-en"),
+                              "c": write_model(tmp_path / "c", shared="nlp-fr")},
+                             max_models=2)
+    registry.get("a")
+    registry.get("b")
+    assert registry.get("a").pipeline[0] is registry.get("b").pipeline[0]
+
+    registry.get("c")
+    # b still uses the component shared with a
+    assert set(registry.component_builder.component_cache) == {"nlp-en", "nlp-fr"}
+    registry.evict("b")
+    assert list(registry.component_builder.component_cache) == ["nlp-fr"]
+    registry.unregister("c")
+    assert registry.stats()["cached_components"] == 0
+
+
+def test_parse_counts_and_loads_on_first_use(tmp_path, memory):
+    registry = ModelRegistry({"a": write_model(tmp_path / "a")})
+    assert loaded(registry) == []
+    assert registry.parse("a", "hello")["text"] == "hello"
+    registry.parse("a", "hello")
+    assert registry.stats()["models"][0]["parses"] == 2
+    with pytest.raises(KeyError):
+        registry.parse("missing", "hello")
+
+
+def test_reload_swaps_the_model(tmp_path, memory):
+    registry = ModelRegistry({"a": write_model(tmp_path / "v1", shared="nlp-v1")})
+    previous = registry.get("a")
+    current = registry.reload("a", write_model(tmp_path / "v2", shared="nlp-v2"))
+    assert current is not previous
+    assert registry.get("a") is current
+    assert current.model_dir == str(tmp_path / "v2")
+    # the component of the previous version is no longer cached
+    assert list(registry.component_builder.component_cache) == ["nlp-v2"]
+
+
+def test_refresh_reloads_changed_models(tmp_path, memory):
+    registry = ModelRegistry({"a": write_model(tmp_path / "a"), "b": write_model(tmp_path / "b")})
+    interpreter = registry.get("a")
+    assert registry.refresh() == []
+
+    metadata = os.path.join(str(tmp_path / "b"), "metadata.json")
+    os.utime(metadata, (time.time() + 10, time.time() + 10))
+    # b is not loaded, it is read again on its next use
+    assert registry.refresh() == []
+
+    metadata = os.path.join(str(tmp_path / "a"), "metadata.json")
+    os.utime(metadata, (time.time() + 10, time.time() + 10))
+    assert registry.refresh() == ["a"]
+    assert registry.get("a") is not interpreter
+    assert registry.refresh() == []
+
+
+def test_release_during_a_load_keeps_its_components(tmp_path, memory, monkeypatch):
+    registry = ModelRegistry({"a": write_model(tmp_path / "a", shared="nlp-a"),
+                              "b": write_model(tmp_path / "b", shared="nlp-b")})
+    registry.get("a")
+    load = registry._load
+
+    def load_then_evict(entry, model_dir):
+        loaded = load(entry, model_dir)
+        # another thread releases a model before this one is set
+        registry.evict("a")
+        return loaded
+
+    monkeypatch.setattr(registry, "_load", load_then_evict)
+    registry.get("b")
+    assert list(registry.component_builder.component_cache) == ["nlp-b"]
+
+
+def test_failed_load_is_not_counted(tmp_path, memory):
+    registry = ModelRegistry({"a": str(tmp_path / "missing")})
+    with pytest.raises(IOError):
+        registry.get("a")
+    assert registry._loading == 0
+    assert loaded(registry) == []
@@ -0,0 +1,71 @@
+import asyncio
+import json
+
+import pytest
+
+from kolibri import server
+from kolibri.server import HTTPServer
+from kolibri.server import MicroBatcher
+
+
+class FakeInterpreter(object):
+
+    def parse(self, text):
+        if text == "boom":
+            raise ValueError("can not parse")
+        return {"text": text}
+
+
+def fake_init_worker(model_dir, mmap_mode):
+    server._interpreter = FakeInterpreter()
+
+
+def test_parse_batch_returns_an_error_per_text(monkeypatch):
+    monkeypatch.setattr(server, "_interpreter", FakeInterpreter())
+    results = server._parse_batch(["a", "boom", "b"])
+    assert [error for error, _ in results] == [None, "ValueError: can not parse", None]
+    assert json.loads(results[2][1]) == {"text": "b"}
+
+
+async def post(port, payload):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps(payload).encode("utf-8")
+    writer.write("POST /parse HTTP/1.1\r\nContent-Length: {}\r\nConnection: close\r\n\r\n"
+                 "".format(len(body)).encode("latin-1") + body)
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), head.decode("latin-1"), json.loads(body.decode("utf-8"))
+
+
+@pytest.fixture
+def responses(monkeypatch):
+    monkeypatch.setattr(server, "_init_worker", fake_init_worker)
+
+    def run(*payloads):
+        async def requests():
+            http = HTTPServer(MicroBatcher("model", max_queue=3, max_wait=0.001), port=0)
+            await http.start()
+            try:
+                port = http._server.sockets[0].getsockname()[1]
+                return [await post(port, payload) for payload in payloads]
+            finally:
+                await http.stop()
+        return asyncio.run(requests())
+    return run
+
+
+def test_failed_text_does_not_fail_the_batch(responses):
+    (status, _, results), (single_status, _, single) = responses({"texts": ["a", "boom", "b"]},
+                                                                 {"text": "boom"})
+    assert status == 200
+    assert results[0] == {"text": "a"} and results[2] == {"text": "b"}
+    assert "can not parse" in results[1]["error"]
+    assert single_status == 500
+    assert "can not parse" in single["error"]
+
+
+def test_more_texts_than_the_queue_is_too_large(responses):
+    [(status, head, _)] = responses({"texts": ["a", "b", "c", "d"]})
+    assert status == 413
+    assert "Retry-After" not in head
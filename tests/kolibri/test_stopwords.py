@@ -0,0 +1,38 @@
+import pickle
+
+import pytest
+
+import kolibri.stopwords
+from kolibri.stopwords import StopwordSet
+from kolibri.stopwords import stopword_set
+
+STOP_WORDS = {"en": ["the", "a", "of"], "fr": ["le", "la", "déjà"]}
+
+
+@pytest.fixture
+def languages(monkeypatch):
+    def get_stop_words(language, cache=True, aggressive=False):
+        return STOP_WORDS[language]
+
+    monkeypatch.setattr(kolibri.stopwords, "get_stop_words", get_stop_words)
+    monkeypatch.setattr(kolibri.stopwords, "_STOPWORD_SETS", {})
+
+
+def test_membership_is_case_and_accent_insensitive():
+    words = StopwordSet(["The", "déjà"], accents=False)
+    assert "the" in words and "THE" in words
+    assert "deja" in words and "Déjà" in words
+    assert "cat" not in words
+    assert None not in words and ["the"] not in words
+    assert "the" in pickle.loads(pickle.dumps(words))
+
+
+def test_extra_words_are_added_to_the_language(languages):
+    words = stopword_set("en", ["invoice"])
+    assert set(words) == {"the", "a", "of", "invoice"}
+    assert stopword_set("en", ["invoice"]) is words
+
+
+def test_a_string_of_extra_words_is_a_language(languages):
+    assert set(stopword_set("en", "en")) == set(STOP_WORDS["en"])
+    assert set(stopword_set("en", "fr")) == set(STOP_WORDS["en"] + STOP_WORDS["fr"])
@@ -0,0 +1,88 @@
+import itertools
+import threading
+import time
+
+import pytest
+
+from kolibri.document import Document
+from kolibri.model import Interpreter
+from kolibri.pipeComponent import Component
+from kolibri.streaming import StreamPipeline
+
+
+class Upper(Component):
+    name = "upper"
+
+    def process(self, document, **kwargs):
+        if document.text == "boom":
+            raise ValueError("can not process")
+        document.target = {"name": document.text.upper(), "confidence": 1.0}
+        document.set_output_property("target")
+
+
+class Shuffle(Component):
+    """Takes longer on the first documents, so that the chunks of its
+    replicas finish out of order."""
+    name = "shuffle"
+
+    def process(self, document, **kwargs):
+        time.sleep(0.02 if int(document.text) < 4 else 0)
+
+
+def names(documents):
+    return [document.target["name"] for document in documents]
+
+
+def stage_threads():
+    return [thread for thread in threading.enumerate()
+            if thread.name.startswith("kolibri-stage-") and thread.is_alive()]
+
+
+def test_keeps_the_input_order():
+    texts = [str(i) for i in range(50)]
+    pipeline = StreamPipeline([Upper()], queue_size=4)
+    assert names(pipeline.run(Document(text) for text in texts)) == texts
+
+
+def test_keeps_the_input_order_with_replicas():
+    texts = [str(i) for i in range(40)]
+    pipeline = StreamPipeline([Shuffle(), Upper()], replicas={"shuffle": 3}, chunk_size=2)
+    assert names(pipeline.run(Document(text) for text in texts)) == texts
+
+
+def test_close_stops_an_endless_input():
+    documents = (Document(str(i)) for i in itertools.count())
+    results = StreamPipeline([Upper()], queue_size=2).run(documents)
+    assert names(itertools.islice(results, 5)) == ["0", "1", "2", "3", "4"]
+    results.close()
+    assert stage_threads() == []
+
+
+@pytest.mark.parametrize("replicas", [None, {"upper": 2}], ids=["thread", "process"])
+def test_stage_error_reaches_the_consumer(replicas):
+    texts = ["a", "b", "boom"] + ["c"] * 100
+    results = StreamPipeline([Upper()], replicas=replicas, chunk_size=1).run(
+            Document(text) for text in texts)
+    assert names(itertools.islice(results, 2)) == ["A", "B"]
+    with pytest.raises(ValueError, match="can not process"):
+        next(results)
+    assert stage_threads() == []
+
+
+def test_input_error_reaches_the_consumer():
+    def documents():
+        yield Document("a")
+        raise IOError("can not read")
+
+    results = StreamPipeline([Upper()]).run(documents())
+    assert names(itertools.islice(results, 1)) == ["A"]
+    with pytest.raises(IOError, match="can not read"):
+        next(results)
+
+
+def test_parse_stream_skips_empty_texts():
+    interpreter = Interpreter([Upper()], {})
+    results = list(interpreter.parse_stream(["a", "", "b", None]))
+    assert [result["text"] for result in results] == ["a", "", "b", ""]
+    assert [result["target"]["name"] for result in results] == ["A", None, "B", None]
+    assert results == [interpreter.parse(text) for text in ["a", "", "b", ""]]
@@ -0,0 +1,26 @@
+from types import SimpleNamespace
+
+from kolibri.tokenizer.token_ import Token
+from kolibri.vocabulary import Vocabulary
+
+
+def vocabulary():
+    vocabulary = Vocabulary(specials=())
+    for token in ["cat", "cat", "dog", "Paris"]:
+        vocabulary.add_token(token)
+    vocabulary.build()
+    return vocabulary
+
+
+def test_doc2bow_keeps_the_case_of_the_tokens():
+    vocab = vocabulary()
+    document = SimpleNamespace(tokens=[Token(t) for t in ["dog", "Cat", "cat", "paris", "Paris"]])
+    cat, dog, paris = vocab.token2id["cat"], vocab.token2id["dog"], vocab.token2id["paris"]
+    assert vocab.doc2bow(document) == sorted([(cat, 1), (dog, 1), (paris, 1)])
+    assert vocab.doc2bow(document, return_missing=True) == (sorted([(cat, 1), (dog, 1), (paris, 1)]),
+                                                           {"Cat": 1, "Paris": 1})
+
+
+def test_doc2id_lowercases_the_tokens():
+    vocab = vocabulary()
+    assert vocab.doc2id(["Cat", "PARIS"]) == [vocab.token2id["cat"], vocab.token2id["paris"]]